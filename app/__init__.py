@@ -1 +1,257 @@
 """Инициализация приложения Flask"""
+
+import functools
+import logging
+import os
+import tempfile
+from typing import Dict, Optional
+
+from flask import Flask
+
+logger = logging.getLogger(__name__)
+
+# Корень проекта (каталоги templates и static)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_config() -> Dict:
+    """
+    Прочитать конфигурацию из переменных окружения (и файла .env)
+
+    Returns:
+        Dict: Параметры конфигурации Flask
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    config = {}
+    config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+    config['SESSION_TYPE'] = os.getenv('SESSION_TYPE', 'memory')  # memory, sqlite или cookie
+    config['SESSION_SQLITE_PATH'] = os.getenv(
+        'SESSION_SQLITE_PATH', os.path.join(tempfile.gettempdir(), 'hostel_sessions.sqlite3')
+    )
+    config['SESSION_MAX_ENTRIES'] = int(os.getenv('SESSION_MAX_ENTRIES', 10000))
+    config['SESSION_SWEEP_INTERVAL'] = float(os.getenv('SESSION_SWEEP_INTERVAL', 300))  # секунд
+    config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 час
+    config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))  # байт
+    config['SSE_HEARTBEAT'] = float(os.getenv('SSE_HEARTBEAT', 15))  # секунд
+    config['SSE_CLIENT_BUFFER'] = int(os.getenv('SSE_CLIENT_BUFFER', 100))  # событий
+    config['SSE_EVENT_LOG_PATH'] = os.getenv('SSE_EVENT_LOG_PATH', '')  # пустое значение - события только внутри процесса
+    config['SSE_EVENT_POLL_INTERVAL'] = float(os.getenv('SSE_EVENT_POLL_INTERVAL', 0.5))  # секунд
+    config['USER_CACHE_TTL'] = float(os.getenv('USER_CACHE_TTL', 300))  # секунд
+    config['REPORT_CACHE_TTL'] = float(os.getenv('REPORT_CACHE_TTL', 300))  # секунд
+    config['REPORT_CACHE_SIZE'] = int(os.getenv('REPORT_CACHE_SIZE', 256))  # отчетов на БД
+    config['REPORT_CACHE_DIR'] = os.getenv('REPORT_CACHE_DIR', '')  # пустое значение - сброс только внутри процесса
+    config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 4))  # подключений на БД
+    config['DB_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT', 10))  # секунд
+    config['DB_READ_LIMIT'] = int(os.getenv('DB_READ_LIMIT', 3))  # одновременных чтений
+    config['DB_WRITE_LIMIT'] = int(os.getenv('DB_WRITE_LIMIT', 1))  # одновременных записей
+    config['DB_READ_QUEUE'] = int(os.getenv('DB_READ_QUEUE', 16))  # ожидающих чтений
+    config['DB_WRITE_QUEUE'] = int(os.getenv('DB_WRITE_QUEUE', 32))  # ожидающих записей
+    config['DB_ADMISSION_TIMEOUT'] = float(os.getenv('DB_ADMISSION_TIMEOUT', 2))  # секунд
+    config['DB_RETRY_ATTEMPTS'] = int(os.getenv('DB_RETRY_ATTEMPTS', 3))  # повторов чтения
+    config['DB_RETRY_BACKOFF'] = float(os.getenv('DB_RETRY_BACKOFF', 0.1))  # секунд
+    config['DB_BREAKER_THRESHOLD'] = int(os.getenv('DB_BREAKER_THRESHOLD', 3))  # ошибок подряд
+    config['DB_BREAKER_PROBE_INTERVAL'] = float(os.getenv('DB_BREAKER_PROBE_INTERVAL', 1))  # секунд
+    config['DB_TIMEOUT_LIST'] = float(os.getenv('DB_TIMEOUT_LIST', 30))  # секунд на выборку списка
+    config['DB_TIMEOUT_READ'] = float(os.getenv('DB_TIMEOUT_READ', 5))  # секунд на чтение карты
+    config['DB_TIMEOUT_WRITE'] = float(os.getenv('DB_TIMEOUT_WRITE', 10))  # секунд на изменение
+    config['UPLOAD_DIR'] = os.getenv(
+        'UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'hostel_uploads')
+    )
+    config['UPLOAD_MAX_SIZE'] = int(os.getenv('UPLOAD_MAX_SIZE', 2 * 1024 ** 3))  # байт
+    config['IMPORT_CHUNK_SIZE'] = int(os.getenv('IMPORT_CHUNK_SIZE', 500))  # строк в транзакции
+    config['BULK_CHUNK_SIZE'] = int(os.getenv('BULK_CHUNK_SIZE', 200))  # карт в транзакции
+    config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', 2))  # потоков фоновых задач
+    config['JOB_QUEUE'] = int(os.getenv('JOB_QUEUE', 20))  # задач в очереди
+    config['JOB_HEARTBEAT_INTERVAL'] = float(os.getenv('JOB_HEARTBEAT_INTERVAL', 10))  # секунд
+    config['JOBS_SQLITE_PATH'] = os.getenv(
+        'JOBS_SQLITE_PATH', os.path.join(tempfile.gettempdir(), 'hostel_jobs.sqlite3')
+    )  # пустое значение - состояние задач только в памяти процесса
+    config['CARD_REPLICA_DIR'] = os.getenv('CARD_REPLICA_DIR', '')  # пустое значение - без копии
+    config['CARD_REPLICA_MODE'] = os.getenv('CARD_REPLICA_MODE', 'fallback')  # fallback или always
+    config['CARD_REPLICA_SYNC_INTERVAL'] = float(os.getenv('CARD_REPLICA_SYNC_INTERVAL', 30))  # секунд
+    config['CARD_REPLICA_FULL_SYNC_INTERVAL'] = float(
+        os.getenv('CARD_REPLICA_FULL_SYNC_INTERVAL', 3600)
+    )  # секунд
+    config['CARD_SNAPSHOT_DIR'] = os.getenv('CARD_SNAPSHOT_DIR', '')  # пустое значение - без общего снимка
+    config['CARD_SNAPSHOT_INTERVAL'] = float(os.getenv('CARD_SNAPSHOT_INTERVAL', 10))  # секунд
+    config['WRITE_BEHIND_PATH'] = os.getenv('WRITE_BEHIND_PATH', '')  # пустое значение - без отложенной записи
+    config['WRITE_BEHIND_INTERVAL'] = float(os.getenv('WRITE_BEHIND_INTERVAL', 5))  # секунд
+    config['PROFILE_DIR'] = os.getenv(
+        'PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'hostel_profiles')
+    )  # пустое значение - без профилей отдельных запросов
+    config['PROFILE_KEEP'] = int(os.getenv('PROFILE_KEEP', 50))  # файлов профилей
+    config['PROFILE_MAX_SECONDS'] = float(os.getenv('PROFILE_MAX_SECONDS', 60))  # секунд
+    config['PROFILE_SAMPLE_INTERVAL'] = float(os.getenv('PROFILE_SAMPLE_INTERVAL', 0.005))  # секунд
+    config['ASGI_WSGI_THREADS'] = int(os.getenv('ASGI_WSGI_THREADS', 8))  # потоков моста WSGI
+    return config
+
+
+def create_app(config: Optional[Dict] = None) -> Flask:
+    """
+    Создать приложение Flask
+
+    При запуске в нескольких процессах приложение создается в каждом рабочем
+    процессе после fork, поэтому пулы подключений, кэши и подписки на
+    события у каждого процесса свои.
+
+    Args:
+        config: Параметры, переопределяющие конфигурацию из окружения
+
+    Returns:
+        Flask: Приложение
+    """
+    logging.basicConfig(level=logging.INFO)
+
+    from app.managers import admission, circuit_breaker, connection_pool
+    from app.managers.database_manager import LIST, READ, WRITE, DatabaseManager
+    from app.managers.event_broadcaster import EventBroadcaster, SQLiteEventLog
+    from app.managers.card_bulk import bulk_retryable, run_bulk_job
+    from app.managers.card_import import run_import_job
+    from app.managers.card_replica import MODES, CardReplica, ReplicaSynchronizer
+    from app.managers.card_snapshot import SharedCardSnapshot, SnapshotRefresher
+    from app.managers.jobs import JobRegistry, SQLiteJobStore, job_connection
+    from app.managers.report_cache import ReportCache
+    from app.managers.session_store import create_session_interface
+    from app.managers.user_cache import UserCache
+    from app.managers.write_journal import WriteJournal, WriteReplayer
+    from app.routes import CARD_LIST_ENCODERS, bp, publish_replayed_edit
+    from app.utils.compression import StaticCompressionCache
+    from app.utils.json_encoder import SnapshotCache
+    from app.utils.profiling import RequestProfiles
+    from app.utils.uploads import UploadRequest, cleanup_partial_uploads
+
+    app = Flask(__name__, root_path=ROOT_DIR)
+    app.config.update(load_config())
+    if config:
+        app.config.update(config)
+    if app.config.get('MAX_CONTENT_LENGTH') is None:
+        # Запас на остальные поля формы выбора БД
+        app.config['MAX_CONTENT_LENGTH'] = app.config['UPLOAD_MAX_SIZE'] + 64 * 1024
+
+    UserCache.default_ttl = app.config['USER_CACHE_TTL']
+    ReportCache.default_ttl = app.config['REPORT_CACHE_TTL']
+    ReportCache.default_max_entries = app.config['REPORT_CACHE_SIZE']
+    ReportCache.directory = app.config['REPORT_CACHE_DIR'] or None
+    # Пул вмещает все допущенные чтения и записи: одновременность ограничивают
+    # лимиты, а записи не ждут подключений, занятых чтениями
+    connection_pool.default_pool_size = max(
+        app.config['DB_POOL_SIZE'], app.config['DB_READ_LIMIT'] + app.config['DB_WRITE_LIMIT']
+    )
+    admission.default_settings = {
+        'read_limit': app.config['DB_READ_LIMIT'],
+        'write_limit': app.config['DB_WRITE_LIMIT'],
+        'read_queue': app.config['DB_READ_QUEUE'],
+        'write_queue': app.config['DB_WRITE_QUEUE'],
+        'timeout': app.config['DB_ADMISSION_TIMEOUT'],
+    }
+
+    DatabaseManager.retry_attempts = app.config['DB_RETRY_ATTEMPTS']
+    DatabaseManager.retry_backoff = app.config['DB_RETRY_BACKOFF']
+    DatabaseManager.statement_timeouts = {
+        LIST: app.config['DB_TIMEOUT_LIST'],
+        READ: app.config['DB_TIMEOUT_READ'],
+        WRITE: app.config['DB_TIMEOUT_WRITE'],
+    }
+    circuit_breaker.default_settings = {
+        'failure_threshold': app.config['DB_BREAKER_THRESHOLD'],
+        'probe_interval': app.config['DB_BREAKER_PROBE_INTERVAL'],
+    }
+
+    # Локальная копия карт: чтение списка без Firebird и при его недоступности
+    if app.config['CARD_REPLICA_MODE'] not in MODES:
+        raise ValueError(f"Неизвестный режим локальной копии: {app.config['CARD_REPLICA_MODE']}")
+    CardReplica.directory = app.config['CARD_REPLICA_DIR'] or None
+    DatabaseManager.replica_mode = app.config['CARD_REPLICA_MODE']
+    if CardReplica.directory:
+        synchronizer = ReplicaSynchronizer(
+            functools.partial(job_connection, kind=admission.READ,
+                              acquire_timeout=app.config['DB_POOL_TIMEOUT']),
+            interval=app.config['CARD_REPLICA_SYNC_INTERVAL'],
+            full_interval=app.config['CARD_REPLICA_FULL_SYNC_INTERVAL']
+        )
+        synchronizer.start()
+        app.extensions['card_replica_sync'] = synchronizer
+
+    # Общий снимок списка карт: один файл на узел, отображаемый в память
+    # всеми процессами; снимок старше трех интервалов обновления не отдается
+    SharedCardSnapshot.directory = app.config['CARD_SNAPSHOT_DIR'] or None
+    SharedCardSnapshot.max_age = app.config['CARD_SNAPSHOT_INTERVAL'] * 3
+    if SharedCardSnapshot.directory:
+        refresher = SnapshotRefresher(
+            functools.partial(job_connection, kind=admission.READ,
+                              acquire_timeout=app.config['DB_POOL_TIMEOUT']),
+            CARD_LIST_ENCODERS,
+            interval=app.config['CARD_SNAPSHOT_INTERVAL']
+        )
+        refresher.start()
+        app.extensions['card_snapshot_refresh'] = refresher
+
+    # Загружаемые файлы БД пишутся на диск по мере приема с вычислением хеша
+    app.request_class = UploadRequest
+    cleanup_partial_uploads(app.config['UPLOAD_DIR'])
+
+    # Серверные сессии: в cookie хранится только идентификатор сессии
+    session_interface = create_session_interface(
+        app.config['SESSION_TYPE'],
+        sqlite_path=app.config['SESSION_SQLITE_PATH'],
+        max_entries=app.config['SESSION_MAX_ENTRIES'],
+        sweep_interval=app.config['SESSION_SWEEP_INTERVAL']
+    )
+    if session_interface is not None:
+        app.session_interface = session_interface
+
+    app.extensions['card_snapshots'] = SnapshotCache()
+    app.extensions['static_compression'] = StaticCompressionCache()
+    if app.config['PROFILE_DIR']:
+        app.extensions['request_profiles'] = RequestProfiles(app.config['PROFILE_DIR'],
+                                                             app.config['PROFILE_KEEP'])
+
+    # Фоновые задачи: ограниченный пул потоков, состояние в SQLite
+    jobs_path = app.config['JOBS_SQLITE_PATH']
+    jobs = JobRegistry(
+        workers=app.config['JOB_WORKERS'],
+        max_queued=app.config['JOB_QUEUE'],
+        store=SQLiteJobStore(jobs_path) if jobs_path else None,
+        heartbeat_interval=app.config['JOB_HEARTBEAT_INTERVAL']
+    )
+    jobs.register('import', run_import_job)
+    jobs.register('bulk', run_bulk_job, retryable=bulk_retryable)
+    jobs.start()
+    app.extensions['jobs'] = jobs
+    # События изменений карт: общий журнал доставляет их подписчикам всех процессов
+    event_log_path = app.config['SSE_EVENT_LOG_PATH']
+    card_events = EventBroadcaster(
+        max_events=app.config['SSE_CLIENT_BUFFER'],
+        log=SQLiteEventLog(event_log_path) if event_log_path else None,
+        poll_interval=app.config['SSE_EVENT_POLL_INTERVAL']
+    )
+    app.extensions['card_events'] = card_events
+
+    # Отложенная запись: изменения карт при недоступности БД ждут в журнале
+    if app.config['WRITE_BEHIND_PATH']:
+        journal = WriteJournal(app.config['WRITE_BEHIND_PATH'])
+        replayer = WriteReplayer(
+            journal,
+            functools.partial(job_connection, kind=admission.WRITE,
+                              acquire_timeout=app.config['DB_POOL_TIMEOUT']),
+            interval=app.config['WRITE_BEHIND_INTERVAL'],
+            on_applied=functools.partial(publish_replayed_edit, card_events)
+        )
+        replayer.start()
+        jobs.journal = journal
+        app.extensions['write_journal'] = journal
+        app.extensions['write_replayer'] = replayer
+
+    app.register_blueprint(bp)
+    return app
+
+
+def __getattr__(name: str):
+    """Приложение с конфигурацией по умолчанию (from app import app)"""
+    if name == 'app':
+        application = create_app()
+        globals()['app'] = application
+        return application
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,149 @@
+"""
+Командная строка приложения.
+
+    python -m app serve --workers 4 --threads 8 --port 8000
+    python -m app import-cards --db /path/to/guardee.fdb cards.csv
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+
+def _env_list(name: str) -> List[str]:
+    """Список значений переменной окружения через запятую"""
+    return [item.strip() for item in os.getenv(name, '').split(',') if item.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Создать разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(prog='python -m app', description='Управление картами хостела')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='Запустить сервер с рабочими процессами')
+    serve.add_argument('--host', default=os.getenv('SERVE_HOST', '127.0.0.1'))
+    serve.add_argument('--port', type=int, default=int(os.getenv('SERVE_PORT', 8000)))
+    serve.add_argument('--workers', type=int, default=int(os.getenv('SERVE_WORKERS', 2)),
+                       help='Количество рабочих процессов')
+    serve.add_argument('--threads', type=int, default=int(os.getenv('SERVE_THREADS', 8)),
+                       help='Количество потоков в рабочем процессе')
+    serve.add_argument('--streams', type=int, default=int(os.getenv('SERVE_STREAMS', 16)),
+                       help='Количество потоков событий (SSE) в рабочем процессе сверх --threads')
+    serve.add_argument('--max-requests', type=int, default=int(os.getenv('SERVE_MAX_REQUESTS', 0)),
+                       help='Перезапускать процесс после указанного количества запросов (0 - нет)')
+    serve.add_argument('--max-requests-jitter', type=int,
+                       default=int(os.getenv('SERVE_MAX_REQUESTS_JITTER', 0)))
+    serve.add_argument('--graceful-timeout', type=float,
+                       default=float(os.getenv('SERVE_GRACEFUL_TIMEOUT', 30)),
+                       help='Время на завершение запросов при остановке (секунды)')
+    serve.add_argument('--warmup', action='append', default=None, metavar='DB_PATH',
+                       help='БД, подключения и кэши которой прогреваются при запуске процесса')
+    serve.add_argument('--warmup-connections', type=int,
+                       default=int(os.getenv('WARMUP_CONNECTIONS', 1)))
+
+    import_cards = commands.add_parser('import-cards', help='Импортировать карты из CSV')
+    import_cards.add_argument('file', help='Файл CSV (card_number, room, valid_until или valid_days)')
+    import_cards.add_argument('--db', required=True, metavar='DB_PATH', help='Путь к файлу БД')
+    import_cards.add_argument('--chunk-size', type=int,
+                              default=int(os.getenv('IMPORT_CHUNK_SIZE', 500)),
+                              help='Количество строк в одной транзакции')
+    return parser
+
+
+def import_cards(file: str, db_path: str, chunk_size: int) -> int:
+    """
+    Импортировать карты из CSV с выводом прогресса
+
+    Returns:
+        int: Код завершения (0 - все строки импортированы, 1 - есть ошибки)
+    """
+    from app.managers.card_import import CardImporter, read_csv, single_connection
+    from app.managers.database_manager import DatabaseManager
+
+    db_manager = DatabaseManager(db_path)
+    db_manager.connect()
+    started = time.monotonic()
+
+    def progress(processed: int, summary: dict) -> None:
+        print(f"\rстрок: {processed}, ошибок: {summary['failed']}, "
+              f"{processed / max(time.monotonic() - started, 1e-6):.0f} строк/с",
+              end='', file=sys.stderr, flush=True)
+
+    try:
+        with open(file, 'rb') as stream:
+            summary = CardImporter(lambda: single_connection(db_manager), chunk_size,
+                                   progress).run(read_csv(stream))
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        db_manager.disconnect()
+    print(file=sys.stderr)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 1 if summary['failed'] else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Точка входа командной строки
+
+    Args:
+        argv: Аргументы (по умолчанию sys.argv)
+
+    Returns:
+        int: Код завершения
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        from app.server import ServeOptions, serve
+
+        config = {}
+        if args.workers > 1:
+            session_type = os.getenv('SESSION_TYPE')
+            if session_type is None:
+                # Сессии в памяти не видны другим процессам
+                config['SESSION_TYPE'] = 'sqlite'
+            elif session_type == 'memory':
+                # Вход, выполненный в одном процессе, не виден другим
+                parser.error('SESSION_TYPE=memory нельзя использовать при --workers больше 1: '
+                             'укажите sqlite или cookie')
+            if os.getenv('SSE_EVENT_LOG_PATH') is None:
+                # Событие, записанное одним процессом, доставляется подписчикам всех
+                config['SSE_EVENT_LOG_PATH'] = os.path.join(tempfile.gettempdir(),
+                                                            'hostel_events.sqlite3')
+            if os.getenv('REPORT_CACHE_DIR') is None:
+                # Изменение карт в одном процессе сбрасывает отчеты всех
+                config['REPORT_CACHE_DIR'] = os.path.join(tempfile.gettempdir(),
+                                                          'hostel_reports')
+
+        options = ServeOptions(
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            threads=args.threads,
+            streams=args.streams,
+            max_requests=args.max_requests,
+            max_requests_jitter=args.max_requests_jitter,
+            graceful_timeout=args.graceful_timeout,
+            warmup_databases=args.warmup if args.warmup is not None else _env_list('WARMUP_DATABASES'),
+            warmup_connections=args.warmup_connections
+        )
+        serve(options, config)
+    elif args.command == 'import-cards':
+        return import_cards(args.file, args.db, args.chunk_size)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
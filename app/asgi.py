@@ -0,0 +1,465 @@
+"""
+ASGI-вариант приложения.
+
+API карт (/cards) и поток событий (/cards/events) обрабатываются в event
+loop: блокирующие вызовы DatabaseManager выполняются в ограниченном пуле
+потоков DatabaseExecutor, а ожидающие клиенты Server-Sent Events не
+занимают потоков. Остальные маршруты (выбор БД, вход, страницы, статика)
+передаются приложению Flask через мост WSGI.
+
+Запуск: uvicorn --factory app.asgi:create_asgi_app
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from flask import Flask
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, Rule
+
+from app.managers.admission import READ, WRITE, AdmissionRejected, get_admission
+from app.managers.auth_manager import AuthManager
+from app.managers.circuit_breaker import DatabaseUnavailable
+from app.managers.database_executor import get_executor, shutdown_executors
+from app.managers.connection_pool import PoolTimeoutError
+from app.routes import (CARD_LIST_FORMATS, build_card_event, card_edit_params, card_event_type,
+                        load_card_snapshot, parse_card_list_args, replica_header_items)
+from app.utils.compression import negotiate
+from app.utils.db_errors import StatementTimeout
+from app.utils.error_handler import ErrorHandler
+from app.utils.json_encoder import dumps
+
+logger = logging.getLogger(__name__)
+
+# Маршруты, обрабатываемые асинхронно (остальные передаются приложению Flask)
+ASYNC_ROUTES = Map([
+    Rule('/cards', endpoint='list_cards', methods=['GET']),
+    Rule('/cards', endpoint='create_card', methods=['POST']),
+    Rule('/cards/events', endpoint='card_events', methods=['GET']),
+    Rule('/cards/<int:card_id>', endpoint='get_card', methods=['GET']),
+    Rule('/cards/<int:card_id>', endpoint='update_card', methods=['PUT']),
+    Rule('/cards/<int:card_id>', endpoint='delete_card', methods=['DELETE']),
+])
+
+# Проверки разрешений асинхронных маршрутов
+PERMISSIONS = {
+    'list_cards': AuthManager.compile_permission('can_view'),
+    'card_events': AuthManager.compile_permission('can_view'),
+    'get_card': AuthManager.compile_permission('can_view'),
+    'create_card': AuthManager.compile_permission('can_create'),
+    'update_card': AuthManager.compile_permission('can_edit'),
+    'delete_card': AuthManager.compile_permission('can_delete'),
+}
+
+ERRORS = {401: 'Unauthorized', 403: 'Forbidden'}
+
+# Ошибки, при которых изменение карты ставится в журнал отложенной записи
+WRITE_STALLS = (AdmissionRejected, DatabaseUnavailable, StatementTimeout, PoolTimeoutError)
+
+
+class _BodyStream:
+    """wsgi.input для моста WSGI: тело запроса читается из ASGI по мере необходимости"""
+
+    def __init__(self, chunks: 'queue.Queue[Optional[bytes]]'):
+        self._chunks = chunks
+        self._buffer = b''
+        self._eof = False
+
+    def _fill(self, size: int) -> None:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._eof = True
+            else:
+                self._buffer += chunk
+
+    def read(self, size: int = -1) -> bytes:
+        self._fill(size)
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def readline(self, size: int = -1) -> bytes:
+        while b'\n' not in self._buffer and not self._eof:
+            self._fill(len(self._buffer) + 1)
+        end = self._buffer.find(b'\n') + 1 or len(self._buffer)
+        if size >= 0:
+            end = min(end, size)
+        data, self._buffer = self._buffer[:end], self._buffer[end:]
+        return data
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+
+def build_environ(scope: Dict, body) -> Dict:
+    """
+    Сформировать окружение WSGI из scope ASGI
+
+    Args:
+        scope: Scope HTTP-запроса ASGI
+        body: Поток тела запроса (wsgi.input)
+
+    Returns:
+        Dict: Окружение WSGI
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class CardsASGI:
+    """ASGI-приложение: асинхронный API карт поверх приложения Flask"""
+
+    def __init__(self, flask_app: Flask, wsgi_threads: int = 8):
+        """
+        Инициализация приложения
+
+        Args:
+            flask_app: Приложение Flask (create_app)
+            wsgi_threads: Количество потоков моста WSGI для остальных маршрутов
+        """
+        self.flask_app = flask_app
+        self.config = flask_app.config
+        self.events = flask_app.extensions['card_events']
+        self.snapshots = flask_app.extensions['card_snapshots']
+        self._wsgi_executor = ThreadPoolExecutor(max_workers=wsgi_threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope: Dict, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        adapter = ASYNC_ROUTES.bind('localhost')
+        try:
+            endpoint, values = adapter.match(scope['path'], scope['method'])
+        except HTTPException:
+            await self._call_wsgi(scope, receive, send)
+            return
+        if endpoint == 'list_cards' and dict(parse_qsl(
+                scope.get('query_string', b'').decode('latin-1'))).get('profile') == '1':
+            # Профиль cProfile снимается маршрутом Flask
+            await self._call_wsgi(scope, receive, send)
+            return
+
+        session = self._open_session(scope)
+        status = AuthManager.authorize(session, PERMISSIONS[endpoint])
+        if status is not None:
+            await self._send_json(send, {'error': ERRORS[status]}, status)
+            return
+
+        handler = getattr(self, endpoint)
+        try:
+            await handler(scope, receive, send, session, **values)
+        except (AdmissionRejected, DatabaseUnavailable) as e:
+            await self._send(send, 503, [(b'content-type', b'application/json'),
+                                         (b'retry-after', str(e.retry_after).encode())],
+                             dumps({'error': str(e)}))
+        except StatementTimeout as e:
+            await self._send_json(send, *ErrorHandler.handle_database_error(e))
+        except Exception as e:
+            logger.error(f"Ошибка обработки {scope['method']} {scope['path']}: {str(e)}")
+            await self._send_json(send, {'error': str(e)}, 500)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.events.close_all()
+                shutdown_executors(wait=False)
+                self._wsgi_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _open_session(self, scope: Dict):
+        """Загрузить сессию Flask по cookie запроса"""
+        request = self.flask_app.request_class(build_environ(scope, None))
+        return self.flask_app.session_interface.open_session(self.flask_app, request)
+
+    async def _run(self, session, kind: str, func, *args):
+        """
+        Выполнить операцию с БД сессии, получив слот ограничителя чтений или записей
+
+        Raises:
+            AdmissionRejected: Если слот не получен
+        """
+        db_path = session['db_path']
+        limiter = get_admission(db_path).limiter(kind)
+        await limiter.acquire_async()
+        started = time.monotonic()
+        try:
+            return await get_executor(db_path, self.config['DB_POOL_TIMEOUT']).run(func, *args)
+        finally:
+            limiter.release(time.monotonic() - started)
+
+    @staticmethod
+    async def _read_json(receive) -> Dict:
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        return json.loads(body) if body else {}
+
+    @staticmethod
+    async def _send(send, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': headers + [(b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _send_json(self, send, data, status: int = 200) -> None:
+        await self._send(send, status, [(b'content-type', b'application/json')], dumps(data))
+
+    async def list_cards(self, scope, receive, send, session) -> None:
+        """GET /cards (параметры format, fields, ids - как у маршрута Flask)"""
+        try:
+            fmt, fields, card_ids = parse_card_list_args(dict(parse_qsl(
+                scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True
+            )))
+        except ValueError as e:
+            await self._send_json(send, {'error': str(e)}, 400)
+            return
+
+        def load(db_manager):
+            snapshot = load_card_snapshot(db_manager, self.snapshots, session['db_path'], fmt,
+                                          fields, card_ids)
+            return snapshot, replica_header_items(db_manager)
+
+        snapshot, replica = await self._run(session, READ, load)
+        headers = [(b'content-type', CARD_LIST_FORMATS[fmt][1].encode()),
+                   (b'vary', b'Accept-Encoding')]
+        headers += [(name.lower().encode(), value.encode()) for name, value in replica.items()]
+        encoding = None
+        if snapshot.size >= self.config['COMPRESS_MIN_SIZE']:
+            accept = dict(scope.get('headers', [])).get(b'accept-encoding', b'').decode('latin-1')
+            encoding = negotiate(accept)
+        if getattr(snapshot, 'stream', None) is not None:
+            # Снимок в mmap: сохраненное тело или его сжатая копия - частями
+            if encoding is not None and snapshot.variant(encoding) is None:
+                encoding = None
+            if encoding is not None:
+                headers.append((b'content-encoding', encoding.encode()))
+            size = len(snapshot.variant(encoding))
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': headers + [(b'content-length', str(size).encode())]})
+            for chunk in snapshot.stream(encoding):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        if encoding is not None:
+            body = snapshot.compressed(encoding)
+            headers.append((b'content-encoding', encoding.encode()))
+        else:
+            body = snapshot.body
+        await self._send(send, 200, headers, body)
+
+    async def get_card(self, scope, receive, send, session, card_id: int) -> None:
+        """GET /cards/<id>"""
+        result = await self._run(
+            session, READ, lambda db_manager: db_manager.call_cardedit_procedure(action=0, card_number=card_id)
+        )
+        await self._send_json(send, result)
+
+    async def _edit(self, send, session, edit, card_id: Optional[int] = None) -> None:
+        """Выполнить изменение карты и разослать событие (одно подключение из пула)"""
+        def run(db_manager):
+            event_type, result = edit(db_manager)
+            return result, build_card_event(db_manager, event_type, result, card_id)
+
+        result, event = await self._run(session, WRITE, run)
+        if event is not None:
+            self.events.publish(session['db_path'], event)
+        await self._send_json(send, result)
+
+    async def _save(self, scope, send, session, params: Dict, card_id: Optional[int] = None) -> None:
+        """
+        Изменить карту через HOSTEL_CARDEDIT; при недоступности БД - поставить
+        изменение в журнал отложенной записи (как routes.edit_card)
+        """
+        journal = self.flask_app.extensions.get('write_journal')
+        db_path = session['db_path']
+        if journal is None or not journal.pending_count(db_path):
+            def edit(db_manager):
+                result = db_manager.call_cardedit_procedure(**params)
+                return card_event_type(params['action'], result), result
+
+            try:
+                await self._edit(send, session, edit, card_id)
+                return
+            except WRITE_STALLS as e:
+                if journal is None:
+                    raise
+                logger.warning(f"БД {db_path} не отвечает, изменение карты "
+                               f"{params.get('card_number')} отложено: {str(e)}")
+
+        key = dict(scope.get('headers', [])).get(b'idempotency-key')
+        # Запись в журнал ждет fsync - вне event loop
+        entry = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: journal.append(db_path, params, key=key.decode('latin-1') if key else None,
+                                         user_id=session.get('user_id'))
+        )
+        await self._send(send, 202, [(b'content-type', b'application/json'),
+                                     (b'location', f"/cards/queued/{entry['id']}".encode())],
+                         dumps({'status': 'queued', 'entry': entry}))
+
+    async def create_card(self, scope, receive, send, session) -> None:
+        """POST /cards"""
+        await self._save(scope, send, session, card_edit_params(await self._read_json(receive)))
+
+    async def update_card(self, scope, receive, send, session, card_id: int) -> None:
+        """PUT /cards/<id>"""
+        params = card_edit_params(await self._read_json(receive), card_id)
+        await self._save(scope, send, session, params, card_id)
+
+    async def delete_card(self, scope, receive, send, session, card_id: int) -> None:
+        """DELETE /cards/<id>"""
+        await self._save(scope, send, session, {'action': 2, 'card_number': card_id}, card_id)
+
+    async def card_events(self, scope, receive, send, session) -> None:
+        """GET /cards/events - поток Server-Sent Events без выделенного потока"""
+        headers = dict(scope.get('headers', []))
+        last_event_id = headers.get(b'last-event-id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_event_id = None
+
+        subscription = self.events.subscribe(session['db_path'], last_event_id)
+
+        async def wait_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            subscription.close()
+
+        watcher = asyncio.ensure_future(wait_disconnect())
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ]})
+            async for message in self.events.astream(subscription, self.config['SSE_HEARTBEAT']):
+                await send({'type': 'http.response.body', 'body': message.encode('utf-8'),
+                            'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            watcher.cancel()
+            self.events.unsubscribe(subscription)
+
+    async def _call_wsgi(self, scope: Dict, receive, send) -> None:
+        """Передать запрос приложению Flask (в потоке моста WSGI)"""
+        loop = asyncio.get_running_loop()
+        chunks: 'queue.Queue[Optional[bytes]]' = queue.Queue()
+        environ = build_environ(scope, _BodyStream(chunks))
+
+        async def pump_body():
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    break
+                chunks.put(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            chunks.put(None)
+
+        def send_sync(message: Dict) -> None:
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def run_app() -> None:
+            # Начало ответа отправляется вместе с первой частью тела
+            pending = {}
+
+            def flush_start() -> None:
+                if pending:
+                    send_sync(pending.pop('start'))
+
+            def write(data: bytes) -> None:
+                flush_start()
+                if data:
+                    send_sync({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+            def start_response(status, response_headers, exc_info=None):
+                pending['start'] = {
+                    'type': 'http.response.start',
+                    'status': int(status.split(' ', 1)[0]),
+                    'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                for name, value in response_headers],
+                }
+                return write
+
+            result = self.flask_app.wsgi_app(environ, start_response)
+            try:
+                for data in result:
+                    write(data)
+                flush_start()
+                send_sync({'type': 'http.response.body', 'body': b''})
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+
+        pump = asyncio.ensure_future(pump_body())
+        try:
+            await loop.run_in_executor(self._wsgi_executor, run_app)
+        finally:
+            pump.cancel()
+
+
+def create_asgi_app(config: Optional[Dict] = None) -> CardsASGI:
+    """
+    Создать ASGI-приложение
+
+    Args:
+        config: Параметры, переопределяющие конфигурацию из окружения
+
+    Returns:
+        CardsASGI: Приложение ASGI
+    """
+    from app import create_app
+
+    flask_app = create_app(config)
+    return CardsASGI(flask_app, flask_app.config['ASGI_WSGI_THREADS'])
@@ -0,0 +1,274 @@
+"""
+Ограничение количества одновременных операций с БД (admission control).
+Для каждой БД отдельно ограничиваются чтения и записи: тяжелые выборки
+списка карт отклоняются, не мешая выдаче карт. Запрос, не получивший
+слот за отведенное время или не поместившийся в очередь, сразу получает
+отказ с рекомендуемым временем повтора.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+READ = 'read'
+WRITE = 'write'
+
+
+class AdmissionRejected(Exception):
+    """Операция отклонена: превышен лимит одновременных операций"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        """
+        Args:
+            message: Описание причины
+            retry_after: Рекомендуемое время повтора (секунды)
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """Ожидающий слот запрос"""
+
+    __slots__ = ('wake', 'granted')
+
+    def __init__(self, wake: Callable[[], None]):
+        self.wake = wake
+        self.granted = False
+
+
+class Limiter:
+    """Ограничитель одновременных операций с очередью ожидания (FIFO)"""
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        """
+        Инициализация ограничителя
+
+        Args:
+            name: Имя для журнала и сообщений
+            limit: Максимальное количество одновременных операций
+            queue_size: Максимальное количество ожидающих операций
+            timeout: Максимальное время ожидания слота (секунды)
+        """
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.rejected = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+        # Скользящее среднее длительности операции (для Retry-After)
+        self._avg_duration = 0.0
+
+    @property
+    def waiting(self) -> int:
+        """Количество ожидающих операций"""
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Оценка времени освобождения очереди (секунды, не меньше 1)"""
+        backlog = (len(self._waiters) + 1) / max(self.limit, 1)
+        return max(1, math.ceil(self._avg_duration * backlog))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.rejected += 1
+        logger.warning(f"{self.name}: операция отклонена ({reason}), "
+                       f"выполняется {self.active}, ожидает {len(self._waiters)}")
+        return AdmissionRejected(f"{self.name}: {reason}", self.retry_after())
+
+    def _try_enter(self, wake: Callable[[], None]) -> Optional[_Waiter]:
+        """Занять слот или встать в очередь (под блокировкой)"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.queue_size:
+            raise self._reject('очередь заполнена')
+        waiter = _Waiter(wake)
+        self._waiters.append(waiter)
+        return waiter
+
+    def _give_up(self, waiter: _Waiter) -> bool:
+        """
+        Отказаться от ожидания по истечении времени
+
+        Returns:
+            bool: True если слот все же был выдан до отказа
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+        return False
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        """
+        Получить слот (блокирующее ожидание)
+
+        Args:
+            timeout: Время ожидания (по умолчанию - timeout ограничителя)
+
+        Raises:
+            AdmissionRejected: Если очередь заполнена или время ожидания истекло
+        """
+        event = threading.Event()
+        with self._lock:
+            waiter = self._try_enter(event.set)
+        if waiter is None:
+            return
+        if event.wait(self.timeout if timeout is None else timeout) or self._give_up(waiter):
+            return
+        raise self._reject('время ожидания истекло')
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> None:
+        """
+        Получить слот (ожидание в event loop)
+
+        Args:
+            timeout: Время ожидания (по умолчанию - timeout ограничителя)
+
+        Raises:
+            AdmissionRejected: Если очередь заполнена или время ожидания истекло
+        """
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(True))
+
+        with self._lock:
+            waiter = self._try_enter(wake)
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(granted), self.timeout if timeout is None else timeout)
+            return
+        except asyncio.TimeoutError:
+            if self._give_up(waiter):
+                return
+        except asyncio.CancelledError:
+            # Задача отменена в очереди (клиент отключился): выданный слот
+            # возвращается, иначе он достался бы ожидающему, которого уже нет
+            if self._give_up(waiter):
+                self.release()
+            raise
+        raise self._reject('время ожидания истекло')
+
+    def release(self, duration: Optional[float] = None) -> None:
+        """
+        Освободить слот (передается первому ожидающему)
+
+        Args:
+            duration: Длительность завершенной операции (секунды)
+        """
+        with self._lock:
+            if duration is not None:
+                self._avg_duration += (duration - self._avg_duration) * 0.2
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.wake()
+            else:
+                self.active -= 1
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        Контекстный менеджер: занять слот на время операции
+
+        Args:
+            timeout: Время ожидания слота (секунды)
+        """
+        self.acquire(timeout)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+
+class AdmissionController:
+    """Ограничители чтений и записей одной БД"""
+
+    def __init__(self, db_path: str, read_limit: int = 3, write_limit: int = 1,
+                 read_queue: int = 16, write_queue: int = 32, timeout: float = 2.0):
+        """
+        Инициализация
+
+        Args:
+            db_path: Путь к файлу БД
+            read_limit: Максимальное количество одновременных чтений
+            write_limit: Максимальное количество одновременных записей
+            read_queue: Размер очереди чтений
+            write_queue: Размер очереди записей
+            timeout: Максимальное время ожидания слота (секунды)
+        """
+        self.db_path = db_path
+        self.limiters = {
+            READ: Limiter(f'{db_path} (чтение)', read_limit, read_queue, timeout),
+            WRITE: Limiter(f'{db_path} (запись)', write_limit, write_queue, timeout),
+        }
+
+    def limiter(self, kind: str) -> Limiter:
+        """
+        Получить ограничитель
+
+        Args:
+            kind: read или write
+
+        Returns:
+            Limiter
+        """
+        return self.limiters[kind]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Текущее состояние ограничителей (для мониторинга)"""
+        return {kind: {'active': limiter.active, 'waiting': limiter.waiting,
+                       'rejected': limiter.rejected}
+                for kind, limiter in self.limiters.items()}
+
+
+# Параметры контроллеров, создаваемых через get_admission
+default_settings: Dict[str, float] = {}
+
+_controllers: Dict[str, AdmissionController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_admission(db_path: str) -> AdmissionController:
+    """
+    Получить контроллер БД (создается при первом обращении с default_settings)
+
+    Args:
+        db_path: Путь к файлу БД
+
+    Returns:
+        AdmissionController
+    """
+    controller = _controllers.get(db_path)
+    if controller is None:
+        with _controllers_lock:
+            controller = _controllers.get(db_path)
+            if controller is None:
+                controller = AdmissionController(db_path, **default_settings)
+                _controllers[db_path] = controller
+    return controller
+
+
+def _after_fork_in_child() -> None:
+    """Сбросить контроллеры в дочернем процессе (слоты родителя не наследуются)"""
+    global _controllers_lock
+    _controllers_lock = threading.Lock()
+    _controllers.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
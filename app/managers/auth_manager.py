@@ -3,10 +3,25 @@ AuthManager для управления аутентификацией и сес
 """
 
 import logging
-from typing import Dict, Optional
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+from flask import abort, session as flask_session
 
 logger = logging.getLogger(__name__)
 
+# Биты FLAGS, дающие права доступа (0 - право есть у всех)
+PERMISSION_BITS = {
+    'can_view': 0,
+    'can_create': 0x01,  # Бит 0 - создание
+    'can_edit': 0x02,    # Бит 1 - редактирование
+    'can_delete': 0x04,  # Бит 2 - удаление
+    'is_admin': 0x08     # Бит 3 - администратор
+}
+
+# Администраторы имеют все разрешения
+ADMIN_BIT = PERMISSION_BITS['is_admin']
+
 
 class AuthManager:
     """Менеджер для управления аутентификацией пользователей"""
@@ -23,10 +38,17 @@ class AuthManager:
             Dict с информацией о сессии
         """
         try:
+            permissions = user_data.get('permissions', {})
+            flags = user_data.get('flags')
+            if flags is None:
+                flags = AuthManager.flags_from_permissions(permissions)
+
             session_data = {
                 'user_id': user_data.get('id'),
                 'username': user_data.get('username'),
-                'permissions': user_data.get('permissions', {}),
+                'flags': flags,
+                'sflags': user_data.get('sflags') or 0,
+                'permissions': permissions,
                 'authenticated': True
             }
             logger.info(f"Пользователь {user_data.get('username')} вошел в систему")
@@ -67,6 +89,74 @@ class AuthManager:
         """
         return session.get('authenticated', False) and 'user_id' in session
 
+    @staticmethod
+    def permissions_from_flags(flags: int) -> Dict[str, bool]:
+        """
+        Получить словарь разрешений по битовой маске FLAGS
+        
+        Args:
+            flags: Значение FLAGS
+            
+        Returns:
+            Dict с правами доступа
+        """
+        flags = flags or 0
+        return {name: (flags & bit) == bit for name, bit in PERMISSION_BITS.items()}
+
+    @staticmethod
+    def flags_from_permissions(permissions: Dict[str, bool]) -> int:
+        """
+        Получить битовую маску по словарю разрешений
+        
+        Args:
+            permissions: Словарь разрешений
+            
+        Returns:
+            int: Маска в формате FLAGS
+        """
+        flags = 0
+        for name, bit in PERMISSION_BITS.items():
+            if permissions.get(name, False):
+                flags |= bit
+        return flags
+
+    @staticmethod
+    def session_flags(session: Dict) -> int:
+        """
+        Получить маску разрешений из сессии
+        
+        Args:
+            session: Данные сессии
+            
+        Returns:
+            int: Маска FLAGS (для сессий со словарем разрешений - вычисленная по нему)
+        """
+        flags = session.get('flags')
+        if flags is None:
+            return AuthManager.flags_from_permissions(session.get('permissions') or {})
+        return flags
+
+    @staticmethod
+    def compile_permission(permission: str) -> Callable[[int], bool]:
+        """
+        Получить функцию проверки разрешения по маске FLAGS
+        
+        Args:
+            permission: Требуемое разрешение (can_view, can_create, can_edit, can_delete, is_admin)
+            
+        Returns:
+            Функция flags -> bool (одна побитовая операция, с учетом бита администратора)
+        """
+        if permission not in PERMISSION_BITS:
+            raise ValueError(f"Неизвестное разрешение: {permission}")
+
+        required = PERMISSION_BITS[permission]
+        if not required:
+            return lambda flags: True
+
+        mask = required | ADMIN_BIT
+        return lambda flags: (flags & mask) != 0
+
     @staticmethod
     def check_permissions(session: Dict, required_permission: str) -> bool:
         """
@@ -82,13 +172,8 @@ class AuthManager:
         if not AuthManager.is_authenticated(session):
             return False
 
-        permissions = session.get('permissions', {})
-        
-        # Администраторы имеют все разрешения
-        if permissions.get('is_admin', False):
-            return True
-
-        return permissions.get(required_permission, False)
+        check = AuthManager.compile_permission(required_permission)
+        return check(AuthManager.session_flags(session))
 
     @staticmethod
     def get_user_permissions(session: Dict) -> Dict[str, bool]:
@@ -110,30 +195,59 @@ class AuthManager:
                 'is_admin': False
             }
 
+        if session.get('flags') is not None:
+            return AuthManager.permissions_from_flags(session['flags'])
         return session.get('permissions', {})
 
+    @staticmethod
+    def authorize(session: Dict, check: Callable[[int], bool]) -> Optional[int]:
+        """
+        Проверить сессию скомпилированной проверкой разрешения
+        
+        Args:
+            session: Данные сессии
+            check: Функция из compile_permission
+            
+        Returns:
+            None если доступ разрешен, иначе HTTP-код ошибки (401 или 403)
+        """
+        if 'user_id' not in session:
+            return 401
+
+        flags = session.get('flags')
+        if flags is None:
+            flags = AuthManager.session_flags(session)
+
+        if not check(flags):
+            logger.warning(f"Доступ запрещен для пользователя {session.get('username')}")
+            return 403
+        return None
+
     @staticmethod
     def require_permission(permission: str):
         """
         Декоратор для проверки разрешения на выполнение функции
         
+        Маска разрешения вычисляется при декорировании, проверка в запросе -
+        одна побитовая операция над FLAGS из сессии.
+        
         Args:
             permission: Требуемое разрешение
             
         Returns:
             Функция-декоратор
         """
+        check = AuthManager.compile_permission(permission)
+
         def decorator(func):
+            @wraps(func)
             def wrapper(*args, **kwargs):
-                from flask import session, abort
-                
-                if not AuthManager.check_permissions(session, permission):
-                    logger.warning(f"Доступ запрещен для пользователя {session.get('username')}")
-                    abort(403)
+                status = AuthManager.authorize(flask_session, check)
+                if status is not None:
+                    abort(status)
                 
                 return func(*args, **kwargs)
             
-            wrapper.__name__ = func.__name__
             return wrapper
         
         return decorator
@@ -0,0 +1,303 @@
+"""
+Массовые операции с картами: продление на N дней, блокировка (HOSTEL_CARDEDIT,
+действие 3) и активация (действие 4) всех карт комнаты, этажа или списка.
+
+Карты выбираются одним запросом по индексируемым столбцам, изменения
+выполняются порциями, каждая порция - одной транзакцией. Дампы
+(UPD_CARDSLIST) обновляются один раз в конце для всех измененных карт.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional, Tuple
+
+from app.managers.admission import READ, WRITE
+from app.managers.database_manager import DatabaseManager
+from app.managers.jobs import Job, JobCancelled, job_connection
+from app.models.card import Card
+from app.utils.error_handler import ErrorHandler
+
+logger = logging.getLogger(__name__)
+
+RENEW = 'renew'
+BLOCK = 'block'
+ACTIVATE = 'activate'
+
+# Действие HOSTEL_CARDEDIT и статус карт (ACTIVED), к которым применяется
+# операция (None - любой статус)
+OPERATIONS = {
+    RENEW: (1, None),
+    BLOCK: (3, 1),
+    ACTIVATE: (4, 0),
+}
+
+# Количество карт в одной транзакции
+BULK_CHUNK_SIZE = 200
+
+# Максимальный срок продления (дней)
+MAX_RENEW_DAYS = 3650
+
+# Количество номеров карт в ответе пробного запуска
+DRY_RUN_SAMPLE = 100
+
+# Количество карт с ошибками, попадающих в отчет
+MAX_REPORTED_ERRORS = 1000
+
+# Поля карт, выбираемых для операции
+TARGET_FIELDS = ('card_number', 'room', 'valid_from', 'valid_until', 'comments')
+
+
+def parse_target(data: Dict) -> Dict:
+    """
+    Разобрать выбор карт: ровно одно из room (номер комнаты (X)XYY),
+    floor (этаж) или ids (список ID карт)
+
+    Args:
+        data: Тело запроса
+
+    Returns:
+        Dict: Условия выбора для DatabaseManager.find_card_rows
+
+    Raises:
+        ValueError: Если выбор не указан или некорректен
+    """
+    keys = [key for key in ('room', 'floor', 'ids') if data.get(key) not in (None, '', [])]
+    if len(keys) != 1:
+        raise ValueError('Укажите ровно одно из: room, floor, ids')
+
+    key = keys[0]
+    value = data[key]
+    try:
+        if key == 'ids':
+            if isinstance(value, str):
+                value = value.split(',')
+            return {'card_ids': [int(card_id) for card_id in value]}
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Параметр {key} должен содержать целые числа')
+
+    if key == 'room':
+        return {'room': Card.room_name(number)}
+    if number <= 0:
+        raise ValueError('Этаж должен быть больше 0')
+    return {'floor': number}
+
+
+def parse_days(operation: str, data: Dict) -> Optional[int]:
+    """
+    Разобрать срок продления (только для renew)
+
+    Raises:
+        ValueError: Если срок не указан или вне допустимого диапазона
+    """
+    if operation != RENEW:
+        return None
+    try:
+        days = int(data.get('days'))
+    except (TypeError, ValueError):
+        raise ValueError('Укажите срок продления days (целое число дней)')
+    if not 0 < days <= MAX_RENEW_DAYS:
+        raise ValueError(f'Срок продления должен быть от 1 до {MAX_RENEW_DAYS} дней')
+    return days
+
+
+def find_targets(db_manager: DatabaseManager, operation: str, target: Dict) -> List[Tuple]:
+    """
+    Выбрать карты, к которым применяется операция (одним запросом)
+
+    Args:
+        db_manager: Менеджер БД
+        operation: renew, block или activate
+        target: Условия выбора (результат parse_target)
+
+    Returns:
+        List[Tuple]: Строки в порядке TARGET_FIELDS
+    """
+    status = OPERATIONS[operation][1]
+    return db_manager.find_card_rows(status=status, fields=TARGET_FIELDS, **target)
+
+
+def _as_date(value) -> Optional[date]:
+    """Дата из значения DATE/TIMESTAMP"""
+    return value.date() if isinstance(value, datetime) else value
+
+
+def operation_params(operation: str, row: Tuple, days: Optional[int], today: date) -> Dict:
+    """
+    Параметры HOSTEL_CARDEDIT для карты
+
+    Продление отсчитывается от даты окончания действия, а для истекших
+    карт - от сегодняшнего дня; дата начала не меняется.
+
+    Args:
+        operation: renew, block или activate
+        row: Строка карты в порядке TARGET_FIELDS
+        days: Срок продления (дней)
+        today: Текущая дата
+
+    Returns:
+        Dict: Именованные параметры call_cardedit_procedure
+
+    Raises:
+        ValueError: Если у карты нет комнаты или ее имя некорректно
+    """
+    card_number, room_name, valid_from, valid_until, comments = row
+    if not room_name:
+        raise ValueError('У карты не указана комната')
+    params = {'action': OPERATIONS[operation][0], 'room': Card.room_number(room_name),
+              'card_number': card_number}
+    if operation == RENEW:
+        valid_from = _as_date(valid_from) or today
+        valid_until = max(_as_date(valid_until) or today, today) + timedelta(days=days)
+        params.update(valid_from=valid_from.isoformat(),
+                      valid_days=(valid_until - valid_from).days, comments=comments)
+    return params
+
+
+class CardBulkOperation:
+    """Применение операции к выбранным картам порциями"""
+
+    def __init__(self, connect: Callable[[], ContextManager[DatabaseManager]],
+                 operation: str, days: Optional[int] = None,
+                 chunk_size: int = BULK_CHUNK_SIZE,
+                 on_progress: Optional[Callable[[int, Dict], None]] = None,
+                 cancelled: Optional[Callable[[], bool]] = None):
+        """
+        Инициализация
+
+        Args:
+            connect: Функция, возвращающая контекстный менеджер с DatabaseManager;
+                транзакция подтверждается при выходе без исключения
+            operation: renew, block или activate
+            days: Срок продления (для renew)
+            chunk_size: Количество карт в одной транзакции
+            on_progress: Вызывается после каждой порции с количеством
+                обработанных карт и текущим отчетом
+            cancelled: Проверяется перед каждой порцией; при True операция
+                останавливается (измененные порции остаются)
+        """
+        self.connect = connect
+        self.operation = operation
+        self.days = days
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress
+        self.cancelled = cancelled
+
+    @staticmethod
+    def _fail(summary: Dict, card_number: int, error: str) -> None:
+        summary['failed'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'card_number': card_number, 'error': error})
+
+    def run(self, rows: Iterable[Tuple]) -> Dict:
+        """
+        Применить операцию
+
+        Args:
+            rows: Строки карт в порядке TARGET_FIELDS (результат find_targets)
+
+        Returns:
+            Dict: Отчет (operation, processed, changed, failed, errors,
+            dumps_refreshed, cancelled)
+        """
+        summary = {'operation': self.operation, 'processed': 0, 'changed': 0, 'failed': 0,
+                   'errors': [], 'dumps_refreshed': False, 'cancelled': False}
+        changed: List[int] = []
+        today = date.today()
+        rows = iter(rows)
+
+        while True:
+            if self.cancelled and self.cancelled():
+                summary['cancelled'] = True
+                break
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+
+            calls = []
+            for row in chunk:
+                summary['processed'] += 1
+                try:
+                    calls.append(operation_params(self.operation, row, self.days, today))
+                except ValueError as e:
+                    self._fail(summary, row[0], str(e))
+
+            if calls:
+                with self.connect() as db_manager:
+                    for params in calls:
+                        result = db_manager.call_cardedit_procedure(**params)
+                        code = result.get('result_code')
+                        if result.get('error') or code not in (0, 1):
+                            self._fail(summary, params['card_number'], result.get('error')
+                                       or ErrorHandler.handle_procedure_error(code)[0]['error'])
+                        else:
+                            summary['changed'] += 1
+                            changed.append(params['card_number'])
+
+            if self.on_progress:
+                self.on_progress(summary['processed'], summary)
+
+        if changed:
+            with self.connect() as db_manager:
+                summary['dumps_refreshed'] = db_manager.refresh_dumps(changed)
+        logger.info(f"Массовая операция {self.operation}: обработано {summary['processed']}, "
+                    f"изменено {summary['changed']}, ошибок {summary['failed']}")
+        return summary
+
+
+def bulk_retryable(operation: str, *args) -> bool:
+    """
+    Можно ли выполнить заново прерванную массовую операцию
+
+    Блокировка и активация выбирают карты по статусу и не меняют уже
+    измененные; повторное продление продлило бы карты прерванного запуска
+    еще раз, поэтому renew не повторяется.
+
+    Args:
+        operation: renew, block или activate (первый аргумент run_bulk_job)
+    """
+    return operation != RENEW
+
+
+def run_bulk_job(job: Job, operation: str, target: Dict, days: Optional[int] = None,
+                 chunk_size: int = BULK_CHUNK_SIZE,
+                 acquire_timeout: Optional[float] = None) -> Dict:
+    """
+    Функция фоновой задачи массовой операции: карты выбираются одним
+    запросом, затем изменяются порциями, каждая - со своим подключением
+    и слотом записи БД
+
+    Args:
+        job: Задача (db_path, прогресс, промежуточный отчет)
+        operation: renew, block или activate
+        target: Условия выбора (результат parse_target)
+        days: Срок продления (для renew)
+        chunk_size: Количество карт в одной транзакции
+        acquire_timeout: Время ожидания подключения из пула (секунды)
+
+    Returns:
+        Dict: Отчет операции
+
+    Raises:
+        JobCancelled: Если задача отменена
+    """
+    with job_connection(job.db_path, READ, acquire_timeout) as db_manager:
+        rows = find_targets(db_manager, operation, target)
+    job.progress(0, len(rows))
+
+    def batch() -> ContextManager[DatabaseManager]:
+        # Изменения из журнала отложенной записи применяются раньше изменений задачи
+        job.wait_for_queued_writes()
+        return job_connection(job.db_path, WRITE, acquire_timeout)
+
+    def progress(processed: int, summary: Dict) -> None:
+        job.progress(processed)
+        job.result = summary
+
+    summary = CardBulkOperation(batch, operation, days, chunk_size, progress,
+                                lambda: job.cancel_requested).run(rows)
+    job.result = summary
+    if summary['cancelled']:
+        raise JobCancelled(f"Задача {job.id} отменена")
+    return summary
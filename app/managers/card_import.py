@@ -0,0 +1,287 @@
+"""
+Импорт карт из CSV.
+
+Файл разбирается потоково, строки проверяются моделью Card порциями,
+допустимые строки каждой порции передаются в HOSTEL_CARDEDIT одной
+транзакцией. Дампы (UPD_CARDSLIST) обновляются один раз в конце импорта
+для всех загруженных карт.
+"""
+
+import csv
+import io
+import logging
+import os
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import (IO, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional,
+                    Tuple)
+
+from app.managers.admission import WRITE
+from app.managers.database_manager import DatabaseManager
+from app.managers.jobs import Job, JobCancelled, job_connection
+from app.models.card import Card
+from app.utils.error_handler import ErrorHandler
+from app.utils.export import EXPORT_HEADERS
+
+logger = logging.getLogger(__name__)
+
+# Количество строк в одной транзакции
+IMPORT_CHUNK_SIZE = 500
+
+# Количество строк с ошибками, попадающих в отчет
+MAX_REPORTED_ERRORS = 1000
+
+# Поля импорта: имена полей API и заголовки выгрузки (без учета регистра)
+COLUMN_ALIASES = {
+    **{field: field for field in ('card_number', 'room', 'valid_from', 'valid_until',
+                                  'valid_days', 'comments', 'dep')},
+    **{header.lower(): field for field, header in EXPORT_HEADERS.items()},
+    'дней': 'valid_days',
+    'отдел': 'dep',
+}
+
+REQUIRED_COLUMNS = ('card_number', 'room')
+
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y')
+
+
+def read_csv(stream: IO[bytes]) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """
+    Потоково разобрать CSV (UTF-8, разделитель ';' или ',' по строке заголовков)
+
+    Args:
+        stream: Двоичный поток файла
+
+    Yields:
+        Tuple[int, Dict[str, str]]: (номер строки файла, значения полей импорта)
+
+    Raises:
+        ValueError: Если в заголовке нет обязательных столбцов
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    header_line = text.readline()
+    delimiter = ';' if header_line.count(';') >= header_line.count(',') else ','
+    header = next(csv.reader([header_line], delimiter=delimiter), [])
+    columns = [COLUMN_ALIASES.get(name.strip().lower()) for name in header]
+
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if 'valid_until' not in columns and 'valid_days' not in columns:
+        missing.append('valid_until или valid_days')
+    if missing:
+        raise ValueError(f"В файле нет столбцов: {', '.join(missing)}")
+
+    reader = csv.reader(text, delimiter=delimiter)
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        # Первая строка файла - заголовок
+        yield reader.line_num + 1, {column: value.strip()
+                                    for column, value in zip(columns, row) if column}
+
+
+def parse_row(values: Dict[str, str], today: date) -> Tuple[Optional[Dict], Dict[str, str]]:
+    """
+    Преобразовать и проверить строку импорта
+
+    Args:
+        values: Значения полей импорта
+        today: Дата начала действия по умолчанию
+
+    Returns:
+        Tuple[Optional[Dict], Dict[str, str]]: (параметры HOSTEL_CARDEDIT или None, ошибки)
+    """
+    errors = {}
+
+    def integer(field: str) -> Optional[int]:
+        raw = values.get(field)
+        if not raw:
+            return None
+        try:
+            return int(raw)
+        except ValueError:
+            errors[field] = 'Должно быть целым числом'
+            return None
+
+    def day(field: str) -> Optional[date]:
+        raw = values.get(field)
+        if not raw:
+            return None
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(raw, fmt).date()
+            except ValueError:
+                pass
+        errors[field] = 'Некорректная дата (ГГГГ-ММ-ДД или ДД.ММ.ГГГГ)'
+        return None
+
+    room = integer('room')
+    card_number = integer('card_number')
+    valid_days = integer('valid_days')
+    valid_from = day('valid_from') or today
+    valid_until = day('valid_until')
+    if valid_until is None and valid_days is not None:
+        valid_until = valid_from + timedelta(days=valid_days)
+    if errors:
+        return None, errors
+
+    card = Card(room=room, card_number=card_number, valid_from=valid_from,
+                valid_until=valid_until, comments=values.get('comments') or None)
+    is_valid, errors = card.validate()
+    if not is_valid:
+        return None, errors
+
+    return {
+        'room': room,
+        'card_number': card_number,
+        'valid_from': valid_from.isoformat(),
+        'valid_days': (valid_until - valid_from).days,
+        'comments': card.comments,
+        'dep': values.get('dep') or 'ХОСТЕЛ'
+    }, {}
+
+
+class CardImporter:
+    """Импорт строк CSV порциями через HOSTEL_CARDEDIT"""
+
+    def __init__(self, connect: Callable[[], ContextManager[DatabaseManager]],
+                 chunk_size: int = IMPORT_CHUNK_SIZE,
+                 on_progress: Optional[Callable[[int, Dict], None]] = None,
+                 cancelled: Optional[Callable[[], bool]] = None):
+        """
+        Инициализация
+
+        Args:
+            connect: Функция, возвращающая контекстный менеджер с DatabaseManager;
+                транзакция подтверждается при выходе без исключения
+            chunk_size: Количество строк в одной транзакции
+            on_progress: Вызывается после каждой порции с количеством
+                обработанных строк и текущим отчетом
+            cancelled: Проверяется перед каждой порцией; при True импорт
+                останавливается (загруженные порции остаются)
+        """
+        self.connect = connect
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress
+        self.cancelled = cancelled
+
+    @staticmethod
+    def _fail(summary: Dict, line: int, errors: Dict[str, str]) -> None:
+        summary['failed'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'line': line, 'errors': errors})
+
+    def run(self, rows: Iterable[Tuple[int, Dict[str, str]]]) -> Dict:
+        """
+        Импортировать строки
+
+        Args:
+            rows: (номер строки, значения полей) - результат read_csv
+
+        Returns:
+            Dict: Отчет (rows, added, updated, failed, errors, dumps_refreshed, cancelled)
+        """
+        summary = {'rows': 0, 'added': 0, 'updated': 0, 'failed': 0, 'errors': [],
+                   'dumps_refreshed': False, 'cancelled': False}
+        imported: List[int] = []
+        today = date.today()
+        rows = iter(rows)
+
+        while True:
+            if self.cancelled and self.cancelled():
+                summary['cancelled'] = True
+                break
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+
+            valid = []
+            for line, values in chunk:
+                summary['rows'] += 1
+                params, errors = parse_row(values, today)
+                if errors:
+                    self._fail(summary, line, errors)
+                else:
+                    valid.append((line, params))
+
+            if valid:
+                with self.connect() as db_manager:
+                    for line, params in valid:
+                        result = db_manager.call_cardedit_procedure(action=1, **params)
+                        code = result.get('result_code')
+                        if result.get('error') or code not in (0, 1):
+                            message = (result.get('error')
+                                       or ErrorHandler.handle_procedure_error(code)[0]['error'])
+                            self._fail(summary, line, {'card_number': message})
+                        else:
+                            summary['added' if code == 0 else 'updated'] += 1
+                            imported.append(params['card_number'])
+
+            if self.on_progress:
+                self.on_progress(summary['rows'], summary)
+
+        if imported:
+            with self.connect() as db_manager:
+                summary['dumps_refreshed'] = db_manager.refresh_dumps(imported)
+        logger.info(f"Импорт карт: строк {summary['rows']}, добавлено {summary['added']}, "
+                    f"обновлено {summary['updated']}, ошибок {summary['failed']}")
+        return summary
+
+
+@contextmanager
+def single_connection(db_manager: DatabaseManager) -> Iterator[DatabaseManager]:
+    """
+    Контекстный менеджер для CardImporter с одним подключением
+    (подтверждение или откат транзакции при выходе)
+
+    Args:
+        db_manager: Подключенный менеджер БД
+    """
+    try:
+        yield db_manager
+    except Exception:
+        db_manager.end_transaction(commit=False)
+        raise
+    else:
+        db_manager.end_transaction(commit=True)
+
+
+def run_import_job(job: Job, path: str, chunk_size: int = IMPORT_CHUNK_SIZE,
+                   acquire_timeout: Optional[float] = None) -> Dict:
+    """
+    Функция фоновой задачи импорта: каждая порция выполняется с подключением
+    из пула и слотом записи БД, между порциями они свободны для запросов
+    пользователей. При отмене задачи импорт останавливается после текущей
+    порции, дампы загруженных карт обновляются
+
+    Args:
+        job: Задача (db_path, прогресс, промежуточный отчет)
+        path: Путь к сохраненному CSV (удаляется по завершении)
+        chunk_size: Количество строк в одной транзакции
+        acquire_timeout: Время ожидания подключения из пула (секунды)
+
+    Returns:
+        Dict: Отчет импорта
+
+    Raises:
+        JobCancelled: Если задача отменена
+    """
+    def batch() -> ContextManager[DatabaseManager]:
+        # Изменения из журнала отложенной записи применяются раньше изменений задачи
+        job.wait_for_queued_writes()
+        return job_connection(job.db_path, WRITE, acquire_timeout)
+
+    def progress(processed: int, summary: Dict) -> None:
+        job.progress(processed)
+        job.result = summary
+
+    try:
+        with open(path, 'rb') as stream:
+            summary = CardImporter(batch, chunk_size, progress,
+                                   lambda: job.cancel_requested).run(read_csv(stream))
+    finally:
+        os.unlink(path)
+    job.result = summary
+    if summary['cancelled']:
+        raise JobCancelled(f"Задача {job.id} отменена")
+    return summary
@@ -0,0 +1,500 @@
+"""
+CardReplica - локальная копия CARDS/PEOPLE в файле SQLite для чтения списка
+карт без обращения к Firebird.
+
+Копия обновляется фоновым потоком (ReplicaSynchronizer): новые карты и
+люди - по возрастанию CARDSID/PEOPLEID, карты, измененные через это
+приложение, - по журналу изменений (таблица changes в файле копии, ее
+пополняет DatabaseManager при подтверждении транзакции). Изменения,
+сделанные в БД в обход приложения, попадают в копию при периодической
+полной синхронизации.
+
+Файл копии общий для рабочих процессов: синхронизирует один процесс,
+удерживающий аренду, остальные только читают. DatabaseManager читает
+карты из копии всегда или только при недоступности Firebird (режим
+деградации) и сообщает возраст данных.
+"""
+
+import hashlib
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import (Callable, ContextManager, Dict, Iterable, Iterator, List, Optional,
+                    Sequence, Tuple)
+
+logger = logging.getLogger(__name__)
+
+# Режимы чтения карт DatabaseManager
+FALLBACK = 'fallback'  # из копии только при недоступности Firebird
+ALWAYS = 'always'      # всегда из копии (после первой синхронизации)
+MODES = (FALLBACK, ALWAYS)
+
+# Выражения SQL копии для полей карты (см. database_manager.CARD_COLUMNS)
+REPLICA_COLUMNS = {
+    'card_id': 'c.card_id',
+    'card_number': 'c.card_number',
+    'room': 'p.room',
+    'valid_from': 'c.valid_from',
+    'valid_until': 'c.valid_until',
+    'status': 'c.status',
+    'comments': 'c.comments'
+}
+
+# Поля, хранимые в копии строкой ISO и возвращаемые как date/datetime
+DATE_FIELDS = ('valid_from', 'valid_until')
+
+# Максимальное количество параметров в одном списке IN (ограничение SQLite)
+IN_CHUNK_SIZE = 500
+
+CARDS_TABLE = """(
+    card_id INTEGER PRIMARY KEY,
+    card_number INTEGER,
+    people_id INTEGER,
+    valid_from TEXT,
+    valid_until TEXT,
+    status INTEGER,
+    comments TEXT
+)"""
+
+PEOPLE_TABLE = """(
+    people_id INTEGER PRIMARY KEY,
+    room TEXT
+)"""
+
+
+def _store_value(value):
+    """Значение строки Firebird для записи в SQLite (даты - строкой ISO)"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _load_date(value: Optional[str]):
+    """Дата из строки ISO (date или datetime, как в Firebird)"""
+    if value is None:
+        return None
+    return date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+
+
+def _chunks(values: Sequence, size: int = IN_CHUNK_SIZE) -> Iterator[Sequence]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class CardReplica:
+    """Локальная копия карт одной БД"""
+
+    # Каталог файлов копий (None - копии не используются)
+    directory: Optional[str] = None
+
+    _registry: Dict[str, 'CardReplica'] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, path: str, db_path: str = None):
+        """
+        Инициализация копии
+
+        Args:
+            path: Путь к файлу SQLite
+            db_path: Путь к БД Firebird, копией которой является файл
+        """
+        self.path = path
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS cards {CARDS_TABLE}")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS people {PEOPLE_TABLE}")
+            conn.execute("CREATE INDEX IF NOT EXISTS cards_number ON cards (card_number)")
+            conn.execute("CREATE INDEX IF NOT EXISTS cards_people ON cards (people_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS cards_status ON cards (status)")
+            conn.execute("CREATE INDEX IF NOT EXISTS people_room ON people (room)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS changes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    card_number INTEGER NOT NULL,
+                    created REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lease (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    owner TEXT,
+                    expires REAL NOT NULL
+                )
+            """)
+            conn.execute("INSERT OR IGNORE INTO lease (id, owner, expires) VALUES (1, NULL, 0)")
+
+    @classmethod
+    def for_database(cls, db_path: str) -> Optional['CardReplica']:
+        """
+        Получить копию карт БД (файл создается при первом обращении)
+
+        Args:
+            db_path: Путь к БД
+
+        Returns:
+            CardReplica или None, если каталог копий не задан
+        """
+        if not cls.directory:
+            return None
+        with cls._registry_lock:
+            replica = cls._registry.get(db_path)
+            if replica is None:
+                os.makedirs(cls.directory, exist_ok=True)
+                name = hashlib.sha1(db_path.encode('utf-8')).hexdigest()[:16]
+                replica = cls(os.path.join(cls.directory, f'cards_{name}.sqlite3'), db_path)
+                cls._registry[db_path] = replica
+            return replica
+
+    @classmethod
+    def registered(cls) -> List['CardReplica']:
+        """Копии БД, к которым обращался этот процесс"""
+        with cls._registry_lock:
+            return list(cls._registry.values())
+
+    def _connection(self) -> sqlite3.Connection:
+        """Соединение SQLite текущего потока (новое после fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Транзакция записи (читатели видят данные до ее подтверждения)"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _state(self, key: str, default=None):
+        row = self._connection().execute("SELECT value FROM state WHERE key = ?",
+                                         (key,)).fetchone()
+        return default if row is None or row[0] is None else row[0]
+
+    @staticmethod
+    def _set_state(conn: sqlite3.Connection, key: str, value) -> None:
+        conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    def synced_at(self) -> Optional[float]:
+        """Время (time.time()) начала последней успешной синхронизации"""
+        return self._state('synced_at')
+
+    def age(self) -> Optional[float]:
+        """
+        Возраст данных копии
+
+        Returns:
+            float: Секунды с начала последней успешной синхронизации или
+            None, если копия еще не синхронизирована
+        """
+        synced_at = self.synced_at()
+        return None if synced_at is None else max(0.0, time.time() - synced_at)
+
+    def status(self) -> Dict:
+        """Состояние копии: возраст, количество карт, последняя ошибка синхронизации"""
+        conn = self._connection()
+        return {
+            'age': self.age(),
+            'cards': conn.execute("SELECT COUNT(*) FROM cards").fetchone()[0],
+            'pending_changes': conn.execute("SELECT COUNT(*) FROM changes").fetchone()[0],
+            'full_synced_at': self._state('full_synced_at'),
+            'last_error': self._state('last_error'),
+        }
+
+    # Чтение (строки - как у методов DatabaseManager)
+
+    def _select(self, fields: Sequence[str]) -> str:
+        unknown = [field for field in fields if field not in REPLICA_COLUMNS]
+        if unknown:
+            raise ValueError(f"Неизвестные поля карты: {', '.join(unknown)}")
+        columns = ', '.join(REPLICA_COLUMNS[field] for field in fields)
+        return (f"SELECT {columns} FROM cards c "
+                f"LEFT JOIN people p ON c.people_id = p.people_id ")
+
+    @staticmethod
+    def _rows(cursor: Iterable[Tuple], fields: Sequence[str]) -> List[Tuple]:
+        positions = [index for index, field in enumerate(fields) if field in DATE_FIELDS]
+        if not positions:
+            return [tuple(row) for row in cursor]
+        rows = []
+        for row in cursor:
+            row = list(row)
+            for index in positions:
+                row[index] = _load_date(row[index])
+            rows.append(tuple(row))
+        return rows
+
+    def get_all_card_rows(self, fields: Sequence[str]) -> List[Tuple]:
+        """Строки всех карт в порядке fields (по убыванию card_id)"""
+        cursor = self._connection().execute(self._select(fields) + "ORDER BY c.card_id DESC")
+        return self._rows(cursor, fields)
+
+    def get_card_rows_by_ids(self, card_ids: Sequence[int], fields: Sequence[str]) -> List[Tuple]:
+        """Строки карт по ID в порядке card_ids (ненайденные пропускаются)"""
+        ids = list(dict.fromkeys(card_ids))
+        select = self._select(('card_id',) + tuple(fields))
+        conn = self._connection()
+        found = {}
+        for chunk in _chunks(ids):
+            cursor = conn.execute(select + f"WHERE c.card_id IN ({', '.join('?' * len(chunk))})",
+                                  chunk)
+            for row in self._rows(cursor, ('card_id',) + tuple(fields)):
+                found[row[0]] = row[1:]
+        return [found[card_id] for card_id in ids if card_id in found]
+
+    def get_card_by_number(self, card_number: int) -> Optional[Dict]:
+        """Карта по номеру (как DatabaseManager.get_card_by_number)"""
+        fields = tuple(REPLICA_COLUMNS)
+        rows = self._rows(self._connection().execute(
+            self._select(fields) + "WHERE c.card_number = ?", (card_number,)
+        ), fields)
+        if not rows:
+            return None
+        card = dict(zip(fields, rows[0]))
+        for field in DATE_FIELDS:
+            card[field] = card[field].isoformat() if card[field] else None
+        return card
+
+    # Журнал изменений и синхронизация
+
+    def record_changes(self, card_numbers: Iterable[int]) -> None:
+        """
+        Отметить карты, измененные в Firebird (обновятся при следующей синхронизации)
+
+        Args:
+            card_numbers: Номера карт
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany("INSERT INTO changes (card_number, created) VALUES (?, ?)",
+                             [(number, now) for number in card_numbers if number is not None])
+
+    def claim(self, owner: str, ttl: float) -> bool:
+        """
+        Получить или продлить аренду синхронизации
+
+        Args:
+            owner: Процесс
+            ttl: Время аренды (секунды)
+
+        Returns:
+            bool: True если синхронизирует этот процесс
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE lease SET owner = ?, expires = ? WHERE id = 1 AND (owner = ? OR expires < ?)",
+            (owner, now + ttl, owner, now)
+        )
+        return cursor.rowcount > 0
+
+    def full_sync_due(self, interval: float) -> bool:
+        """Нужна ли полная синхронизация (не было или прошло interval секунд)"""
+        full_synced_at = self._state('full_synced_at')
+        return full_synced_at is None or time.time() - full_synced_at >= interval
+
+    def record_error(self, error: str) -> None:
+        """Сохранить ошибку синхронизации (показывается в status)"""
+        with self._transaction() as conn:
+            self._set_state(conn, 'last_error', error)
+
+    def sync(self, db_manager, full: bool = False) -> Dict:
+        """
+        Синхронизировать копию с Firebird
+
+        Строки читаются из Firebird до начала записи в копию; изменения
+        применяются одной транзакцией SQLite, поэтому читатели видят либо
+        старое, либо новое состояние.
+
+        Args:
+            db_manager: DatabaseManager (методы iter_replica_cards и iter_replica_people)
+            full: True - перечитать все карты и людей (с удалением отсутствующих)
+
+        Returns:
+            Dict: full, cards, people, changes - количество обработанных строк
+            и записей журнала
+        """
+        started = time.time()
+        journal_max = self._connection().execute(
+            "SELECT COALESCE(MAX(id), 0) FROM changes"
+        ).fetchone()[0]
+        if full:
+            summary, apply = self._read_full(db_manager)
+        else:
+            summary, apply = self._read_incremental(db_manager, journal_max)
+
+        with self._transaction() as conn:
+            summary['changes'] = conn.execute("DELETE FROM changes WHERE id <= ?",
+                                              (journal_max,)).rowcount
+            self._set_state(conn, 'synced_at', started)
+            self._set_state(conn, 'last_error', None)
+            if full:
+                self._set_state(conn, 'full_synced_at', started)
+            apply(conn)
+        logger.info(f"Локальная копия карт {self.db_path} синхронизирована "
+                    f"({'полностью' if full else 'по изменениям'}): карт {summary['cards']}, "
+                    f"людей {summary['people']}, записей журнала {summary['changes']}")
+        return summary
+
+    def _read_full(self, db_manager) -> Tuple[Dict, Callable[[sqlite3.Connection], None]]:
+        """
+        Перечитать карты и людей во временные таблицы соединения
+
+        Returns:
+            (итог, функция замены таблиц копии в транзакции sync)
+        """
+        conn = self._connection()
+        conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS cards_sync {CARDS_TABLE}")
+        conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS people_sync {PEOPLE_TABLE}")
+        conn.execute("DELETE FROM temp.cards_sync")
+        conn.execute("DELETE FROM temp.people_sync")
+
+        counts = {'cards': 0, 'people': 0}
+        for table, rows_iter, key in (('people_sync', db_manager.iter_replica_people(), 'people'),
+                                      ('cards_sync', db_manager.iter_replica_cards(), 'cards')):
+            for batch in rows_iter:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO temp.{table} VALUES "
+                    f"({', '.join('?' * len(batch[0]))})",
+                    [tuple(_store_value(value) for value in row) for row in batch]
+                )
+                counts[key] += len(batch)
+
+        def apply(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM cards")
+            conn.execute("INSERT INTO cards SELECT * FROM temp.cards_sync")
+            conn.execute("DELETE FROM people")
+            conn.execute("INSERT INTO people SELECT * FROM temp.people_sync")
+            conn.execute("DELETE FROM temp.cards_sync")
+            conn.execute("DELETE FROM temp.people_sync")
+            self._set_last_ids(conn)
+
+        return {'full': True, **counts}, apply
+
+    def _read_incremental(self, db_manager,
+                          journal_max: int) -> Tuple[Dict, Callable[[sqlite3.Connection], None]]:
+        """
+        Прочитать новые карты и людей и карты из журнала изменений
+
+        Returns:
+            (итог, функция записи строк в транзакции sync)
+        """
+        last_card_id = self._state('last_card_id', 0)
+        last_people_id = self._state('last_people_id', 0)
+        numbers = [row[0] for row in self._connection().execute(
+            "SELECT DISTINCT card_number FROM changes WHERE id <= ?", (journal_max,)
+        )]
+
+        people = [row for batch in db_manager.iter_replica_people(after_id=last_people_id)
+                  for row in batch]
+        cards = [row for batch in db_manager.iter_replica_cards(after_id=last_card_id)
+                 for row in batch]
+        changed = []
+        if numbers:
+            changed = [row for batch in db_manager.iter_replica_cards(card_numbers=numbers)
+                       for row in batch]
+            people_ids = sorted({row[2] for row in changed if row[2] is not None})
+            if people_ids:
+                people.extend(row for batch in db_manager.iter_replica_people(people_ids=people_ids)
+                              for row in batch)
+
+        def apply(conn: sqlite3.Connection) -> None:
+            conn.executemany("INSERT OR REPLACE INTO people VALUES (?, ?)",
+                             [tuple(_store_value(value) for value in row) for row in people])
+            conn.executemany("INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             [tuple(_store_value(value) for value in row)
+                              for row in cards + changed])
+            # Карты из журнала, которых больше нет в Firebird, удалены
+            found = {row[0] for row in changed}
+            for chunk in _chunks(numbers):
+                stored = conn.execute(
+                    f"SELECT card_id FROM cards WHERE card_number IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                conn.executemany("DELETE FROM cards WHERE card_id = ?",
+                                 [row for row in stored if row[0] not in found])
+            self._set_last_ids(conn)
+
+        return {'full': False, 'cards': len(cards) + len(changed), 'people': len(people)}, apply
+
+    def _set_last_ids(self, conn: sqlite3.Connection) -> None:
+        """Запомнить максимальные CARDSID и PEOPLEID копии (для следующей синхронизации)"""
+        self._set_state(conn, 'last_card_id',
+                        conn.execute("SELECT COALESCE(MAX(card_id), 0) FROM cards").fetchone()[0])
+        self._set_state(conn, 'last_people_id',
+                        conn.execute("SELECT COALESCE(MAX(people_id), 0) FROM people").fetchone()[0])
+
+
+class ReplicaSynchronizer:
+    """Фоновая синхронизация локальных копий карт процесса"""
+
+    def __init__(self, connect: Callable[[str], ContextManager], interval: float = 30.0,
+                 full_interval: float = 3600.0):
+        """
+        Args:
+            connect: connect(db_path) - контекстный менеджер, выдающий DatabaseManager
+            interval: Интервал синхронизации по изменениям (секунды)
+            full_interval: Интервал полной синхронизации (секунды)
+        """
+        self.connect = connect
+        self.interval = interval
+        self.full_interval = full_interval
+        self._pid = None
+        self._owner = f"{os.getpid()}:{secrets.token_hex(4)}"
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Запустить поток текущего процесса (после fork создается заново)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._owner = f"{os.getpid()}:{secrets.token_hex(4)}"
+            threading.Thread(target=self._loop, name='card-replica-sync', daemon=True).start()
+
+    def _loop(self) -> None:
+        while True:
+            self.run_once()
+            time.sleep(self.interval)
+
+    def run_once(self) -> None:
+        """Синхронизировать копии, аренду которых удерживает этот процесс"""
+        for replica in CardReplica.registered():
+            self.sync_replica(replica)
+
+    def sync_replica(self, replica: CardReplica) -> Optional[Dict]:
+        """
+        Синхронизировать одну копию, если аренда у этого процесса
+
+        Returns:
+            Dict: Итог синхронизации или None (аренда у другого процесса, ошибка)
+        """
+        # Аренда переживает пропуск двух интервалов (долгая полная синхронизация)
+        if not replica.claim(self._owner, self.interval * 3 + 60):
+            return None
+        try:
+            with self.connect(replica.db_path) as db_manager:
+                return replica.sync(db_manager, replica.full_sync_due(self.full_interval))
+        except Exception as e:
+            logger.warning(f"Синхронизация локальной копии {replica.db_path} не выполнена: {str(e)}")
+            try:
+                replica.record_error(str(e))
+            except sqlite3.Error as store_error:
+                logger.error(f"Ошибка записи состояния копии: {str(store_error)}")
+            return None
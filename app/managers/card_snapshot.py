@@ -0,0 +1,556 @@
+"""
+SharedCardSnapshot - снимок списка карт в файле, общий для рабочих процессов
+одного узла.
+
+Снимок пишет один процесс (SnapshotRefresher, удерживающий блокировку
+файла), остальные отображают файл в память только для чтения (mmap):
+страницы файла общие в кэше ОС, поэтому память не растет с количеством
+процессов, а список карт кодируется и сжимается один раз на узел. Новый
+снимок записывается во временный файл и заменяет прежний атомарно
+(os.replace); читатели переключаются на новый файл по изменению inode.
+
+Структура файла (little-endian):
+    b'HCS1', uint32 - длина заголовка, заголовок (JSON UTF-8), выравнивание
+    до 8 байт; смещения секций в заголовке - от конца выравнивания:
+        records - записи фиксированной длины RECORD (64 байта) в порядке
+            списка карт (CARDSID по убыванию);
+        index   - пары (номер карты int64, номер записи int64), по
+            возрастанию номера карты, для поиска делением пополам;
+        heap    - строки UTF-8 (комната, комментарий), одинаковые строки
+            хранятся один раз;
+        bodies  - закодированные тела полного списка карт для каждого
+            формата ответа и их сжатые копии.
+
+Запись RECORD: card_id, card_number, valid_from, valid_until, status
+(int64), маска (uint16: бит поля - пустое значение, DATETIME_BITS - дата
+со временем), 6 байт выравнивания, смещение и длина в heap для room и
+comments (uint32). Даты - номер дня (date.toordinal), даты со временем -
+микросекунды от datetime.min.
+
+Снимок используется, пока он не старше max_age и после его чтения из БД
+этот узел не подтверждал изменений (mark_stale). Изменения, сделанные
+в обход узла, попадают в снимок при следующем обновлении.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, ContextManager, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.utils.compression import compress, supported_encodings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - зависит от окружения
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'HCS1'
+PREFIX = struct.Struct('<4sI')
+
+# Поля записи (как database_manager.CARD_FIELDS)
+FIELDS = ('card_id', 'card_number', 'room', 'valid_from', 'valid_until', 'status', 'comments')
+
+RECORD = struct.Struct('<qqqqqH6xIIII')
+INDEX_ENTRY = struct.Struct('<qq')
+
+# Биты маски: даты со временем (valid_from, valid_until)
+DATETIME_BITS = {'valid_from': 1 << 8, 'valid_until': 1 << 9}
+
+# Размер части тела ответа, отдаваемой из снимка (байт)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_INT_FIELDS = ('card_id', 'card_number', 'valid_from', 'valid_until', 'status')
+_STRING_FIELDS = ('room', 'comments')
+_FIELD_INDEX = {field: index for index, field in enumerate(FIELDS)}
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _encode_date(value) -> Tuple[int, bool]:
+    """Дата в целое число и признак даты со временем"""
+    if isinstance(value, datetime):
+        return (value - datetime.min) // _MICROSECOND, True
+    return value.toordinal(), False
+
+
+def _decode_date(value: int, with_time: bool):
+    if with_time:
+        return datetime.min + value * _MICROSECOND
+    return date.fromordinal(value)
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def build_snapshot(rows: Sequence[Sequence], encoders: Dict[str, Callable],
+                   read_started_ns: int) -> bytes:
+    """
+    Закодировать строки списка карт в формат снимка
+
+    Args:
+        rows: Строки полного списка карт (поля FIELDS)
+        encoders: {формат: encoder(rows, fields)} - тела полного списка
+        read_started_ns: Время начала чтения строк из БД (time.time_ns)
+
+    Returns:
+        bytes: Содержимое файла снимка
+    """
+    heap = bytearray()
+    strings: Dict[str, Tuple[int, int]] = {}
+
+    def store(value: Optional[str]) -> Tuple[int, int]:
+        if value is None:
+            return 0, 0
+        location = strings.get(value)
+        if location is None:
+            data = value.encode('utf-8')
+            location = (len(heap), len(data))
+            heap.extend(data)
+            strings[value] = location
+        return location
+
+    records = bytearray(RECORD.size * len(rows))
+    numbers = []
+    for position, row in enumerate(rows):
+        values = dict(zip(FIELDS, row))
+        mask = 0
+        ints = []
+        for field in _INT_FIELDS:
+            value = values[field]
+            if value is None:
+                mask |= 1 << _FIELD_INDEX[field]
+                ints.append(0)
+            elif field in DATETIME_BITS:
+                value, with_time = _encode_date(value)
+                if with_time:
+                    mask |= DATETIME_BITS[field]
+                ints.append(value)
+            else:
+                ints.append(int(value))
+        for field in _STRING_FIELDS:
+            if values[field] is None:
+                mask |= 1 << _FIELD_INDEX[field]
+        RECORD.pack_into(records, position * RECORD.size, *ints, mask,
+                         *store(values['room']), *store(values['comments']))
+        if values['card_number'] is not None:
+            numbers.append((int(values['card_number']), position))
+
+    numbers.sort()
+    index = bytearray(INDEX_ENTRY.size * len(numbers))
+    for position, entry in enumerate(numbers):
+        INDEX_ENTRY.pack_into(index, position * INDEX_ENTRY.size, *entry)
+
+    sections = [records, index, heap]
+    bodies = {}
+    for fmt, encoder in encoders.items():
+        body = encoder(rows, FIELDS)
+        variants = {None: body}
+        for encoding in supported_encodings():
+            variants[encoding] = compress(body, encoding, cached=True)
+        bodies[fmt] = variants
+
+    offset = 0
+    layout = []
+    for section in sections:
+        layout.append([offset, len(section)])
+        offset = _align(offset + len(section))
+    body_layout = {}
+    for fmt, variants in bodies.items():
+        body_layout[fmt] = {}
+        for encoding, data in variants.items():
+            body_layout[fmt][encoding or 'identity'] = [offset, len(data)]
+            sections.append(data)
+            offset = _align(offset + len(data))
+
+    header = json.dumps({
+        'count': len(rows),
+        'records': layout[0],
+        'index': layout[1],
+        'heap': layout[2],
+        'bodies': body_layout,
+        'read_started_ns': read_started_ns,
+        'created': time.time(),
+    }).encode('utf-8')
+    base = _align(PREFIX.size + len(header))
+    data = bytearray(base + offset)
+    PREFIX.pack_into(data, 0, MAGIC, len(header))
+    data[PREFIX.size:PREFIX.size + len(header)] = header
+    position = base
+    for section in sections:
+        data[position:position + len(section)] = section
+        position = _align(position + len(section))
+    return bytes(data)
+
+
+class MappedSnapshot:
+    """Файл снимка, отображенный в память только для чтения"""
+
+    def __init__(self, path: str):
+        """
+        Открыть файл снимка
+
+        Args:
+            path: Путь к файлу
+
+        Raises:
+            ValueError: Если файл не является снимком
+        """
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+        magic, header_size = PREFIX.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f'Файл {path} не является снимком списка карт')
+        header = json.loads(self._mmap[PREFIX.size:PREFIX.size + header_size])
+        self._view = memoryview(self._mmap)[_align(PREFIX.size + header_size):]
+        self.count = header['count']
+        self.read_started_ns = header['read_started_ns']
+        self.created = header['created']
+        self._records = self._section(header['records'])
+        self._index = self._section(header['index'])
+        self._heap = self._section(header['heap'])
+        self._bodies = {fmt: {encoding: self._section(location)
+                              for encoding, location in variants.items()}
+                        for fmt, variants in header['bodies'].items()}
+
+    def _section(self, location: List[int]) -> memoryview:
+        offset, size = location
+        return self._view[offset:offset + size]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def age(self) -> float:
+        """Возраст снимка (секунды)"""
+        return max(time.time() - self.created, 0.0)
+
+    def _string(self, offset: int, size: int, cache: Dict[int, str]) -> str:
+        value = cache.get(offset)
+        if value is None:
+            value = str(self._heap[offset:offset + size], 'utf-8')
+            cache[offset] = value
+        return value
+
+    def _row(self, record: Tuple, fields: Sequence[str], cache: Dict[int, str]) -> Tuple:
+        card_id, card_number, valid_from, valid_until, status, mask = record[:6]
+        values = []
+        for field in fields:
+            if mask & (1 << _FIELD_INDEX[field]):
+                values.append(None)
+            elif field == 'room':
+                values.append(self._string(record[6], record[7], cache))
+            elif field == 'comments':
+                values.append(self._string(record[8], record[9], cache))
+            elif field in DATETIME_BITS:
+                value = valid_from if field == 'valid_from' else valid_until
+                values.append(_decode_date(value, bool(mask & DATETIME_BITS[field])))
+            else:
+                values.append(card_id if field == 'card_id'
+                              else card_number if field == 'card_number' else status)
+        return tuple(values)
+
+    def rows(self, fields: Sequence[str] = FIELDS) -> List[Tuple]:
+        """
+        Строки списка карт (как DatabaseManager.get_all_card_rows)
+
+        Args:
+            fields: Поля из FIELDS
+
+        Returns:
+            List[Tuple]: Строки в порядке списка
+        """
+        cache: Dict[int, str] = {}
+        return [self._row(record, fields, cache) for record in RECORD.iter_unpack(self._records)]
+
+    def find(self, card_number: int, fields: Sequence[str] = FIELDS) -> Optional[Tuple]:
+        """
+        Найти карту по номеру (деление пополам по индексу)
+
+        Returns:
+            Tuple: Строка карты или None
+        """
+        low, high = 0, len(self._index) // INDEX_ENTRY.size
+        while low < high:
+            middle = (low + high) // 2
+            if INDEX_ENTRY.unpack_from(self._index, middle * INDEX_ENTRY.size)[0] < card_number:
+                low = middle + 1
+            else:
+                high = middle
+        if low * INDEX_ENTRY.size >= len(self._index):
+            return None
+        number, position = INDEX_ENTRY.unpack_from(self._index, low * INDEX_ENTRY.size)
+        if number != card_number:
+            return None
+        return self._row(RECORD.unpack_from(self._records, position * RECORD.size), fields, {})
+
+    def body(self, fmt: str, encoding: Optional[str] = None) -> Optional[memoryview]:
+        """Закодированное тело полного списка (None, если формат или сжатие не сохранены)"""
+        return self._bodies.get(fmt, {}).get(encoding or 'identity')
+
+
+class SnapshotBody:
+    """
+    Тело полного списка карт из снимка (интерфейс CachedSnapshot).
+    Тело и его сжатые копии отдаются частями из mmap (stream), без копии
+    целиком на время ответа
+    """
+
+    __slots__ = ('snapshot', 'fmt')
+
+    def __init__(self, snapshot: MappedSnapshot, fmt: str):
+        self.snapshot = snapshot
+        self.fmt = fmt
+
+    @property
+    def size(self) -> int:
+        return len(self.snapshot.body(self.fmt))
+
+    def variant(self, encoding: Optional[str] = None) -> Optional[memoryview]:
+        """Сохраненное тело (None, если сжатая копия этой кодировкой не сохранена)"""
+        return self.snapshot.body(self.fmt, encoding)
+
+    def stream(self, encoding: Optional[str] = None) -> Iterator[bytes]:
+        """
+        Части сохраненного тела для ответа
+
+        Args:
+            encoding: Кодировка сжатия (None - несжатое тело)
+
+        Returns:
+            Iterator[bytes]: Части не больше STREAM_CHUNK_SIZE; сервер WSGI
+            принимает только bytes, поэтому копируется одна часть за раз
+        """
+        data = self.variant(encoding)
+        for offset in range(0, len(data), STREAM_CHUNK_SIZE):
+            yield bytes(data[offset:offset + STREAM_CHUNK_SIZE])
+
+
+class SharedCardSnapshot:
+    """Снимок списка карт одной БД в каталоге снимков узла"""
+
+    # Каталог файлов снимков (None - снимки не используются)
+    directory: Optional[str] = None
+
+    # Максимальный возраст снимка, который отдается читателям (секунды)
+    max_age: float = 30.0
+
+    _registry: Dict[str, 'SharedCardSnapshot'] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, path: str, db_path: str = None):
+        """
+        Инициализация снимка
+
+        Args:
+            path: Путь к файлу снимка
+            db_path: Путь к БД, список карт которой хранится в снимке
+        """
+        self.path = path
+        self.db_path = db_path
+        self.stale_path = path + '.stale'
+        self._mapped: Optional[MappedSnapshot] = None
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self._lock_pid = None
+
+    @classmethod
+    def for_database(cls, db_path: str) -> Optional['SharedCardSnapshot']:
+        """
+        Получить снимок БД
+
+        Args:
+            db_path: Путь к БД
+
+        Returns:
+            SharedCardSnapshot или None, если каталог снимков не задан
+        """
+        if not cls.directory:
+            return None
+        with cls._registry_lock:
+            snapshot = cls._registry.get(db_path)
+            if snapshot is None:
+                os.makedirs(cls.directory, exist_ok=True)
+                name = hashlib.sha1(db_path.encode('utf-8')).hexdigest()[:16]
+                snapshot = cls(os.path.join(cls.directory, f'cards_{name}.snapshot'), db_path)
+                cls._registry[db_path] = snapshot
+            return snapshot
+
+    @classmethod
+    def registered(cls) -> List['SharedCardSnapshot']:
+        """Снимки БД, к которым обращался этот процесс"""
+        with cls._registry_lock:
+            return list(cls._registry.values())
+
+    def _stale_since(self) -> int:
+        """Время последнего подтвержденного изменения (ns), 0 - не было"""
+        try:
+            return os.stat(self.stale_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def mapped(self) -> Optional[MappedSnapshot]:
+        """Последний записанный снимок (файл отображается заново после замены)"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        mapped = self._mapped
+        if mapped is None or mapped.identity != (stat.st_ino, stat.st_mtime_ns):
+            with self._lock:
+                mapped = self._mapped
+                if mapped is None or mapped.identity != (stat.st_ino, stat.st_mtime_ns):
+                    try:
+                        mapped = MappedSnapshot(self.path)
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"Снимок списка карт {self.path} не прочитан: {str(e)}")
+                        return None
+                    # Прежний файл освобождается, когда на него не останется ссылок
+                    self._mapped = mapped
+        return mapped
+
+    def current(self) -> Optional[MappedSnapshot]:
+        """
+        Снимок, который можно отдать вместо чтения из БД
+
+        Returns:
+            MappedSnapshot или None, если снимка нет, он старше max_age или
+            после его чтения подтверждались изменения
+        """
+        mapped = self.mapped()
+        if mapped is None or mapped.age() > self.max_age:
+            return None
+        if self._stale_since() >= mapped.read_started_ns:
+            return None
+        return mapped
+
+    def mark_stale(self) -> None:
+        """Отметить, что карты БД изменились (снимок будет обновлен)"""
+        now = time.time_ns()
+        try:
+            with open(self.stale_path, 'a'):
+                pass
+            os.utime(self.stale_path, ns=(now, now))
+        except OSError as e:
+            logger.error(f"Ошибка отметки снимка списка карт {self.path}: {str(e)}")
+
+    def refresh_due(self, interval: float) -> bool:
+        """Нужно ли обновить снимок: нет файла, он старше interval или устарел"""
+        mapped = self.mapped()
+        return (mapped is None or mapped.age() >= interval
+                or self._stale_since() >= mapped.read_started_ns)
+
+    def try_lock(self) -> bool:
+        """
+        Стать процессом, обновляющим снимок (блокировка файла снимается
+        при завершении процесса)
+
+        Returns:
+            bool: True если снимок обновляет этот процесс
+        """
+        if fcntl is None:
+            return True
+        if self._lock_pid == os.getpid():
+            return True
+        lock_file = open(self.path + '.lock', 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self._lock_pid = os.getpid()
+        return True
+
+    def refresh(self, db_manager, encoders: Dict[str, Callable]) -> int:
+        """
+        Прочитать список карт из БД и атомарно заменить файл снимка
+
+        Args:
+            db_manager: DatabaseManager
+            encoders: {формат: encoder(rows, fields)} - тела полного списка
+
+        Returns:
+            int: Количество карт в снимке
+        """
+        read_started_ns = time.time_ns()
+        rows = db_manager.get_all_card_rows(FIELDS)
+        data = build_snapshot(rows, encoders, read_started_ns)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        logger.info(f"Снимок списка карт БД {self.db_path} обновлен: карт {len(rows)}, "
+                    f"{len(data)} байт")
+        return len(rows)
+
+
+class SnapshotRefresher:
+    """Фоновое обновление снимков списка карт процесса"""
+
+    def __init__(self, connect: Callable[[str], ContextManager], encoders: Dict[str, Callable],
+                 interval: float = 10.0):
+        """
+        Args:
+            connect: connect(db_path) - контекстный менеджер, выдающий DatabaseManager
+            encoders: {формат: encoder(rows, fields)} - тела полного списка
+            interval: Интервал обновления снимка (секунды); отметки изменений
+                проверяются не реже раза в секунду
+        """
+        self.connect = connect
+        self.encoders = encoders
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Запустить поток текущего процесса (после fork создается заново)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._loop, name='card-snapshot-refresh', daemon=True).start()
+
+    def _loop(self) -> None:
+        while True:
+            self.run_once()
+            time.sleep(min(self.interval, 1.0))
+
+    def run_once(self) -> None:
+        """Обновить снимки, блокировку которых удерживает этот процесс"""
+        for snapshot in SharedCardSnapshot.registered():
+            self.refresh_snapshot(snapshot)
+
+    def refresh_snapshot(self, snapshot: SharedCardSnapshot) -> Optional[int]:
+        """
+        Обновить один снимок, если он устарел и его обновляет этот процесс
+
+        Returns:
+            int: Количество карт или None (снимок не обновлялся, ошибка)
+        """
+        try:
+            if not snapshot.try_lock() or not snapshot.refresh_due(self.interval):
+                return None
+            with self.connect(snapshot.db_path) as db_manager:
+                return snapshot.refresh(db_manager, self.encoders)
+        except Exception as e:
+            logger.warning(f"Снимок списка карт БД {snapshot.db_path} не обновлен: {str(e)}")
+            return None
@@ -0,0 +1,166 @@
+"""
+CircuitBreaker - быстрый отказ при недоступности сервера БД.
+
+После нескольких подряд ошибок подключения размыкатель открывается:
+операции с БД сразу завершаются DatabaseUnavailable (ответ 503 с
+Retry-After) вместо ожидания сетевых таймаутов в каждом запросе. Пока
+размыкатель открыт, фоновый поток периодически пробует подключиться и
+закрывает его при первом успешном подключении.
+"""
+
+import logging
+import math
+import os
+import threading
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+
+
+class DatabaseUnavailable(Exception):
+    """Сервер БД недоступен (размыкатель открыт или подключение потеряно)"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        """
+        Args:
+            message: Описание причины
+            retry_after: Рекомендуемое время повтора (секунды)
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Размыкатель для одной БД с фоновой проверкой доступности"""
+
+    def __init__(self, name: str, probe: Callable[[], None], failure_threshold: int = 3,
+                 probe_interval: float = 1.0, max_probe_interval: float = 10.0):
+        """
+        Инициализация размыкателя
+
+        Args:
+            name: Имя для журнала и сообщений (путь к БД)
+            probe: Проверка доступности (исключение - БД недоступна)
+            failure_threshold: Количество ошибок подряд, открывающее размыкатель
+            probe_interval: Начальный интервал между проверками (секунды)
+            max_probe_interval: Максимальный интервал между проверками (секунды)
+        """
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.max_probe_interval = max_probe_interval
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._interval = probe_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def retry_after(self) -> int:
+        """Время до следующей проверки доступности (секунды, не меньше 1)"""
+        return max(1, math.ceil(self._interval))
+
+    def check(self) -> None:
+        """
+        Проверить, можно ли обращаться к БД
+
+        Raises:
+            DatabaseUnavailable: Если размыкатель открыт
+        """
+        if self.state == OPEN:
+            raise DatabaseUnavailable(f"БД {self.name} недоступна", self.retry_after())
+
+    def record_success(self) -> None:
+        """Учесть успешную операцию"""
+        if self.failures:
+            with self._lock:
+                self.failures = 0
+
+    def record_failure(self) -> None:
+        """Учесть ошибку подключения (при достижении порога - открыть размыкатель)"""
+        with self._lock:
+            self.failures += 1
+            if self.state == OPEN or self.failures < self.failure_threshold:
+                return
+            self.state = OPEN
+            self.opened += 1
+            self._interval = self.probe_interval
+            # У каждого открытия свой признак остановки проверки
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._probe_loop, args=(self._stop,),
+                                            daemon=True, name=f'db-probe {self.name}')
+            self._thread.start()
+        logger.error(f"БД {self.name} недоступна: {self.failures} ошибок подряд, "
+                     f"запросы отклоняются до восстановления подключения")
+
+    def close(self) -> None:
+        """Закрыть размыкатель (БД снова доступна)"""
+        with self._lock:
+            was_open = self.state == OPEN
+            self.state = CLOSED
+            self.failures = 0
+            self._interval = self.probe_interval
+            self._stop.set()
+        if was_open:
+            logger.info(f"Подключение к БД {self.name} восстановлено")
+
+    def _probe_loop(self, stop: threading.Event) -> None:
+        """Проверять доступность БД, увеличивая интервал после неудач"""
+        while not stop.wait(self._interval):
+            try:
+                self.probe()
+            except Exception as e:
+                logger.warning(f"БД {self.name} по-прежнему недоступна: {str(e)}")
+                self._interval = min(self._interval * 2, self.max_probe_interval)
+            else:
+                if not stop.is_set():
+                    self.close()
+                return
+
+    def stop(self) -> None:
+        """Остановить фоновую проверку (размыкатель остается в текущем состоянии)"""
+        self._stop.set()
+
+
+# Параметры размыкателей, создаваемых через get_breaker
+default_settings: Dict[str, float] = {}
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(db_path: str, probe: Callable[[], None]) -> CircuitBreaker:
+    """
+    Получить размыкатель БД (создается при первом обращении с default_settings)
+
+    Args:
+        db_path: Путь к файлу БД
+        probe: Проверка доступности (используется только при создании)
+
+    Returns:
+        CircuitBreaker
+    """
+    breaker = _breakers.get(db_path)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(db_path)
+            if breaker is None:
+                breaker = CircuitBreaker(db_path, probe, **default_settings)
+                _breakers[db_path] = breaker
+    return breaker
+
+
+def _after_fork_in_child() -> None:
+    """Сбросить размыкатели в дочернем процессе (потоки проверки не наследуются)"""
+    global _breakers_lock
+    _breakers_lock = threading.Lock()
+    _breakers.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
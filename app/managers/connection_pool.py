@@ -0,0 +1,257 @@
+"""
+ConnectionPool - пул подключенных DatabaseManager для одной базы данных.
+Каждый DatabaseManager владеет собственным подключением fdb и выдается
+одному запросу за раз.
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+from app.managers.database_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Не удалось получить подключение из пула за отведенное время"""
+    pass
+
+
+class ConnectionPool:
+    """Пул подключений к одной БД"""
+
+    def __init__(self, db_path: str, size: int = 4,
+                 factory: Callable[[str], DatabaseManager] = DatabaseManager):
+        """
+        Инициализация пула
+
+        Args:
+            db_path: Путь к файлу БД
+            size: Максимальное количество подключений
+            factory: Функция создания DatabaseManager по пути к БД
+        """
+        self.db_path = db_path
+        self.size = size
+        self.factory = factory
+        self._idle: Deque[DatabaseManager] = deque()
+        self._created = 0
+        self._condition = threading.Condition()
+        self._pid = os.getpid()
+
+    def _check_fork(self) -> None:
+        """
+        После fork подключения родительского процесса не используются
+        (и не закрываются, чтобы не разорвать их у родителя)
+        """
+        if self._pid != os.getpid():
+            # Ссылки сохраняются: при сборке мусора fdb закрыл бы подключение
+            _inherited.extend(self._idle)
+            self._idle = deque()
+            self._created = 0
+            self._condition = threading.Condition()
+            self._pid = os.getpid()
+
+    def acquire(self, timeout: Optional[float] = None) -> DatabaseManager:
+        """
+        Получить DatabaseManager из пула
+
+        Args:
+            timeout: Время ожидания свободного подключения (секунды); None - без ограничения
+
+        Returns:
+            DatabaseManager: Менеджер с собственным подключением (подключается при первом запросе)
+
+        Raises:
+            PoolTimeoutError: Если свободное подключение не появилось за timeout
+        """
+        self._check_fork()
+        with self._condition:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self.size:
+                    self._created += 1
+                    break
+                if not self._condition.wait(timeout):
+                    raise PoolTimeoutError(f"Нет свободных подключений к БД {self.db_path}")
+
+        try:
+            return self.factory(self.db_path)
+        except Exception:
+            with self._condition:
+                self._created -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, manager: DatabaseManager, commit: bool = True) -> None:
+        """
+        Вернуть DatabaseManager в пул, завершив его транзакцию
+
+        Args:
+            manager: Менеджер, полученный через acquire или add
+            commit: True - подтвердить транзакцию, False - откатить
+        """
+        discard = False
+        try:
+            manager.end_transaction(commit)
+        except Exception as e:
+            logger.error(f"Ошибка при завершении транзакции, подключение закрыто: {str(e)}")
+            manager.disconnect()
+            discard = True
+
+        with self._condition:
+            if discard:
+                self._created -= 1
+            else:
+                self._idle.append(manager)
+            self._condition.notify()
+
+    def discard(self, manager: DatabaseManager) -> None:
+        """
+        Закрыть подключение и не возвращать его в пул
+
+        Args:
+            manager: Менеджер, полученный через acquire
+        """
+        manager.disconnect()
+        with self._condition:
+            self._created -= 1
+            self._condition.notify()
+
+    def add(self, manager: DatabaseManager) -> bool:
+        """
+        Добавить в пул уже подключенный DatabaseManager (например, после
+        проверки подключения)
+
+        Args:
+            manager: Подключенный менеджер этой БД
+
+        Returns:
+            bool: True если менеджер принят, False если пул заполнен (менеджер отключен)
+        """
+        self._check_fork()
+        with self._condition:
+            if self._created < self.size:
+                self._created += 1
+                self._idle.append(manager)
+                self._condition.notify()
+                return True
+        manager.disconnect()
+        return False
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[DatabaseManager]:
+        """
+        Контекстный менеджер: получить DatabaseManager и вернуть его в пул
+
+        Args:
+            timeout: Время ожидания свободного подключения (секунды)
+
+        Yields:
+            DatabaseManager
+        """
+        manager = self.acquire(timeout)
+        try:
+            yield manager
+        except Exception:
+            self.release(manager, commit=False)
+            raise
+        else:
+            self.release(manager)
+
+    def warm(self, count: int = 1) -> int:
+        """
+        Заранее открыть подключения
+
+        Args:
+            count: Желаемое количество открытых свободных подключений
+
+        Returns:
+            int: Количество открытых свободных подключений
+        """
+        managers = []
+        try:
+            for _ in range(max(0, count - self.idle_count())):
+                manager = self.acquire(timeout=0)
+                managers.append(manager)
+                if not manager.connection:
+                    manager.connect()
+        except PoolTimeoutError:
+            pass
+        finally:
+            for manager in managers:
+                if manager.connection:
+                    self.release(manager)
+                else:
+                    self.discard(manager)
+        return self.idle_count()
+
+    def idle_count(self) -> int:
+        """Количество свободных подключений"""
+        self._check_fork()
+        return sum(1 for manager in self._idle if manager.connection)
+
+    def close(self) -> None:
+        """Закрыть все свободные подключения"""
+        self._check_fork()
+        with self._condition:
+            idle, self._idle = self._idle, deque()
+            self._created -= len(idle)
+        for manager in idle:
+            manager.disconnect()
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+# Подключения, унаследованные от родительского процесса при fork
+_inherited: List[DatabaseManager] = []
+
+# Размер пулов, создаваемых через get_pool
+default_pool_size = 4
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """
+    Получить пул подключений к БД (создается при первом обращении)
+
+    Args:
+        db_path: Путь к файлу БД
+
+    Returns:
+        ConnectionPool: Пул этой БД
+    """
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(db_path)
+            if pool is None:
+                pool = ConnectionPool(db_path, size=default_pool_size)
+                _pools[db_path] = pool
+    return pool
+
+
+def close_all_pools() -> None:
+    """Закрыть свободные подключения всех пулов"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
+def _after_fork_in_child() -> None:
+    """Сбросить реестр пулов в дочернем процессе"""
+    global _pools_lock
+    # Блокировка могла быть захвачена другим потоком родителя в момент fork
+    _pools_lock = threading.Lock()
+    for pool in _pools.values():
+        pool._check_fork()
+    _pools.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
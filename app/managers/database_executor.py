@@ -0,0 +1,129 @@
+"""
+DatabaseExecutor - выполнение блокирующих операций DatabaseManager из asyncio.
+Размер пула потоков равен размеру пула подключений БД, поэтому поток,
+получивший задачу, не ждет свободного подключения, а очередь ожидающих
+операций находится в event loop, а не в занятых потоках.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.managers.connection_pool import ConnectionPool, get_pool
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseExecutor:
+    """Ограниченный пул потоков для операций с одной БД"""
+
+    def __init__(self, pool: ConnectionPool, max_workers: Optional[int] = None,
+                 acquire_timeout: Optional[float] = None):
+        """
+        Инициализация исполнителя
+
+        Args:
+            pool: Пул подключений БД
+            max_workers: Количество потоков (по умолчанию - размер пула подключений)
+            acquire_timeout: Время ожидания подключения из пула (секунды)
+        """
+        self.pool = pool
+        self.max_workers = max_workers or pool.size
+        self.acquire_timeout = acquire_timeout
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Пул потоков текущего процесса (после fork создается заново)"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='db')
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _call(self, func: Callable[..., Any], args: tuple, kwargs: Dict) -> Any:
+        """Выполнить функцию с DatabaseManager из пула (в потоке исполнителя)"""
+        with self.pool.connection(self.acquire_timeout) as manager:
+            return func(manager, *args, **kwargs)
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Выполнить func(db_manager, *args, **kwargs) в потоке исполнителя
+
+        Транзакция подтверждается после успешного выполнения и откатывается
+        при исключении.
+
+        Args:
+            func: Функция, первым аргументом получающая DatabaseManager
+
+        Returns:
+            Результат функции
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), functools.partial(self._call, func, args, kwargs)
+        )
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Остановить пул потоков
+
+        Args:
+            wait: Дождаться завершения выполняемых операций
+        """
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+            self._pid = None
+
+
+_executors: Dict[str, DatabaseExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(db_path: str, acquire_timeout: Optional[float] = None) -> DatabaseExecutor:
+    """
+    Получить исполнитель операций БД (создается при первом обращении)
+
+    Args:
+        db_path: Путь к файлу БД
+        acquire_timeout: Время ожидания подключения из пула (секунды)
+
+    Returns:
+        DatabaseExecutor: Исполнитель, связанный с пулом подключений этой БД
+    """
+    pool = get_pool(db_path)
+    with _executors_lock:
+        executor = _executors.get(db_path)
+        if executor is None or executor.pool is not pool:
+            # Пул пересоздается после fork - исполнитель тоже
+            executor = DatabaseExecutor(pool, acquire_timeout=acquire_timeout)
+            _executors[db_path] = executor
+        return executor
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    """Остановить все исполнители"""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait)
+
+
+def _after_fork_in_child() -> None:
+    """Сбросить реестр исполнителей в дочернем процессе (потоки родителя не наследуются)"""
+    global _executors_lock
+    _executors_lock = threading.Lock()
+    _executors.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -3,17 +3,101 @@ DatabaseManager для работы с базой данных Firebird.
 Управляет подключением и выполнением операций с картами через процедуру HOSTEL_CARDEDIT.
 """
 
-import fdb
+import functools
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from app.managers.auth_manager import AuthManager
+from app.managers.card_replica import ALWAYS, FALLBACK, CardReplica
+from app.managers.card_snapshot import SharedCardSnapshot
+from app.managers.circuit_breaker import DatabaseUnavailable, get_breaker
+from app.managers.report_cache import ReportCache
+from app.managers.statement_timeout import get_watchdog
+from app.managers.user_cache import UserCache
+from app.utils.db_errors import CONNECTION, TRANSIENT, StatementTimeout, classify_error
 
 logger = logging.getLogger(__name__)
 
+# Имена полей карты в порядке столбцов выборки из CARDS/PEOPLE
+CARD_FIELDS = ('card_id', 'card_number', 'room', 'valid_from', 'valid_until', 'status', 'comments')
+
+# Выражения SQL для полей карты
+CARD_COLUMNS = {
+    'card_id': 'c.CARDSID',
+    'card_number': 'c.CARDNUM',
+    'room': 'p.FNAME',
+    'valid_from': 'c.OPENDATE',
+    'valid_until': 'c.CLOSEDATE',
+    'status': 'c.ACTIVED',
+    'comments': 'c.COMMENTS'
+}
+
+# Отдел карты: HOSTEL_CARDEDIT записывает параметр dep (по умолчанию 'ХОСТЕЛ')
+# в фамилию записи PEOPLE, имя - комната (FNAME), отчество - номер карты
+DEP_COLUMN = 'p.LNAME'
+
+# Максимальное количество параметров в одном списке IN
+IN_CHUNK_SIZE = 512
+
+# Количество строк, получаемых из курсора за раз при выгрузке
+FETCH_BATCH_SIZE = 1000
+
+T = TypeVar('T')
+
+# Ошибки, которые методы чтения не заменяют пустым результатом (ответы 503/504)
+PROPAGATED_ERRORS = (DatabaseUnavailable, StatementTimeout)
+
+# Виды запросов для ограничения времени выполнения
+LIST = 'list'    # выборки списка карт
+READ = 'read'    # чтение одной карты или пользователя
+WRITE = 'write'  # HOSTEL_CARDEDIT и UPD_CARDSLIST
+
+# Столбцы CARDS и PEOPLE, копируемые в локальную копию (CardReplica)
+REPLICA_CARD_COLUMNS = ('c.CARDSID', 'c.CARDNUM', 'c.PEOPLEID', 'c.OPENDATE', 'c.CLOSEDATE',
+                        'c.ACTIVED', 'c.COMMENTS')
+REPLICA_PEOPLE_COLUMNS = ('p.PEOPLEID', 'p.FNAME')
+
+# Драйвер fdb импортируется при первом подключении (ускоряет запуск и тесты)
+fdb = None
+
+
+def _import_fdb():
+    """
+    Импортировать драйвер fdb при первом использовании
+    
+    Returns:
+        module: Модуль fdb
+    """
+    global fdb
+    if fdb is None:
+        import fdb as module
+        fdb = module
+    return fdb
+
+
+def _probe_connection(params: Dict) -> None:
+    """
+    Проверить доступность БД отдельным подключением (для размыкателя)
+    
+    Args:
+        params: Параметры fdb.connect
+    """
+    _import_fdb().connect(**params).close()
+
 
 class DatabaseManager:
     """Менеджер для работы с базой данных Firebird"""
 
+    # Повторы идемпотентных чтений после потери подключения или конфликта блокировок
+    retry_attempts = 3
+    retry_backoff = 0.1  # секунд, удваивается с каждой попыткой
+    # Время выполнения оператора по видам запросов (секунды, 0 - без ограничения)
+    statement_timeouts = {LIST: 30.0, READ: 5.0, WRITE: 10.0}
+    # Чтение карт из локальной копии: FALLBACK - при недоступности БД, ALWAYS - всегда
+    replica_mode = FALLBACK
+
     def __init__(self, db_path: str, host: str = 'localhost', port: int = 3050, 
                  user: str = 'SYSDBA', password: str = 'masterkey'):
         """
@@ -33,6 +117,33 @@ class DatabaseManager:
         self.password = password
         self.connection = None
         self.cursor = None
+        self.user_cache = UserCache.for_database(db_path)
+        self.report_cache = ReportCache.for_database(db_path)
+        # Локальная копия карт (None, если не настроена)
+        self.replica = CardReplica.for_database(db_path)
+        # Общий снимок списка карт узла (None, если не настроен)
+        self.snapshot = SharedCardSnapshot.for_database(db_path)
+        # Возраст данных копии, если карты в этом запросе прочитаны из нее,
+        # и признак чтения из копии из-за недоступности БД
+        self.replica_age: Optional[float] = None
+        self.degraded = False
+        # В текущей транзакции есть неподтвержденные изменения
+        self._dirty = False
+        # Номера карт, измененных в текущей транзакции (журнал копии)
+        self._changed_cards = set()
+        self.breaker = get_breaker(db_path, functools.partial(_probe_connection,
+                                                              self._connect_params()))
+
+    def _connect_params(self) -> Dict:
+        """Параметры fdb.connect"""
+        return {
+            'host': self.host,
+            'port': self.port,
+            'database': self.db_path,
+            'user': self.user,
+            'password': self.password,
+            'charset': 'WIN1251'
+        }
 
     def connect(self) -> bool:
         """
@@ -40,21 +151,21 @@ class DatabaseManager:
         
         Returns:
             bool: True если подключение успешно, False иначе
+            
+        Raises:
+            DatabaseUnavailable: Если размыкатель БД открыт
         """
+        self.breaker.check()
         try:
-            self.connection = fdb.connect(
-                host=self.host,
-                port=self.port,
-                database=self.db_path,
-                user=self.user,
-                password=self.password,
-                charset='WIN1251'
-            )
+            self.connection = _import_fdb().connect(**self._connect_params())
             self.cursor = self.connection.cursor()
+            self.breaker.record_success()
             logger.info(f"Успешное подключение к БД: {self.db_path}")
             return True
         except Exception as e:
             logger.error(f"Ошибка подключения к БД: {str(e)}")
+            if classify_error(e) == CONNECTION:
+                self.breaker.record_failure()
             raise
 
     def disconnect(self) -> None:
@@ -67,6 +178,221 @@ class DatabaseManager:
             logger.info("Отключение от БД")
         except Exception as e:
             logger.error(f"Ошибка при отключении от БД: {str(e)}")
+        finally:
+            self.cursor = None
+            self.connection = None
+            self._dirty = False
+            self._changed_cards.clear()
+
+    def end_transaction(self, commit: bool = True) -> None:
+        """
+        Завершить текущую транзакцию (перед возвратом подключения в пул)
+        
+        Args:
+            commit: True - подтвердить изменения, False - откатить
+        """
+        self.replica_age = None
+        self.degraded = False
+        if not self.connection:
+            return
+        try:
+            if commit:
+                self.connection.commit()
+                self._committed()
+            else:
+                self.connection.rollback()
+        finally:
+            self._dirty = False
+            self._changed_cards.clear()
+
+    def _committed(self) -> None:
+        """
+        Изменения подтверждены: сбросить материализованные отчеты БД и
+        общий снимок списка карт, отметить измененные карты в журнале
+        локальной копии
+        """
+        if self._dirty:
+            self._dirty = False
+            self.report_cache.invalidate()
+            if self.snapshot is not None:
+                self.snapshot.mark_stale()
+        if self._changed_cards:
+            changed, self._changed_cards = self._changed_cards, set()
+            if self.replica is not None:
+                try:
+                    self.replica.record_changes(changed)
+                except Exception as e:
+                    # Карты обновятся в копии при полной синхронизации
+                    logger.error(f"Ошибка записи журнала локальной копии: {str(e)}")
+
+    def _connection_lost(self, error: Exception) -> bool:
+        """
+        Обработать ошибку операции: потерянное подключение закрывается,
+        чтобы следующая операция подключилась заново
+        
+        Args:
+            error: Исключение операции
+            
+        Returns:
+            bool: True если ошибка - потеря подключения
+        """
+        if classify_error(error) != CONNECTION:
+            return False
+        if self.connection is not None:
+            logger.warning(f"Подключение к БД {self.db_path} потеряно: {str(error)}")
+            self.breaker.record_failure()
+            self.disconnect()
+        return True
+
+    def _unavailable(self, error: Exception) -> DatabaseUnavailable:
+        """Исключение для ответа 503 после потери подключения"""
+        return DatabaseUnavailable(f"Нет подключения к БД {self.db_path}: {str(error)}",
+                                   self.breaker.retry_after())
+
+    def _execute(self, operation: Callable[[], T], kind: str) -> T:
+        """
+        Выполнить operation, отменив оператор по истечении времени для вида запроса
+        
+        После отмены транзакция откатывается, и подключение можно сразу
+        использовать для следующего запроса.
+        
+        Args:
+            operation: Функция без аргументов, выполняющая запросы через self.cursor
+            kind: LIST, READ или WRITE
+            
+        Returns:
+            Результат operation
+            
+        Raises:
+            StatementTimeout: Если оператор отменен
+        """
+        timeout = self.statement_timeouts.get(kind)
+        with get_watchdog().watch(self.connection, timeout) as watch:
+            try:
+                return operation()
+            except Exception as e:
+                if watch is None or not watch.expired:
+                    raise
+                error = e
+        logger.warning(f"Оператор ({kind}) в БД {self.db_path} отменен через {timeout} с")
+        try:
+            self.end_transaction(commit=False)
+        except Exception as e:
+            logger.error(f"Ошибка отката после отмены оператора, подключение закрыто: {str(e)}")
+            self.disconnect()
+        raise StatementTimeout(f"Превышено время выполнения запроса ({timeout} с)",
+                               timeout) from error
+
+    def _read(self, operation: Callable[[], T], kind: str = READ) -> T:
+        """
+        Выполнить идемпотентное чтение; после потери подключения или конфликта
+        блокировок повторить его с экспоненциальной задержкой
+        
+        Чтение не повторяется, если в транзакции есть неподтвержденные
+        изменения: вместе с подключением они потеряны.
+        
+        Args:
+            operation: Функция без аргументов, выполняющая запросы через self.cursor
+            kind: Вид запроса для ограничения времени (LIST или READ)
+            
+        Returns:
+            Результат operation
+            
+        Raises:
+            DatabaseUnavailable: Если размыкатель открыт или повторы не помогли
+            StatementTimeout: Если оператор отменен по истечении времени
+        """
+        attempt = 0
+        while True:
+            self.breaker.check()
+            dirty = self._dirty
+            try:
+                if not self.connection:
+                    self.connect()
+                result = self._execute(operation, kind)
+            except Exception as e:
+                lost = self._connection_lost(e)
+                retryable = lost or (classify_error(e) == TRANSIENT and not dirty)
+                if not retryable or dirty or attempt >= self.retry_attempts:
+                    if lost:
+                        raise self._unavailable(e) from e
+                    raise
+                if not lost:
+                    self.connection.rollback()
+                delay = self.retry_backoff * 2 ** attempt
+                attempt += 1
+                logger.warning(f"Повтор чтения из БД {self.db_path} "
+                               f"({attempt}/{self.retry_attempts}) через {delay:.2f} с: {str(e)}")
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    def _replicated(self, read: Callable[[], T], replica_read: Callable[[CardReplica], T]) -> T:
+        """
+        Прочитать карты из Firebird или из локальной копии (по replica_mode)
+        
+        Копия используется только после первой синхронизации; возраст ее
+        данных сохраняется в replica_age до конца транзакции. После изменений
+        в текущей транзакции карты читаются из Firebird (копия их еще не
+        содержит).
+        
+        Args:
+            read: Чтение из Firebird
+            replica_read: То же чтение из копии
+            
+        Returns:
+            Результат чтения
+            
+        Raises:
+            DatabaseUnavailable: Если БД недоступна, а копии нет
+        """
+        replica = self.replica
+        if replica is not None and self.replica_mode == ALWAYS and not self._dirty:
+            age = replica.age()
+            if age is not None:
+                self.replica_age = age
+                return replica_read(replica)
+        try:
+            return read()
+        except DatabaseUnavailable as e:
+            age = replica.age() if replica is not None else None
+            if age is None:
+                raise
+            logger.warning(f"БД {self.db_path} недоступна, карты прочитаны из локальной копии "
+                           f"(возраст {age:.0f} с): {str(e)}")
+            self.replica_age = age
+            self.degraded = True
+            return replica_read(replica)
+
+    def _write(self, operation: Callable[[], T], kind: str = WRITE) -> T:
+        """
+        Выполнить изменяющую операцию (без повтора: при потере подключения
+        сервер откатывает незавершенную транзакцию, клиент повторяет запрос)
+        
+        Args:
+            operation: Функция без аргументов, выполняющая запросы через self.cursor
+            kind: Вид запроса для ограничения времени
+            
+        Returns:
+            Результат operation
+            
+        Raises:
+            DatabaseUnavailable: Если размыкатель открыт или подключение потеряно
+            StatementTimeout: Если оператор отменен по истечении времени
+        """
+        self.breaker.check()
+        if not self.connection:
+            self.connect()
+        self._dirty = True
+        try:
+            result = self._execute(operation, kind)
+        except Exception as e:
+            if self._connection_lost(e):
+                raise self._unavailable(e) from e
+            raise
+        self.breaker.record_success()
+        return result
 
     def call_cardedit_procedure(self, action: int, room: int = None, card_number: int = None,
                                valid_from: str = None, valid_days: int = None,
@@ -87,28 +413,28 @@ class DatabaseManager:
             Dict с результатом операции
         """
         try:
-            if not self.connection:
-                self.connect()
-
             # Преобразовать дату
             if valid_from:
                 valid_from_date = datetime.strptime(valid_from, '%Y-%m-%d').date()
             else:
                 valid_from_date = datetime.now().date()
 
-            # Вызвать процедуру
-            self.cursor.callproc('HOSTEL_CARDEDIT', [
-                action,
-                room,
-                card_number,
-                valid_from_date,
-                valid_days,
-                comments or '',
-                dep
-            ])
+            def call():
+                self.cursor.callproc('HOSTEL_CARDEDIT', [
+                    action,
+                    room,
+                    card_number,
+                    valid_from_date,
+                    valid_days,
+                    comments or '',
+                    dep
+                ])
+                return self.cursor.fetchone()
 
-            # Получить результаты
-            result = self.cursor.fetchone()
+            # Вызвать процедуру (action=0 только читает карту - чтение можно повторить)
+            result = self._read(call) if action == 0 else self._write(call)
+            if action != 0 and card_number is not None:
+                self._changed_cards.add(card_number)
             
             if result:
                 return {
@@ -124,6 +450,8 @@ class DatabaseManager:
             else:
                 return {'error': 'Процедура не вернула результат'}
 
+        except PROPAGATED_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Ошибка при вызове HOSTEL_CARDEDIT: {str(e)}")
             return {'error': str(e)}
@@ -140,64 +468,429 @@ class DatabaseManager:
             bool: True если успешно, False иначе
         """
         try:
-            if not self.connection:
-                self.connect()
+            def call():
+                self.cursor.callproc('UPD_CARDSLIST', [card_number, action])
+                self.connection.commit()
 
-            self.cursor.callproc('UPD_CARDSLIST', [card_number, action])
-            self.connection.commit()
+            self._write(call)
+            self._committed()
             logger.info(f"UPD_CARDSLIST вызвана для карты {card_number}")
             return True
 
+        except PROPAGATED_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Ошибка при вызове UPD_CARDSLIST: {str(e)}")
             return False
 
-    def get_all_cards(self) -> List[Dict]:
+    def refresh_dumps(self, card_numbers: Sequence[int], action: int = 0) -> bool:
         """
-        Получить список всех карт
+        Обновить дампы нескольких карт (UPD_CARDSLIST для каждой карты,
+        одна фиксация транзакции в конце)
         
+        Args:
+            card_numbers: Номера карт
+            action: Действие (0=добавить, 1=удалить)
+            
         Returns:
-            List[Dict]: Список карт с их атрибутами
+            bool: True если успешно, False иначе
         """
         try:
-            if not self.connection:
-                self.connect()
+            numbers = list(dict.fromkeys(card_numbers))
+            for card_number in numbers:
+                self._write(lambda: self.cursor.callproc('UPD_CARDSLIST', [card_number, action]))
+            self._write(lambda: self.connection.commit())
+            self._committed()
+            logger.info(f"UPD_CARDSLIST вызвана для {len(numbers)} карт")
+            return True
 
-            query = """
+        except PROPAGATED_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка при вызове UPD_CARDSLIST: {str(e)}")
+            return False
+
+    @staticmethod
+    def _card_select(fields: Sequence[str]) -> str:
+        """
+        Сформировать SELECT по CARDS только с нужными столбцами
+        
+        Args:
+            fields: Поля карты (из CARD_FIELDS)
+            
+        Returns:
+            str: Запрос без условий WHERE/ORDER BY
+        """
+        unknown = [field for field in fields if field not in CARD_COLUMNS]
+        if unknown:
+            raise ValueError(f"Неизвестные поля карты: {', '.join(unknown)}")
+
+        columns = ',\n                    '.join(CARD_COLUMNS[field] for field in fields)
+        query = f"""
                 SELECT 
-                    c.CARDSID,
-                    c.CARDNUM,
-                    p.FNAME,
-                    c.OPENDATE,
-                    c.CLOSEDATE,
-                    c.ACTIVED,
-                    c.COMMENTS
+                    {columns}
                 FROM CARDS c
-                LEFT JOIN PEOPLE p ON c.PEOPLEID = p.PEOPLEID
-                ORDER BY c.CARDSID DESC
             """
+        # PEOPLE нужна только для поля room
+        if 'room' in fields:
+            query += "LEFT JOIN PEOPLE p ON c.PEOPLEID = p.PEOPLEID\n"
+        return query
 
-            self.cursor.execute(query)
-            rows = self.cursor.fetchall()
+    def get_all_card_rows(self, fields: Sequence[str] = CARD_FIELDS) -> List[Tuple]:
+        """
+        Получить строки всех карт без преобразования в словари
+        
+        Args:
+            fields: Выбираемые поля карты (по умолчанию все CARD_FIELDS)
+            
+        Returns:
+            List[Tuple]: Строки в порядке fields (даты - объекты date)
+        """
+        query = self._card_select(fields) + "ORDER BY c.CARDSID DESC"
 
-            cards = []
-            for row in rows:
-                cards.append({
-                    'card_id': row[0],
-                    'card_number': row[1],
-                    'room': row[2],
-                    'valid_from': row[3].isoformat() if row[3] else None,
-                    'valid_until': row[4].isoformat() if row[4] else None,
-                    'status': row[5],
-                    'comments': row[6]
-                })
+        def fetch():
+            self.cursor.execute(query)
+            return [tuple(row) for row in self.cursor.fetchall()]
 
-            return cards
+        try:
+            return self._replicated(lambda: self._read(fetch, LIST),
+                                    lambda replica: replica.get_all_card_rows(fields))
 
+        except PROPAGATED_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Ошибка при получении списка карт: {str(e)}")
             return []
 
+    def get_card_rows_by_ids(self, card_ids: Sequence[int],
+                             fields: Sequence[str] = CARD_FIELDS) -> List[Tuple]:
+        """
+        Получить строки нескольких карт по CARDSID одним запросом на каждые
+        IN_CHUNK_SIZE идентификаторов
+        
+        Args:
+            card_ids: ID карт
+            fields: Выбираемые поля карты (по умолчанию все CARD_FIELDS)
+            
+        Returns:
+            List[Tuple]: Строки найденных карт в порядке card_ids
+        """
+        ids = list(dict.fromkeys(card_ids))
+        select = self._card_select(('card_id',) + tuple(fields))
+
+        def fetch():
+            found = {}
+            for start in range(0, len(ids), IN_CHUNK_SIZE):
+                chunk = ids[start:start + IN_CHUNK_SIZE]
+                # Дополнить список до степени двойки, чтобы текст запроса
+                # (и подготовленный оператор) повторялся между вызовами
+                size = min(IN_CHUNK_SIZE, 1 << (len(chunk) - 1).bit_length())
+                params = chunk + [chunk[-1]] * (size - len(chunk))
+                query = select + f"WHERE c.CARDSID IN ({', '.join('?' * size)})"
+
+                self.cursor.execute(query, params)
+                for row in self.cursor.fetchall():
+                    found[row[0]] = tuple(row[1:])
+            return found
+
+        def read():
+            found = self._read(fetch, LIST)
+            return [found[card_id] for card_id in ids if card_id in found]
+
+        try:
+            return self._replicated(read, lambda replica: replica.get_card_rows_by_ids(ids, fields))
+
+        except PROPAGATED_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка при получении карт по списку ID: {str(e)}")
+            return []
+
+    def iter_card_rows(self, fields: Sequence[str] = CARD_FIELDS,
+                       card_ids: Optional[Sequence[int]] = None,
+                       batch_size: int = FETCH_BATCH_SIZE) -> Iterator[List[Tuple]]:
+        """
+        Выбрать карты порциями из курсора, не загружая весь список в память
+        
+        Ограничение времени (LIST) и повтор после потери подключения действуют
+        на выполнение запроса; строки затем читаются с той скоростью, с
+        которой их забирает получатель.
+        
+        Args:
+            fields: Выбираемые поля карты (по умолчанию все CARD_FIELDS)
+            card_ids: ID карт или None для всех карт
+            batch_size: Количество строк в порции
+            
+        Yields:
+            List[Tuple]: Порция строк в порядке fields (по убыванию CARDSID
+            в пределах каждых IN_CHUNK_SIZE идентификаторов)
+            
+        Raises:
+            DatabaseUnavailable: Если БД недоступна
+            StatementTimeout: Если запрос отменен по истечении времени
+        """
+        select = self._card_select(fields)
+        if card_ids is None:
+            queries = [(select + "ORDER BY c.CARDSID DESC", ())]
+        else:
+            ids = list(dict.fromkeys(card_ids))
+            queries = [
+                (select + f"WHERE c.CARDSID IN ({', '.join('?' * len(chunk))})\n"
+                          "ORDER BY c.CARDSID DESC", chunk)
+                for chunk in (ids[start:start + IN_CHUNK_SIZE]
+                              for start in range(0, len(ids), IN_CHUNK_SIZE))
+            ]
+
+        return self._iter_batches(queries, batch_size)
+
+    def _iter_batches(self, queries: Sequence[Tuple[str, Sequence]],
+                      batch_size: int) -> Iterator[List[Tuple]]:
+        """
+        Выполнить запросы по очереди и выдавать их строки порциями из курсора
+        
+        Args:
+            queries: Пары (запрос, параметры)
+            batch_size: Количество строк в порции
+            
+        Yields:
+            List[Tuple]: Порция строк
+        """
+        for query, params in queries:
+            self._read(lambda: self.cursor.execute(query, params), LIST)
+            while True:
+                try:
+                    rows = self.cursor.fetchmany(batch_size)
+                except Exception as e:
+                    if self._connection_lost(e):
+                        raise self._unavailable(e) from e
+                    raise
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+
+    def _replica_queries(self, select: str, id_column: str, after_id: int,
+                         key_column: str, keys: Optional[Sequence[int]]) -> List[Tuple[str, Sequence]]:
+        """Запросы строк для локальной копии: после after_id или по списку keys"""
+        if keys is None:
+            return [(select + f"WHERE {id_column} > ?\nORDER BY {id_column}", (after_id,))]
+        keys = list(dict.fromkeys(keys))
+        return [
+            (select + f"WHERE {key_column} IN ({', '.join('?' * len(chunk))})", chunk)
+            for chunk in (keys[start:start + IN_CHUNK_SIZE]
+                          for start in range(0, len(keys), IN_CHUNK_SIZE))
+        ]
+
+    def iter_replica_cards(self, after_id: int = 0, card_numbers: Optional[Sequence[int]] = None,
+                           batch_size: int = FETCH_BATCH_SIZE) -> Iterator[List[Tuple]]:
+        """
+        Выбрать строки CARDS для локальной копии порциями
+        
+        Args:
+            after_id: Только карты с CARDSID больше after_id
+            card_numbers: Только карты с этими номерами (журнал изменений копии)
+            batch_size: Количество строк в порции
+            
+        Yields:
+            List[Tuple]: Строки в порядке REPLICA_CARD_COLUMNS
+        """
+        select = f"SELECT {', '.join(REPLICA_CARD_COLUMNS)} FROM CARDS c\n"
+        return self._iter_batches(
+            self._replica_queries(select, 'c.CARDSID', after_id, 'c.CARDNUM', card_numbers),
+            batch_size
+        )
+
+    def iter_replica_people(self, after_id: int = 0, people_ids: Optional[Sequence[int]] = None,
+                            batch_size: int = FETCH_BATCH_SIZE) -> Iterator[List[Tuple]]:
+        """
+        Выбрать строки PEOPLE для локальной копии порциями
+        
+        Args:
+            after_id: Только люди с PEOPLEID больше after_id
+            people_ids: Только люди с этими PEOPLEID
+            batch_size: Количество строк в порции
+            
+        Yields:
+            List[Tuple]: Строки в порядке REPLICA_PEOPLE_COLUMNS
+        """
+        select = f"SELECT {', '.join(REPLICA_PEOPLE_COLUMNS)} FROM PEOPLE p\n"
+        return self._iter_batches(
+            self._replica_queries(select, 'p.PEOPLEID', after_id, 'p.PEOPLEID', people_ids),
+            batch_size
+        )
+
+    def find_card_rows(self, room: Optional[str] = None, floor: Optional[int] = None,
+                       card_ids: Optional[Sequence[int]] = None, status: Optional[int] = None,
+                       fields: Sequence[str] = CARD_FIELDS) -> List[Tuple]:
+        """
+        Выбрать карты по комнате, этажу, списку ID и статусу одним запросом
+        (на каждые IN_CHUNK_SIZE идентификаторов) по индексируемым столбцам
+        
+        Args:
+            room: Имя комнаты в PEOPLE.FNAME ("Этаж.Комната", см. Card.room_name)
+            floor: Этаж (имена комнат, начинающиеся с "Этаж.")
+            card_ids: ID карт
+            status: Статус карты (ACTIVED)
+            fields: Выбираемые поля карты (по умолчанию все CARD_FIELDS)
+            
+        Returns:
+            List[Tuple]: Строки в порядке fields (по убыванию CARDSID)
+            
+        Raises:
+            DatabaseUnavailable: Если БД недоступна
+            StatementTimeout: Если запрос отменен по истечении времени
+        """
+        select = self._card_select(fields)
+        if 'room' not in fields and (room is not None or floor is not None):
+            select += "LEFT JOIN PEOPLE p ON c.PEOPLEID = p.PEOPLEID\n"
+        
+        conditions, params = [], []
+        if room is not None:
+            conditions.append("p.FNAME = ?")
+            params.append(room)
+        if floor is not None:
+            # STARTING WITH использует индекс, в отличие от разбора номера в SQL
+            conditions.append("p.FNAME STARTING WITH ?")
+            params.append(f"{floor}.")
+        if status is not None:
+            conditions.append("c.ACTIVED = ?")
+            params.append(status)
+        
+        queries = []
+        if card_ids is None:
+            queries.append((conditions, params))
+        else:
+            ids = list(dict.fromkeys(card_ids))
+            for start in range(0, len(ids), IN_CHUNK_SIZE):
+                chunk = ids[start:start + IN_CHUNK_SIZE]
+                queries.append((conditions + [f"c.CARDSID IN ({', '.join('?' * len(chunk))})"],
+                                params + chunk))
+        
+        def fetch():
+            rows = []
+            for where, values in queries:
+                query = select
+                if where:
+                    query += "WHERE " + " AND ".join(where) + "\n"
+                self.cursor.execute(query + "ORDER BY c.CARDSID DESC", values)
+                rows.extend(tuple(row) for row in self.cursor.fetchall())
+            return rows
+        
+        return self._read(fetch, LIST)
+
+    def _report(self, query: str, params: Sequence = ()) -> List[Tuple]:
+        """
+        Выполнить агрегирующий запрос отчета (ограничение времени - как у списка карт)
+        
+        Raises:
+            DatabaseUnavailable: Если БД недоступна
+            StatementTimeout: Если запрос отменен по истечении времени
+        """
+        def fetch():
+            self.cursor.execute(query, params)
+            return [tuple(row) for row in self.cursor.fetchall()]
+        
+        return self._read(fetch, LIST)
+
+    def count_active_cards_by_floor(self, today: date) -> List[Tuple[str, int]]:
+        """
+        Количество действующих карт по этажам (этаж - часть имени комнаты
+        PEOPLE.FNAME до точки)
+        
+        Args:
+            today: Текущая дата
+            
+        Returns:
+            List[Tuple[str, int]]: (этаж, количество карт)
+        """
+        floor = "SUBSTRING(p.FNAME FROM 1 FOR POSITION('.' IN p.FNAME) - 1)"
+        return self._report(f"""
+            SELECT {floor}, COUNT(*)
+            FROM CARDS c
+            JOIN PEOPLE p ON c.PEOPLEID = p.PEOPLEID
+            WHERE c.ACTIVED = 1 AND c.CLOSEDATE >= ? AND p.FNAME CONTAINING '.'
+            GROUP BY {floor}
+        """, (today,))
+
+    def count_cards_expiring_by_day(self, start: date, end: date) -> List[Tuple[date, int]]:
+        """
+        Количество действующих карт, истекающих в каждый день периода
+        
+        Args:
+            start: Первый день периода
+            end: День после окончания периода
+            
+        Returns:
+            List[Tuple[date, int]]: (день, количество карт) по возрастанию дня,
+            дни без истекающих карт не возвращаются
+        """
+        return self._report("""
+            SELECT CAST(c.CLOSEDATE AS DATE), COUNT(*)
+            FROM CARDS c
+            WHERE c.ACTIVED = 1 AND c.CLOSEDATE >= ? AND c.CLOSEDATE < ?
+            GROUP BY CAST(c.CLOSEDATE AS DATE)
+            ORDER BY 1
+        """, (start, end))
+
+    def get_card_intervals(self, start: date, end: date) -> List[Tuple[str, date, date]]:
+        """
+        Интервалы действия активных карт, пересекающиеся с периодом
+        
+        Args:
+            start: Первый день периода
+            end: Последний день периода (включительно)
+            
+        Returns:
+            List[Tuple[str, date, date]]: (имя комнаты, valid_from, valid_until)
+        """
+        return self._report("""
+            SELECT p.FNAME, c.OPENDATE, c.CLOSEDATE
+            FROM CARDS c
+            LEFT JOIN PEOPLE p ON c.PEOPLEID = p.PEOPLEID
+            WHERE c.ACTIVED = 1 AND c.CLOSEDATE >= ?
+              AND (c.OPENDATE <= ? OR c.OPENDATE IS NULL)
+        """, (start, end))
+
+    def count_cards_by_dep(self, today: date) -> List[Tuple[str, int, int]]:
+        """
+        Количество выданных и действующих карт по отделам - значениям dep,
+        переданным HOSTEL_CARDEDIT (DEP_COLUMN)
+        
+        Args:
+            today: Текущая дата
+            
+        Returns:
+            List[Tuple[str, int, int]]: (отдел, всего карт, действующих карт)
+        """
+        return self._report(f"""
+            SELECT {DEP_COLUMN}, COUNT(*),
+                   SUM(CASE WHEN c.ACTIVED = 1 AND c.CLOSEDATE >= ? THEN 1 ELSE 0 END)
+            FROM CARDS c
+            LEFT JOIN PEOPLE p ON c.PEOPLEID = p.PEOPLEID
+            GROUP BY {DEP_COLUMN}
+            ORDER BY 2 DESC
+        """, (today,))
+
+    def get_all_cards(self) -> List[Dict]:
+        """
+        Получить список всех карт
+        
+        Returns:
+            List[Dict]: Список карт с их атрибутами
+        """
+        cards = []
+        for row in self.get_all_card_rows():
+            cards.append({
+                'card_id': row[0],
+                'card_number': row[1],
+                'room': row[2],
+                'valid_from': row[3].isoformat() if row[3] else None,
+                'valid_until': row[4].isoformat() if row[4] else None,
+                'status': row[5],
+                'comments': row[6]
+            })
+
+        return cards
+
     def authenticate_user(self, username: str, password: str) -> Optional[Dict]:
         """
         Аутентифицировать пользователя через таблицу USERS
@@ -210,8 +903,15 @@ class DatabaseManager:
             Dict с информацией о пользователе или None если аутентификация не удалась
         """
         try:
-            if not self.connection:
-                self.connect()
+            self._refresh_user_cache()
+
+            # Проверка пароля (упрощенная - в реальном приложении нужна хеширование)
+            # Здесь предполагается, что пароль хранится в открытом виде или нужна специальная проверка
+            # TODO: Реализовать правильную проверку пароля
+
+            cached = self.user_cache.get_by_name(username)
+            if cached is not None:
+                return cached
 
             query = """
                 SELECT USERID, NAME, FLAGS, SFLAGS
@@ -219,30 +919,16 @@ class DatabaseManager:
                 WHERE NAME = ?
             """
 
-            self.cursor.execute(query, [username])
-            user = self.cursor.fetchone()
+            user = self._read(lambda: self._fetch_one(query, [username]))
 
             if not user:
                 logger.warning(f"Пользователь {username} не найден")
                 return None
 
-            # Проверка пароля (упрощенная - в реальном приложении нужна хеширование)
-            # Здесь предполагается, что пароль хранится в открытом виде или нужна специальная проверка
-            # TODO: Реализовать правильную проверку пароля
-
-            user_id, name, flags, sflags = user
-
-            # Анализировать FLAGS и SFLAGS для определения прав доступа
-            permissions = self._parse_permissions(flags, sflags)
-
-            return {
-                'id': user_id,
-                'username': name,
-                'flags': flags,
-                'sflags': sflags,
-                'permissions': permissions
-            }
+            return self._cache_user(user)
 
+        except PROPAGATED_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Ошибка при аутентификации пользователя: {str(e)}")
             return None
@@ -258,17 +944,58 @@ class DatabaseManager:
         Returns:
             Dict с правами доступа
         """
-        # Битовые флаги для прав доступа
+        # Битовые флаги для прав доступа (см. PERMISSION_BITS)
         # Это примерная реализация - нужно уточнить с реальной структурой БД
-        permissions = {
-            'can_view': True,  # Все могут просматривать
-            'can_create': bool(flags & 0x01),  # Бит 0 - создание
-            'can_edit': bool(flags & 0x02),    # Бит 1 - редактирование
-            'can_delete': bool(flags & 0x04),  # Бит 2 - удаление
-            'is_admin': bool(flags & 0x08)     # Бит 3 - администратор
-        }
+        permissions = AuthManager.permissions_from_flags(flags)
         return permissions
 
+    def _cache_user(self, row: Tuple) -> Dict:
+        """
+        Разобрать строку USERS и сохранить пользователя в кэше
+        
+        Args:
+            row: Строка (USERID, NAME, FLAGS, SFLAGS)
+            
+        Returns:
+            Dict с информацией о пользователе
+        """
+        user_id, name, flags, sflags = row
+
+        # Анализировать FLAGS и SFLAGS для определения прав доступа
+        permissions = self._parse_permissions(flags, sflags)
+
+        user = {
+            'id': user_id,
+            'username': name,
+            'flags': flags,
+            'sflags': sflags,
+            'permissions': permissions
+        }
+        self.user_cache.put(user)
+        return user
+
+    def _refresh_user_cache(self) -> None:
+        """Сбросить кэш пользователей, если изменилась версия таблицы USERS"""
+        if not self.user_cache.version_check_due():
+            return
+
+        # Количество строк и контрольные суммы меняются при добавлении,
+        # удалении пользователей и изменении их прав
+        version = self._read(lambda: self._fetch_one("""
+            SELECT COUNT(*), MAX(USERID), SUM(FLAGS), SUM(SFLAGS)
+            FROM USERS
+        """))
+        self.user_cache.update_version(tuple(version))
+
+    def _fetch_one(self, query: str, params: Sequence = ()) -> Optional[Tuple]:
+        """Выполнить запрос и получить первую строку"""
+        self.cursor.execute(query, params)
+        return self.cursor.fetchone()
+
+    def invalidate_user_cache(self) -> None:
+        """Сбросить кэш пользователей этой БД"""
+        self.user_cache.invalidate()
+
     def get_user_by_id(self, user_id: int) -> Optional[Dict]:
         """
         Получить информацию о пользователе по ID
@@ -280,8 +1007,11 @@ class DatabaseManager:
             Dict с информацией о пользователе или None
         """
         try:
-            if not self.connection:
-                self.connect()
+            self._refresh_user_cache()
+
+            cached = self.user_cache.get_by_id(user_id)
+            if cached is not None:
+                return cached
 
             query = """
                 SELECT USERID, NAME, FLAGS, SFLAGS
@@ -289,23 +1019,15 @@ class DatabaseManager:
                 WHERE USERID = ?
             """
 
-            self.cursor.execute(query, [user_id])
-            user = self.cursor.fetchone()
+            user = self._read(lambda: self._fetch_one(query, [user_id]))
 
             if not user:
                 return None
 
-            user_id, name, flags, sflags = user
-            permissions = self._parse_permissions(flags, sflags)
-
-            return {
-                'id': user_id,
-                'username': name,
-                'flags': flags,
-                'sflags': sflags,
-                'permissions': permissions
-            }
+            return self._cache_user(user)
 
+        except PROPAGATED_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Ошибка при получении информации о пользователе: {str(e)}")
             return None
@@ -321,9 +1043,6 @@ class DatabaseManager:
             Dict с информацией о карте или None
         """
         try:
-            if not self.connection:
-                self.connect()
-
             query = """
                 SELECT 
                     c.CARDSID,
@@ -338,22 +1057,30 @@ class DatabaseManager:
                 WHERE c.CARDNUM = ?
             """
 
-            self.cursor.execute(query, [card_number])
-            row = self.cursor.fetchone()
+            def read():
+                mapped = self.snapshot.current() if self.snapshot is not None else None
+                if mapped is not None and not self._dirty:
+                    row = mapped.find(card_number)
+                else:
+                    row = self._read(lambda: self._fetch_one(query, [card_number]))
 
-            if not row:
-                return None
+                if not row:
+                    return None
 
-            return {
-                'card_id': row[0],
-                'card_number': row[1],
-                'room': row[2],
-                'valid_from': row[3].isoformat() if row[3] else None,
-                'valid_until': row[4].isoformat() if row[4] else None,
-                'status': row[5],
-                'comments': row[6]
-            }
+                return {
+                    'card_id': row[0],
+                    'card_number': row[1],
+                    'room': row[2],
+                    'valid_from': row[3].isoformat() if row[3] else None,
+                    'valid_until': row[4].isoformat() if row[4] else None,
+                    'status': row[5],
+                    'comments': row[6]
+                }
 
+            return self._replicated(read, lambda replica: replica.get_card_by_number(card_number))
+
+        except PROPAGATED_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Ошибка при получении информации о карте: {str(e)}")
             return None
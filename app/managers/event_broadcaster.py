@@ -0,0 +1,453 @@
+"""
+EventBroadcaster для рассылки событий изменения карт подписчикам (Server-Sent Events).
+
+Без журнала события рассылаются внутри процесса всем подписчикам одной базы
+данных; номера событий начинаются с отметки времени запуска процесса, поэтому
+номер, выданный до перезапуска, меньше любого нового, и переподключившийся
+клиент получает resync.
+
+При нескольких рабочих процессах события пишутся в журнал SQLite, общий для
+процессов (SQLiteEventLog): каждый процесс читает из него новые события для
+своих подписчиков, а номер события - номер записи журнала, одинаковый во всех
+процессах. Переподключение к другому процессу или после перезапуска
+досылает пропущенные события или, если их уже нет в журнале, resync.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.utils.json_encoder import dumps
+
+logger = logging.getLogger(__name__)
+
+# Событие, после которого клиент должен перезагрузить список целиком
+RESYNC = 'resync'
+
+
+class Subscription:
+    """Подписка клиента с ограниченным буфером событий"""
+
+    def __init__(self, key: str, max_events: int):
+        """
+        Инициализация подписки
+
+        Args:
+            key: Ключ канала (путь к БД)
+            max_events: Максимальное количество неотправленных событий
+        """
+        self.key = key
+        self.max_events = max_events
+        self.overflowed = False
+        self.closed = False
+        # Номер последнего добавленного события (повторы из журнала пропускаются)
+        self.last_id = 0
+        self._events: Deque[Tuple[int, Dict]] = deque()
+        self._condition = threading.Condition()
+        # Вызывается при новом событии или закрытии (для ожидания в asyncio)
+        self.on_ready: Optional[Callable[[], None]] = None
+
+    def push(self, event_id: int, event: Dict) -> None:
+        """
+        Добавить событие в буфер. При переполнении буфер очищается и клиенту
+        будет отправлено событие resync
+
+        Args:
+            event_id: Номер события
+            event: Данные события
+        """
+        with self._condition:
+            if event_id <= self.last_id:
+                return
+            self.last_id = event_id
+            if len(self._events) >= self.max_events:
+                self._events.clear()
+                self.overflowed = True
+            else:
+                self._events.append((event_id, event))
+            self._condition.notify()
+        if self.on_ready is not None:
+            self.on_ready()
+
+    def get(self, timeout: float) -> Optional[Tuple[int, Dict]]:
+        """
+        Получить следующее событие
+
+        Args:
+            timeout: Время ожидания события (секунды)
+
+        Returns:
+            (номер, событие) или None, если событий не было
+        """
+        with self._condition:
+            if not self._events and not self.overflowed and not self.closed:
+                self._condition.wait(timeout)
+            if self.overflowed:
+                self.overflowed = False
+                return 0, {'type': RESYNC}
+            if self._events:
+                return self._events.popleft()
+            return None
+
+    def get_nowait(self) -> Optional[Tuple[int, Dict]]:
+        """
+        Получить следующее событие без ожидания
+
+        Returns:
+            (номер, событие) или None, если событий нет
+        """
+        with self._condition:
+            if self.overflowed:
+                self.overflowed = False
+                return 0, {'type': RESYNC}
+            if self._events:
+                return self._events.popleft()
+            return None
+
+    def close(self) -> None:
+        """Закрыть подписку и разбудить ожидающий поток"""
+        with self._condition:
+            self.closed = True
+            self._condition.notify()
+        if self.on_ready is not None:
+            self.on_ready()
+
+
+class SQLiteEventLog:
+    """Журнал событий в файле SQLite, общий для нескольких процессов"""
+
+    def __init__(self, path: str, keep: int = 256):
+        """
+        Инициализация журнала
+
+        Args:
+            path: Путь к файлу SQLite
+            keep: Количество хранимых событий одного канала
+        """
+        self.path = path
+        self.keep = keep
+        self._local = threading.local()
+        with self._connection() as conn:
+            # AUTOINCREMENT: номера удаленных событий не выдаются повторно
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    key TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS events_key ON events (key, id)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Соединение SQLite текущего потока (новое после fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, key: str, event: Dict) -> int:
+        """
+        Записать событие и удалить самые старые события канала сверх keep
+
+        Returns:
+            int: Номер события
+        """
+        conn = self._connection()
+        cursor = conn.execute(
+            "INSERT INTO events (key, data, created) VALUES (?, ?, ?)",
+            (key, json.dumps(event, ensure_ascii=False, default=str), time.time())
+        )
+        conn.execute("""
+            DELETE FROM events WHERE key = ? AND id <= (
+                SELECT id FROM events WHERE key = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+            )
+        """, (key, key, self.keep))
+        return cursor.lastrowid
+
+    def read(self, key: str, after_id: int) -> List[Tuple[int, Dict]]:
+        """События канала с номером больше after_id (по возрастанию)"""
+        return [(row[0], json.loads(row[1])) for row in self._connection().execute(
+            "SELECT id, data FROM events WHERE key = ? AND id > ? ORDER BY id", (key, after_id)
+        )]
+
+    def bounds(self, key: str) -> Tuple[Optional[int], int]:
+        """
+        Номер самого старого события канала и последний выданный номер журнала
+
+        Returns:
+            (первый номер канала или None, последний номер журнала или 0)
+        """
+        conn = self._connection()
+        first = conn.execute("SELECT MIN(id) FROM events WHERE key = ?", (key,)).fetchone()[0]
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'events'").fetchone()
+        return first, row[0] if row else 0
+
+
+class EventBroadcaster:
+    """Рассылка событий подписчикам процесса (и других процессов через журнал)"""
+
+    def __init__(self, max_events: int = 100, history_size: int = 256,
+                 log: Optional[SQLiteEventLog] = None, poll_interval: float = 0.5):
+        """
+        Инициализация рассылки
+
+        Args:
+            max_events: Размер буфера событий одного подписчика
+            history_size: Количество последних событий канала, хранимых для
+                повторной отправки после переподключения (Last-Event-ID)
+            log: Журнал событий, общий для процессов (None - только этот процесс)
+            poll_interval: Интервал чтения событий других процессов из журнала (секунды)
+        """
+        self.max_events = max_events
+        self.history_size = history_size
+        self.log = log
+        self.poll_interval = poll_interval
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._history: Dict[str, Deque[Tuple[int, Dict]]] = {}
+        # Номера событий процесса больше номеров, выданных до его запуска
+        self._first_id = int(time.time() * 1000)
+        self._ids = itertools.count(self._first_id)
+        self._last_id = self._first_id - 1
+        self._lock = threading.Lock()
+        # Последнее доставленное из журнала событие канала
+        self._delivered: Dict[str, int] = {}
+        self._deliver_lock = threading.Lock()
+        self._poller_pid = None
+
+    def subscribe(self, key: str, last_event_id: Optional[int] = None) -> Subscription:
+        """
+        Подписаться на события канала
+
+        Args:
+            key: Ключ канала (путь к БД)
+            last_event_id: Номер последнего полученного клиентом события
+
+        Returns:
+            Subscription: Подписка
+        """
+        if self.log is not None:
+            return self._subscribe_log(key, last_event_id)
+        subscription = Subscription(key, self.max_events)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscription)
+            if last_event_id is not None:
+                history = self._history.get(key, ())
+                missed = [item for item in history if item[0] > last_event_id]
+                if last_event_id < self._first_id - 1 or last_event_id > self._last_id \
+                        or (history and history[0][0] > last_event_id + 1):
+                    # Номер выдан другим запуском процесса или часть событий
+                    # уже вытеснена из истории
+                    subscription.overflowed = True
+                    missed = []
+                for event_id, event in missed:
+                    subscription.push(event_id, event)
+        return subscription
+
+    def _subscribe_log(self, key: str, last_event_id: Optional[int]) -> Subscription:
+        """Подписаться на события канала из общего журнала"""
+        self._ensure_poller()
+        subscription = Subscription(key, self.max_events)
+        # Под блокировкой доставки: пропущенные события добавляются раньше новых
+        with self._deliver_lock:
+            first, last = self.log.bounds(key)
+            self._delivered.setdefault(key, last)
+            if last_event_id is not None and last_event_id <= last \
+                    and (first is None or first <= last_event_id + 1):
+                subscription.last_id = last_event_id
+                for event_id, event in self.log.read(key, last_event_id):
+                    subscription.push(event_id, event)
+            else:
+                # Без Last-Event-ID - только новые события; номер не из этого
+                # журнала или пропущенные события вытеснены - resync
+                subscription.last_id = last
+                subscription.overflowed = last_event_id is not None
+            with self._lock:
+                self._subscribers.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def _ensure_poller(self) -> None:
+        """Запустить поток чтения журнала (по одному на процесс)"""
+        if self._poller_pid == os.getpid():
+            return
+        with self._lock:
+            if self._poller_pid == os.getpid():
+                return
+            self._poller_pid = os.getpid()
+            self._delivered = {}
+            threading.Thread(target=self._poll_loop, name='event-log-poller', daemon=True).start()
+
+    def _poll_loop(self) -> None:
+        """Периодически доставлять подписчикам события других процессов"""
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                keys = list(self._subscribers)
+            for key in keys:
+                try:
+                    self._deliver(key)
+                except sqlite3.Error as e:
+                    logger.error(f"Ошибка чтения журнала событий: {str(e)}")
+
+    def _deliver(self, key: str) -> None:
+        """Разослать подписчикам процесса новые события канала из журнала"""
+        with self._deliver_lock:
+            after = self._delivered.get(key)
+            if after is None:
+                # Подписчиков канала еще не было - прошлые события не нужны
+                return
+            events = self.log.read(key, after)
+            if not events:
+                return
+            self._delivered[key] = events[-1][0]
+        with self._lock:
+            subscribers: List[Subscription] = list(self._subscribers.get(key, ()))
+        for subscription in subscribers:
+            for event_id, event in events:
+                subscription.push(event_id, event)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Отменить подписку
+
+        Args:
+            subscription: Подписка
+        """
+        subscription.close()
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.key]
+
+    def publish(self, key: str, event: Dict) -> int:
+        """
+        Разослать событие всем подписчикам канала
+
+        Args:
+            key: Ключ канала (путь к БД)
+            event: Данные события (type, card_id, card)
+
+        Returns:
+            int: Номер события
+        """
+        if self.log is not None:
+            event_id = self.log.append(key, event)
+            self._deliver(key)
+            return event_id
+
+        with self._lock:
+            event_id = next(self._ids)
+            self._last_id = event_id
+            history = self._history.setdefault(key, deque(maxlen=self.history_size))
+            history.append((event_id, event))
+            subscribers: List[Subscription] = list(self._subscribers.get(key, ()))
+
+        for subscription in subscribers:
+            subscription.push(event_id, event)
+        return event_id
+
+    def close_all(self) -> None:
+        """Закрыть все подписки (например, при остановке процесса)"""
+        with self._lock:
+            subscriptions = [sub for subs in self._subscribers.values() for sub in subs]
+        for subscription in subscriptions:
+            subscription.close()
+
+    def subscriber_count(self, key: str = None) -> int:
+        """
+        Получить количество подписчиков
+
+        Args:
+            key: Ключ канала; None - по всем каналам
+
+        Returns:
+            int: Количество подписчиков
+        """
+        with self._lock:
+            if key is not None:
+                return len(self._subscribers.get(key, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def stream(self, subscription: Subscription, heartbeat: float = 15.0) -> Iterator[str]:
+        """
+        Генератор сообщений text/event-stream для подписки
+
+        Args:
+            subscription: Подписка
+            heartbeat: Интервал отправки комментария-пульса (секунды)
+
+        Yields:
+            str: Сообщения в формате Server-Sent Events
+        """
+        try:
+            yield f'retry: {int(heartbeat * 1000)}\n\n'
+            while not subscription.closed:
+                item = subscription.get(heartbeat)
+                if item is None:
+                    yield ': ping\n\n'
+                    continue
+                yield self.format_event(*item)
+        finally:
+            self.unsubscribe(subscription)
+
+    async def astream(self, subscription: Subscription, heartbeat: float = 15.0) -> AsyncIterator[str]:
+        """
+        Асинхронный генератор сообщений text/event-stream: ожидающий клиент
+        не занимает поток
+
+        Args:
+            subscription: Подписка
+            heartbeat: Интервал отправки комментария-пульса (секунды)
+
+        Yields:
+            str: Сообщения в формате Server-Sent Events
+        """
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        subscription.on_ready = lambda: loop.call_soon_threadsafe(ready.set)
+        try:
+            yield f'retry: {int(heartbeat * 1000)}\n\n'
+            while not subscription.closed:
+                # Сброс до проверки буфера: событие, пришедшее после проверки, разбудит цикл
+                ready.clear()
+                item = subscription.get_nowait()
+                if item is not None:
+                    yield self.format_event(*item)
+                    continue
+                try:
+                    await asyncio.wait_for(ready.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+        finally:
+            subscription.on_ready = None
+            self.unsubscribe(subscription)
+
+    @staticmethod
+    def format_event(event_id: int, event: Dict) -> str:
+        """
+        Сформировать сообщение Server-Sent Events
+
+        Args:
+            event_id: Номер события (0 - без номера)
+            event: Данные события
+
+        Returns:
+            str: Сообщение
+        """
+        message = f"data: {dumps(event).decode('utf-8')}\n\n"
+        if event_id:
+            message = f'id: {event_id}\n' + message
+        return message
@@ -0,0 +1,622 @@
+"""
+JobRegistry - фоновые задачи процесса (импорт карт, массовые операции и т.п.)
+с состоянием, прогрессом и результатом, доступными через API.
+
+Задачи выполняются ограниченным пулом потоков; при заполненной очереди
+новая задача сразу отклоняется (AdmissionRejected). Состояние задач
+сохраняется в файле SQLite, общем для рабочих процессов: состояние видно
+из любого процесса, а задачи процесса, переставшего обновлять отметку
+активности (перезапуск, сбой), подхватываются и выполняются заново другим
+процессом. Поэтому функция задачи регистрируется по виду задачи и получает
+только сериализуемые в JSON аргументы. Задачи, повторное выполнение которых
+изменяет данные еще раз (например, продление карт), регистрируются как
+неповторяемые: прерванная задача такого вида завершается ошибкой.
+"""
+
+import json
+import logging
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from app.managers.admission import AdmissionRejected, get_admission
+from app.managers.connection_pool import get_pool
+from app.managers.database_manager import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# Максимальное количество запусков задачи (с учетом перезапусков после сбоев)
+MAX_ATTEMPTS = 3
+
+
+class JobCancelled(Exception):
+    """Задача отменена (выбрасывается функцией задачи через Job.check_cancelled)"""
+
+
+class Job:
+    """Фоновая задача"""
+
+    def __init__(self, kind: str, db_path: str, total: Optional[int] = None):
+        """
+        Args:
+            kind: Вид задачи (например, import)
+            db_path: БД, с которой работает задача
+            total: Общий объем работы, если известен заранее
+        """
+        self.id = secrets.token_hex(8)
+        self.kind = kind
+        self.db_path = db_path
+        self.status = QUEUED
+        self.processed = 0
+        self.total = total
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.args: tuple = ()
+        self.attempts = 0
+        self.cancel_event = threading.Event()
+        # Вызывается при изменении прогресса (сохранение состояния)
+        self.on_change: Optional[Callable[['Job'], None]] = None
+        # Журнал отложенной записи (WriteJournal): изменения задачи ждут его записей
+        self.journal = None
+        self.saved_at = 0.0
+
+    @property
+    def cancel_requested(self) -> bool:
+        """Запрошена ли отмена задачи"""
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self) -> None:
+        """
+        Прервать выполнение, если запрошена отмена (вызывается функцией
+        задачи между единицами работы)
+
+        Raises:
+            JobCancelled: Если запрошена отмена
+        """
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Задача {self.id} отменена")
+
+    def wait_for_queued_writes(self, interval: float = 1.0) -> None:
+        """
+        Дождаться применения изменений БД задачи, ожидающих в журнале
+        отложенной записи (вызывается функцией задачи перед изменением БД),
+        чтобы изменения задачи не опередили их
+
+        Args:
+            interval: Интервал проверки журнала (секунды)
+
+        Raises:
+            JobCancelled: Если запрошена отмена
+        """
+        if self.journal is None:
+            return
+        while self.journal.pending_count(self.db_path):
+            self.check_cancelled()
+            time.sleep(interval)
+
+    def progress(self, processed: int, total: Optional[int] = None) -> None:
+        """
+        Обновить прогресс (вызывается функцией задачи)
+
+        Args:
+            processed: Обработано единиц работы
+            total: Общий объем, если стал известен
+        """
+        self.processed = processed
+        if total is not None:
+            self.total = total
+        if self.on_change:
+            self.on_change(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Состояние задачи для ответа API"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'processed': self.processed,
+            'total': self.total,
+            'result': self.result,
+            'error': self.error,
+            'cancel_requested': self.cancel_requested,
+            'attempts': self.attempts,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> 'Job':
+        """
+        Восстановить задачу из строки хранилища
+
+        Args:
+            row: Строка таблицы jobs
+
+        Returns:
+            Job: Задача
+        """
+        job = cls(row['kind'], row['db_path'], row['total'])
+        job.id = row['id']
+        job.status = row['status']
+        job.processed = row['processed']
+        job.result = json.loads(row['result']) if row['result'] else None
+        job.error = row['error']
+        job.created = row['created']
+        job.started = row['started']
+        job.finished = row['finished']
+        job.args = tuple(json.loads(row['args']))
+        job.attempts = row['attempts']
+        if row['cancel_requested']:
+            job.cancel_event.set()
+        return job
+
+
+class SQLiteJobStore:
+    """Хранилище состояния задач в файле SQLite, общее для нескольких процессов"""
+
+    def __init__(self, path: str):
+        """
+        Инициализация хранилища
+
+        Args:
+            path: Путь к файлу SQLite
+        """
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    db_path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    processed INTEGER NOT NULL,
+                    total INTEGER,
+                    result TEXT,
+                    error TEXT,
+                    args TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    owner TEXT,
+                    heartbeat REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_db_path ON jobs (db_path, created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, heartbeat)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Соединение SQLite текущего потока (новое после fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def save(self, job: Job, owner: str) -> None:
+        """
+        Сохранить состояние задачи (флаг отмены не сбрасывается)
+
+        Args:
+            job: Задача
+            owner: Процесс, выполняющий задачу
+        """
+        self._connection().execute("""
+            INSERT INTO jobs (id, kind, db_path, status, processed, total, result, error, args,
+                              attempts, cancel_requested, created, started, finished, owner,
+                              heartbeat)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                status = excluded.status, processed = excluded.processed,
+                total = excluded.total, result = excluded.result, error = excluded.error,
+                attempts = excluded.attempts,
+                cancel_requested = max(cancel_requested, excluded.cancel_requested),
+                started = excluded.started, finished = excluded.finished,
+                owner = excluded.owner, heartbeat = excluded.heartbeat
+        """, (job.id, job.kind, job.db_path, job.status, job.processed, job.total,
+              json.dumps(job.result, ensure_ascii=False, default=str) if job.result is not None
+              else None,
+              job.error, json.dumps(list(job.args), ensure_ascii=False), job.attempts,
+              int(job.cancel_requested), job.created, job.started, job.finished, owner,
+              time.time()))
+
+    def load(self, job_id: str) -> Optional[Job]:
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def list(self, db_path: str, kind: Optional[str] = None, limit: int = 50) -> List[Job]:
+        """Последние задачи БД (новые первыми)"""
+        query = "SELECT * FROM jobs WHERE db_path = ?"
+        params: list = [db_path]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        query += " ORDER BY created DESC LIMIT ?"
+        params.append(limit)
+        return [Job.from_row(row) for row in self._connection().execute(query, params)]
+
+    def request_cancel(self, job_id: str) -> bool:
+        """
+        Запросить отмену незавершенной задачи
+
+        Returns:
+            bool: True если задача найдена и не завершена
+        """
+        cursor = self._connection().execute(
+            f"UPDATE jobs SET cancel_requested = 1 WHERE id = ? "
+            f"AND status NOT IN ({','.join('?' * len(FINISHED))})", (job_id, *FINISHED)
+        )
+        return cursor.rowcount > 0
+
+    def heartbeat(self, owner: str) -> List[str]:
+        """
+        Обновить отметку активности задач процесса
+
+        Args:
+            owner: Процесс
+
+        Returns:
+            List[str]: ID задач процесса с запрошенной отменой
+        """
+        conn = self._connection()
+        conn.execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status IN (?, ?)",
+                     (time.time(), owner, QUEUED, RUNNING))
+        return [row['id'] for row in conn.execute(
+            "SELECT id FROM jobs WHERE owner = ? AND status IN (?, ?) AND cancel_requested = 1",
+            (owner, QUEUED, RUNNING)
+        )]
+
+    def claim_stale(self, owner: str, stale_before: float) -> List[Job]:
+        """
+        Забрать незавершенные задачи процессов, переставших обновлять отметку
+        активности
+
+        Args:
+            owner: Процесс, забирающий задачи
+            stale_before: Задачи с отметкой активности раньше этого времени
+
+        Returns:
+            List[Job]: Забранные задачи
+        """
+        conn = self._connection()
+        claimed = []
+        rows = conn.execute("SELECT * FROM jobs WHERE status IN (?, ?) AND heartbeat < ?",
+                            (QUEUED, RUNNING, stale_before)).fetchall()
+        for row in rows:
+            # Условное обновление: задачу забирает только один процесс
+            cursor = conn.execute(
+                "UPDATE jobs SET owner = ?, heartbeat = ? WHERE id = ? AND owner IS ? "
+                "AND heartbeat = ?", (owner, time.time(), row['id'], row['owner'], row['heartbeat'])
+            )
+            if cursor.rowcount:
+                claimed.append(Job.from_row(row))
+        return claimed
+
+    def trim(self, max_finished: int) -> int:
+        """Удалить самые старые завершенные задачи сверх max_finished"""
+        placeholders = ','.join('?' * len(FINISHED))
+        cursor = self._connection().execute(f"""
+            DELETE FROM jobs WHERE status IN ({placeholders}) AND id NOT IN (
+                SELECT id FROM jobs WHERE status IN ({placeholders})
+                ORDER BY finished DESC LIMIT ?
+            )
+        """, (*FINISHED, *FINISHED, max_finished))
+        return cursor.rowcount
+
+
+@contextmanager
+def job_connection(db_path: str, kind: str,
+                   acquire_timeout: Optional[float] = None) -> Iterator[DatabaseManager]:
+    """
+    Подключение из пула для порции работы фоновой задачи. Задача не получает
+    отказ ограничителя, а ждет освобождения очереди; между порциями слот
+    и подключение свободны для запросов пользователей
+
+    Args:
+        db_path: Путь к БД
+        kind: READ или WRITE (ограничитель операций БД)
+        acquire_timeout: Время ожидания подключения из пула (секунды)
+
+    Yields:
+        DatabaseManager: Транзакция подтверждается при выходе без исключения
+    """
+    limiter = get_admission(db_path).limiter(kind)
+    while True:
+        try:
+            limiter.acquire()
+            break
+        except AdmissionRejected as e:
+            time.sleep(e.retry_after)
+    started = time.monotonic()
+    try:
+        with get_pool(db_path).connection(acquire_timeout) as db_manager:
+            yield db_manager
+    finally:
+        limiter.release(time.monotonic() - started)
+
+
+class JobRegistry:
+    """Реестр задач процесса с ограниченным пулом потоков"""
+
+    def __init__(self, workers: int = 2, max_queued: int = 20,
+                 store: Optional[SQLiteJobStore] = None, max_finished: int = 100,
+                 heartbeat_interval: float = 10.0):
+        """
+        Args:
+            workers: Количество потоков выполнения задач
+            max_queued: Максимальное количество задач в очереди
+            store: Хранилище состояния (None - только в памяти процесса)
+            max_finished: Количество хранимых завершенных задач
+            heartbeat_interval: Интервал обновления отметки активности (секунды);
+                задачи без обновления дольше трех интервалов перезапускаются
+        """
+        self.workers = workers
+        self.max_queued = max_queued
+        self.store = store
+        self.max_finished = max_finished
+        self.heartbeat_interval = heartbeat_interval
+        # Журнал отложенной записи, передаваемый задачам (Job.wait_for_queued_writes)
+        self.journal = None
+        self._handlers: Dict[str, Callable[..., Optional[Dict]]] = {}
+        self._retryable: Dict[str, Union[bool, Callable[..., bool]]] = {}
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._queue: 'queue.Queue[Job]' = queue.Queue()
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._owner = None
+        # Скользящее среднее длительности задачи (для Retry-After)
+        self._avg_duration = 0.0
+
+    def register(self, kind: str, func: Callable[..., Optional[Dict]],
+                 retryable: Union[bool, Callable[..., bool]] = True) -> None:
+        """
+        Зарегистрировать функцию задачи
+
+        Args:
+            kind: Вид задачи
+            func: Функция func(job, *args), возвращающая результат задачи
+            retryable: Можно ли выполнить заново задачу, прерванную сбоем
+                процесса; функция retryable(*args) - решение по аргументам задачи
+        """
+        self._handlers[kind] = func
+        self._retryable[kind] = retryable
+
+    def _can_retry(self, job: Job) -> bool:
+        """Можно ли выполнить заново прерванную задачу"""
+        if job.attempts == 0:
+            # Задача не начиналась - изменений не было
+            return True
+        retryable = self._retryable.get(job.kind, True)
+        return retryable(*job.args) if callable(retryable) else retryable
+
+    def start(self) -> None:
+        """Запустить потоки текущего процесса (после fork создаются заново)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._owner = f"{os.getpid()}:{secrets.token_hex(4)}"
+            self._queue = queue.Queue()
+            self._queued = 0
+            for number in range(self.workers):
+                threading.Thread(target=self._worker, name=f'job-worker-{number}',
+                                 daemon=True).start()
+            if self.store is not None:
+                threading.Thread(target=self._maintain, name='job-heartbeat', daemon=True).start()
+
+    def retry_after(self) -> int:
+        """Оценка времени освобождения очереди (секунды, не меньше 1)"""
+        backlog = (self._queued + 1) / max(self.workers, 1)
+        return max(1, int(self._avg_duration * backlog + 0.5))
+
+    def submit(self, job: Job, *args) -> Job:
+        """
+        Поставить задачу в очередь
+
+        Args:
+            job: Новая задача
+            *args: Аргументы функции задачи (сериализуемые в JSON)
+
+        Returns:
+            Job: Задача в очереди
+
+        Raises:
+            KeyError: Если вид задачи не зарегистрирован
+            AdmissionRejected: Если очередь задач заполнена
+        """
+        if job.kind not in self._handlers:
+            raise KeyError(f"Неизвестный вид задачи: {job.kind}")
+        self.start()
+        with self._lock:
+            if self._queued >= self.max_queued:
+                logger.warning(f"Задача {job.kind} отклонена: очередь заполнена ({self._queued})")
+                raise AdmissionRejected('Очередь задач заполнена', self.retry_after())
+            self._queued += 1
+            job.args = args
+            self._track(job)
+        self._save(job)
+        self._queue.put(job)
+        return job
+
+    def _track(self, job: Job) -> None:
+        """Добавить задачу в реестр процесса (под блокировкой)"""
+        job.on_change = self._on_progress
+        self._jobs[job.id] = job
+        self._trim()
+
+    def _worker(self) -> None:
+        """Выполнять задачи из очереди"""
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._queued -= 1
+            if job.cancel_requested:
+                job.status = CANCELLED
+                job.finished = time.time()
+                self._save(job)
+                continue
+            self._run(job)
+
+    def _run(self, job: Job) -> None:
+        job.status = RUNNING
+        job.started = time.time()
+        job.attempts += 1
+        job.journal = self.journal
+        self._save(job)
+        try:
+            job.result = self._handlers[job.kind](job, *job.args)
+            job.status = DONE
+        except JobCancelled:
+            logger.info(f"Задача {job.kind} {job.id} отменена")
+            job.status = CANCELLED
+        except Exception as e:
+            logger.error(f"Задача {job.kind} {job.id} завершилась ошибкой: {str(e)}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+            duration = job.finished - job.started
+            self._avg_duration = (duration if not self._avg_duration
+                                  else 0.8 * self._avg_duration + 0.2 * duration)
+            self._save(job)
+
+    def _save(self, job: Job) -> None:
+        """Сохранить состояние задачи в хранилище (ошибки хранилища не прерывают задачу)"""
+        if self.store is None:
+            return
+        try:
+            self.store.save(job, self._owner)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка при сохранении задачи {job.id}: {str(e)}")
+
+    def _on_progress(self, job: Job) -> None:
+        """Сохранять прогресс не чаще раза в секунду"""
+        now = time.monotonic()
+        if now - job.saved_at >= 1.0:
+            job.saved_at = now
+            self._save(job)
+
+    def _maintain(self) -> None:
+        """Обновлять отметку активности, принимать отмены и забирать брошенные задачи"""
+        while True:
+            try:
+                for job_id in self.store.heartbeat(self._owner):
+                    job = self._jobs.get(job_id)
+                    if job is not None:
+                        job.cancel_event.set()
+                self._recover()
+                self.store.trim(self.max_finished)
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка хранилища задач: {str(e)}")
+            time.sleep(self.heartbeat_interval)
+
+    def _recover(self) -> None:
+        """Поставить в очередь задачи процессов, завершившихся без их выполнения"""
+        stale_before = time.time() - 3 * self.heartbeat_interval
+        for job in self.store.claim_stale(self._owner, stale_before):
+            if job.cancel_requested or job.kind not in self._handlers \
+                    or job.attempts >= MAX_ATTEMPTS or not self._can_retry(job):
+                job.status = CANCELLED if job.cancel_requested else FAILED
+                job.error = job.error or 'Задача прервана перезапуском'
+                job.finished = time.time()
+                self._save(job)
+                continue
+            logger.info(f"Задача {job.kind} {job.id} перезапущена после сбоя процесса")
+            job.status = QUEUED
+            job.processed = 0
+            with self._lock:
+                self._queued += 1
+                self._track(job)
+            self._save(job)
+            self._queue.put(job)
+
+    def _trim(self) -> None:
+        """Удалить самые старые завершенные задачи сверх max_finished (под блокировкой)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Получить задачу (в том числе задачу другого процесса из хранилища)
+
+        Args:
+            job_id: ID задачи
+
+        Returns:
+            Optional[Job]: Задача или None
+        """
+        job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.load(job_id)
+        return job
+
+    def list(self, db_path: str, kind: Optional[str] = None, limit: int = 50) -> List[Job]:
+        """
+        Последние задачи БД (новые первыми)
+
+        Args:
+            db_path: БД
+            kind: Вид задачи (None - все)
+            limit: Максимальное количество задач
+
+        Returns:
+            List[Job]: Задачи
+        """
+        if self.store is not None:
+            stored = {job.id: job for job in self.store.list(db_path, kind, limit)}
+        else:
+            stored = {}
+        # Состояние задач процесса актуальнее сохраненного
+        local = {job_id: job for job_id, job in list(self._jobs.items())
+                 if job.db_path == db_path and (kind is None or job.kind == kind)}
+        jobs = list({**stored, **local}.values())
+        jobs.sort(key=lambda job: job.created, reverse=True)
+        return jobs[:limit]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Запросить отмену задачи. Задача в очереди не запускается; выполняемая
+        задача прерывается при следующей проверке Job.check_cancelled, в том
+        числе в другом процессе (через хранилище)
+
+        Args:
+            job_id: ID задачи
+
+        Returns:
+            Optional[Job]: Задача или None, если не найдена
+        """
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        job.cancel_event.set()
+        if self.store is not None:
+            self.store.request_cancel(job_id)
+        return job
@@ -0,0 +1,177 @@
+"""
+ReportCache - материализованные результаты отчетов по картам.
+Результат отчета хранится ограниченное время (TTL) и сбрасывается, когда
+DatabaseManager подтверждает изменение карт. Одновременные запросы одного
+отчета ждут единственного вычисления.
+
+Ключ отчета включает произвольные параметры (например, период), поэтому
+кэш хранит не больше max_entries результатов: устаревшие удаляются при
+сохранении нового, затем - давно не запрошенные (LRU).
+
+Сброс в других процессах узла - через файл-отметку в каталоге directory,
+как SharedCardSnapshot.mark_stale: результат, вычисление которого началось
+до последней отметки, не отдается.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ReportCache:
+    """Кэш результатов отчетов одной базы данных"""
+
+    # Значения по умолчанию для кэшей, создаваемых через for_database
+    default_ttl = 300.0
+    default_max_entries = 256
+
+    # Каталог отметок сброса, общий для процессов узла (None - сброс только
+    # в своем процессе)
+    directory: Optional[str] = None
+
+    _registry: Dict[str, 'ReportCache'] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, ttl: float = None, max_entries: int = None,
+                 stale_path: Optional[str] = None):
+        """
+        Инициализация кэша
+
+        Args:
+            ttl: Время жизни результата (секунды)
+            max_entries: Максимальное количество хранимых результатов
+            stale_path: Файл-отметка сброса, общий для процессов
+        """
+        self.ttl = self.default_ttl if ttl is None else ttl
+        self.max_entries = self.default_max_entries if max_entries is None else max_entries
+        self.stale_path = stale_path
+        # Ключ -> (срок действия (monotonic), время вычисления, результат,
+        # начало вычисления (time_ns) для сравнения с отметкой сброса)
+        self._entries: 'OrderedDict[Hashable, Tuple[float, float, Any, int]]' = OrderedDict()
+        # Ключ -> [блокировка вычисления, количество ожидающих ее запросов]
+        self._key_locks: Dict[Hashable, List] = {}
+        # Номер поколения: результат, вычисленный до сброса, не сохраняется
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_database(cls, db_path: str) -> 'ReportCache':
+        """
+        Получить общий кэш отчетов базы данных
+
+        Args:
+            db_path: Путь к БД
+
+        Returns:
+            ReportCache: Кэш, общий для всех DatabaseManager этой БД
+        """
+        with cls._registry_lock:
+            cache = cls._registry.get(db_path)
+            if cache is None:
+                stale_path = None
+                if cls.directory:
+                    os.makedirs(cls.directory, exist_ok=True)
+                    name = hashlib.sha1(db_path.encode('utf-8')).hexdigest()[:16]
+                    stale_path = os.path.join(cls.directory, f'reports_{name}.stale')
+                cache = cls(stale_path=stale_path)
+                cls._registry[db_path] = cache
+            return cache
+
+    def _stale_since(self) -> int:
+        """Время последнего сброса в любом процессе (ns), 0 - не было"""
+        if self.stale_path is None:
+            return 0
+        try:
+            return os.stat(self.stale_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _fresh(self, key: Hashable, stale_since: int):
+        """Действующая запись (под блокировкой); устаревшая удаляется"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] > time.monotonic() and entry[3] > stale_since:
+            self._entries.move_to_end(key)
+            return entry
+        del self._entries[key]
+        return None
+
+    def _store(self, key: Hashable, entry: Tuple) -> None:
+        """Сохранить результат (под блокировкой) с вытеснением сверх max_entries"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) <= self.max_entries:
+            return
+        now = time.monotonic()
+        for expired in [k for k, value in self._entries.items() if value[0] <= now]:
+            del self._entries[expired]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Tuple[Any, float, bool]:
+        """
+        Получить результат отчета, вычисляя его только при отсутствии в кэше
+
+        Args:
+            key: Ключ отчета (имя и параметры)
+            compute: Функция вычисления результата
+
+        Returns:
+            Tuple[Any, float, bool]: (результат, время вычисления (time.time()),
+            взят ли результат из кэша)
+        """
+        stale_since = self._stale_since()
+        with self._lock:
+            entry = self._fresh(key, stale_since)
+            if entry is not None:
+                return entry[2], entry[1], True
+            key_lock = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            key_lock[1] += 1
+
+        try:
+            with key_lock[0]:
+                with self._lock:
+                    entry = self._fresh(key, stale_since)
+                    if entry is not None:
+                        return entry[2], entry[1], True
+                    generation = self._generation
+
+                started_ns = time.time_ns()
+                result = compute()
+                generated = time.time()
+                with self._lock:
+                    if generation == self._generation:
+                        self._store(key, (time.monotonic() + self.ttl, generated, result,
+                                          started_ns))
+            return result, generated, False
+        finally:
+            with self._lock:
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self._key_locks[key]
+
+    def invalidate(self) -> None:
+        """Сбросить все результаты (после изменения карт) во всех процессах"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+        if self.stale_path is not None:
+            now = time.time_ns()
+            try:
+                with open(self.stale_path, 'a'):
+                    pass
+                os.utime(self.stale_path, ns=(now, now))
+            except OSError as e:
+                logger.error(f"Ошибка отметки сброса кэша отчетов {self.stale_path}: {str(e)}")
+        logger.debug("Кэш отчетов сброшен")
+
+    def __len__(self) -> int:
+        """Количество хранимых результатов"""
+        return len(self._entries)
@@ -0,0 +1,166 @@
+"""
+Отчеты по картам для панелей мониторинга.
+Агрегация выполняется в Firebird (GROUP BY), приложение только приводит
+строки к виду ответа; ряд заполняемости по дням строится из интервалов
+действия карт (app.utils.occupancy). Результаты материализуются в
+ReportCache БД.
+"""
+
+import logging
+from datetime import date, timedelta
+from typing import Callable, Dict, Mapping, Optional
+
+from app.managers.database_manager import DatabaseManager
+from app.managers.report_cache import ReportCache
+from app.utils.occupancy import GROUPS, occupancy_timeline, period_dates
+
+logger = logging.getLogger(__name__)
+
+# Максимальный период отчета об истекающих картах (дней)
+MAX_EXPIRING_DAYS = 366
+
+# Период ряда заполняемости по умолчанию и максимальный (дней)
+OCCUPANCY_DAYS = 365
+MAX_OCCUPANCY_DAYS = 1096
+
+
+class Report:
+    """Описание отчета"""
+
+    def __init__(self, title: str, build: Callable[..., Dict],
+                 parse: Callable[[Mapping], Dict] = lambda args: {}):
+        """
+        Args:
+            title: Название отчета
+            build: Функция build(db_manager, today, **params), возвращающая
+                поля ответа (например, rows - строки отчета)
+            parse: Функция разбора параметров запроса (ValueError при ошибке)
+        """
+        self.title = title
+        self.build = build
+        self.parse = parse
+
+
+def _active_by_floor(db_manager: DatabaseManager, today: date) -> Dict:
+    rows = []
+    for floor, count in db_manager.count_active_cards_by_floor(today):
+        try:
+            rows.append({'floor': int(floor), 'active': count})
+        except (TypeError, ValueError):
+            logger.warning(f"Некорректный этаж в имени комнаты: {floor!r}")
+    rows.sort(key=lambda row: row['floor'])
+    return {'rows': rows}
+
+
+def _parse_days(args: Mapping) -> Dict:
+    try:
+        days = int(args.get('days', 30))
+    except (TypeError, ValueError):
+        raise ValueError('Параметр days должен быть целым числом')
+    if not 0 < days <= MAX_EXPIRING_DAYS:
+        raise ValueError(f'Параметр days должен быть от 1 до {MAX_EXPIRING_DAYS}')
+    return {'days': days}
+
+
+def _expiring_by_day(db_manager: DatabaseManager, today: date, days: int) -> Dict:
+    counts = dict(db_manager.count_cards_expiring_by_day(today, today + timedelta(days=days)))
+    # Дни без истекающих карт дополняются нулями для графика
+    return {'rows': [{'date': day.isoformat(), 'expiring': counts.get(day, 0)}
+                     for day in (today + timedelta(days=offset) for offset in range(days))]}
+
+
+def _by_dep(db_manager: DatabaseManager, today: date) -> Dict:
+    return {'rows': [{'dep': dep, 'issued': issued, 'active': active or 0}
+                     for dep, issued, active in db_manager.count_cards_by_dep(today)]}
+
+
+def _parse_occupancy(args: Mapping) -> Dict:
+    params = {}
+    for arg, param in (('from', 'start'), ('to', 'end')):
+        value = args.get(arg)
+        if value:
+            try:
+                date.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f'Параметр {arg} должен быть датой ГГГГ-ММ-ДД')
+        params[param] = value or None
+    group = args.get('group') or None
+    if group is not None and group not in GROUPS:
+        raise ValueError(f"Параметр group должен быть одним из: {', '.join(GROUPS)}")
+    params['group'] = group
+
+    start, end = _occupancy_period(date.today(), params['start'], params['end'])
+    if start > end:
+        raise ValueError('Дата from должна быть не позже даты to')
+    if (end - start).days >= MAX_OCCUPANCY_DAYS:
+        raise ValueError(f'Период должен быть не длиннее {MAX_OCCUPANCY_DAYS} дней')
+    return params
+
+
+def _occupancy_period(today: date, start: Optional[str], end: Optional[str]):
+    """Период ряда: без дат - год от сегодняшнего дня, с одной датой - год от нее"""
+    year = timedelta(days=OCCUPANCY_DAYS - 1)
+    if start and end:
+        return date.fromisoformat(start), date.fromisoformat(end)
+    if start:
+        return date.fromisoformat(start), date.fromisoformat(start) + year
+    if end:
+        return date.fromisoformat(end) - year, date.fromisoformat(end)
+    return today, today + year
+
+
+def _occupancy(db_manager: DatabaseManager, today: date, start: Optional[str],
+               end: Optional[str], group: Optional[str]) -> Dict:
+    start, end = _occupancy_period(today, start, end)
+    timeline = occupancy_timeline(db_manager.get_card_intervals(start, end), start, end, group)
+    data = {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'dates': period_dates(start, len(timeline['total'])),
+        'total': timeline['total'],
+    }
+    if group:
+        data['groups'] = [{group: key, 'counts': counts}
+                          for key, counts in zip(timeline['keys'], timeline['counts'])]
+    return data
+
+
+REPORTS: Dict[str, Report] = {
+    'active-by-floor': Report('Действующие карты по этажам', _active_by_floor),
+    'expiring-by-day': Report('Истекающие карты по дням', _expiring_by_day, _parse_days),
+    'cards-by-dep': Report('Выданные карты по отделам', _by_dep),
+    'occupancy': Report('Заполняемость по дням', _occupancy, _parse_occupancy),
+}
+
+
+def get_report(db_path: str, name: str, params: Dict,
+               run: Callable[[Callable[[DatabaseManager], Dict]], Dict],
+               today: date = None) -> Dict:
+    """
+    Получить отчет из кэша БД или вычислить его
+
+    Args:
+        db_path: Путь к БД (кэш отчетов)
+        name: Имя отчета (ключ REPORTS)
+        params: Параметры отчета (результат Report.parse)
+        run: Вызывается только при вычислении: run(build) выполняет
+            build(db_manager) с подключением к БД
+        today: Текущая дата (по умолчанию - сегодня; входит в ключ кэша)
+
+    Returns:
+        Dict: Отчет (report, title, params, поля отчета, generated, cached)
+    """
+    report = REPORTS[name]
+    today = today or date.today()
+    key = (name, today, tuple(sorted(params.items())))
+    data, generated, cached = ReportCache.for_database(db_path).get_or_compute(
+        key, lambda: run(lambda db_manager: report.build(db_manager, today, **params))
+    )
+    return {
+        'report': name,
+        'title': report.title,
+        'params': params,
+        **data,
+        'generated': generated,
+        'cached': cached,
+    }
@@ -0,0 +1,360 @@
+"""
+Хранение сессий на сервере.
+В cookie передается только случайный идентификатор сессии, данные хранятся
+в памяти процесса (MemorySessionStore) или в файле SQLite, общем для всех
+рабочих процессов (SQLiteSessionStore). При входе и выходе идентификатор
+заменяется новым (regenerate_session).
+"""
+
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+logger = logging.getLogger(__name__)
+
+
+def new_sid() -> str:
+    """Новый случайный идентификатор сессии"""
+    return secrets.token_urlsafe(32)
+
+
+def regenerate_session(session) -> None:
+    """
+    Выдать сессии новый идентификатор (при входе и выходе), чтобы
+    идентификатор, известный до входа, не давал доступа к сессии после него.
+    Для cookie-сессий Flask ничего не делает
+
+    Args:
+        session: Текущая сессия Flask
+    """
+    regenerate = getattr(session, 'regenerate', None)
+    if regenerate is not None:
+        regenerate()
+
+
+class SessionStore(ABC):
+    """Базовый класс хранилища сессий"""
+
+    @abstractmethod
+    def load(self, sid: str) -> Optional[Tuple[Dict, float]]:
+        """
+        Загрузить данные сессии
+
+        Args:
+            sid: Идентификатор сессии
+
+        Returns:
+            (данные сессии, время истечения) или None, если сессии нет или она истекла
+        """
+
+    @abstractmethod
+    def save(self, sid: str, data: Dict, ttl: float) -> None:
+        """
+        Сохранить данные сессии
+
+        Args:
+            sid: Идентификатор сессии
+            data: Данные сессии
+            ttl: Время жизни (секунды)
+        """
+
+    @abstractmethod
+    def touch(self, sid: str, ttl: float) -> None:
+        """
+        Продлить время жизни сессии без изменения данных
+
+        Args:
+            sid: Идентификатор сессии
+            ttl: Время жизни (секунды)
+        """
+
+    @abstractmethod
+    def delete(self, sid: str) -> None:
+        """
+        Удалить сессию
+
+        Args:
+            sid: Идентификатор сессии
+        """
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """
+        Удалить истекшие сессии
+
+        Returns:
+            int: Количество удаленных сессий
+        """
+
+
+class MemorySessionStore(SessionStore):
+    """Хранилище сессий в памяти процесса (LRU с ограничением размера и TTL)"""
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        Инициализация хранилища
+
+        Args:
+            max_entries: Максимальное количество сессий (давно не использованные вытесняются)
+        """
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, sid: str) -> Optional[Tuple[Dict, float]]:
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return dict(entry[1]), entry[0]
+
+    def save(self, sid: str, data: Dict, ttl: float) -> None:
+        with self._lock:
+            self._entries[sid] = (time.time() + ttl, dict(data))
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def touch(self, sid: str, ttl: float) -> None:
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is not None:
+                self._entries[sid] = (time.time() + ttl, entry[1])
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (expires, _) in self._entries.items() if expires <= now]
+            for sid in expired:
+                del self._entries[sid]
+        return len(expired)
+
+    def __len__(self) -> int:
+        """Количество хранимых сессий"""
+        return len(self._entries)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Хранилище сессий в файле SQLite, общее для нескольких процессов"""
+
+    def __init__(self, path: str):
+        """
+        Инициализация хранилища
+
+        Args:
+            path: Путь к файлу SQLite
+        """
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    sid TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Соединение SQLite текущего потока (новое после fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, sid: str) -> Optional[Tuple[Dict, float]]:
+        row = self._connection().execute(
+            "SELECT data, expires FROM sessions WHERE sid = ? AND expires > ?", (sid, time.time())
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def save(self, sid: str, data: Dict, ttl: float) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)",
+            (sid, json.dumps(data, ensure_ascii=False, separators=(',', ':')), time.time() + ttl)
+        )
+
+    def touch(self, sid: str, ttl: float) -> None:
+        self._connection().execute(
+            "UPDATE sessions SET expires = ? WHERE sid = ?", (time.time() + ttl, sid)
+        )
+
+    def delete(self, sid: str) -> None:
+        self._connection().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def sweep(self) -> int:
+        cursor = self._connection().execute("DELETE FROM sessions WHERE expires <= ?", (time.time(),))
+        return cursor.rowcount
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Сессия, данные которой хранятся на сервере"""
+
+    def __init__(self, initial: Dict = None, sid: str = None, new: bool = False,
+                 expires: float = 0.0):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires = expires
+        self.modified = False
+        # Прежний идентификатор, запись которого удаляется при сохранении
+        self.previous_sid: Optional[str] = None
+
+    def regenerate(self) -> None:
+        """Заменить идентификатор сессии новым, сохранив данные"""
+        if not self.new and self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = new_sid()
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Интерфейс сессий Flask поверх SessionStore"""
+
+    def __init__(self, store: SessionStore, sweep_interval: float = 300.0):
+        """
+        Инициализация интерфейса
+
+        Args:
+            store: Хранилище сессий
+            sweep_interval: Интервал фоновой очистки истекших сессий (секунды)
+        """
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self._sweeper_pid = None
+        self._sweeper_lock = threading.Lock()
+
+    def _ttl(self, app) -> float:
+        return app.permanent_session_lifetime.total_seconds()
+
+    def _ensure_sweeper(self) -> None:
+        """Запустить поток очистки (по одному на процесс)"""
+        if self._sweeper_pid == os.getpid() or self.sweep_interval <= 0:
+            return
+        with self._sweeper_lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_pid = os.getpid()
+            thread = threading.Thread(target=self._sweep_loop, name='session-sweeper', daemon=True)
+            thread.start()
+
+    def _sweep_loop(self) -> None:
+        """Периодически удалять истекшие сессии"""
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                removed = self.store.sweep()
+                if removed:
+                    logger.info(f"Удалено истекших сессий: {removed}")
+            except Exception as e:
+                logger.error(f"Ошибка при очистке сессий: {str(e)}")
+
+    def open_session(self, app, request) -> ServerSideSession:
+        self._ensure_sweeper()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            loaded = self.store.load(sid)
+            if loaded is not None:
+                data, expires = loaded
+                return ServerSideSession(data, sid=sid, expires=expires)
+        return ServerSideSession(sid=new_sid(), new=True)
+
+    def save_session(self, app, session: ServerSideSession, response) -> None:
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.previous_sid is not None:
+            self.store.delete(session.previous_sid)
+            session.previous_sid = None
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        ttl = self._ttl(app)
+        if session.modified or session.new:
+            self.store.save(session.sid, dict(session), ttl)
+        elif self.should_touch(session, ttl):
+            self.store.touch(session.sid, ttl)
+
+        if session.new or session.modified or session.permanent:
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+        response.vary.add('Cookie')
+
+    def should_touch(self, session: ServerSideSession, ttl: float) -> bool:
+        """
+        Проверить, нужно ли продлить сессию. Продление записывается не чаще,
+        чем раз в десятую часть TTL, чтобы не писать в хранилище на каждый запрос
+
+        Args:
+            session: Сессия
+            ttl: Время жизни сессии (секунды)
+
+        Returns:
+            bool: True если сессию нужно продлить
+        """
+        return session.expires - time.time() < ttl * 0.9
+
+
+def create_session_interface(session_type: str, sqlite_path: str = None,
+                             max_entries: int = 10000,
+                             sweep_interval: float = 300.0) -> Optional[SessionInterface]:
+    """
+    Создать интерфейс серверных сессий
+
+    Args:
+        session_type: memory, sqlite или cookie (подписанные cookie Flask)
+        sqlite_path: Путь к файлу SQLite для типа sqlite
+        max_entries: Максимальное количество сессий в памяти
+        sweep_interval: Интервал очистки истекших сессий (секунды)
+
+    Returns:
+        SessionInterface или None для cookie-сессий Flask
+    """
+    if session_type == 'cookie':
+        return None
+    if session_type == 'memory':
+        store = MemorySessionStore(max_entries=max_entries)
+    elif session_type == 'sqlite':
+        store = SQLiteSessionStore(sqlite_path)
+    else:
+        raise ValueError(f"Неизвестный тип хранилища сессий: {session_type}")
+    return ServerSideSessionInterface(store, sweep_interval)
@@ -0,0 +1,165 @@
+"""
+Ограничение времени выполнения операторов SQL.
+
+Один фоновый поток на процесс следит за сроками выполняемых операторов и
+отменяет просроченные через fb_cancel_operation (fb_cancel_raise) клиентской
+библиотеки Firebird. Отмененный оператор завершается ошибкой isc_cancelled,
+транзакция откатывается, и подключение возвращается в пул пригодным для
+следующего запроса, а не остается занятым до завершения запроса.
+"""
+
+import ctypes
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_fb_cancel_operation = None
+
+
+def cancel_operation(connection) -> None:
+    """
+    Отменить оператор, выполняемый на подключении fdb
+
+    fdb 2.x не предоставляет fb_cancel_operation, поэтому функция вызывается
+    из клиентской библиотеки через ctypes с дескриптором подключения.
+
+    Args:
+        connection: Подключение fdb.Connection
+
+    Raises:
+        fdb.DatabaseError: Если сервер не принял отмену
+    """
+    global _fb_cancel_operation
+    from fdb import fbcore, ibase
+
+    if _fb_cancel_operation is None:
+        function = fbcore.load_api().client_library.fb_cancel_operation
+        function.restype = ibase.ISC_STATUS
+        function.argtypes = [ctypes.POINTER(ibase.ISC_STATUS),
+                             ctypes.POINTER(ibase.isc_db_handle), ctypes.c_ushort]
+        _fb_cancel_operation = function
+
+    status = ibase.ISC_STATUS_ARRAY()
+    _fb_cancel_operation(status, ctypes.byref(connection._db_handle), ibase.fb_cancel_raise)
+    if status[0] == 1 and status[1] > 0:
+        raise fbcore.exception_from_status(fbcore.DatabaseError, status,
+                                           "Error while cancelling operation:")
+
+
+class Watch:
+    """Выполняемый оператор под наблюдением"""
+
+    __slots__ = ('connection', 'deadline', 'active', 'expired')
+
+    def __init__(self, connection, deadline: float):
+        self.connection = connection
+        self.deadline = deadline
+        self.active = True
+        self.expired = False
+
+
+class StatementWatchdog:
+    """Поток, отменяющий операторы по истечении отведенного времени"""
+
+    def __init__(self, cancel: Optional[Callable[[object], None]] = None):
+        """
+        Инициализация
+
+        Args:
+            cancel: Функция отмены оператора на подключении (по умолчанию cancel_operation)
+        """
+        self.cancel = cancel or cancel_operation
+        self.cancelled = 0
+        self._heap: List[Tuple[float, int, Watch]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def watch(self, connection, timeout: Optional[float]) -> Iterator[Optional[Watch]]:
+        """
+        Контекстный менеджер: отменить оператор, если он выполняется дольше timeout
+
+        Отмена выполняется под той же блокировкой, что и снятие наблюдения,
+        поэтому не может попасть в следующий оператор этого подключения.
+
+        Args:
+            connection: Подключение, на котором выполняется оператор
+            timeout: Время выполнения (секунды); None или 0 - без ограничения
+
+        Yields:
+            Optional[Watch]: Наблюдение (expired=True после отмены) или None
+        """
+        if not timeout:
+            yield None
+            return
+
+        watch = Watch(connection, time.monotonic() + timeout)
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True,
+                                                name='statement-watchdog')
+                self._thread.start()
+            heapq.heappush(self._heap, (watch.deadline, next(self._sequence), watch))
+            if self._heap[0][2] is watch:
+                self._condition.notify()
+        try:
+            yield watch
+        finally:
+            with self._condition:
+                # Запись удаляется из кучи потоком при достижении вершины
+                watch.active = False
+
+    def _run(self) -> None:
+        """Ожидать ближайший срок и отменять просроченные операторы"""
+        with self._condition:
+            while True:
+                while self._heap and not self._heap[0][2].active:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                delay = self._heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+
+                watch = heapq.heappop(self._heap)[2]
+                watch.expired = True
+                self.cancelled += 1
+                try:
+                    self.cancel(watch.connection)
+                except Exception as e:
+                    logger.error(f"Не удалось отменить оператор: {str(e)}")
+
+
+_watchdog: Optional[StatementWatchdog] = None
+_watchdog_lock = threading.Lock()
+
+
+def get_watchdog() -> StatementWatchdog:
+    """Наблюдатель операторов текущего процесса (создается при первом обращении)"""
+    global _watchdog
+    if _watchdog is None:
+        with _watchdog_lock:
+            if _watchdog is None:
+                _watchdog = StatementWatchdog()
+    return _watchdog
+
+
+def _after_fork_in_child() -> None:
+    """Сбросить наблюдатель в дочернем процессе (поток родителя не наследуется)"""
+    global _watchdog, _watchdog_lock
+    _watchdog_lock = threading.Lock()
+    _watchdog = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,150 @@
+"""
+UserCache - кэш записей таблицы USERS с разобранными правами доступа.
+Записи хранятся ограниченное время (TTL) и сбрасываются при изменении
+версии таблицы USERS или по запросу администратора.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    """Кэш пользователей одной базы данных (по NAME и по USERID)"""
+
+    # Значения по умолчанию для кэшей, создаваемых через for_database
+    default_ttl = 300.0
+    default_version_interval = 10.0
+
+    _registry: Dict[str, 'UserCache'] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, ttl: float = None, version_interval: float = None):
+        """
+        Инициализация кэша
+
+        Args:
+            ttl: Время жизни записи (секунды)
+            version_interval: Минимальный интервал между проверками версии USERS (секунды)
+        """
+        self.ttl = self.default_ttl if ttl is None else ttl
+        self.version_interval = (self.default_version_interval
+                                 if version_interval is None else version_interval)
+        self._entries: Dict[Hashable, tuple] = {}
+        self._version = None
+        self._version_checked = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_database(cls, db_path: str) -> 'UserCache':
+        """
+        Получить общий кэш пользователей базы данных
+
+        Args:
+            db_path: Путь к БД
+
+        Returns:
+            UserCache: Кэш, общий для всех DatabaseManager этой БД
+        """
+        with cls._registry_lock:
+            cache = cls._registry.get(db_path)
+            if cache is None:
+                cache = cls()
+                cls._registry[db_path] = cache
+            return cache
+
+    @staticmethod
+    def _copy(user: Dict) -> Dict:
+        """Копия записи, чтобы вызывающий код не изменял кэш"""
+        copy = dict(user)
+        copy['permissions'] = dict(user.get('permissions') or {})
+        return copy
+
+    def _get(self, key: Hashable) -> Optional[Dict]:
+        """Получить запись по ключу, если она не устарела"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+        return self._copy(user)
+
+    def get_by_name(self, name: str) -> Optional[Dict]:
+        """
+        Получить пользователя по имени
+
+        Args:
+            name: Имя пользователя (USERS.NAME)
+
+        Returns:
+            Dict с информацией о пользователе или None, если записи нет в кэше
+        """
+        return self._get(('name', name))
+
+    def get_by_id(self, user_id: int) -> Optional[Dict]:
+        """
+        Получить пользователя по ID
+
+        Args:
+            user_id: ID пользователя (USERS.USERID)
+
+        Returns:
+            Dict с информацией о пользователе или None, если записи нет в кэше
+        """
+        return self._get(('id', user_id))
+
+    def put(self, user: Dict) -> None:
+        """
+        Сохранить пользователя в кэше
+
+        Args:
+            user: Информация о пользователе (id, username, flags, sflags, permissions)
+        """
+        user = self._copy(user)
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[('name', user['username'])] = (expires, user)
+            self._entries[('id', user['id'])] = (expires, user)
+
+    def invalidate(self) -> None:
+        """Сбросить все записи (например, по запросу администратора)"""
+        with self._lock:
+            self._entries.clear()
+            self._version_checked = None
+        logger.info("Кэш пользователей сброшен")
+
+    def version_check_due(self) -> bool:
+        """
+        Проверить, пора ли сверить версию таблицы USERS
+
+        Returns:
+            bool: True если с последней проверки прошло больше version_interval
+        """
+        checked = self._version_checked
+        return checked is None or time.monotonic() - checked >= self.version_interval
+
+    def update_version(self, version) -> bool:
+        """
+        Сверить версию таблицы USERS и сбросить кэш при ее изменении
+
+        Args:
+            version: Версия таблицы (например, количество строк и контрольные суммы)
+
+        Returns:
+            bool: True если версия изменилась и кэш сброшен
+        """
+        with self._lock:
+            self._version_checked = time.monotonic()
+            changed = self._version is not None and version != self._version
+            self._version = version
+            if changed:
+                self._entries.clear()
+        if changed:
+            logger.info("Таблица USERS изменилась, кэш пользователей сброшен")
+        return changed
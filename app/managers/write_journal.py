@@ -0,0 +1,429 @@
+"""
+WriteJournal - журнал отложенной записи изменений карт.
+
+Когда Firebird не отвечает (sweep, резервное копирование, блокировки),
+изменение карты (HOSTEL_CARDEDIT) записывается в файл SQLite с полной
+синхронизацией на диск и подтверждается клиенту как "queued". WriteReplayer
+применяет записи журнала по порядку, как только БД снова доступна.
+
+Учет "ровно один раз":
+- повтор запроса клиентом с тем же ключом (Idempotency-Key) не создает
+  новую запись;
+- записи одной БД применяет один процесс, удерживающий аренду;
+- запись отмечается примененной после подтверждения транзакции Firebird.
+  Если процесс остановился во время применения, неизвестно, подтверждена
+  ли транзакция: запись, оставшаяся в статусе applying, повторно не
+  применяется, а получает статус uncertain и задерживает следующие записи
+  БД, пока оператор не проверит карту и не разрешит запись
+  (WriteJournal.resolve: вернуть в очередь, отметить примененной или
+  отклонить).
+
+Коды результата 2 (карта уже существует) и 3 (карта не найдена) означают
+конфликт с изменениями, сделанными в БД после постановки в журнал: запись
+получает статус conflict и результат процедуры для разбора.
+"""
+
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Callable, ContextManager, Dict, List, Optional
+
+from app.managers.circuit_breaker import DatabaseUnavailable
+from app.utils.db_errors import StatementTimeout
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+APPLYING = 'applying'
+APPLIED = 'applied'
+CONFLICT = 'conflict'
+FAILED = 'failed'
+UNCERTAIN = 'uncertain'
+
+FINISHED = (APPLIED, CONFLICT, FAILED)
+
+# Непримененные записи: задерживают следующие изменения БД
+UNFINISHED = (PENDING, APPLYING, UNCERTAIN)
+
+# Решения оператора по записи uncertain
+RESOLUTIONS = (PENDING, APPLIED, FAILED)
+
+# Коды результата HOSTEL_CARDEDIT, означающие конфликт
+CONFLICT_CODES = {2: 'Карта уже существует', 3: 'Карта не найдена'}
+
+# Максимальное количество попыток записи, завершающейся ошибкой (кроме STALLED_ERRORS)
+MAX_ATTEMPTS = 5
+
+# Ошибки, после которых применение откладывается до следующего цикла
+STALLED_ERRORS = (DatabaseUnavailable, StatementTimeout)
+
+
+class WriteJournal:
+    """Журнал отложенных изменений карт в файле SQLite, общий для процессов"""
+
+    def __init__(self, path: str):
+        """
+        Инициализация журнала
+
+        Args:
+            path: Путь к файлу SQLite
+        """
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS writes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                db_path TEXT NOT NULL,
+                key TEXT,
+                params TEXT NOT NULL,
+                user_id INTEGER,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                created REAL NOT NULL,
+                finished REAL,
+                UNIQUE (db_path, key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS writes_status ON writes (db_path, status, id)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                db_path TEXT PRIMARY KEY,
+                owner TEXT,
+                expires REAL NOT NULL
+            )
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Соединение SQLite текущего потока (новое после fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Подтверждение записи клиенту - только после fsync
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _entry(row: sqlite3.Row) -> Dict:
+        return {
+            'id': row['id'],
+            'db_path': row['db_path'],
+            'params': json.loads(row['params']),
+            'user_id': row['user_id'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created': row['created'],
+            'finished': row['finished'],
+        }
+
+    def append(self, db_path: str, params: Dict, key: Optional[str] = None,
+               user_id: Optional[int] = None) -> Dict:
+        """
+        Записать изменение карты в журнал
+
+        Args:
+            db_path: Путь к БД
+            params: Аргументы DatabaseManager.call_cardedit_procedure
+            key: Ключ идемпотентности клиента (повтор возвращает прежнюю запись)
+            user_id: Пользователь, запросивший изменение
+
+        Returns:
+            Dict: Запись журнала
+        """
+        conn = self._connection()
+        try:
+            cursor = conn.execute(
+                "INSERT INTO writes (db_path, key, params, user_id, status, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (db_path, key, json.dumps(params, ensure_ascii=False), user_id, PENDING,
+                 time.time())
+            )
+            entry_id = cursor.lastrowid
+            logger.info(f"Изменение карты {params.get('card_number')} поставлено в журнал "
+                        f"отложенной записи БД {db_path} (#{entry_id})")
+        except sqlite3.IntegrityError:
+            entry_id = conn.execute("SELECT id FROM writes WHERE db_path = ? AND key = ?",
+                                    (db_path, key)).fetchone()[0]
+        return self.get(db_path, entry_id)
+
+    def get(self, db_path: str, entry_id: int) -> Optional[Dict]:
+        """Запись журнала БД по номеру (None, если нет)"""
+        row = self._connection().execute("SELECT * FROM writes WHERE db_path = ? AND id = ?",
+                                         (db_path, entry_id)).fetchone()
+        return self._entry(row) if row else None
+
+    def list(self, db_path: str, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Последние записи БД (новые первыми)"""
+        query = "SELECT * FROM writes WHERE db_path = ?"
+        params: list = [db_path]
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [self._entry(row) for row in self._connection().execute(query, params)]
+
+    def pending_count(self, db_path: str) -> int:
+        """Количество непримененных записей БД (включая uncertain)"""
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM writes WHERE db_path = ? AND status IN (?, ?, ?)",
+            (db_path, *UNFINISHED)
+        ).fetchone()[0]
+
+    def databases(self) -> List[str]:
+        """БД с непримененными записями"""
+        return [row[0] for row in self._connection().execute(
+            "SELECT DISTINCT db_path FROM writes WHERE status IN (?, ?)", (PENDING, APPLYING)
+        )]
+
+    def next_entry(self, db_path: str) -> Optional[Dict]:
+        """Первая по порядку непримененная запись БД (в том числе uncertain)"""
+        row = self._connection().execute(
+            "SELECT * FROM writes WHERE db_path = ? AND status IN (?, ?, ?) ORDER BY id LIMIT 1",
+            (db_path, *UNFINISHED)
+        ).fetchone()
+        return self._entry(row) if row else None
+
+    def start_attempt(self, entry_id: int) -> None:
+        """Отметить начало применения записи (до вызова процедуры)"""
+        self._connection().execute(
+            "UPDATE writes SET status = ?, attempts = attempts + 1 WHERE id = ?",
+            (APPLYING, entry_id)
+        )
+
+    def postpone(self, entry_id: int, error: str) -> None:
+        """Вернуть запись в очередь после неудачной попытки"""
+        self._connection().execute("UPDATE writes SET status = ?, error = ? WHERE id = ?",
+                                   (PENDING, error, entry_id))
+
+    def mark_uncertain(self, entry_id: int) -> None:
+        """Отметить запись, применение которой было прервано (результат неизвестен)"""
+        self._connection().execute(
+            "UPDATE writes SET status = ?, error = ? WHERE id = ? AND status = ?",
+            (UNCERTAIN, 'Применение прервано: результат неизвестен', entry_id, APPLYING)
+        )
+
+    def resolve(self, db_path: str, entry_id: int, status: str) -> Optional[Dict]:
+        """
+        Решение оператора по записи uncertain
+
+        Args:
+            db_path: Путь к БД
+            entry_id: Номер записи
+            status: pending - применить повторно, applied - изменение уже в БД,
+                failed - отклонить запись
+
+        Returns:
+            Dict: Запись журнала; None, если запись не в статусе uncertain
+
+        Raises:
+            ValueError: Недопустимое решение
+        """
+        if status not in RESOLUTIONS:
+            raise ValueError(f"Недопустимый статус: {status}")
+        finished = time.time() if status in FINISHED else None
+        cursor = self._connection().execute(
+            "UPDATE writes SET status = ?, finished = ? "
+            "WHERE db_path = ? AND id = ? AND status = ?",
+            (status, finished, db_path, entry_id, UNCERTAIN)
+        )
+        if not cursor.rowcount:
+            return None
+        logger.info(f"Запись #{entry_id} журнала отложенной записи БД {db_path} "
+                    f"разрешена оператором: {status}")
+        return self.get(db_path, entry_id)
+
+    def finish(self, entry_id: int, status: str, result: Optional[Dict] = None,
+               error: Optional[str] = None) -> None:
+        """Завершить запись (applied, conflict или failed)"""
+        self._connection().execute(
+            "UPDATE writes SET status = ?, result = ?, error = ?, finished = ? WHERE id = ?",
+            (status, json.dumps(result, ensure_ascii=False, default=str) if result else None,
+             error, time.time(), entry_id)
+        )
+
+    def claim(self, db_path: str, owner: str, ttl: float) -> bool:
+        """
+        Получить или продлить аренду применения записей БД
+
+        Args:
+            db_path: Путь к БД
+            owner: Процесс
+            ttl: Время аренды (секунды)
+
+        Returns:
+            bool: True если записи применяет этот процесс
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute("INSERT OR IGNORE INTO leases (db_path, owner, expires) VALUES (?, NULL, 0)",
+                     (db_path,))
+        cursor = conn.execute(
+            "UPDATE leases SET owner = ?, expires = ? "
+            "WHERE db_path = ? AND (owner = ? OR expires < ?)",
+            (owner, now + ttl, db_path, owner, now)
+        )
+        return cursor.rowcount > 0
+
+
+class WriteReplayer:
+    """Фоновое применение журнала отложенной записи"""
+
+    def __init__(self, journal: WriteJournal, connect: Callable[[str], ContextManager],
+                 interval: float = 5.0,
+                 on_applied: Optional[Callable[..., None]] = None):
+        """
+        Args:
+            journal: Журнал
+            connect: connect(db_path) - контекстный менеджер, выдающий DatabaseManager
+            interval: Интервал проверки журнала (секунды)
+            on_applied: on_applied(db_manager, entry, result) после применения записи
+                (например, рассылка события изменения карты)
+        """
+        self.journal = journal
+        self.connect = connect
+        self.interval = interval
+        self.on_applied = on_applied
+        self._pid = None
+        self._owner = f"{os.getpid()}:{secrets.token_hex(4)}"
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Запустить поток текущего процесса (после fork создается заново)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._owner = f"{os.getpid()}:{secrets.token_hex(4)}"
+            threading.Thread(target=self._loop, name='write-replayer', daemon=True).start()
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            self.run_once()
+
+    def run_once(self) -> None:
+        """Применить записи всех БД, аренду которых удерживает этот процесс"""
+        for db_path in self.journal.databases():
+            try:
+                self.replay(db_path)
+            except Exception as e:
+                logger.error(f"Ошибка применения журнала отложенной записи БД {db_path}: {str(e)}")
+
+    def replay(self, db_path: str) -> Optional[Dict]:
+        """
+        Применить записи БД по порядку до первой отложенной
+
+        Args:
+            db_path: Путь к БД
+
+        Returns:
+            Dict: applied, conflicts, failed - количество записей, pending -
+            осталось в журнале (включая uncertain); None, если аренда у другого
+            процесса
+        """
+        ttl = self.interval * 3 + 60
+        if not self.journal.claim(db_path, self._owner, ttl):
+            return None
+        summary = {'applied': 0, 'conflicts': 0, 'failed': 0}
+        entry = self.journal.next_entry(db_path)
+        if entry is not None:
+            with self.connect(db_path) as db_manager:
+                while entry is not None and self._apply(db_manager, entry, summary):
+                    if not self.journal.claim(db_path, self._owner, ttl):
+                        break
+                    entry = self.journal.next_entry(db_path)
+        summary['pending'] = self.journal.pending_count(db_path)
+        if any(summary.values()):
+            logger.info(f"Журнал отложенной записи БД {db_path}: {summary}")
+        return summary
+
+    def _apply(self, db_manager, entry: Dict, summary: Dict) -> bool:
+        """
+        Применить одну запись в отдельной транзакции
+
+        Returns:
+            bool: True - можно переходить к следующей записи
+        """
+        if entry['status'] == UNCERTAIN:
+            return False
+        if entry['status'] == APPLYING:
+            # Предыдущая попытка прервана: процедура могла быть подтверждена
+            logger.warning(f"Запись #{entry['id']} журнала отложенной записи прервана во время "
+                           f"применения (карта {entry['params'].get('card_number')}) и ожидает "
+                           f"решения оператора")
+            self.journal.mark_uncertain(entry['id'])
+            return False
+        self.journal.start_attempt(entry['id'])
+        try:
+            result = db_manager.call_cardedit_procedure(**entry['params'])
+            if result.get('error') is None:
+                db_manager.end_transaction(commit=True)
+            else:
+                db_manager.end_transaction(commit=False)
+        except STALLED_ERRORS as e:
+            self.journal.postpone(entry['id'], str(e))
+            return False
+        except Exception as e:
+            # Прочие ошибки (драйвер, данные записи) считаются попытками, как
+            # ошибка процедуры; подключение после них не используется
+            logger.error(f"Ошибка применения записи #{entry['id']} журнала отложенной записи: "
+                         f"{str(e)}")
+            try:
+                db_manager.end_transaction(commit=False)
+            except Exception as rollback_error:
+                logger.error(f"Ошибка отката записи #{entry['id']}: {str(rollback_error)}")
+            self._failed_attempt(entry, None, str(e), summary)
+            return False
+
+        if result.get('error') is not None:
+            return self._failed_attempt(entry, result, result['error'], summary)
+
+        code = result.get('result_code')
+        if code in CONFLICT_CODES:
+            logger.warning(f"Конфликт записи #{entry['id']} журнала отложенной записи "
+                           f"(карта {entry['params'].get('card_number')}): {CONFLICT_CODES[code]}")
+            self.journal.finish(entry['id'], CONFLICT, result, CONFLICT_CODES[code])
+            summary['conflicts'] += 1
+            return True
+
+        self.journal.finish(entry['id'], APPLIED, result)
+        summary['applied'] += 1
+        if self.on_applied is not None:
+            try:
+                self.on_applied(db_manager, entry, result)
+            except Exception as e:
+                logger.error(f"Ошибка обработки примененной записи #{entry['id']}: {str(e)}")
+        return True
+
+    def _failed_attempt(self, entry: Dict, result: Optional[Dict], error: str,
+                        summary: Dict) -> bool:
+        """
+        Учесть неудачную попытку: до MAX_ATTEMPTS запись возвращается в
+        очередь, затем получает статус failed
+
+        Returns:
+            bool: True - можно переходить к следующей записи
+        """
+        if entry['attempts'] + 1 < MAX_ATTEMPTS:
+            # Порядок сохраняется: следующие записи ждут этой
+            self.journal.postpone(entry['id'], error)
+            return False
+        logger.error(f"Запись #{entry['id']} журнала отложенной записи не применена: {error}")
+        self.journal.finish(entry['id'], FAILED, result, error)
+        summary['failed'] += 1
+        return True
@@ -146,6 +146,36 @@ class Card:
 
         return floor, room
 
+    @staticmethod
+    def room_name(room_number: int) -> str:
+        """
+        Имя комнаты, под которым карта хранится в БД (PEOPLE.FNAME)
+        
+        Args:
+            room_number: Номер комнаты в формате (X)XYY
+            
+        Returns:
+            str: "Этаж.Комната" (например, "1.05" для комнаты 105)
+        """
+        floor, room = Card.parse_room(room_number)
+        return f"{floor}.{room:02d}"
+
+    @staticmethod
+    def room_number(room_name: str) -> int:
+        """
+        Номер комнаты в формате (X)XYY по имени из БД
+        
+        Args:
+            room_name: "Этаж.Комната" или номер комнаты строкой
+            
+        Returns:
+            int: Номер комнаты (например, 105 для "1.05")
+        """
+        if '.' in room_name:
+            floor, room = room_name.split('.', 1)
+            return int(floor) * 100 + int(room)
+        return int(room_name)
+
     def __repr__(self) -> str:
         """Строковое представление карты"""
         return (f"Card(card_id={self.card_id}, card_number={self.card_number}, "
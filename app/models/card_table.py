@@ -0,0 +1,119 @@
+"""
+Колоночное представление списка карт (CardTable).
+Используется для компактных форматов ответа GET /cards.
+"""
+
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Начало отсчета дней для дат в колоночном формате
+EPOCH = date(1970, 1, 1)
+_EPOCH_ORDINAL = EPOCH.toordinal()
+
+
+class CardTable:
+    """Список карт в виде столбцов"""
+
+    def __init__(self, fields: Sequence[str], columns: Dict[str, List]):
+        """
+        Инициализация таблицы
+
+        Args:
+            fields: Имена столбцов в порядке выборки
+            columns: Значения столбцов {имя: список значений}
+        """
+        self.fields = tuple(fields)
+        self.columns = columns
+
+    @staticmethod
+    def from_rows(rows: Sequence[Sequence], fields: Sequence[str]) -> 'CardTable':
+        """
+        Построить таблицу из строк выборки
+
+        Args:
+            rows: Строки выборки (кортежи значений)
+            fields: Имена полей в порядке столбцов выборки
+
+        Returns:
+            CardTable: Таблица карт
+        """
+        if rows:
+            values = [list(column) for column in zip(*rows)]
+        else:
+            values = [[] for _ in fields]
+        return CardTable(fields, dict(zip(fields, values)))
+
+    def __len__(self) -> int:
+        """Количество карт в таблице"""
+        if not self.fields:
+            return 0
+        return len(self.columns[self.fields[0]])
+
+    def is_date_column(self, field: str) -> bool:
+        """
+        Проверить, содержит ли столбец даты
+
+        Args:
+            field: Имя столбца
+
+        Returns:
+            bool: True если непустые значения столбца - даты
+        """
+        for value in self.columns[field]:
+            if value is not None:
+                return isinstance(value, date)
+        return False
+
+    def day_offsets(self, field: str) -> List[Optional[int]]:
+        """
+        Получить даты столбца в виде количества дней от EPOCH
+
+        Args:
+            field: Имя столбца с датами
+
+        Returns:
+            List[Optional[int]]: Смещения в днях (None для пустых дат)
+        """
+        return [value.toordinal() - _EPOCH_ORDINAL if value is not None else None
+                for value in self.columns[field]]
+
+    def to_columns_dict(self) -> Dict:
+        """
+        Преобразовать таблицу в колоночный словарь для JSON
+
+        Returns:
+            Dict: {'columns': [...], 'epoch': 'YYYY-MM-DD', 'dates': [...], 'data': {столбец: [...]}}
+        """
+        data = {}
+        dates = []
+        for field in self.fields:
+            if self.is_date_column(field):
+                dates.append(field)
+                data[field] = self.day_offsets(field)
+            else:
+                data[field] = self.columns[field]
+
+        return {
+            'columns': list(self.fields),
+            'epoch': EPOCH.isoformat(),
+            'dates': dates,
+            'data': data
+        }
+
+    @staticmethod
+    def offset_to_date(offset: Optional[int]) -> Optional[date]:
+        """
+        Преобразовать смещение в днях обратно в дату
+
+        Args:
+            offset: Количество дней от EPOCH
+
+        Returns:
+            date или None
+        """
+        if offset is None:
+            return None
+        return date.fromordinal(offset + _EPOCH_ORDINAL)
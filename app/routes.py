@@ -0,0 +1,1037 @@
+"""
+Маршруты веб-приложения для управления картами (пропусками) в хостеле.
+"""
+
+import itertools
+import logging
+import os
+import time
+from datetime import date
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+from flask import (Blueprint, Response, current_app, g, jsonify, redirect, render_template,
+                   request, session, url_for)
+from werkzeug.exceptions import RequestEntityTooLarge, ServiceUnavailable
+from werkzeug.security import safe_join
+
+from app.managers.admission import READ, WRITE, AdmissionRejected, get_admission
+from app.managers.auth_manager import AuthManager
+from app.managers.card_bulk import (DRY_RUN_SAMPLE, OPERATIONS, find_targets, parse_days,
+                                    parse_target)
+from app.managers.card_import import read_csv
+from app.managers.card_snapshot import SharedCardSnapshot, SnapshotBody
+from app.managers.circuit_breaker import DatabaseUnavailable
+from app.managers.connection_pool import PoolTimeoutError, get_pool
+from app.managers.database_manager import CARD_FIELDS, PROPAGATED_ERRORS, DatabaseManager
+from app.managers.event_broadcaster import EventBroadcaster
+from app.managers.jobs import FINISHED, Job
+from app.managers.reports import REPORTS, get_report
+from app.managers.session_store import regenerate_session
+from app.managers.user_cache import UserCache
+from app.managers.write_journal import WriteJournal
+from app.models.card_table import CardTable
+from app.server import DETACH_STREAM
+from app.utils.binary_encoder import encode_table
+from app.utils.compression import compress_response, snapshot_response
+from app.utils.db_errors import StatementTimeout
+from app.utils.error_handler import ErrorHandler
+from app.utils.export import XLSX_MIMETYPE, write_csv, write_xlsx
+from app.utils.json_encoder import CachedSnapshot, encode_columns, encode_rows
+from app.utils.profiling import ProfilerBusy, StackSampler, track_request, untrack_request
+from app.utils.uploads import save_stream, store_upload
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('hostel', __name__)
+
+auth_manager = AuthManager()
+
+# Форматы ответа GET /cards: format -> (кодировщик строк и полей, MIME-тип)
+CARD_LIST_FORMATS = {
+    'json': (encode_rows, 'application/json'),
+    'columns': (encode_columns, 'application/json'),
+    'binary': (lambda rows, fields: encode_table(CardTable.from_rows(rows, fields)),
+               'application/octet-stream'),
+}
+
+# Кодировщики тел полного списка карт, сохраняемых в общем снимке
+CARD_LIST_ENCODERS = {fmt: encoder for fmt, (encoder, _) in CARD_LIST_FORMATS.items()}
+
+# Ошибки, при которых изменение карты ставится в журнал отложенной записи
+# (ServiceUnavailable - очередь записей ограничителя заполнена)
+WRITE_STALLS = (DatabaseUnavailable, StatementTimeout, ServiceUnavailable, PoolTimeoutError)
+
+# Форматы выгрузки карт: формат -> (кодировщик порций строк, тип содержимого)
+EXPORT_FORMATS = {
+    'csv': (write_csv, 'text/csv'),
+    'xlsx': (write_xlsx, XLSX_MIMETYPE),
+}
+
+def get_db() -> DatabaseManager:
+    """
+    Получить DatabaseManager текущего запроса из пула подключений БД сессии
+    
+    Returns:
+        DatabaseManager: Менеджер, возвращаемый в пул по окончании запроса
+    """
+    if 'db_manager' not in g:
+        pool = get_pool(session['db_path'])
+        g.db_manager = pool.acquire(timeout=current_app.config['DB_POOL_TIMEOUT'])
+        g.db_pool = pool
+    return g.db_manager
+
+@bp.before_app_request
+def track_request_thread():
+    """Отметить поток запроса для выборочного профилировщика"""
+    track_request(f"{request.method} {request.endpoint}")
+
+@bp.teardown_app_request
+def untrack_request_thread(error):
+    """Снять отметку потока запроса"""
+    untrack_request()
+
+@bp.teardown_app_request
+def release_db(error):
+    """Вернуть подключение запроса в пул (с откатом транзакции при ошибке)"""
+    manager = g.pop('db_manager', None)
+    if manager is not None:
+        g.pop('db_pool').release(manager, commit=error is None)
+
+def admit(kind: str):
+    """
+    Декоратор: выполнять обработчик, только получив слот ограничителя
+    чтений или записей БД сессии; иначе - быстрый ответ 503 с Retry-After
+    
+    Args:
+        kind: READ или WRITE
+        
+    Returns:
+        Функция-декоратор
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            limiter = get_admission(session['db_path']).limiter(kind)
+            try:
+                limiter.acquire()
+            except AdmissionRejected as e:
+                raise ServiceUnavailable(str(e), retry_after=e.retry_after)
+            
+            started = time.monotonic()
+            error = None
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                # Подключение возвращается в пул до освобождения слота
+                release_db(error)
+                limiter.release(time.monotonic() - started)
+        
+        return wrapper
+    
+    return decorator
+
+def profiled(func):
+    """
+    Декоратор: по параметру profile=1 от администратора выполнить обработчик
+    под cProfile; имя файла профиля - в заголовке X-Profile
+    """
+    is_admin = AuthManager.compile_permission('is_admin')
+    
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profiles = current_app.extensions.get('request_profiles')
+        if (profiles is None or request.args.get('profile') != '1'
+                or AuthManager.authorize(session, is_admin) is not None):
+            return func(*args, **kwargs)
+        result, name = profiles.profile(request.endpoint, func, *args, **kwargs)
+        response = current_app.make_response(result)
+        if name is not None:
+            response.headers['X-Profile'] = name
+        return response
+    
+    return wrapper
+
+@bp.after_app_request
+def after_request(response):
+    """Сжатие ответа по заголовку Accept-Encoding"""
+    static_path = None
+    if request.endpoint == 'static' and request.view_args:
+        static_path = safe_join(current_app.static_folder, request.view_args.get('filename', ''))
+    return compress_response(
+        response,
+        request.headers.get('Accept-Encoding'),
+        current_app.config['COMPRESS_MIN_SIZE'],
+        current_app.extensions['static_compression'],
+        static_path
+    )
+
+@bp.route('/')
+def index():
+    """Главная страница"""
+    if 'user_id' not in session:
+        if 'db_path' not in session:
+            return redirect(url_for('.select_database'))
+        return redirect(url_for('.login'))
+    return render_template('index.html')
+
+@bp.route('/select-database', methods=['GET', 'POST'])
+def select_database():
+    """Выбор файла базы данных"""
+    if request.method == 'POST':
+        db_path = None
+        created = False
+        
+        # Проверить загруженный файл
+        try:
+            file = request.files.get('db_file')
+        except RequestEntityTooLarge:
+            return render_template('select_database.html', error='Файл слишком большой'), 413
+        if file and file.filename and file.filename.endswith('.fdb'):
+            # Файл уже записан в каталог загрузок при разборе запроса,
+            # сохранить его под именем по хешу содержимого
+            try:
+                db_path, created = store_upload(file, current_app.config['UPLOAD_DIR'],
+                                                current_app.config['UPLOAD_MAX_SIZE'])
+            except RequestEntityTooLarge:
+                return render_template('select_database.html', error='Файл слишком большой'), 413
+            except Exception as e:
+                logger.error(f"Error saving uploaded file: {str(e)}")
+                return render_template('select_database.html', error=f'Ошибка при сохранении файла: {str(e)}')
+        
+        # Если файл не загружен, использовать введенный путь
+        if not db_path:
+            db_path = request.form.get('db_path')
+        
+        if not db_path or not os.path.exists(db_path):
+            return render_template('select_database.html', error='Файл не найден или не выбран')
+        
+        try:
+            # Проверка подключения; для уже открытой БД (в т.ч. повторно
+            # загруженной) достаточно свободного подключения в пуле
+            pool = get_pool(db_path)
+            if not pool.idle_count():
+                test_db = DatabaseManager(db_path)
+                test_db.connect()
+                # Проверочное подключение остается в пуле
+                pool.add(test_db)
+            
+            session['db_path'] = db_path
+            return redirect(url_for('.login'))
+        except Exception as e:
+            logger.error(f"Database connection error: {str(e)}")
+            if created:
+                # Загруженный файл не является БД - не хранить его
+                os.unlink(db_path)
+            return render_template('select_database.html', error=f'Ошибка подключения: {str(e)}')
+    
+    return render_template('select_database.html')
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    """Страница входа"""
+    if 'db_path' not in session:
+        return redirect(url_for('.select_database'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+        
+        try:
+            user = get_db().authenticate_user(username, password)
+            if user:
+                # Идентификатор сессии до входа не должен давать доступ после него
+                regenerate_session(session)
+                session['user_id'] = user['id']
+                session['username'] = user['username']
+                # В сессии хранится только битовая маска прав (FLAGS/SFLAGS)
+                session['flags'] = user['flags'] or 0
+                session['sflags'] = user['sflags'] or 0
+                return redirect(url_for('.index'))
+            else:
+                return render_template('login.html', error='Неверное имя пользователя или пароль')
+        except Exception as e:
+            return render_template('login.html', error=f'Ошибка аутентификации: {str(e)}')
+    
+    return render_template('login.html')
+
+@bp.route('/logout')
+def logout():
+    """Выход из приложения"""
+    session.clear()
+    regenerate_session(session)
+    return redirect(url_for('.select_database'))
+
+def warm_database(db_path: str, connections: int = 1) -> None:
+    """
+    Открыть подключения к БД и заполнить кэш списка карт (вызывается
+    в контексте приложения до приема запросов)
+
+    Args:
+        db_path: Путь к файлу БД
+        connections: Количество открываемых подключений
+    """
+    pool = get_pool(db_path)
+    pool.warm(connections)
+    shared = SharedCardSnapshot.for_database(db_path)
+    if shared is not None:
+        # Общий снимок записывает один процесс узла, остальные его только читают
+        if shared.current() is None and shared.try_lock():
+            with pool.connection(timeout=current_app.config['DB_POOL_TIMEOUT']) as db_manager:
+                shared.refresh(db_manager, CARD_LIST_ENCODERS)
+        logger.info(f"БД {db_path} прогрета: подключений {pool.idle_count()}, общий снимок")
+        return
+    with pool.connection(timeout=current_app.config['DB_POOL_TIMEOUT']) as db_manager:
+        rows = db_manager.get_all_card_rows(CARD_FIELDS)
+    encoder, _ = CARD_LIST_FORMATS['json']
+    current_app.extensions['card_snapshots'].get_or_encode(
+        (db_path, 'json', CARD_FIELDS), rows, lambda rows: encoder(rows, CARD_FIELDS)
+    )
+    logger.info(f"БД {db_path} прогрета: подключений {pool.idle_count()}, карт {len(rows)}")
+
+@bp.route('/cards', methods=['GET'])
+@auth_manager.require_permission('can_view')
+@profiled
+@admit(READ)
+def get_cards():
+    """
+    Получить список карт
+    
+    Параметры запроса:
+        format: json (по умолчанию), columns или binary
+        fields: Список полей через запятую (по умолчанию все)
+        ids: Список ID карт через запятую (по умолчанию все карты)
+        profile: 1 - снять профиль cProfile запроса (только администратор)
+    """
+    try:
+        fmt, fields, card_ids = parse_card_list_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        db_manager = get_db()
+        snapshot = load_card_snapshot(db_manager, current_app.extensions['card_snapshots'],
+                                      session['db_path'], fmt, fields, card_ids)
+        response = snapshot_response(snapshot, CARD_LIST_FORMATS[fmt][1],
+                                     request.headers.get('Accept-Encoding'),
+                                     current_app.config['COMPRESS_MIN_SIZE'])
+        return replica_headers(response, db_manager)
+    except PROPAGATED_ERRORS:
+        # 503 или 504 - обработчики ошибок приложения
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def replica_headers(response: Response, db_manager: DatabaseManager) -> Response:
+    """
+    Отметить ответ, прочитанный из локальной копии карт (см. replica_header_items)
+    
+    Args:
+        response: Ответ
+        db_manager: Менеджер БД, выполнивший чтение
+        
+    Returns:
+        Response: Тот же ответ
+    """
+    response.headers.update(replica_header_items(db_manager))
+    return response
+
+def replica_header_items(db_manager: DatabaseManager) -> Dict[str, str]:
+    """
+    Заголовки ответа, прочитанного из локальной копии карт: X-Replica-Age -
+    возраст данных (секунды), Warning 110 - БД недоступна и данные могут
+    быть устаревшими
+    
+    Args:
+        db_manager: Менеджер БД, выполнивший чтение
+        
+    Returns:
+        Dict[str, str]: Заголовки (пустой словарь, если чтение из БД)
+    """
+    headers = {}
+    if db_manager.replica_age is not None:
+        headers['X-Replica-Age'] = str(int(db_manager.replica_age))
+        if db_manager.degraded:
+            headers['Warning'] = '110 - "Response is Stale"'
+    return headers
+
+def parse_card_list_args(args) -> Tuple[str, Tuple[str, ...], Optional[List[int]]]:
+    """
+    Разобрать параметры запроса списка карт
+    
+    Args:
+        args: Параметры запроса (format, fields, ids)
+        
+    Returns:
+        (формат, поля, список ID карт или None для всех карт)
+        
+    Raises:
+        ValueError: Если параметры некорректны
+    """
+    fmt = args.get('format', 'json')
+    if fmt not in CARD_LIST_FORMATS:
+        raise ValueError(f'Неизвестный формат: {fmt}')
+    return (fmt,) + parse_card_filters(args)
+
+def parse_card_filters(args) -> Tuple[Tuple[str, ...], Optional[List[int]]]:
+    """
+    Разобрать параметры выбора карт (общие для списка и выгрузки)
+    
+    Args:
+        args: Параметры запроса (fields, ids)
+        
+    Returns:
+        (поля, список ID карт или None для всех карт)
+        
+    Raises:
+        ValueError: Если параметры некорректны
+    """
+    fields = CARD_FIELDS
+    if args.get('fields'):
+        fields = tuple(dict.fromkeys(f.strip() for f in args['fields'].split(',') if f.strip()))
+        unknown = [f for f in fields if f not in CARD_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+    
+    card_ids = None
+    if 'ids' in args:
+        try:
+            card_ids = [int(i) for i in args['ids'].split(',') if i.strip()]
+        except ValueError:
+            raise ValueError('Параметр ids должен содержать целые числа')
+    return fields, card_ids
+
+@bp.route('/cards/export', methods=['GET'])
+@auth_manager.require_permission('can_view')
+def export_cards():
+    """
+    Выгрузить карты в CSV или XLSX потоком
+    
+    Параметры запроса:
+        format: csv (по умолчанию) или xlsx
+        fields, ids: Как у GET /cards
+    
+    Слот чтения и подключение из пула заняты до окончания передачи файла.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Неизвестный формат: {fmt}'}), 400
+    try:
+        fields, card_ids = parse_card_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    db_path = session['db_path']
+    limiter = get_admission(db_path).limiter(READ)
+    try:
+        limiter.acquire()
+    except AdmissionRejected as e:
+        raise ServiceUnavailable(str(e), retry_after=e.retry_after)
+    started = time.monotonic()
+    
+    pool = get_pool(db_path)
+    try:
+        manager = pool.acquire(timeout=current_app.config['DB_POOL_TIMEOUT'])
+    except Exception:
+        limiter.release()
+        raise
+    
+    batches = manager.iter_card_rows(fields, card_ids)
+    completed = False
+    
+    def finish() -> None:
+        batches.close()
+        pool.release(manager, commit=completed)
+        limiter.release(time.monotonic() - started)
+    
+    try:
+        # Первая порция выбирается до начала ответа: ошибки БД дают 503/504,
+        # а не оборванный файл
+        first = next(batches, [])
+    except Exception:
+        finish()
+        raise
+    
+    writer, mimetype = EXPORT_FORMATS[fmt]
+    
+    def generate():
+        nonlocal completed
+        try:
+            yield from writer(itertools.chain([first], batches), fields)
+            completed = True
+        except Exception as e:
+            logger.error(f"Ошибка выгрузки карт из БД {db_path}: {str(e)}")
+            raise
+    
+    # Подключение и слот освобождаются при закрытии ответа сервером, в том
+    # числе если клиент отключился, не дочитав файл
+    response = Response(generate(), mimetype=mimetype)
+    response.call_on_close(finish)
+    response.headers['Content-Disposition'] = f'attachment; filename=cards.{fmt}'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@bp.route('/cards/import', methods=['POST'])
+@auth_manager.require_permission('can_create')
+def import_cards():
+    """
+    Импортировать карты из CSV в фоновой задаче
+    
+    Файл передается в поле формы file или телом запроса (text/csv).
+    Обязательные столбцы: card_number, room и valid_until или valid_days;
+    необязательные: valid_from, comments, dep (подходят и заголовки выгрузки).
+    
+    Returns:
+        202 с состоянием задачи; заголовок Location - адрес состояния задачи
+    """
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    path = save_stream(stream, current_app.config['UPLOAD_DIR'], '.csv')
+    
+    # Заголовок проверяется сразу, строки - в задаче
+    try:
+        with open(path, 'rb') as file:
+            next(read_csv(file), None)
+    except (ValueError, UnicodeDecodeError) as e:
+        os.unlink(path)
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        job = submit_job('import', path, current_app.config['IMPORT_CHUNK_SIZE'],
+                         current_app.config['DB_POOL_TIMEOUT'])
+    except ServiceUnavailable:
+        os.unlink(path)
+        raise
+    return job_accepted(job, url_for('.import_status', job_id=job.id))
+
+@bp.route('/cards/import/<job_id>', methods=['GET'])
+@auth_manager.require_permission('can_view')
+def import_status(job_id):
+    """Состояние задачи импорта: прогресс, отчет и ошибки по строкам"""
+    job = find_job(job_id)
+    if job is None or job.kind != 'import':
+        return jsonify({'error': 'Задача не найдена'}), 404
+    return jsonify(job.to_dict())
+
+@bp.route('/cards/bulk', methods=['POST'])
+@auth_manager.require_permission('can_edit')
+def bulk_cards():
+    """
+    Массовая операция с картами комнаты, этажа или списка
+    
+    Тело запроса (JSON):
+        operation: renew (продлить на days дней), block или activate
+        room, floor или ids: Номер комнаты, этаж или список ID карт
+        days: Срок продления (для renew)
+        dry_run: Только подсчитать карты, к которым будет применена операция
+    
+    Returns:
+        200 с количеством карт (dry_run) или 202 с состоянием фоновой задачи
+    """
+    data = request.get_json(silent=True) or {}
+    operation = data.get('operation')
+    if operation not in OPERATIONS:
+        return jsonify({'error': f"Неизвестная операция: {operation}"}), 400
+    try:
+        target = parse_target(data)
+        days = parse_days(operation, data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if data.get('dry_run'):
+        return count_bulk_targets(operation, target)
+    job = submit_job('bulk', operation, target, days, current_app.config['BULK_CHUNK_SIZE'],
+                     current_app.config['DB_POOL_TIMEOUT'])
+    return job_accepted(job)
+
+@admit(READ)
+def count_bulk_targets(operation: str, target: Dict):
+    """Пробный запуск массовой операции: количество и номера затрагиваемых карт"""
+    rows = find_targets(get_db(), operation, target)
+    return jsonify({
+        'dry_run': True,
+        'operation': operation,
+        'count': len(rows),
+        'card_numbers': [row[0] for row in rows[:DRY_RUN_SAMPLE]]
+    })
+
+@bp.route('/reports', methods=['GET'])
+@auth_manager.require_permission('can_view')
+def list_reports():
+    """Список доступных отчетов"""
+    return jsonify({'reports': [
+        {'name': name, 'title': report.title, 'url': url_for('.show_report', name=name)}
+        for name, report in REPORTS.items()
+    ]})
+
+@bp.route('/reports/<name>', methods=['GET'])
+@auth_manager.require_permission('can_view')
+def show_report(name):
+    """
+    Отчет по картам БД сессии
+    
+    Результат берется из кэша отчетов БД; слот чтения и подключение
+    занимаются только при вычислении (после изменения карт или истечения
+    REPORT_CACHE_TTL).
+    """
+    report = REPORTS.get(name)
+    if report is None:
+        return jsonify({'error': 'Отчет не найден'}), 404
+    try:
+        params = report.parse(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(get_report(session['db_path'], name, params, with_read_db))
+
+@admit(READ)
+def with_read_db(func):
+    """Выполнить func(db_manager) со слотом чтения и подключением из пула"""
+    return func(get_db())
+
+def submit_job(kind: str, *args) -> Job:
+    """
+    Поставить фоновую задачу текущей БД в очередь
+    
+    Args:
+        kind: Вид задачи (зарегистрированный в JobRegistry)
+        *args: Аргументы функции задачи (сериализуемые в JSON)
+        
+    Returns:
+        Job: Задача в очереди
+        
+    Raises:
+        ServiceUnavailable: Если очередь задач заполнена
+    """
+    try:
+        return current_app.extensions['jobs'].submit(Job(kind, session['db_path']), *args)
+    except AdmissionRejected as e:
+        raise ServiceUnavailable(str(e), retry_after=e.retry_after)
+
+def job_accepted(job: Job, location: Optional[str] = None) -> Response:
+    """Ответ 202 с состоянием задачи и адресом для опроса"""
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers['Location'] = location or url_for('.job_status', job_id=job.id)
+    return response
+
+def find_job(job_id: str) -> Optional[Job]:
+    """Задача текущей БД или None"""
+    job = current_app.extensions['jobs'].get(job_id)
+    if job is None or job.db_path != session['db_path']:
+        return None
+    return job
+
+@bp.route('/jobs', methods=['GET'])
+@auth_manager.require_permission('can_view')
+def list_jobs():
+    """
+    Список последних фоновых задач текущей БД (новые первыми)
+    
+    Query параметры:
+        kind: Вид задачи
+        limit: Количество задач (по умолчанию 50, не больше 500)
+    """
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+    except ValueError:
+        return jsonify({'error': 'Некорректное значение limit'}), 400
+    jobs = current_app.extensions['jobs'].list(session['db_path'], request.args.get('kind'),
+                                               max(limit, 1))
+    return jsonify({'jobs': [job.to_dict() for job in jobs]})
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+@auth_manager.require_permission('can_view')
+def job_status(job_id):
+    """Состояние фоновой задачи: прогресс, результат, ошибка"""
+    job = find_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Задача не найдена'}), 404
+    return jsonify(job.to_dict())
+
+@bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+@auth_manager.require_permission('can_create')
+def cancel_job(job_id):
+    """
+    Отменить фоновую задачу: задача в очереди не запускается, выполняемая
+    останавливается после текущей единицы работы
+    
+    Returns:
+        202 с состоянием задачи; 409 если задача уже завершена
+    """
+    if find_job(job_id) is None:
+        return jsonify({'error': 'Задача не найдена'}), 404
+    job = current_app.extensions['jobs'].cancel(job_id)
+    if job.status in FINISHED:
+        return jsonify({'error': 'Задача уже завершена', 'job': job.to_dict()}), 409
+    return job_accepted(job)
+
+def load_card_snapshot(db_manager: DatabaseManager, snapshots, db_path: str, fmt: str,
+                       fields: Tuple[str, ...], card_ids: Optional[List[int]] = None) -> CachedSnapshot:
+    """
+    Выбрать карты и получить закодированное тело ответа
+    
+    Полный список читается из общего снимка узла, если он актуален:
+    тело всех полей отдается из снимка без кодирования, для части полей
+    строки читаются из снимка вместо БД.
+    
+    Args:
+        db_manager: Менеджер БД
+        snapshots: Кэш снимков (SnapshotCache) для полного списка
+        db_path: Путь к БД (ключ кэша)
+        fmt: Формат ответа
+        fields: Поля карты
+        card_ids: Список ID карт или None для всех карт
+        
+    Returns:
+        CachedSnapshot: Закодированный снимок (SnapshotBody - из общего снимка)
+    """
+    encoder = CARD_LIST_FORMATS[fmt][0]
+    if card_ids is not None:
+        rows = db_manager.get_card_rows_by_ids(card_ids, fields) if card_ids else []
+        return CachedSnapshot(None, encoder(rows, fields))
+    shared = SharedCardSnapshot.for_database(db_path)
+    mapped = shared.current() if shared is not None else None
+    if mapped is not None and mapped.body(fmt) is not None and fields == CARD_FIELDS:
+        return SnapshotBody(mapped, fmt)
+    if mapped is not None:
+        rows = mapped.rows(fields)
+    else:
+        rows = db_manager.get_all_card_rows(fields)
+    return snapshots.get_or_encode((db_path, fmt, fields), rows, lambda rows: encoder(rows, fields))
+
+def card_edit_params(data: Dict, card_number: int = None) -> Dict:
+    """
+    Аргументы HOSTEL_CARDEDIT для создания или обновления карты (действие 1)
+    
+    Дата начала по умолчанию фиксируется сразу, чтобы изменение из журнала
+    отложенной записи применилось с той же датой.
+    
+    Args:
+        data: Данные карты из тела запроса
+        card_number: Номер карты из URL (для обновления)
+        
+    Returns:
+        Dict: Аргументы DatabaseManager.call_cardedit_procedure
+    """
+    return {
+        'action': 1,
+        'room': data.get('room'),
+        'card_number': card_number if card_number is not None else data.get('card_number'),
+        'valid_from': data.get('valid_from') or date.today().isoformat(),
+        'valid_days': data.get('valid_days'),
+        'comments': data.get('comments'),
+        'dep': data.get('dep', 'ХОСТЕЛ')
+    }
+
+def card_event_type(action: int, result: Dict) -> str:
+    """Тип события изменения карты по действию и коду результата HOSTEL_CARDEDIT"""
+    if action == 2:
+        return 'deleted'
+    if action == 3:
+        return 'blocked'
+    return 'created' if result.get('result_code') == 0 else 'updated'
+
+def edit_card(params: Dict, card_id: int = None) -> Response:
+    """
+    Изменить карту через HOSTEL_CARDEDIT
+    
+    При включенной отложенной записи изменение ставится в журнал (ответ 202,
+    status queued), если БД не отвечает или в журнале уже есть
+    непримененные изменения этой БД (порядок изменений сохраняется).
+    Повтор запроса с тем же заголовком Idempotency-Key возвращает ту же
+    запись журнала.
+    
+    Args:
+        params: Аргументы DatabaseManager.call_cardedit_procedure
+        card_id: Номер карты из URL
+        
+    Returns:
+        Response: Результат процедуры или запись журнала
+    """
+    journal = current_app.extensions.get('write_journal')
+    if journal is not None and journal.pending_count(session['db_path']):
+        return queue_card_edit(journal, params)
+    try:
+        return apply_card_edit(params, card_id)
+    except WRITE_STALLS as e:
+        if journal is None:
+            raise
+        logger.warning(f"БД {session['db_path']} не отвечает, изменение карты "
+                       f"{params.get('card_number')} отложено: {str(e)}")
+        return queue_card_edit(journal, params)
+
+@admit(WRITE)
+def apply_card_edit(params: Dict, card_id: int = None) -> Response:
+    """Вызвать HOSTEL_CARDEDIT и разослать событие изменения карты"""
+    try:
+        result = get_db().call_cardedit_procedure(**params)
+        publish_card_event(card_event_type(params['action'], result), result, card_id)
+        return jsonify(result)
+    except WRITE_STALLS:
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def queue_card_edit(journal: WriteJournal, params: Dict) -> Response:
+    """Поставить изменение карты в журнал отложенной записи (ответ 202)"""
+    entry = journal.append(session['db_path'], params,
+                           key=request.headers.get('Idempotency-Key'),
+                           user_id=session.get('user_id'))
+    response = jsonify({'status': 'queued', 'entry': entry})
+    response.status_code = 202
+    response.headers['Location'] = url_for('.queued_write', entry_id=entry['id'])
+    return response
+
+def publish_replayed_edit(card_events: EventBroadcaster, db_manager: DatabaseManager,
+                          entry: Dict, result: Dict) -> None:
+    """
+    Разослать событие изменения карты, примененного из журнала отложенной
+    записи (WriteReplayer.on_applied)
+    """
+    params = entry['params']
+    event = build_card_event(db_manager, card_event_type(params['action'], result), result,
+                             params.get('card_number'))
+    if event is not None:
+        card_events.publish(entry['db_path'], event)
+
+def build_card_event(db_manager: DatabaseManager, event_type: str, result: Dict,
+                     card_id: int = None) -> Optional[Dict]:
+    """
+    Сформировать событие изменения карты
+    
+    Args:
+        db_manager: Менеджер БД
+        event_type: Тип события (created, updated, deleted, blocked, activated)
+        result: Результат процедуры HOSTEL_CARDEDIT
+        card_id: ID карты, если процедура его не вернула
+        
+    Returns:
+        Dict события или None, если карта не изменилась
+    """
+    # Коды 2 и 3 - карта уже существует / не найдена, изменений нет
+    if result.get('error') is not None or result.get('result_code') in (2, 3):
+        return None
+
+    card_id = result.get('card_id') or card_id
+    card = None
+    if event_type != 'deleted' and card_id:
+        rows = db_manager.get_card_rows_by_ids([card_id])
+        if rows:
+            card = dict(zip(CARD_FIELDS, rows[0]))
+    return {'type': event_type, 'card_id': card_id, 'card': card}
+
+def publish_card_event(event_type: str, result: dict, card_id: int = None) -> None:
+    """
+    Разослать подписчикам БД событие изменения карты
+    
+    Args:
+        event_type: Тип события (created, updated, deleted, blocked, activated)
+        result: Результат процедуры HOSTEL_CARDEDIT
+        card_id: ID карты, если процедура его не вернула
+    """
+    event = build_card_event(get_db(), event_type, result, card_id)
+    if event is not None:
+        current_app.extensions['card_events'].publish(session['db_path'], event)
+
+@bp.route('/cards/events', methods=['GET'])
+@auth_manager.require_permission('can_view')
+def card_events_stream():
+    """
+    Поток событий изменения карт (Server-Sent Events)
+    
+    Поток не завершается, поэтому под сервером рабочих процессов он
+    переводится в отдельный лимит потоков событий (server.DETACH_STREAM);
+    при исчерпании лимита - 503.
+    """
+    detach_stream = request.environ.get(DETACH_STREAM)
+    if detach_stream is not None and not detach_stream():
+        raise ServiceUnavailable('Слишком много подписок на события', retry_after=5)
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    card_events = current_app.extensions['card_events']
+    subscription = card_events.subscribe(session['db_path'], last_event_id)
+    response = Response(
+        card_events.stream(subscription, current_app.config['SSE_HEARTBEAT']),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/cards', methods=['POST'])
+@auth_manager.require_permission('can_create')
+def create_card():
+    """Создать новую карту"""
+    return edit_card(card_edit_params(request.get_json()))
+
+@bp.route('/cards/<int:card_id>', methods=['GET'])
+@auth_manager.require_permission('can_view')
+@admit(READ)
+def get_card(card_id):
+    """Получить данные карты"""
+    try:
+        db_manager = get_db()
+        
+        result = db_manager.call_cardedit_procedure(action=0, card_number=card_id)
+        return jsonify(result)
+    except PROPAGATED_ERRORS:
+        # 503 или 504 - обработчики ошибок приложения
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/cards/<int:card_id>', methods=['PUT'])
+@auth_manager.require_permission('can_edit')
+def update_card(card_id):
+    """Обновить карту"""
+    return edit_card(card_edit_params(request.get_json(), card_id), card_id)
+
+@bp.route('/cards/<int:card_id>/block', methods=['POST'])
+@auth_manager.require_permission('can_edit')
+def block_card(card_id):
+    """Заблокировать карту (HOSTEL_CARDEDIT, действие 3; room - необязательно)"""
+    data = request.get_json(silent=True) or {}
+    return edit_card({'action': 3, 'room': data.get('room'), 'card_number': card_id}, card_id)
+
+@bp.route('/cards/queued', methods=['GET'])
+@auth_manager.require_permission('can_view')
+def queued_writes():
+    """
+    Записи журнала отложенной записи БД сессии (новые первыми)
+    
+    Параметры запроса:
+        status: pending, applying, uncertain, applied, conflict или failed
+        limit: Количество записей (по умолчанию 50, не больше 500)
+    """
+    journal = current_app.extensions.get('write_journal')
+    if journal is None:
+        return jsonify({'error': 'Отложенная запись не включена'}), 404
+    limit = request.args.get('limit', 50, type=int)
+    if limit is None or not 0 < limit <= 500:
+        return jsonify({'error': 'Параметр limit должен быть от 1 до 500'}), 400
+    entries = journal.list(session['db_path'], request.args.get('status'), limit)
+    return jsonify({'entries': entries, 'pending': journal.pending_count(session['db_path'])})
+
+@bp.route('/cards/queued/<int:entry_id>', methods=['GET'])
+@auth_manager.require_permission('can_view')
+def queued_write(entry_id):
+    """Состояние записи журнала отложенной записи (конфликт - status conflict и result)"""
+    journal = current_app.extensions.get('write_journal')
+    entry = journal.get(session['db_path'], entry_id) if journal is not None else None
+    if entry is None:
+        return jsonify({'error': 'Запись не найдена'}), 404
+    return jsonify(entry)
+
+@bp.route('/cards/queued/<int:entry_id>/resolve', methods=['POST'])
+@auth_manager.require_permission('can_edit')
+def resolve_queued_write(entry_id):
+    """
+    Решение по записи uncertain (применение прервано, результат неизвестен)
+    
+    Тело запроса:
+        status: pending - применить повторно, applied - изменение уже в БД,
+            failed - отклонить запись
+    """
+    journal = current_app.extensions.get('write_journal')
+    if journal is None:
+        return jsonify({'error': 'Отложенная запись не включена'}), 404
+    data = request.get_json(silent=True) or {}
+    try:
+        entry = journal.resolve(session['db_path'], entry_id, data.get('status'))
+    except ValueError:
+        return jsonify({'error': 'Параметр status должен быть pending, applied или failed'}), 400
+    if entry is None:
+        return jsonify({'error': 'Запись не найдена или не ожидает решения'}), 409
+    return jsonify(entry)
+
+@bp.route('/cards/<int:card_id>', methods=['DELETE'])
+@auth_manager.require_permission('can_delete')
+def delete_card(card_id):
+    """Удалить карту (после непримененных изменений журнала - в журнал, по порядку)"""
+    return edit_card({'action': 2, 'card_number': card_id}, card_id)
+
+@bp.route('/admin/users/refresh', methods=['POST'])
+@auth_manager.require_permission('is_admin')
+def refresh_users():
+    """Сбросить кэш пользователей текущей БД (только для администратора)"""
+    UserCache.for_database(session['db_path']).invalidate()
+    return jsonify({'message': 'Кэш пользователей сброшен'})
+
+@bp.route('/debug/profile', methods=['GET'])
+@auth_manager.require_permission('is_admin')
+def debug_profile():
+    """
+    Выборочное профилирование потоков запросов этого процесса; ответ -
+    стеки в свернутом формате для flame graph (flamegraph.pl, speedscope)
+    
+    При нескольких рабочих процессах (serve --workers) профиль снимается
+    только в процессе, принявшем запрос (его PID - в заголовке
+    X-Profile-Pid): для остальных процессов запрос нужно повторить, пока
+    не ответит каждый из них.
+    
+    Параметры запроса:
+        seconds: Длительность (по умолчанию 10, не больше PROFILE_MAX_SECONDS)
+        all: 1 - все потоки процесса, а не только обрабатывающие запросы
+    """
+    seconds = request.args.get('seconds', 10, type=float)
+    max_seconds = current_app.config['PROFILE_MAX_SECONDS']
+    if seconds is None or not 0 < seconds <= max_seconds:
+        return jsonify({'error': f'Параметр seconds должен быть от 0 до {max_seconds}'}), 400
+    sampler = StackSampler(current_app.config['PROFILE_SAMPLE_INTERVAL'],
+                           all_threads=request.args.get('all') == '1')
+    try:
+        sampler.run(seconds)
+    except ProfilerBusy as e:
+        return jsonify({'error': str(e)}), 409
+    response = Response(sampler.collapsed(), mimetype='text/plain')
+    response.headers['X-Profile-Samples'] = str(sampler.samples)
+    response.headers['X-Profile-Pid'] = str(os.getpid())
+    return response
+
+@bp.app_errorhandler(400)
+def bad_request(error):
+    """Обработка ошибки 400"""
+    return jsonify({'error': 'Bad request'}), 400
+
+@bp.app_errorhandler(401)
+def unauthorized(error):
+    """Обработка ошибки 401"""
+    return jsonify({'error': 'Unauthorized'}), 401
+
+@bp.app_errorhandler(403)
+def forbidden(error):
+    """Обработка ошибки 403"""
+    return jsonify({'error': 'Forbidden'}), 403
+
+@bp.app_errorhandler(404)
+def not_found(error):
+    """Обработка ошибки 404"""
+    return jsonify({'error': 'Not found'}), 404
+
+@bp.app_errorhandler(503)
+def service_unavailable(error):
+    """Обработка ошибки 503 (с заголовком Retry-After)"""
+    response = jsonify({'error': error.description or 'Service unavailable'})
+    response.status_code = 503
+    retry_after = getattr(error, 'retry_after', None)
+    if retry_after:
+        response.headers['Retry-After'] = str(int(retry_after))
+    return response
+
+@bp.app_errorhandler(DatabaseUnavailable)
+def database_unavailable(error):
+    """Сервер БД недоступен: быстрый ответ 503 с Retry-After"""
+    return service_unavailable(ServiceUnavailable(str(error), retry_after=error.retry_after))
+
+@bp.app_errorhandler(StatementTimeout)
+def statement_timeout(error):
+    """Запрос к БД отменен по истечении времени: 504"""
+    response, status = ErrorHandler.handle_database_error(error)
+    return jsonify(response), status
+
+@bp.app_errorhandler(500)
+def internal_error(error):
+    """Обработка ошибки 500"""
+    return jsonify({'error': 'Internal server error'}), 500
@@ -0,0 +1,373 @@
+"""
+Запуск приложения в рабочем режиме: простой preforking-супервизор.
+Родительский процесс открывает сокет и запускает рабочие процессы.
+Каждый рабочий процесс после fork создает собственное приложение
+(create_app), прогревает пулы подключений и кэши, после чего принимает
+запросы пулом потоков. Упавшие процессы и процессы, обработавшие
+max_requests запросов, перезапускаются.
+
+Потоки событий (Server-Sent Events) не завершаются, поэтому не занимают
+слоты обычных запросов: приложение вызывает environ[DETACH_STREAM], и
+запрос переходит в отдельный лимит потоков событий (streams на процесс).
+При исчерпании этого лимита маршрут отвечает 503, а обычные запросы
+продолжают обслуживаться. Изменение, обработанное одним процессом,
+доходит до подписчиков остальных через общий журнал событий
+(SSE_EVENT_LOG_PATH, при нескольких процессах включается командой serve).
+"""
+
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+logger = logging.getLogger(__name__)
+
+# Ключ environ: функция перевода запроса в лимит потоков событий
+DETACH_STREAM = 'hostel.detach_stream'
+
+
+@dataclass
+class ServeOptions:
+    """Параметры запуска сервера"""
+
+    host: str = '127.0.0.1'
+    port: int = 8000
+    workers: int = 2
+    threads: int = 8
+    streams: int = 16
+    max_requests: int = 0  # 0 - без перезапуска по количеству запросов
+    max_requests_jitter: int = 0
+    graceful_timeout: float = 30.0
+    warmup_databases: List[str] = field(default_factory=list)
+    warmup_connections: int = 1
+
+
+class RequestHandler(WSGIRequestHandler):
+    """Обработчик запросов: одно соединение - один запрос"""
+
+    # Без keep-alive поток не удерживается простаивающим соединением
+    protocol_version = 'HTTP/1.0'
+
+    def make_environ(self):
+        environ = super().make_environ()
+        environ[DETACH_STREAM] = self.server.detach_stream
+        return environ
+
+
+class WorkerServer(BaseWSGIServer):
+    """WSGI-сервер рабочего процесса с ограниченным пулом потоков"""
+
+    multithread = True
+
+    def __init__(self, sock: socket.socket, app, threads: int, max_requests: int = 0,
+                 multiprocess: bool = False, streams: int = 16):
+        """
+        Инициализация сервера на уже открытом сокете
+
+        Args:
+            sock: Слушающий сокет (общий для всех рабочих процессов)
+            app: WSGI-приложение
+            threads: Количество потоков обработки запросов
+            max_requests: Количество запросов, после которого процесс завершается (0 - без ограничения)
+            multiprocess: Запущено несколько рабочих процессов
+            streams: Количество одновременных потоков событий (сверх threads)
+        """
+        self.multiprocess = multiprocess
+        host, port = sock.getsockname()[:2]
+        super().__init__(host, port, app, handler=RequestHandler, fd=sock.fileno())
+        self.max_requests = max_requests
+        self.handled = 0
+        self._executor = ThreadPoolExecutor(max_workers=threads + streams,
+                                            thread_name_prefix='request')
+        self._slots = threading.Semaphore(threads)
+        self._streams = threading.Semaphore(streams)
+        self._local = threading.local()
+        self._in_flight = 0
+        self._idle = threading.Condition()
+        self._stopping = False
+
+    def process_request(self, request, client_address) -> None:
+        # Пока все потоки заняты, соединения не принимаются и достаются
+        # другим рабочим процессам
+        self._slots.acquire()
+        with self._idle:
+            self._in_flight += 1
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address) -> None:
+        # Запрос учитывается до отправки ответа: клиент может получить
+        # ответ раньше, чем поток закроет соединение
+        with self._idle:
+            self.handled += 1
+            handled = self.handled
+        self._local.stream = False
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            if self._local.stream:
+                self._streams.release()
+            else:
+                self._slots.release()
+            with self._idle:
+                self._in_flight -= 1
+                self._idle.notify_all()
+            if self.max_requests and handled >= self.max_requests:
+                self.stop(f"обработано {handled} запросов")
+
+    def detach_stream(self) -> bool:
+        """
+        Перевести текущий запрос из слотов обычных запросов в лимит потоков
+        событий (вызывается приложением из потока запроса)
+
+        Returns:
+            bool: False, если лимит потоков событий исчерпан
+        """
+        if self._local.stream:
+            return True
+        if not self._streams.acquire(blocking=False):
+            return False
+        self._local.stream = True
+        self._slots.release()
+        return True
+
+    def stop(self, reason: str = '') -> None:
+        """
+        Прекратить прием соединений (можно вызывать из любого потока)
+
+        Args:
+            reason: Причина остановки для журнала
+        """
+        with self._idle:
+            if self._stopping:
+                return
+            self._stopping = True
+        logger.info(f"Рабочий процесс {os.getpid()} прекращает прием запросов: {reason}")
+        threading.Thread(target=self.shutdown, name='server-shutdown', daemon=True).start()
+
+    def drain(self, timeout: float) -> bool:
+        """
+        Дождаться завершения обрабатываемых запросов
+
+        Args:
+            timeout: Максимальное время ожидания (секунды)
+
+        Returns:
+            bool: True если все запросы завершены
+        """
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"Не завершено запросов: {self._in_flight}")
+                    return False
+                self._idle.wait(remaining)
+        self._executor.shutdown(wait=False)
+        return True
+
+
+def warm_up(app, databases: List[str], connections: int = 1) -> None:
+    """
+    Прогреть пулы подключений и кэши приложения перед приемом запросов
+
+    Args:
+        app: Приложение Flask
+        databases: Пути к БД
+        connections: Количество подключений, открываемых в пуле каждой БД
+    """
+    from app.routes import warm_database
+
+    with app.app_context():
+        for db_path in databases:
+            try:
+                warm_database(db_path, connections)
+            except Exception as e:
+                logger.error(f"Ошибка прогрева БД {db_path}: {str(e)}")
+
+
+def run_worker(sock: socket.socket, options: ServeOptions, config: Optional[Dict] = None) -> None:
+    """
+    Тело рабочего процесса: создать приложение, прогреть его и обслуживать запросы
+
+    Args:
+        sock: Слушающий сокет
+        options: Параметры сервера
+        config: Параметры конфигурации приложения
+    """
+    from app import create_app
+    from app.managers.connection_pool import close_all_pools
+
+    app = create_app(config)
+    warm_up(app, options.warmup_databases, options.warmup_connections)
+
+    max_requests = options.max_requests
+    if max_requests and options.max_requests_jitter:
+        # Разброс, чтобы процессы не перезапускались одновременно
+        max_requests += random.randint(0, options.max_requests_jitter)
+
+    server = WorkerServer(sock, app, options.threads, max_requests,
+                          multiprocess=options.workers > 1, streams=options.streams)
+
+    def on_signal(signum, frame):
+        server.stop(signal.Signals(signum).name)
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+
+    logger.info(f"Рабочий процесс {os.getpid()} принимает запросы")
+    server.serve_forever(poll_interval=0.5)
+
+    # Закрыть потоки событий, чтобы клиенты переподключились к другим процессам
+    app.extensions['card_events'].close_all()
+    server.drain(options.graceful_timeout)
+    server.server_close()
+    close_all_pools()
+    logger.info(f"Рабочий процесс {os.getpid()} завершен")
+
+
+class Supervisor:
+    """Родительский процесс: запуск и перезапуск рабочих процессов"""
+
+    # Минимальное время жизни процесса, после которого он перезапускается без задержки
+    min_uptime = 1.0
+
+    def __init__(self, options: ServeOptions, config: Optional[Dict] = None):
+        """
+        Инициализация супервизора
+
+        Args:
+            options: Параметры сервера
+            config: Параметры конфигурации приложения
+        """
+        self.options = options
+        self.config = config
+        self.workers: Dict[int, float] = {}
+        self.stopping = False
+        self.sock: Optional[socket.socket] = None
+
+    def bind(self) -> socket.socket:
+        """Открыть слушающий сокет"""
+        sock = socket.create_server((self.options.host, self.options.port), backlog=2048)
+        sock.set_inheritable(True)
+        self.sock = sock
+        return sock
+
+    def spawn(self) -> int:
+        """
+        Запустить рабочий процесс
+
+        Returns:
+            int: PID процесса
+        """
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                run_worker(self.sock, self.options, self.config)
+            except BaseException:
+                logger.exception("Ошибка рабочего процесса")
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+        logger.info(f"Запущен рабочий процесс {pid}")
+        return pid
+
+    def _on_signal(self, signum, frame) -> None:
+        if not self.stopping:
+            logger.info(f"Получен сигнал {signal.Signals(signum).name}, остановка")
+            self.stopping = True
+            self._signal_workers(signal.SIGTERM)
+
+    def _signal_workers(self, signum: int) -> None:
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _reap(self) -> List[int]:
+        """Собрать завершившиеся процессы"""
+        reaped = []
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                break
+            if pid == 0:
+                break
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0 and not self.stopping:
+                logger.error(f"Рабочий процесс {pid} завершился с кодом {code}")
+            reaped.append(pid)
+            if not self.stopping and time.monotonic() - started < self.min_uptime:
+                # Процесс падает сразу после запуска - не перезапускать в цикле
+                time.sleep(self.min_uptime)
+        return reaped
+
+    def run(self) -> None:
+        """Запустить рабочие процессы и следить за ними до получения сигнала остановки"""
+        if self.sock is None:
+            self.bind()
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        logger.info(f"Сервер слушает {self.options.host}:{self.sock.getsockname()[1]}, "
+                    f"процессов: {self.options.workers}, потоков: {self.options.threads}")
+
+        for _ in range(self.options.workers):
+            self.spawn()
+
+        while not self.stopping:
+            for _ in self._reap():
+                if not self.stopping:
+                    self.spawn()
+            time.sleep(0.2)
+
+        # Дождаться завершения процессов, затем завершить принудительно
+        deadline = time.monotonic() + self.options.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        if self.workers:
+            logger.warning(f"Принудительное завершение процессов: {list(self.workers)}")
+            self._signal_workers(signal.SIGKILL)
+            while self.workers:
+                self._reap()
+                time.sleep(0.05)
+        self.sock.close()
+
+
+def serve(options: ServeOptions, config: Optional[Dict] = None) -> None:
+    """
+    Запустить сервер
+
+    На платформах без fork (Windows) приложение обслуживается одним процессом.
+
+    Args:
+        options: Параметры сервера
+        config: Параметры конфигурации приложения
+    """
+    if not hasattr(os, 'fork'):
+        logger.warning("fork недоступен, запуск в одном процессе")
+        sock = socket.create_server((options.host, options.port))
+        options.workers = 1
+        run_worker(sock, options, config)
+        return
+    Supervisor(options, config).run()
@@ -0,0 +1,111 @@
+"""
+Двоичное колоночное кодирование CardTable (формат HCT1).
+
+Структура (little-endian):
+    b'HCT1', uint32 - количество строк, uint16 - количество столбцов;
+    для каждого столбца: uint8 - длина имени, имя (UTF-8), uint8 - тип;
+    затем данные столбцов по порядку:
+        TYPE_INT32   - int32 на значение, пустое значение = -2**31
+        TYPE_FLOAT64 - float64 на значение, пустое значение = NaN
+        TYPE_DATE    - int32 дней от 1970-01-01, пустое значение = -2**31
+        TYPE_STRING  - uint32 длина + байты UTF-8, пустое значение = длина 0xFFFFFFFF
+"""
+
+import struct
+import sys
+import logging
+from array import array
+from typing import List
+
+from app.models.card_table import CardTable
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'HCT1'
+
+TYPE_INT32 = 1
+TYPE_FLOAT64 = 2
+TYPE_DATE = 3
+TYPE_STRING = 4
+
+INT32_NULL = -2 ** 31
+STRING_NULL = 0xFFFFFFFF
+
+_INT32_MIN = -2 ** 31 + 1
+_INT32_MAX = 2 ** 31 - 1
+
+
+def _column_type(values: List) -> int:
+    """Определить тип столбца по непустым значениям"""
+    numeric = True
+    fits_int32 = True
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            numeric = False
+            break
+        if not isinstance(value, int) or not _INT32_MIN <= value <= _INT32_MAX:
+            fits_int32 = False
+    if not numeric:
+        return TYPE_STRING
+    return TYPE_INT32 if fits_int32 else TYPE_FLOAT64
+
+
+def _pack_array(typecode: str, values: List) -> bytes:
+    """Упаковать значения в little-endian массив"""
+    packed = array(typecode, values)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _pack_strings(values: List) -> bytes:
+    """Упаковать строки с префиксом длины"""
+    parts = []
+    length = struct.Struct('<I')
+    for value in values:
+        if value is None:
+            parts.append(length.pack(STRING_NULL))
+        else:
+            data = str(value).encode('utf-8')
+            parts.append(length.pack(len(data)))
+            parts.append(data)
+    return b''.join(parts)
+
+
+def encode_table(table: CardTable) -> bytes:
+    """
+    Закодировать таблицу карт в двоичный формат HCT1
+
+    Args:
+        table: Таблица карт
+
+    Returns:
+        bytes: Двоичное представление таблицы
+    """
+    header = [MAGIC, struct.pack('<IH', len(table), len(table.fields))]
+    body = []
+
+    for field in table.fields:
+        values = table.columns[field]
+        if table.is_date_column(field):
+            column_type = TYPE_DATE
+            data = _pack_array('i', [INT32_NULL if offset is None else offset
+                                     for offset in table.day_offsets(field)])
+        else:
+            column_type = _column_type(values)
+            if column_type == TYPE_INT32:
+                data = _pack_array('i', [INT32_NULL if value is None else value
+                                         for value in values])
+            elif column_type == TYPE_FLOAT64:
+                data = _pack_array('d', [float('nan') if value is None else float(value)
+                                         for value in values])
+            else:
+                data = _pack_strings(values)
+
+        name = field.encode('utf-8')
+        header.append(struct.pack('<B', len(name)) + name + struct.pack('<B', column_type))
+        body.append(data)
+
+    return b''.join(header + body)
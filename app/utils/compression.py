@@ -0,0 +1,255 @@
+"""
+Сжатие ответов (gzip/brotli) с выбором кодировки по заголовку Accept-Encoding.
+Для кэшируемых данных (снимок списка карт, статические файлы) сжатие
+выполняется один раз, результат хранится в памяти.
+"""
+
+import gzip
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - зависит от окружения
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Минимальный размер тела ответа для сжатия (байт)
+DEFAULT_MIN_SIZE = 1024
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/octet-stream',
+    'application/javascript',
+    'text/javascript',
+    'text/css',
+    'text/html',
+    'text/plain',
+    'text/csv',
+}
+
+# Уровни сжатия: для ответов, сжимаемых на каждый запрос, и для кэшируемых
+_LEVELS = {
+    'br': {False: 5, True: 9},
+    'gzip': {False: 6, True: 9},
+}
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    """
+    Получить поддерживаемые кодировки в порядке предпочтения
+
+    Returns:
+        Tuple[str, ...]: Кодировки (br - только при установленном brotli)
+    """
+    if brotli is not None:
+        return ('br', 'gzip')
+    return ('gzip',)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Выбрать кодировку сжатия по заголовку Accept-Encoding
+
+    Args:
+        accept_encoding: Значение заголовка Accept-Encoding
+
+    Returns:
+        Optional[str]: 'br', 'gzip' или None, если сжатие не принимается
+    """
+    if not accept_encoding:
+        return None
+
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+
+    best = None
+    best_quality = 0.0
+    for encoding in supported_encodings():
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str, cached: bool = False) -> bytes:
+    """
+    Сжать данные
+
+    Args:
+        data: Исходные данные
+        encoding: Кодировка ('br' или 'gzip')
+        cached: True для данных, которые сжимаются один раз и хранятся в кэше
+            (используется более высокий уровень сжатия)
+
+    Returns:
+        bytes: Сжатые данные
+    """
+    level = _LEVELS[encoding][cached]
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def snapshot_response(snapshot, mimetype: str, accept_encoding: Optional[str],
+                      min_size: int = DEFAULT_MIN_SIZE) -> Response:
+    """
+    Сформировать ответ из кэшированного снимка, используя сохраненную
+    сжатую копию тела
+
+    Args:
+        snapshot: Снимок (CachedSnapshot или card_snapshot.SnapshotBody - тело
+            и сжатые копии отдаются частями, без копирования)
+        mimetype: MIME-тип ответа
+        accept_encoding: Значение заголовка Accept-Encoding
+        min_size: Минимальный размер тела для сжатия
+
+    Returns:
+        Response: Ответ Flask
+    """
+    if getattr(snapshot, 'stream', None) is not None:
+        # Снимок в mmap: тело отдается частями, сжатую копию выбирает compress_response
+        response = Response(snapshot.stream(), mimetype=mimetype, direct_passthrough=True)
+        response.content_length = snapshot.size
+        response.precompressed = snapshot
+        return compress_response(response, accept_encoding, min_size)
+
+    encoding = negotiate(accept_encoding) if snapshot.size >= min_size else None
+    if encoding is None:
+        response = Response(snapshot.body, mimetype=mimetype)
+    else:
+        response = Response(snapshot.compressed(encoding), mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+class StaticCompressionCache:
+    """Кэш сжатых копий статических файлов"""
+
+    def __init__(self):
+        """Инициализация кэша"""
+        self._entries: Dict[Tuple[str, str], Tuple[int, int, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str, encoding: str) -> Optional[bytes]:
+        """
+        Получить сжатую копию файла (файл сжимается при первом обращении
+        и повторно - только после изменения)
+
+        Args:
+            path: Путь к файлу
+            encoding: Кодировка сжатия
+
+        Returns:
+            Optional[bytes]: Сжатое содержимое или None, если файл недоступен
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        key = (path, encoding)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+
+        try:
+            with open(path, 'rb') as f:
+                data = compress(f.read(), encoding, cached=True)
+        except OSError as e:
+            logger.error(f"Ошибка при сжатии файла {path}: {str(e)}")
+            return None
+
+        with self._lock:
+            self._entries[key] = (stat.st_mtime_ns, stat.st_size, data)
+        return data
+
+
+def compress_response(response: Response, accept_encoding: Optional[str],
+                      min_size: int = DEFAULT_MIN_SIZE,
+                      static_cache: StaticCompressionCache = None,
+                      static_path: str = None) -> Response:
+    """
+    Сжать ответ, если клиент это поддерживает и тело достаточно большое
+
+    Args:
+        response: Ответ Flask
+        accept_encoding: Значение заголовка Accept-Encoding
+        min_size: Минимальный размер тела для сжатия
+        static_cache: Кэш сжатых статических файлов
+        static_path: Путь к статическому файлу, если ответ отдает файл
+
+    Ответ с атрибутом precompressed (снимок с сохраненными сжатыми копиями,
+    см. snapshot_response) не сжимается заново: отдается сохраненная копия.
+
+    Returns:
+        Response: Исходный или сжатый ответ
+    """
+    if (response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or 'Content-Range' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    precompressed = getattr(response, 'precompressed', None)
+    if precompressed is not None:
+        # Сохраненные сжатые копии (SnapshotBody): выбранная отдается частями
+        if precompressed.size < min_size:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(accept_encoding)
+        data = precompressed.variant(encoding) if encoding is not None else None
+        if data is None:
+            return response
+        response.response = precompressed.stream(encoding)
+        response.content_length = len(data)
+    elif static_path is not None and static_cache is not None:
+        if (response.content_length or 0) < min_size:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(accept_encoding)
+        if encoding is None:
+            return response
+        data = static_cache.get(static_path, encoding)
+        if data is None:
+            return response
+        response.direct_passthrough = False
+        if hasattr(response.response, 'close'):
+            response.response.close()
+        response.set_data(data)
+    else:
+        if response.direct_passthrough or response.is_streamed:
+            return response
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(accept_encoding)
+        if encoding is None:
+            return response
+        response.set_data(compress(body, encoding))
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
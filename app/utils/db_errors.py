@@ -0,0 +1,124 @@
+"""
+Классификация ошибок Firebird (fdb) по SQLCODE и коду GDS.
+
+Ошибки fdb передают в args (сообщение, SQLCODE, код GDS). По кодам ошибка
+относится к одному из классов:
+
+    CONNECTION - подключение потеряно или сервер недоступен: подключение
+                 закрывается, идемпотентное чтение повторяется после
+                 переподключения;
+    TRANSIENT  - конфликт блокировок или взаимоблокировка: транзакция
+                 откатывается и чтение повторяется;
+    TIMEOUT    - оператор отменен по истечении отведенного времени;
+    PERMISSION - недостаточно прав;
+    FATAL      - остальные ошибки (синтаксис, данные, неверный пароль,
+                 отсутствующий файл БД): повтор не поможет.
+"""
+
+from typing import Optional, Tuple
+
+CONNECTION = 'connection'
+TRANSIENT = 'transient'
+TIMEOUT = 'timeout'
+PERMISSION = 'permission'
+FATAL = 'fatal'
+
+# Коды GDS (isc_*)
+ISC_BAD_DB_HANDLE = 335544324       # invalid database handle (no active connection)
+ISC_DEADLOCK = 335544336            # deadlock
+ISC_LOCK_CONFLICT = 335544345       # lock conflict on no wait transaction
+ISC_NO_PRIV = 335544352             # no permission for ... access
+ISC_UNAVAILABLE = 335544375         # unavailable database
+ISC_UPDATE_CONFLICT = 335544451     # update conflicts with concurrent update
+ISC_LOCK_TIMEOUT = 335544510        # lock time-out on wait transaction
+ISC_SHUTDOWN = 335544528            # database shutdown
+ISC_CONN_LOST = 335544648           # connection lost to pipe server
+ISC_NETWORK_ERROR = 335544721       # unable to complete network request to host
+ISC_NET_CONNECT_ERR = 335544722     # failed to establish a connection
+ISC_NET_READ_ERR = 335544726        # error reading data from the connection
+ISC_NET_WRITE_ERR = 335544727       # error writing data to the connection
+ISC_LOST_DB_CONNECTION = 335544741  # connection lost to database
+ISC_CANCELLED = 335544794           # operation was cancelled
+ISC_ATT_SHUTDOWN = 335544856        # connection shutdown
+ISC_CONCURRENT_TRANSACTION = 335544878  # concurrent transaction number is ...
+
+CONNECTION_CODES = frozenset((
+    ISC_BAD_DB_HANDLE, ISC_UNAVAILABLE, ISC_SHUTDOWN, ISC_CONN_LOST, ISC_NETWORK_ERROR,
+    ISC_NET_CONNECT_ERR, ISC_NET_READ_ERR, ISC_NET_WRITE_ERR, ISC_LOST_DB_CONNECTION,
+    ISC_ATT_SHUTDOWN,
+))
+TRANSIENT_CODES = frozenset((
+    ISC_DEADLOCK, ISC_LOCK_CONFLICT, ISC_UPDATE_CONFLICT, ISC_LOCK_TIMEOUT,
+    ISC_CONCURRENT_TRANSACTION,
+))
+PERMISSION_CODES = frozenset((ISC_NO_PRIV,))
+TIMEOUT_CODES = frozenset((ISC_CANCELLED,))
+
+# SQLCODE, если код GDS неизвестен
+SQLCODE_CLASSES = {
+    -913: TRANSIENT,   # deadlock
+    -551: PERMISSION,  # no permission
+}
+
+
+class StatementTimeout(Exception):
+    """Оператор SQL отменен: превышено время выполнения"""
+
+    def __init__(self, message: str, timeout: float):
+        """
+        Args:
+            message: Описание оператора
+            timeout: Отведенное время (секунды)
+        """
+        super().__init__(message)
+        self.timeout = timeout
+
+
+def error_codes(error: BaseException) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Получить SQLCODE и код GDS ошибки fdb
+
+    Args:
+        error: Исключение
+
+    Returns:
+        Tuple[Optional[int], Optional[int]]: (sqlcode, gds_code); None для других исключений
+    """
+    args = getattr(error, 'args', ())
+    if len(args) >= 3 and isinstance(args[1], int) and isinstance(args[2], int):
+        return args[1], args[2]
+    return None, None
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Определить класс ошибки БД
+
+    Args:
+        error: Исключение
+
+    Returns:
+        str: CONNECTION, TRANSIENT, TIMEOUT, PERMISSION или FATAL
+    """
+    if isinstance(error, StatementTimeout):
+        return TIMEOUT
+    sqlcode, gds_code = error_codes(error)
+    if gds_code in CONNECTION_CODES:
+        return CONNECTION
+    if gds_code in TRANSIENT_CODES:
+        return TRANSIENT
+    if gds_code in TIMEOUT_CODES:
+        return TIMEOUT
+    if gds_code in PERMISSION_CODES:
+        return PERMISSION
+    if sqlcode in SQLCODE_CLASSES:
+        return SQLCODE_CLASSES[sqlcode]
+    if sqlcode is None and isinstance(error, (ConnectionError, TimeoutError)):
+        # Ошибки сокета при работе через сеть
+        return CONNECTION
+    return FATAL
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Можно ли повторить идемпотентную операцию после этой ошибки"""
+    return classify_error(error) in (CONNECTION, TRANSIENT)
@@ -7,6 +7,8 @@ import traceback
 from typing import Dict, Tuple
 from flask import jsonify
 
+from app.utils.db_errors import CONNECTION, PERMISSION, TIMEOUT, TRANSIENT, classify_error
+
 logger = logging.getLogger(__name__)
 
 
@@ -27,15 +29,34 @@ class ErrorHandler:
         error_msg = str(error)
         logger.error(f"Database error: {error_msg}\n{traceback.format_exc()}")
         
-        # Преобразовать технические ошибки в понятные сообщения
-        if 'connection' in error_msg.lower():
+        # Ошибки fdb классифицируются по SQLCODE и коду GDS
+        error_class = classify_error(error)
+        if error_class == CONNECTION:
             return {
                 'error': 'Ошибка подключения к базе данных. Проверьте параметры подключения.'
             }, 503
-        elif 'timeout' in error_msg.lower():
+        elif error_class == TRANSIENT:
+            return {
+                'error': 'Конфликт блокировок в базе данных. Повторите операцию.'
+            }, 503
+        elif error_class == TIMEOUT:
             return {
                 'error': 'Время ожидания ответа от базы данных истекло.'
             }, 504
+        elif error_class == PERMISSION:
+            return {
+                'error': 'Недостаточно прав для выполнения операции.'
+            }, 403
+
+        # Остальные ошибки - по тексту сообщения
+        if 'timeout' in error_msg.lower():
+            return {
+                'error': 'Время ожидания ответа от базы данных истекло.'
+            }, 504
+        elif 'connection' in error_msg.lower():
+            return {
+                'error': 'Ошибка подключения к базе данных. Проверьте параметры подключения.'
+            }, 503
         elif 'permission' in error_msg.lower():
             return {
                 'error': 'Недостаточно прав для выполнения операции.'
@@ -0,0 +1,219 @@
+"""
+Потоковая выгрузка карт в CSV и XLSX.
+
+Строки поступают порциями из курсора БД и сразу кодируются, поэтому
+память не зависит от количества карт. XLSX формируется без сторонних
+библиотек: zip-архив пишется в поток без перемотки (с дескрипторами
+данных), лист - с встроенными строками, без таблицы общих строк.
+"""
+
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from typing import Iterable, Iterator, List, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+# Заголовки столбцов выгрузки
+EXPORT_HEADERS = {
+    'card_id': 'ID',
+    'card_number': 'Номер карты',
+    'room': 'Комната',
+    'valid_from': 'Действует с',
+    'valid_until': 'Действует до',
+    'status': 'Статус',
+    'comments': 'Комментарий'
+}
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Символы, недопустимые в XML 1.0
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_EXCEL_EPOCH = date(1899, 12, 30)
+
+
+def _text(value) -> str:
+    """Значение ячейки CSV"""
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def write_csv(batches: Iterable[List[Tuple]], fields: Sequence[str]) -> Iterator[bytes]:
+    """
+    Закодировать строки карт в CSV (UTF-8 с BOM для Excel, разделитель ';')
+
+    Args:
+        batches: Порции строк в порядке fields
+        fields: Поля карты
+
+    Yields:
+        bytes: Части файла (заголовок и по одной части на порцию строк)
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';', lineterminator='\r\n')
+    writer.writerow([EXPORT_HEADERS.get(field, field) for field in fields])
+    yield '\ufeff'.encode('utf-8') + buffer.getvalue().encode('utf-8')
+
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_text(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkStream(io.RawIOBase):
+    """Файловый объект без перемотки: накапливает байты для выдачи частями"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        """Забрать накопленные байты"""
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _column_name(index: int) -> str:
+    """Имя столбца Excel по номеру (0 - A, 26 - AA)"""
+    name = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = chr(ord('A') + remainder) + name
+    return name
+
+
+def _xlsx_cell(ref: str, value) -> str:
+    """XML ячейки листа"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        delta = value - datetime(1899, 12, 30)
+        return f'<c r="{ref}" s="2"><v>{delta.days + delta.seconds / 86400}</v></c>'
+    if isinstance(value, date):
+        return f'<c r="{ref}" s="1"><v>{(value - _EXCEL_EPOCH).days}</v></c>'
+    text = escape(_INVALID_XML_CHARS.sub('', str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" '
+        'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Карты" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Стили ячеек: 0 - обычная, 1 - дата, 2 - дата и время
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '</cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+
+def write_xlsx(batches: Iterable[List[Tuple]], fields: Sequence[str]) -> Iterator[bytes]:
+    """
+    Закодировать строки карт в XLSX (один лист, первая строка - заголовки)
+
+    Args:
+        batches: Порции строк в порядке fields
+        fields: Поля карты
+
+    Yields:
+        bytes: Части zip-архива
+    """
+    stream = _ChunkStream()
+    columns = [_column_name(index) for index in range(len(fields))]
+
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            header = ''.join(_xlsx_cell(f'{column}1', EXPORT_HEADERS.get(field, field))
+                             for column, field in zip(columns, fields))
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                f'<sheetData><row r="1">{header}</row>'
+            ).encode('utf-8'))
+            yield stream.take()
+
+            number = 1
+            for rows in batches:
+                parts = []
+                for row in rows:
+                    number += 1
+                    cells = ''.join(_xlsx_cell(f'{column}{number}', value)
+                                    for column, value in zip(columns, row))
+                    parts.append(f'<row r="{number}">{cells}</row>')
+                sheet.write(''.join(parts).encode('utf-8'))
+                data = stream.take()
+                if data:
+                    yield data
+
+            sheet.write(b'</sheetData></worksheet>')
+
+    yield stream.take()
@@ -0,0 +1,195 @@
+"""
+Быстрая сериализация списков карт в JSON.
+Использует orjson, если он установлен, иначе стандартный модуль json.
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from app.models.card_table import CardTable
+from app.utils.compression import compress
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависит от окружения
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def _default(value):
+    """Сериализовать типы, которые не поддерживает стандартный json"""
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(data) -> bytes:
+    """
+    Сериализовать данные в JSON (UTF-8)
+
+    Args:
+        data: Данные для сериализации (даты сериализуются в формате YYYY-MM-DD)
+
+    Returns:
+        bytes: JSON в кодировке UTF-8
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'),
+                      default=_default).encode('utf-8')
+
+
+def encode_rows(rows: Iterable[Sequence], fields: Sequence[str]) -> bytes:
+    """
+    Сериализовать строки выборки в JSON-массив объектов без промежуточных
+    вызовов isoformat() для каждой даты
+
+    Args:
+        rows: Строки выборки (кортежи значений)
+        fields: Имена полей в порядке столбцов выборки
+
+    Returns:
+        bytes: JSON в кодировке UTF-8
+    """
+    return dumps([dict(zip(fields, row)) for row in rows])
+
+
+def encode_columns(rows: Sequence[Sequence], fields: Sequence[str]) -> bytes:
+    """
+    Сериализовать строки выборки в колоночный JSON без повторения имен полей
+    в каждой строке (даты - количество дней от CardTable EPOCH)
+
+    Args:
+        rows: Строки выборки (кортежи значений)
+        fields: Имена полей в порядке столбцов выборки
+
+    Returns:
+        bytes: JSON вида {"columns": [...], "data": {столбец: [...]}}
+    """
+    return dumps(CardTable.from_rows(rows, fields).to_columns_dict())
+
+
+class SnapshotCache:
+    """Кэш закодированных снимков выборок (например, списка карт)"""
+
+    def __init__(self, max_entries: int = 16):
+        """
+        Инициализация кэша
+
+        Args:
+            max_entries: Максимальное количество хранимых снимков
+        """
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, CachedSnapshot]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(rows: Tuple[Sequence, ...]) -> Optional[int]:
+        """
+        Вычислить отпечаток строк выборки (быстрая проверка изменения;
+        совпадение отпечатков подтверждается сравнением строк)
+
+        Args:
+            rows: Строки выборки
+
+        Returns:
+            Отпечаток или None, если строки содержат нехешируемые значения
+        """
+        try:
+            return hash((len(rows), rows))
+        except TypeError:
+            return None
+
+    def get_or_encode(self, key: Hashable, rows: List[Sequence],
+                      encoder: Callable[[List[Sequence]], bytes]) -> 'CachedSnapshot':
+        """
+        Получить закодированный снимок, кодируя строки только при их изменении
+
+        Args:
+            key: Ключ снимка (например, путь к БД)
+            rows: Строки выборки
+            encoder: Функция кодирования строк в байты
+
+        Returns:
+            CachedSnapshot: Снимок с закодированным телом
+        """
+        snapshot_rows = tuple(rows)
+        fingerprint = self.fingerprint(snapshot_rows)
+        if fingerprint is None:
+            return CachedSnapshot(None, encoder(rows))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            # Совпадение хешей не гарантирует совпадения строк
+            if entry is not None and entry.fingerprint == fingerprint \
+                    and entry.rows == snapshot_rows:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = CachedSnapshot(fingerprint, encoder(rows), snapshot_rows)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, key: Hashable = None) -> None:
+        """
+        Сбросить снимок (или все снимки)
+
+        Args:
+            key: Ключ снимка; None - сбросить все
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+class CachedSnapshot:
+    """Закодированный снимок выборки и его сжатые копии"""
+
+    __slots__ = ('fingerprint', 'body', 'rows', 'variants')
+
+    def __init__(self, fingerprint: Optional[int], body: bytes,
+                 rows: Optional[Tuple[Sequence, ...]] = None):
+        """
+        Инициализация снимка
+
+        Args:
+            fingerprint: Отпечаток строк, из которых получено тело
+            body: Закодированное тело ответа
+            rows: Строки, из которых получено тело (для сравнения в SnapshotCache)
+        """
+        self.fingerprint = fingerprint
+        self.body = body
+        self.rows = rows
+        self.variants = {}
+
+    @property
+    def size(self) -> int:
+        """Размер несжатого тела (байт)"""
+        return len(self.body)
+
+    def compressed(self, encoding: str) -> bytes:
+        """
+        Получить тело, сжатое указанной кодировкой (сжимается один раз)
+
+        Args:
+            encoding: Кодировка сжатия ('br' или 'gzip')
+
+        Returns:
+            bytes: Сжатое тело
+        """
+        data = self.variants.get(encoding)
+        if data is None:
+            data = compress(self.body, encoding, cached=True)
+            self.variants[encoding] = data
+        return data
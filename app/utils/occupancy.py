@@ -0,0 +1,148 @@
+"""
+Временной ряд заполняемости: количество действующих карт по дням, всего
+и по этажам или комнатам.
+
+Интервалы действия карт переводятся в номера дней относительно начала
+периода, счетчики строятся разностным массивом (+1 в день начала, -1 в
+день после окончания) и накопленной суммой, поэтому время не зависит от
+произведения количества карт на количество дней. С NumPy все шаги
+векторизованы (в том числе для матрицы группа x день); без NumPy
+используется тот же алгоритм на списках.
+"""
+
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.models.card import Card
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - зависит от окружения
+    np = None
+
+FLOOR = 'floor'
+ROOM = 'room'
+GROUPS = (FLOOR, ROOM)
+
+
+def _group_key(room_name: Optional[str], group: str) -> Optional[int]:
+    """Этаж или номер комнаты по имени комнаты (None, если имя некорректно)"""
+    try:
+        room = Card.room_number(room_name)
+    except (TypeError, ValueError):
+        return None
+    return room // 100 if group == FLOOR else room
+
+
+def occupancy_timeline(rows: Sequence[Tuple], start: date, end: date,
+                       group: Optional[str] = None) -> Dict:
+    """
+    Построить количество действующих карт по дням периода
+
+    Карта действует в дни с valid_from по valid_until включительно; карта
+    без даты начала считается действующей с начала периода.
+
+    Args:
+        rows: (имя комнаты, valid_from, valid_until) - DatabaseManager.get_card_intervals
+        start: Первый день периода
+        end: Последний день периода (включительно)
+        group: floor, room или None (только общий ряд)
+
+    Returns:
+        Dict: total - количество карт по дням; при group также keys - этажи
+        или комнаты по возрастанию и counts - ряды по дням для каждого ключа
+    """
+    days = (end - start).days + 1
+    if np is not None:
+        return _timeline_numpy(rows, start, days, group)
+    return _timeline_python(rows, start, days, group)
+
+
+def _ordinals(values: Iterable, count: int) -> 'np.ndarray':
+    """Порядковые номера дней (date.toordinal); для пустых значений - 0"""
+    return np.fromiter((value.toordinal() if value is not None else 0 for value in values),
+                       np.int64, count)
+
+
+def _timeline_numpy(rows: Sequence[Tuple], start: date, days: int,
+                    group: Optional[str]) -> Dict:
+    count = len(rows)
+    origin = start.toordinal()
+    valid_from = _ordinals((row[1] for row in rows), count)
+    valid_until = _ordinals((row[2] for row in rows), count)
+
+    # Номера дней относительно начала периода; конец - день после окончания
+    first = np.where(valid_from == 0, 0, valid_from - origin)
+    last = valid_until - origin + 1
+    first = np.clip(first, 0, days)
+    last = np.clip(last, 0, days)
+    keep = (valid_until != 0) & (first < last)
+    first, last = first[keep], last[keep]
+
+    diff = np.bincount(first, minlength=days + 1) - np.bincount(last, minlength=days + 1)
+    result = {'total': np.cumsum(diff[:days]).tolist()}
+    if not group:
+        return result
+
+    # Ключ группы разбирается один раз для каждого имени комнаты
+    name_index: Dict[Optional[str], int] = {}
+    card_names = np.fromiter((name_index.setdefault(row[0], len(name_index)) for row in rows),
+                             np.int64, count)[keep]
+    parsed = (_group_key(name, group) for name in name_index)
+    name_keys = np.array([-1 if key is None else key for key in parsed], dtype=np.int64)
+    card_keys = name_keys[card_names] if count else card_names
+
+    valid = card_keys >= 0
+    keys, key_index = np.unique(card_keys[valid], return_inverse=True)
+    width = days + 1
+    key_index = key_index.reshape(-1)
+    grid = (np.bincount(key_index * width + first[valid], minlength=len(keys) * width)
+            - np.bincount(key_index * width + last[valid], minlength=len(keys) * width))
+    result['keys'] = keys.tolist()
+    result['counts'] = np.cumsum(grid.reshape(len(keys), width)[:, :days], axis=1).tolist()
+    return result
+
+
+def _timeline_python(rows: Sequence[Tuple], start: date, days: int,
+                     group: Optional[str]) -> Dict:
+    total = [0] * (days + 1)
+    grouped: Dict[int, List[int]] = {}
+    keys_by_name: Dict[Optional[str], Optional[int]] = {}
+
+    for room_name, valid_from, valid_until in rows:
+        if valid_until is None:
+            continue
+        first = 0 if valid_from is None else min(max(_days(valid_from, start), 0), days)
+        last = min(max(_days(valid_until, start) + 1, 0), days)
+        if first >= last:
+            continue
+        total[first] += 1
+        total[last] -= 1
+        if group:
+            if room_name not in keys_by_name:
+                keys_by_name[room_name] = _group_key(room_name, group)
+            key = keys_by_name[room_name]
+            if key is not None:
+                diff = grouped.setdefault(key, [0] * (days + 1))
+                diff[first] += 1
+                diff[last] -= 1
+
+    result = {'total': list(accumulate(total[:days]))}
+    if group:
+        keys = sorted(grouped)
+        result['keys'] = keys
+        result['counts'] = [list(accumulate(grouped[key][:days])) for key in keys]
+    return result
+
+
+def _days(value, start: date) -> int:
+    """Номер дня относительно начала периода (для date и datetime)"""
+    if hasattr(value, 'date'):
+        value = value.date()
+    return (value - start).days
+
+
+def period_dates(start: date, days: int) -> List[str]:
+    """Даты периода в формате ISO"""
+    return [(start + timedelta(days=offset)).isoformat() for offset in range(days)]
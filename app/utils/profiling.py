@@ -0,0 +1,204 @@
+"""
+Профилирование работающего приложения без отладчика.
+
+Выборочный профилировщик (StackSampler) с заданным интервалом снимает стеки
+потоков, обрабатывающих запросы (sys._current_frames), и возвращает их в
+свернутом формате для flame graph: "кадр;кадр;... количество". Потоки
+запросов отмечаются в начале и конце запроса (track_request), поэтому
+простаивающие потоки пулов в профиль не попадают.
+Профилировщик видит только потоки своего процесса: при нескольких рабочих
+процессах профиль относится к одному из них (маршрут /debug/profile
+возвращает его PID в заголовке X-Profile-Pid).
+
+Для отдельного запроса можно включить cProfile (RequestProfiles): файлы
+pstats пишутся в локальный каталог, старые файлы удаляются.
+"""
+
+import cProfile
+import itertools
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Метки потоков, обрабатывающих запросы {ident: "METHOD endpoint"}
+_active: Dict[int, str] = {}
+
+# Один выборочный профилировщик на процесс
+_sampling = threading.Lock()
+
+# Корень проекта - пути файлов в кадрах сокращаются относительно него
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ProfilerBusy(Exception):
+    """Профилировщик уже выполняется в этом процессе"""
+
+
+def track_request(label: str) -> None:
+    """Отметить текущий поток как обрабатывающий запрос"""
+    _active[threading.get_ident()] = label
+
+
+def untrack_request() -> None:
+    """Снять отметку запроса с текущего потока"""
+    _active.pop(threading.get_ident(), None)
+
+
+def _frame_name(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_ROOT + os.sep):
+        filename = os.path.relpath(filename, _ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Выборочный профилировщик стеков потоков"""
+
+    def __init__(self, interval: float = 0.005, all_threads: bool = False):
+        """
+        Args:
+            interval: Интервал между выборками (секунды)
+            all_threads: Снимать стеки всех потоков, а не только потоков запросов
+        """
+        self.interval = interval
+        self.all_threads = all_threads
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._names: Dict[object, str] = {}
+
+    def _stack(self, frame) -> List[str]:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            name = self._names.get(code)
+            if name is None:
+                name = self._names[code] = _frame_name(code)
+            names.append(name)
+            frame = frame.f_back
+        names.reverse()
+        return names
+
+    def sample(self) -> None:
+        """Снять одну выборку стеков"""
+        own = threading.get_ident()
+        if self.all_threads:
+            labels = {thread.ident: re.sub(r'[-_]?\d+', '', thread.name)
+                      for thread in threading.enumerate()}
+        else:
+            labels = dict(_active)
+        for ident, frame in sys._current_frames().items():
+            label = labels.get(ident)
+            if ident == own or label is None:
+                continue
+            self.stacks[';'.join([label] + self._stack(frame))] += 1
+        self.samples += 1
+
+    def run(self, seconds: float) -> 'StackSampler':
+        """
+        Снимать выборки в течение заданного времени
+
+        Raises:
+            ProfilerBusy: Если в процессе уже выполняется профилирование
+        """
+        if not _sampling.acquire(blocking=False):
+            raise ProfilerBusy('Профилирование уже выполняется')
+        try:
+            deadline = time.monotonic() + seconds
+            next_sample = time.monotonic()
+            while next_sample < deadline:
+                self.sample()
+                next_sample += self.interval
+                delay = next_sample - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # Выборка дольше интервала - пропускаем отставшие
+                    next_sample = time.monotonic()
+        finally:
+            _sampling.release()
+        return self
+
+    def collapsed(self) -> str:
+        """Стеки в свернутом формате (по убыванию количества выборок)"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiles:
+    """Каталог файлов cProfile отдельных запросов с ограничением количества"""
+
+    def __init__(self, directory: str, keep: int = 50):
+        """
+        Args:
+            directory: Каталог файлов pstats
+            keep: Количество хранимых файлов (старые удаляются)
+        """
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+
+    def profile(self, label: str, func, *args, **kwargs) -> Tuple[object, Optional[str]]:
+        """
+        Выполнить функцию под cProfile и сохранить результат
+
+        Args:
+            label: Метка файла (например, имя маршрута)
+            func: Функция
+
+        Returns:
+            (результат функции, имя файла pstats или None, если профиль не снят)
+        """
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # В потоке уже работает другой профилировщик
+            logger.warning(f"cProfile для {label} не включен: {str(e)}")
+            return func(*args, **kwargs), None
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            profiler.disable()
+        return result, self._save(profiler, label)
+
+    def _save(self, profiler: cProfile.Profile, label: str) -> Optional[str]:
+        # Имена упорядочены по времени: удаляются файлы с меньшими именами
+        now = time.time()
+        name = (f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}"
+                f"-{int(now * 1000) % 1000:03d}-{os.getpid()}-{next(self._sequence):06d}"
+                f"-{re.sub(r'[^A-Za-z0-9_.-]', '_', label)}.prof")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.directory, name))
+            self._rotate()
+        except OSError as e:
+            logger.error(f"Ошибка записи профиля {name}: {str(e)}")
+            return None
+        logger.info(f"Профиль запроса {label} записан: {name}")
+        return name
+
+    def _rotate(self) -> None:
+        with self._lock:
+            names = sorted(self.files())
+            for name in names[:max(len(names) - self.keep, 0)]:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def files(self) -> Iterator[str]:
+        """Имена файлов профилей в каталоге"""
+        try:
+            entries = os.listdir(self.directory)
+        except FileNotFoundError:
+            return iter(())
+        return (name for name in entries if name.endswith('.prof'))
@@ -0,0 +1,221 @@
+"""
+Потоковая загрузка файлов БД с адресацией по содержимому.
+Файл записывается на диск частями по мере разбора multipart-запроса,
+одновременно вычисляется его SHA-256. Готовый файл сохраняется как
+<upload_dir>/<sha256>.fdb, поэтому повторная загрузка той же БД
+использует уже существующий файл (и его пул подключений).
+"""
+
+import hashlib
+import logging
+import os
+import secrets
+import time
+from typing import IO, Optional, Tuple
+
+from flask import Request, current_app
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
+
+logger = logging.getLogger(__name__)
+
+# Расширение загружаемых файлов БД
+DB_EXTENSION = '.fdb'
+
+# Расширение незавершенных загрузок
+PART_EXTENSION = '.part'
+
+# Размер части при копировании потока (байт)
+CHUNK_SIZE = 1024 * 1024
+
+
+class HashingFile:
+    """Временный файл загрузки, вычисляющий SHA-256 при записи"""
+
+    def __init__(self, upload_dir: str, max_size: Optional[int] = None):
+        """
+        Создать временный файл в каталоге загрузок
+
+        Args:
+            upload_dir: Каталог загрузок
+            max_size: Максимальный размер файла (байт); None - без ограничения
+        """
+        os.makedirs(upload_dir, exist_ok=True)
+        self.upload_dir = upload_dir
+        self.max_size = max_size
+        self.path = os.path.join(upload_dir, secrets.token_hex(16) + PART_EXTENSION)
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file = open(self.path, 'x+b')
+
+    def write(self, data: bytes) -> int:
+        """
+        Записать часть файла
+
+        Raises:
+            RequestEntityTooLarge: Если превышен максимальный размер файла
+        """
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            self.close()
+            raise RequestEntityTooLarge(f"Размер файла превышает {self.max_size} байт")
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self) -> str:
+        """SHA-256 записанных данных"""
+        return self._hash.hexdigest()
+
+    def persist(self) -> Tuple[str, bool]:
+        """
+        Сохранить файл под именем <sha256>.fdb
+
+        Returns:
+            (путь к файлу БД, True если файл создан этой загрузкой)
+        """
+        self._file.close()
+        target = os.path.join(self.upload_dir, self.hexdigest() + DB_EXTENSION)
+        created = False
+        try:
+            # link не заменяет существующий файл: БД, уже открытая пулом,
+            # не подменяется при одновременной загрузке той же БД
+            os.link(self.path, target)
+            created = True
+        except FileExistsError:
+            pass
+        except OSError:
+            if not os.path.exists(target):
+                os.replace(self.path, target)
+                created = True
+        self._remove()
+        if created:
+            logger.info(f"Загружена БД {target} ({self.size} байт)")
+        else:
+            logger.info(f"БД {target} уже загружена, используется существующий файл")
+        return target, created
+
+    def _remove(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        """Закрыть и удалить временный файл"""
+        if not self._file.closed:
+            self._file.close()
+        self._remove()
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """
+    Запрос Flask, записывающий загружаемые файлы .fdb сразу в каталог
+    загрузок (UPLOAD_DIR) с вычислением хеша и ограничением UPLOAD_MAX_SIZE
+    """
+
+    def _get_file_stream(self, total_content_length: Optional[int], content_type: Optional[str],
+                         filename: Optional[str] = None,
+                         content_length: Optional[int] = None) -> IO[bytes]:
+        if filename and filename.endswith(DB_EXTENSION):
+            config = current_app.config
+            return HashingFile(config['UPLOAD_DIR'], config.get('UPLOAD_MAX_SIZE'))
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+def store_upload(file: FileStorage, upload_dir: str,
+                 max_size: Optional[int] = None) -> Tuple[str, bool]:
+    """
+    Сохранить загруженный файл БД в каталог загрузок по хешу содержимого
+
+    Args:
+        file: Загруженный файл
+        upload_dir: Каталог загрузок
+        max_size: Максимальный размер файла (байт)
+
+    Returns:
+        (путь к файлу БД, True если файл создан этой загрузкой)
+
+    Raises:
+        RequestEntityTooLarge: Если превышен максимальный размер файла
+    """
+    stream = file.stream
+    if not isinstance(stream, HashingFile):
+        # Файл разобран без UploadRequest - скопировать поток частями
+        hashing = HashingFile(upload_dir, max_size)
+        try:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hashing.write(chunk)
+        except Exception:
+            hashing.close()
+            raise
+        stream = hashing
+    return stream.persist()
+
+
+def save_stream(stream: IO[bytes], upload_dir: str, extension: str) -> str:
+    """
+    Сохранить поток во временный файл каталога загрузок (например, CSV для
+    фоновой обработки после завершения запроса)
+
+    Args:
+        stream: Поток данных
+        upload_dir: Каталог загрузок
+        extension: Расширение файла
+
+    Returns:
+        str: Путь к файлу (удаляется обработчиком)
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, secrets.token_hex(16) + extension)
+    try:
+        with open(path, 'xb') as file:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                file.write(chunk)
+    except Exception:
+        os.unlink(path)
+        raise
+    return path
+
+
+def cleanup_partial_uploads(upload_dir: str, max_age: float = 3600.0) -> int:
+    """
+    Удалить незавершенные загрузки, оставшиеся после сбоев
+
+    Args:
+        upload_dir: Каталог загрузок
+        max_age: Минимальный возраст удаляемого файла (секунды)
+
+    Returns:
+        int: Количество удаленных файлов
+    """
+    removed = 0
+    now = time.time()
+    try:
+        entries = list(os.scandir(upload_dir))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if not entry.name.endswith(PART_EXTENSION):
+            continue
+        try:
+            if now - entry.stat().st_mtime >= max_age:
+                os.unlink(entry.path)
+                removed += 1
+        except OSError as e:
+            logger.error(f"Ошибка при удалении {entry.path}: {str(e)}")
+    if removed:
+        logger.info(f"Удалено незавершенных загрузок: {removed}")
+    return removed
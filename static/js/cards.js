@@ -4,13 +4,147 @@
 
 let currentCardId = null;
 
+// Формат списка карт: 'json', 'columns' или 'binary'
+const CARDS_FORMAT = 'columns';
+
+const MS_PER_DAY = 86400000;
+
+/**
+ * Преобразовать количество дней от 1970-01-01 в строку YYYY-MM-DD
+ * @param {number|null} days - Смещение в днях
+ * @returns {string|null}
+ */
+function dayOffsetToISO(days) {
+    if (days === null || days === undefined) return null;
+    return new Date(days * MS_PER_DAY).toISOString().split('T')[0];
+}
+
+/**
+ * Декодировать колоночный JSON ({columns, dates, data}) в массив карт
+ * @param {object} payload - Ответ GET /cards?format=columns
+ * @returns {array}
+ */
+function decodeColumns(payload) {
+    const columns = payload.columns;
+    const dates = new Set(payload.dates || []);
+    const count = columns.length ? payload.data[columns[0]].length : 0;
+    const cards = new Array(count);
+
+    for (let i = 0; i < count; i++) {
+        const card = {};
+        for (const column of columns) {
+            const value = payload.data[column][i];
+            card[column] = dates.has(column) ? dayOffsetToISO(value) : value;
+        }
+        cards[i] = card;
+    }
+    return cards;
+}
+
+/**
+ * Декодировать двоичный формат HCT1 в массив карт
+ * @param {ArrayBuffer} buffer - Ответ GET /cards?format=binary
+ * @returns {array}
+ */
+function decodeBinaryCards(buffer) {
+    const INT32_NULL = -2147483648;
+    const STRING_NULL = 0xFFFFFFFF;
+    const view = new DataView(buffer);
+    const decoder = new TextDecoder('utf-8');
+    const bytes = new Uint8Array(buffer);
+
+    const magic = decoder.decode(bytes.subarray(0, 4));
+    if (magic !== 'HCT1') {
+        throw new Error('Неизвестный формат списка карт');
+    }
+
+    const count = view.getUint32(4, true);
+    const columnCount = view.getUint16(8, true);
+    let offset = 10;
+
+    const columns = [];
+    for (let c = 0; c < columnCount; c++) {
+        const nameLength = view.getUint8(offset);
+        const name = decoder.decode(bytes.subarray(offset + 1, offset + 1 + nameLength));
+        const type = view.getUint8(offset + 1 + nameLength);
+        columns.push({ name, type });
+        offset += nameLength + 2;
+    }
+
+    const cards = Array.from({ length: count }, () => ({}));
+    for (const { name, type } of columns) {
+        for (let i = 0; i < count; i++) {
+            let value;
+            if (type === 1 || type === 3) {
+                value = view.getInt32(offset, true);
+                offset += 4;
+                if (value === INT32_NULL) value = null;
+                else if (type === 3) value = dayOffsetToISO(value);
+            } else if (type === 2) {
+                value = view.getFloat64(offset, true);
+                offset += 8;
+                if (Number.isNaN(value)) value = null;
+            } else {
+                const length = view.getUint32(offset, true);
+                offset += 4;
+                if (length === STRING_NULL) {
+                    value = null;
+                } else {
+                    value = decoder.decode(bytes.subarray(offset, offset + length));
+                    offset += length;
+                }
+            }
+            cards[i][name] = value;
+        }
+    }
+    return cards;
+}
+
+/**
+ * Получить список карт в формате CARDS_FORMAT и декодировать его
+ * @returns {Promise<array>}
+ */
+async function fetchCards() {
+    const url = CARDS_FORMAT === 'json' ? '/cards' : `/cards?format=${CARDS_FORMAT}`;
+    const response = await fetch(url);
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    showReplicaWarning(response.headers);
+    if (CARDS_FORMAT === 'binary') {
+        return decodeBinaryCards(await response.arrayBuffer());
+    }
+    const payload = await response.json();
+    return CARDS_FORMAT === 'json' ? payload : decodeColumns(payload);
+}
+
+/**
+ * Показать предупреждение, если список прочитан из локальной копии
+ * из-за недоступности БД (заголовки X-Replica-Age и Warning)
+ * @param {Headers} headers - Заголовки ответа GET /cards
+ */
+function showReplicaWarning(headers) {
+    const warning = document.getElementById('replicaWarning');
+    if (!warning) return;
+
+    const age = headers.get('X-Replica-Age');
+    if (age === null || !headers.get('Warning')) {
+        warning.style.display = 'none';
+        return;
+    }
+    const minutes = Math.max(1, Math.round(Number(age) / 60));
+    warning.textContent = `База данных недоступна: показаны данные локальной копии ` +
+        `(обновлены ${minutes} мин назад). Изменение карт временно невозможно.`;
+    warning.style.display = 'block';
+}
+
 /**
  * Загрузить список всех карт
  */
 async function loadCards() {
     showLoading();
     try {
-        const cards = await makeRequest('/cards', 'GET');
+        const cards = await fetchCards();
         displayCards(cards);
         hideLoading();
     } catch (error) {
@@ -30,35 +164,97 @@ function displayCards(cards) {
     tbody.innerHTML = '';
 
     if (!Array.isArray(cards) || cards.length === 0) {
-        tbody.innerHTML = '<tr><td colspan="7" class="text-center text-muted">Карты не найдены</td></tr>';
+        showEmptyCards(tbody);
+        return;
+    }
+
+    const fragment = document.createDocumentFragment();
+    cards.forEach(card => fragment.appendChild(renderCardRow(card)));
+    tbody.appendChild(fragment);
+}
+
+/**
+ * Показать строку "Карты не найдены"
+ * @param {HTMLElement} tbody - Тело таблицы
+ */
+function showEmptyCards(tbody) {
+    tbody.innerHTML = '<tr id="cardsEmpty"><td colspan="7" class="text-center text-muted">Карты не найдены</td></tr>';
+}
+
+/**
+ * Создать строку таблицы для карты
+ * @param {object} card - Данные карты
+ * @returns {HTMLTableRowElement}
+ */
+function renderCardRow(card) {
+    const row = document.createElement('tr');
+    const status = card.status === 1 ? 'Активна' : 'Неактивна';
+    const statusBadge = card.status === 1 ? 'badge-active' : 'badge-inactive';
+
+    row.dataset.cardId = card.card_id;
+    row.innerHTML = `
+        <td>${card.card_id || '-'}</td>
+        <td>${card.card_number || '-'}</td>
+        <td>${card.room || '-'}</td>
+        <td>${card.valid_from || '-'}</td>
+        <td>${card.valid_until || '-'}</td>
+        <td><span class="badge ${statusBadge}">${status}</span></td>
+        <td>
+            <div class="action-buttons">
+                <button class="btn btn-sm btn-warning" onclick="showEditCardForm(${card.card_id})">
+                    Редактировать
+                </button>
+                <button class="btn btn-sm btn-danger" onclick="showDeleteConfirm(${card.card_id})">
+                    Удалить
+                </button>
+            </div>
+        </td>
+    `;
+    return row;
+}
+
+/**
+ * Обновить одну строку таблицы по событию изменения карты
+ * @param {object} event - Событие {type, card_id, card}
+ */
+function applyCardEvent(event) {
+    const tbody = document.getElementById('cardsBody');
+    if (!tbody) return;
+
+    if (event.type === 'resync') {
+        loadCards();
         return;
     }
 
-    cards.forEach(card => {
-        const row = document.createElement('tr');
-        const status = card.status === 1 ? 'Активна' : 'Неактивна';
-        const statusBadge = card.status === 1 ? 'badge-active' : 'badge-inactive';
-
-        row.innerHTML = `
-            <td>${card.card_id || '-'}</td>
-            <td>${card.card_number || '-'}</td>
-            <td>${card.room || '-'}</td>
-            <td>${card.valid_from || '-'}</td>
-            <td>${card.valid_until || '-'}</td>
-            <td><span class="badge ${statusBadge}">${status}</span></td>
-            <td>
-                <div class="action-buttons">
-                    <button class="btn btn-sm btn-warning" onclick="showEditCardForm(${card.card_id})">
-                        Редактировать
-                    </button>
-                    <button class="btn btn-sm btn-danger" onclick="showDeleteConfirm(${card.card_id})">
-                        Удалить
-                    </button>
-                </div>
-            </td>
-        `;
-        tbody.appendChild(row);
-    });
+    const existing = tbody.querySelector(`tr[data-card-id="${event.card_id}"]`);
+
+    if (event.type === 'deleted' || !event.card) {
+        if (existing) existing.remove();
+        if (!tbody.querySelector('tr[data-card-id]')) showEmptyCards(tbody);
+        return;
+    }
+
+    const row = renderCardRow(event.card);
+    if (existing) {
+        existing.replaceWith(row);
+    } else {
+        const empty = document.getElementById('cardsEmpty');
+        if (empty) empty.remove();
+        // Список отсортирован по убыванию ID - новая карта в начало
+        tbody.insertBefore(row, tbody.firstChild);
+    }
+}
+
+let cardEvents = null;
+
+/**
+ * Подписаться на поток изменений карт (Server-Sent Events)
+ */
+function subscribeCardEvents() {
+    if (!window.EventSource || cardEvents) return;
+
+    cardEvents = new EventSource('/cards/events');
+    cardEvents.onmessage = (message) => applyCardEvent(JSON.parse(message.data));
 }
 
 /**
@@ -148,7 +344,8 @@ async function saveCard() {
             // Закрыть модальное окно
             bootstrap.Modal.getInstance(document.getElementById('cardModal')).hide();
             
-            // Перезагрузить список карт
+            // Событие приходит только подписчикам того же процесса сервера -
+            // после своего изменения список перезагружается всегда
             loadCards();
         }
         hideLoading();
@@ -186,7 +383,8 @@ async function confirmDelete() {
             // Закрыть модальное окно
             bootstrap.Modal.getInstance(document.getElementById('deleteModal')).hide();
             
-            // Перезагрузить список карт
+            // Событие приходит только подписчикам того же процесса сервера -
+            // после своего изменения список перезагружается всегда
             loadCards();
         }
         hideLoading();
@@ -0,0 +1,17 @@
+"""
+Общие фикстуры тестов
+"""
+
+import pytest
+
+
+@pytest.fixture
+def login():
+    """Вход в тестовом клиенте: login(client, db_path=..., **права)"""
+    def seed(client, db_path='test.fdb', **permissions):
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['db_path'] = db_path
+            sess['permissions'] = permissions
+
+    return seed
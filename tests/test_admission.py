@@ -0,0 +1,145 @@
+"""
+Тесты для ограничения одновременных операций с БД
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from app import create_app
+from app.managers import admission
+from app.managers.admission import READ, WRITE, AdmissionController, AdmissionRejected, Limiter
+
+
+class TestLimiter:
+    """Тесты для Limiter"""
+
+    def test_within_limit(self):
+        """Тест получения слотов в пределах лимита"""
+        limiter = Limiter('test', limit=2, queue_size=0, timeout=0.1)
+        limiter.acquire()
+        limiter.acquire()
+        assert limiter.active == 2
+
+    def test_queue_full_rejects_immediately(self):
+        """Тест немедленного отказа при заполненной очереди"""
+        limiter = Limiter('test', limit=1, queue_size=0, timeout=10)
+        limiter.acquire()
+        started = time.monotonic()
+        with pytest.raises(AdmissionRejected) as error:
+            limiter.acquire()
+        assert time.monotonic() - started < 0.5
+        assert error.value.retry_after >= 1
+        assert limiter.rejected == 1
+
+    def test_timeout_rejects(self):
+        """Тест отказа по истечении времени ожидания"""
+        limiter = Limiter('test', limit=1, queue_size=5, timeout=0.05)
+        limiter.acquire()
+        with pytest.raises(AdmissionRejected):
+            limiter.acquire()
+        assert limiter.waiting == 0
+
+    def test_release_hands_slot_to_waiter(self):
+        """Тест передачи слота ожидающему"""
+        limiter = Limiter('test', limit=1, queue_size=5, timeout=2)
+        limiter.acquire()
+        threading.Timer(0.05, limiter.release).start()
+        limiter.acquire()
+        assert limiter.active == 1
+        limiter.release()
+        assert limiter.active == 0
+
+    def test_slot_context(self):
+        """Тест освобождения слота контекстным менеджером"""
+        limiter = Limiter('test', limit=1, queue_size=0, timeout=0.1)
+        with pytest.raises(ValueError):
+            with limiter.slot():
+                raise ValueError()
+        assert limiter.active == 0
+
+    def test_async_acquire(self):
+        """Тест ожидания слота в event loop"""
+        limiter = Limiter('test', limit=1, queue_size=5, timeout=2)
+        limiter.acquire()
+
+        async def scenario():
+            asyncio.get_running_loop().call_later(0.05, limiter.release)
+            await limiter.acquire_async()
+
+        asyncio.run(scenario())
+        assert limiter.active == 1
+
+    def test_async_timeout(self):
+        """Тест отказа по времени в event loop"""
+        limiter = Limiter('test', limit=1, queue_size=5, timeout=0.05)
+        limiter.acquire()
+        with pytest.raises(AdmissionRejected):
+            asyncio.run(limiter.acquire_async())
+        assert limiter.waiting == 0
+
+    def test_async_cancelled_waiter(self):
+        """Тест: отмененный ожидающий не занимает слот"""
+        limiter = Limiter('read', 1, 5, 5.0)
+        limiter.acquire()
+
+        async def scenario():
+            task = asyncio.ensure_future(limiter.acquire_async())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert limiter.waiting == 0
+
+            limiter.release()
+            assert limiter.active == 0
+            await limiter.acquire_async()
+
+        asyncio.run(scenario())
+        assert limiter.active == 1
+
+    def test_async_cancelled_after_grant(self):
+        """Тест: слот, выданный отмененному ожидающему, возвращается"""
+        limiter = Limiter('read', 1, 5, 5.0)
+        limiter.acquire()
+
+        async def scenario():
+            task = asyncio.ensure_future(limiter.acquire_async())
+            await asyncio.sleep(0.01)
+            limiter.release()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(scenario())
+        assert (limiter.active, limiter.waiting) == (0, 0)
+
+
+def test_reads_shed_writes_admitted():
+    """Тест отказа чтениям при свободных слотах записи"""
+    controller = AdmissionController('db.fdb', read_limit=1, write_limit=1,
+                                     read_queue=0, write_queue=0, timeout=0.1)
+    controller.limiter(READ).acquire()
+    with pytest.raises(AdmissionRejected):
+        controller.limiter(READ).acquire()
+    controller.limiter(WRITE).acquire()
+    assert controller.stats()[WRITE]['active'] == 1
+
+
+def test_route_returns_503_with_retry_after(tmp_path):
+    """Тест ответа 503 с Retry-After при превышении лимита чтений"""
+    app = create_app({'SESSION_TYPE': 'cookie', 'UPLOAD_DIR': str(tmp_path)})
+    db_path = str(tmp_path / 'busy.fdb')
+    admission._controllers[db_path] = AdmissionController(db_path, read_limit=0, read_queue=0)
+    try:
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['db_path'] = db_path
+            sess['flags'] = 0
+        response = client.get('/cards')
+        assert response.status_code == 503
+        assert int(response.headers['Retry-After']) >= 1
+        assert 'error' in response.get_json()
+    finally:
+        admission._controllers.pop(db_path, None)
@@ -0,0 +1,59 @@
+"""
+Тесты для фабрики приложения
+"""
+
+import os
+import subprocess
+import sys
+import pytest
+from app import create_app
+from app.managers import connection_pool
+
+
+class TestCreateApp:
+    """Тесты для create_app"""
+
+    def test_config_override(self, tmp_path):
+        """Тест переопределения конфигурации"""
+        app = create_app({'DB_POOL_SIZE': 2, 'UPLOAD_DIR': str(tmp_path), 'SESSION_TYPE': 'cookie'})
+        assert app.config['DB_POOL_SIZE'] == 2
+        assert app.config['MAX_CONTENT_LENGTH'] > app.config['UPLOAD_MAX_SIZE']
+
+    def test_apps_do_not_share_state(self, tmp_path):
+        """Тест независимых кэшей и подписок у разных приложений"""
+        first = create_app({'UPLOAD_DIR': str(tmp_path)})
+        second = create_app({'UPLOAD_DIR': str(tmp_path)})
+        assert first.extensions['card_events'] is not second.extensions['card_events']
+        assert first.extensions['card_snapshots'] is not second.extensions['card_snapshots']
+
+    def test_templates_found(self, tmp_path):
+        """Тест поиска шаблонов в корне проекта"""
+        app = create_app({'UPLOAD_DIR': str(tmp_path)})
+        response = app.test_client().get('/select-database')
+        assert response.status_code == 200
+
+    def test_fdb_imported_lazily(self):
+        """Тест отложенного импорта драйвера fdb"""
+        code = ("import sys; from app import create_app; create_app(); "
+                "print('fdb' in sys.modules)")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, '-c', code], cwd=root,
+                                capture_output=True, text=True, check=True).stdout
+        assert output.strip() == 'False'
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='требуется fork')
+def test_pools_reset_after_fork():
+    """Тест отдельных пулов в дочернем процессе"""
+    pool = connection_pool.get_pool('fork-test.fdb')
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        fresh = connection_pool.get_pool('fork-test.fdb') is not pool
+        os.write(write_fd, b'1' if fresh else b'0')
+        os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    assert os.read(read_fd, 1) == b'1'
+    assert connection_pool.get_pool('fork-test.fdb') is pool
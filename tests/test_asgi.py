@@ -0,0 +1,198 @@
+"""
+Тесты для ASGI-варианта приложения
+"""
+
+import asyncio
+import gzip
+import json
+import threading
+import pytest
+from app.asgi import create_asgi_app
+from app.managers import connection_pool
+from app.managers.card_snapshot import SharedCardSnapshot
+from app.managers.connection_pool import ConnectionPool
+from app.routes import CARD_LIST_ENCODERS
+
+DB_PATH = 'asgi-test.fdb'
+
+
+class FakeManager:
+    """DatabaseManager-заглушка"""
+
+    threads = set()
+    replica_age = None
+    degraded = False
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = object()
+
+    def end_transaction(self, commit=True):
+        pass
+
+    def disconnect(self):
+        self.connection = None
+
+    def get_all_card_rows(self, fields):
+        FakeManager.threads.add(threading.current_thread().name)
+        return [tuple(range(len(fields)))]
+
+    def get_card_rows_by_ids(self, card_ids, fields=('card_id', 'card_number')):
+        return [(card_ids[0], 100)]
+
+    def call_cardedit_procedure(self, action, card_number=None, **kwargs):
+        return {'result_code': 0, 'card_id': card_number, 'error': None}
+
+
+@pytest.fixture
+def asgi_app(tmp_path):
+    connection_pool._pools[DB_PATH] = ConnectionPool(DB_PATH, size=2, factory=FakeManager)
+    app = create_asgi_app({'SESSION_TYPE': 'memory', 'UPLOAD_DIR': str(tmp_path),
+                           'SSE_HEARTBEAT': 0.05})
+    store = app.flask_app.session_interface.store
+    store.save('viewer', {'user_id': 1, 'db_path': DB_PATH, 'flags': 0}, 3600)
+    store.save('admin', {'user_id': 2, 'db_path': DB_PATH, 'flags': 0x08}, 3600)
+    yield app
+    connection_pool._pools.pop(DB_PATH, None)
+
+
+async def call(app, method, path, sid=None, body=b'', query=b'', disconnect_after=None,
+               content_type=b'application/json', extra_headers=()):
+    """Выполнить запрос к ASGI-приложению и собрать ответ"""
+    headers = [(b'content-type', content_type), *extra_headers]
+    if sid:
+        headers.append((b'cookie', f'session={sid}'.encode()))
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query,
+             'headers': headers, 'http_version': '1.1', 'scheme': 'http'}
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        if disconnect_after is not None:
+            await asyncio.sleep(disconnect_after)
+        else:
+            await asyncio.Event().wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    status = sent[0]['status']
+    body = b''.join(m.get('body', b'') for m in sent[1:])
+    return status, dict(sent[0]['headers']), body
+
+
+class TestCardsASGI:
+    """Тесты для CardsASGI"""
+
+    def test_requires_session(self, asgi_app):
+        """Тест 401 без сессии"""
+        status, _, _ = asyncio.run(call(asgi_app, 'GET', '/cards'))
+        assert status == 401
+
+    def test_permission_denied(self, asgi_app):
+        """Тест 403 без права удаления"""
+        status, _, _ = asyncio.run(call(asgi_app, 'DELETE', '/cards/5', sid='viewer'))
+        assert status == 403
+
+    def test_list_cards_in_executor(self, asgi_app):
+        """Тест выборки карт в потоке исполнителя БД"""
+        status, headers, body = asyncio.run(
+            call(asgi_app, 'GET', '/cards', sid='viewer', query=b'fields=card_id,room')
+        )
+        assert status == 200
+        assert json.loads(body) == [{'card_id': 0, 'room': 1}]
+        assert all(name.startswith('db') for name in FakeManager.threads)
+
+    def test_list_cards_marks_replica_response(self, asgi_app, monkeypatch):
+        """Тест: ответ из копии содержит возраст данных и предупреждение (как у Flask)"""
+        monkeypatch.setattr(FakeManager, 'replica_age', 125.7)
+        monkeypatch.setattr(FakeManager, 'degraded', True)
+        status, headers, _ = asyncio.run(call(asgi_app, 'GET', '/cards', sid='viewer'))
+        assert status == 200
+        assert headers[b'x-replica-age'] == b'125'
+        assert headers[b'warning'].startswith(b'110')
+
+    def test_bad_format(self, asgi_app):
+        """Тест 400 для неизвестного формата"""
+        status, _, _ = asyncio.run(call(asgi_app, 'GET', '/cards', sid='viewer', query=b'format=xml'))
+        assert status == 400
+
+    def test_update_publishes_event(self, asgi_app):
+        """Тест рассылки события после изменения карты"""
+        subscription = asgi_app.events.subscribe(DB_PATH)
+        status, _, body = asyncio.run(
+            call(asgi_app, 'PUT', '/cards/7', sid='admin', body=b'{"room": 101}')
+        )
+        assert status == 200
+        assert json.loads(body)['card_id'] == 7
+        _, event = subscription.get(0)
+        assert event['type'] == 'created'
+        assert event['card'] == {'card_id': 7, 'card_number': 100}
+
+    def test_event_stream_until_disconnect(self, asgi_app):
+        """Тест потока событий до отключения клиента"""
+        async def scenario():
+            task = asyncio.ensure_future(
+                call(asgi_app, 'GET', '/cards/events', sid='viewer', disconnect_after=0.3)
+            )
+            await asyncio.sleep(0.1)
+            asgi_app.events.publish(DB_PATH, {'type': 'deleted', 'card_id': 3, 'card': None})
+            return await task
+
+        status, headers, body = asyncio.run(scenario())
+        assert status == 200
+        assert headers[b'content-type'].startswith(b'text/event-stream')
+        assert b'"card_id":3' in body
+        assert b': ping' in body
+        assert asgi_app.events.subscriber_count(DB_PATH) == 0
+
+    def test_other_routes_go_to_flask(self, asgi_app):
+        """Тест передачи остальных маршрутов приложению Flask"""
+        status, headers, body = asyncio.run(call(asgi_app, 'GET', '/select-database'))
+        assert status == 200
+        assert b'guardee.fdb' in body
+
+    def test_flask_route_reads_body(self, asgi_app):
+        """Тест передачи тела запроса приложению Flask"""
+        status, headers, body = asyncio.run(call(
+            asgi_app, 'POST', '/select-database', body=b'db_path=%2Fmissing.fdb',
+            content_type=b'application/x-www-form-urlencoded'
+        ))
+        assert status == 200
+        assert 'Файл не найден'.encode('utf-8') in body
+
+    def test_admission_rejected(self, asgi_app):
+        """Тест ответа 503 при превышении лимита чтений"""
+        from app.managers import admission
+        admission._controllers[DB_PATH] = admission.AdmissionController(
+            DB_PATH, read_limit=0, read_queue=0
+        )
+        try:
+            status, headers, _ = asyncio.run(call(asgi_app, 'GET', '/cards', sid='viewer'))
+        finally:
+            admission._controllers.pop(DB_PATH, None)
+        assert status == 503
+        assert int(headers[b'retry-after']) >= 1
+
+    def test_list_cards_streamed_from_snapshot(self, asgi_app, tmp_path, monkeypatch):
+        """Тест: сжатая копия тела из снимка отдается частями"""
+        class SnapshotManager:
+            def get_all_card_rows(self, fields):
+                return [(1, 100, '1.01', None, None, 0, None)]
+
+        monkeypatch.setattr(SharedCardSnapshot, '_registry', {})
+        monkeypatch.setattr(SharedCardSnapshot, 'directory', str(tmp_path / 'snapshots'))
+        SharedCardSnapshot.for_database(DB_PATH).refresh(SnapshotManager(), CARD_LIST_ENCODERS)
+        asgi_app.config['COMPRESS_MIN_SIZE'] = 0
+
+        status, headers, body = asyncio.run(call(
+            asgi_app, 'GET', '/cards', sid='viewer', extra_headers=[(b'accept-encoding', b'gzip')]
+        ))
+        assert status == 200
+        assert headers[b'content-encoding'] == b'gzip'
+        assert int(headers[b'content-length']) == len(body)
+        assert json.loads(gzip.decompress(body))[0]['card_number'] == 100
@@ -182,3 +182,62 @@ class TestAuthManager:
         # Пустая сессия означает неудачную аутентификацию
         assert AuthManager.is_authenticated(session) is False
         assert AuthManager.check_permissions(session, 'can_view') is False
+
+
+class TestPermissionBitmask:
+    """Тесты для проверки разрешений по маске FLAGS"""
+
+    def test_compile_permission(self):
+        """Тест скомпилированной проверки разрешения"""
+        can_edit = AuthManager.compile_permission('can_edit')
+
+        assert can_edit(0x02) is True
+        assert can_edit(0x08) is True  # администратор
+        assert can_edit(0x05) is False
+        assert AuthManager.compile_permission('can_view')(0) is True
+
+    def test_compile_unknown_permission(self):
+        """Тест неизвестного разрешения"""
+        with pytest.raises(ValueError):
+            AuthManager.compile_permission('can_fly')
+
+    @given(st.integers(min_value=0, max_value=0x0F))
+    @settings(max_examples=16)
+    def test_flags_round_trip(self, flags):
+        """Тест преобразования маски в словарь и обратно"""
+        permissions = AuthManager.permissions_from_flags(flags)
+        assert permissions['can_view'] is True
+        assert AuthManager.flags_from_permissions(permissions) == flags
+
+    def test_check_permissions_flags_session(self):
+        """Тест проверки разрешений по маске в сессии"""
+        session = {'user_id': 1, 'authenticated': True, 'flags': 0x01}
+
+        assert AuthManager.check_permissions(session, 'can_create') is True
+        assert AuthManager.check_permissions(session, 'can_delete') is False
+        assert AuthManager.get_user_permissions(session)['can_create'] is True
+
+    def test_require_permission(self):
+        """Тест декоратора на маршруте Flask"""
+        from flask import Flask, session
+
+        app = Flask(__name__)
+        app.secret_key = 'test'
+
+        @app.route('/delete')
+        @AuthManager.require_permission('can_delete')
+        def delete():
+            return 'ok'
+
+        client = app.test_client()
+        assert client.get('/delete').status_code == 401
+
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+            sess['flags'] = 0x03
+        assert client.get('/delete').status_code == 403
+
+        with client.session_transaction() as sess:
+            sess['flags'] = 0x08
+        assert client.get('/delete').status_code == 200
+        assert delete.__name__ == 'delete'
@@ -0,0 +1,210 @@
+"""
+Тесты для массовых операций с картами
+"""
+
+from contextlib import contextmanager
+from datetime import date
+import pytest
+from app import create_app
+from app import routes
+from app.managers import admission, circuit_breaker
+from app.managers.card_bulk import (ACTIVATE, BLOCK, RENEW, CardBulkOperation, bulk_retryable,
+                                    operation_params, parse_days, parse_target)
+from app.managers.database_manager import DatabaseManager
+from app.models.card import Card
+
+TODAY = date(2024, 3, 1)
+
+
+class TestTargets:
+    """Тесты разбора выбора карт"""
+
+    def test_room_name(self):
+        """Тест преобразования номера комнаты в имя PEOPLE.FNAME и обратно"""
+        assert Card.room_name(105) == '1.05'
+        assert Card.room_name(1512) == '15.12'
+        assert Card.room_number('15.12') == 1512
+        assert Card.room_number('0203') == 203
+
+    def test_parse_target(self):
+        """Тест выбора по комнате, этажу и списку"""
+        assert parse_target({'room': 105}) == {'room': '1.05'}
+        assert parse_target({'floor': '3'}) == {'floor': 3}
+        assert parse_target({'ids': '1,2'}) == {'card_ids': [1, 2]}
+
+    @pytest.mark.parametrize('data', [{}, {'room': 105, 'floor': 1}, {'room': 100},
+                                      {'floor': 0}, {'ids': ['x']}])
+    def test_parse_target_invalid(self, data):
+        """Тест некорректного выбора"""
+        with pytest.raises(ValueError):
+            parse_target(data)
+
+    def test_parse_days(self):
+        """Тест срока продления"""
+        assert parse_days(RENEW, {'days': '7'}) == 7
+        assert parse_days(BLOCK, {}) is None
+        with pytest.raises(ValueError):
+            parse_days(RENEW, {'days': 0})
+
+
+class TestOperationParams:
+    """Тесты параметров HOSTEL_CARDEDIT"""
+
+    def test_renew_active_card(self):
+        """Тест: действующая карта продлевается от даты окончания"""
+        params = operation_params(RENEW, (1001, '1.05', date(2024, 2, 1), date(2024, 3, 10), 'к'),
+                                  5, TODAY)
+        assert params == {'action': 1, 'room': 105, 'card_number': 1001,
+                          'valid_from': '2024-02-01', 'valid_days': 43, 'comments': 'к'}
+
+    def test_renew_expired_card(self):
+        """Тест: истекшая карта продлевается от сегодняшнего дня"""
+        params = operation_params(RENEW, (1001, '1.05', date(2024, 1, 1), date(2024, 1, 10), None),
+                                  5, TODAY)
+        assert params['valid_days'] == (date(2024, 3, 6) - date(2024, 1, 1)).days
+
+    def test_block(self):
+        """Тест блокировки: действие 3 без дат"""
+        assert operation_params(BLOCK, (1001, '2.01', None, None, None), None, TODAY) == {
+            'action': 3, 'room': 201, 'card_number': 1001}
+
+    def test_missing_room(self):
+        """Тест: карта без комнаты"""
+        with pytest.raises(ValueError):
+            operation_params(ACTIVATE, (1001, None, None, None, None), None, TODAY)
+
+    def test_renew_not_retried(self):
+        """Тест: прерванное продление не повторяется, блокировка и активация - повторяются"""
+        assert not bulk_retryable(RENEW, {'room': '1.05'}, 30)
+        assert bulk_retryable(BLOCK, {'room': '1.05'}, None)
+        assert bulk_retryable(ACTIVATE, {'floor': 1}, None)
+
+
+class FakeManager:
+    """Менеджер БД: карта 3 не найдена"""
+
+    def __init__(self):
+        self.calls = []
+        self.refreshed = []
+
+    def call_cardedit_procedure(self, **params):
+        self.calls.append(params)
+        return {'result_code': 3 if params['card_number'] == 3 else 1}
+
+    def refresh_dumps(self, card_numbers, action=0):
+        self.refreshed.append(list(card_numbers))
+        return True
+
+
+class TestCardBulkOperation:
+    """Тесты CardBulkOperation"""
+
+    def test_chunks_and_single_refresh(self):
+        """Тест: порции, ошибки по картам, одно обновление дампов"""
+        manager = FakeManager()
+        transactions = []
+
+        @contextmanager
+        def connect():
+            transactions.append(len(manager.calls))
+            yield manager
+
+        rows = [(n, '1.05', None, None, None) for n in range(1, 6)] + [(6, None, None, None, None)]
+        summary = CardBulkOperation(connect, BLOCK, chunk_size=2).run(rows)
+
+        assert {call['action'] for call in manager.calls} == {3}
+        assert (summary['processed'], summary['changed'], summary['failed']) == (6, 4, 2)
+        assert [error['card_number'] for error in summary['errors']] == [3, 6]
+        assert manager.refreshed == [[1, 2, 4, 5]]
+        # 3 порции + обновление дампов
+        assert len(transactions) == 4
+
+
+class FakeCursor:
+    def __init__(self):
+        self.queries = []
+
+    def execute(self, query, params=()):
+        self.queries.append((query, list(params)))
+
+    def fetchall(self):
+        return [(1001, '1.05', None, None, None)]
+
+
+class TestFindCardRows:
+    """Тесты выбора карт одним запросом"""
+
+    def test_floor_and_status(self, monkeypatch):
+        """Тест: этаж - STARTING WITH по имени комнаты, статус - условие ACTIVED"""
+        monkeypatch.setattr(circuit_breaker, '_breakers', {})
+        db = DatabaseManager('bulk.fdb')
+        db.connection = object()
+        db.cursor = FakeCursor()
+
+        rows = db.find_card_rows(floor=1, status=1, fields=('card_number', 'room'))
+        assert rows == [(1001, '1.05', None, None, None)]
+        query, params = db.cursor.queries[0]
+        assert 'p.FNAME STARTING WITH ?' in query
+        assert 'c.ACTIVED = ?' in query
+        assert params == ['1.', 1]
+
+
+class FakePool:
+    def __init__(self, manager):
+        self.manager = manager
+
+    def acquire(self, timeout=None):
+        return self.manager
+
+    def release(self, manager, commit=True):
+        pass
+
+
+class FakeTargetsManager:
+    def find_card_rows(self, status=None, fields=None, **target):
+        self.target = (status, target)
+        return [(1001, '1.05', None, None, None), (1002, '1.06', None, None, None)]
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(admission, '_controllers', {})
+    return create_app({'TESTING': True, 'SESSION_TYPE': 'memory', 'JOBS_SQLITE_PATH': ''})
+
+
+class TestBulkRoute:
+    """Тесты POST /cards/bulk"""
+
+    def test_dry_run(self, app, monkeypatch, login):
+        """Тест пробного запуска: количество карт без изменений"""
+        manager = FakeTargetsManager()
+        monkeypatch.setattr(routes, 'get_pool', lambda db_path: FakePool(manager))
+        client = app.test_client()
+        login(client, db_path='bulk.fdb', can_view=True, can_edit=True)
+
+        response = client.post('/cards/bulk', json={'operation': 'block', 'floor': 1,
+                                                    'dry_run': True})
+        assert response.status_code == 200
+        assert response.get_json()['count'] == 2
+        assert response.get_json()['card_numbers'] == [1001, 1002]
+        assert manager.target == (1, {'floor': 1})
+
+    def test_submits_job(self, app, login):
+        """Тест: операция выполняется фоновой задачей"""
+        submitted = []
+        app.extensions['jobs'].register('bulk', lambda job, *args: submitted.append(args))
+        client = app.test_client()
+        login(client, db_path='bulk.fdb', can_view=True, can_edit=True)
+
+        response = client.post('/cards/bulk', json={'operation': 'renew', 'room': 105, 'days': 7})
+        assert response.status_code == 202
+        assert response.headers['Location'].endswith('/jobs/' + response.get_json()['id'])
+
+    @pytest.mark.parametrize('data', [{'operation': 'delete', 'room': 105},
+                                      {'operation': 'renew', 'room': 105},
+                                      {'operation': 'block'}])
+    def test_invalid_request(self, app, data, login):
+        """Тест некорректного запроса"""
+        client = app.test_client()
+        login(client, db_path='bulk.fdb', can_view=True, can_edit=True)
+        assert client.post('/cards/bulk', json=data).status_code == 400
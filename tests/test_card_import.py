@@ -0,0 +1,185 @@
+"""
+Тесты для импорта карт из CSV
+"""
+
+import io
+import time
+from contextlib import contextmanager
+from datetime import date
+import pytest
+from app import create_app
+from app.managers import admission
+from app.managers.card_import import CardImporter, parse_row, read_csv
+
+TODAY = date(2024, 1, 1)
+
+
+def rows(text: str):
+    return list(read_csv(io.BytesIO(text.encode('utf-8'))))
+
+
+class TestReadCsv:
+    """Тесты разбора CSV"""
+
+    def test_semicolon_with_export_headers(self):
+        """Тест: заголовки выгрузки, BOM и разделитель ';'"""
+        data = rows('\ufeffНомер карты;Комната;Действует до;Лишний\n1001;0203;2024-02-01;x\n\n')
+        assert data == [(2, {'card_number': '1001', 'room': '0203', 'valid_until': '2024-02-01'})]
+
+    def test_comma_with_field_names(self):
+        """Тест: имена полей API и разделитель ','"""
+        data = rows('card_number,room,valid_days\n1001,203,7\n1002,204,3\n')
+        assert [line for line, _ in data] == [2, 3]
+        assert data[1][1]['valid_days'] == '3'
+
+    def test_missing_columns(self):
+        """Тест: нет обязательных столбцов"""
+        with pytest.raises(ValueError) as error:
+            rows('card_number;comments\n1001;x\n')
+        assert 'room' in str(error.value)
+        assert 'valid_days' in str(error.value)
+
+
+class TestParseRow:
+    """Тесты проверки строк"""
+
+    def test_valid_days(self):
+        """Тест: срок из valid_days, отдел по умолчанию"""
+        params, errors = parse_row({'card_number': '1001', 'room': '203', 'valid_days': '7'}, TODAY)
+        assert errors == {}
+        assert params['valid_from'] == '2024-01-01'
+        assert params['valid_days'] == 7
+        assert params['dep'] == 'ХОСТЕЛ'
+
+    def test_valid_until_russian_format(self):
+        """Тест: дата окончания в формате ДД.ММ.ГГГГ"""
+        params, _ = parse_row({'card_number': '1001', 'room': '203',
+                               'valid_from': '10.01.2024', 'valid_until': '20.01.2024'}, TODAY)
+        assert params['valid_from'] == '2024-01-10'
+        assert params['valid_days'] == 10
+
+    def test_errors(self):
+        """Тест: ошибки преобразования по полям"""
+        params, errors = parse_row({'card_number': 'abc', 'room': '203',
+                                    'valid_until': '2024-13-01'}, TODAY)
+        assert params is None
+        assert set(errors) == {'card_number', 'valid_until'}
+
+
+class FakeManager:
+    """Менеджер БД: номер карты 3 уже существует, 4 - занят другой комнатой"""
+
+    def __init__(self):
+        self.calls = []
+        self.refreshed = []
+
+    def call_cardedit_procedure(self, action, **params):
+        self.calls.append(params['card_number'])
+        code = {3: 1, 4: 2}.get(params['card_number'], 0)
+        return {'result_code': code}
+
+    def refresh_dumps(self, card_numbers, action=0):
+        self.refreshed.append(list(card_numbers))
+        return True
+
+
+class TestCardImporter:
+    """Тесты CardImporter"""
+
+    def test_chunks_results_and_single_refresh(self):
+        """Тест: порции, коды результата, одно обновление дампов"""
+        manager = FakeManager()
+        batches = []
+        progress = []
+
+        @contextmanager
+        def connect():
+            batches.append(len(manager.calls))
+            yield manager
+
+        data = [(n + 1, {'card_number': str(n), 'room': '203', 'valid_days': '1'})
+                for n in range(1, 6)]
+        data.append((7, {'card_number': 'x', 'room': '203', 'valid_days': '1'}))
+        summary = CardImporter(connect, 2, lambda processed, _: progress.append(processed)).run(data)
+
+        assert progress == [2, 4, 6]
+        assert summary['rows'] == 6
+        assert (summary['added'], summary['updated'], summary['failed']) == (3, 1, 2)
+        assert [error['line'] for error in summary['errors']] == [5, 7]
+        assert manager.refreshed == [[1, 2, 3, 5]]
+        assert summary['dumps_refreshed'] is True
+        # 3 порции + обновление дампов
+        assert len(batches) == 4
+
+    def test_cancel_between_chunks(self):
+        """Тест: отмена останавливает импорт после порции, дампы загруженных карт обновляются"""
+        manager = FakeManager()
+
+        @contextmanager
+        def connect():
+            yield manager
+
+        data = [(n + 1, {'card_number': str(n), 'room': '203', 'valid_days': '1'})
+                for n in range(1, 6)]
+        summary = CardImporter(connect, 2, cancelled=lambda: len(manager.calls) >= 2).run(data)
+        assert summary['cancelled'] is True
+        assert summary['rows'] == 2
+        assert manager.refreshed == [[1, 2]]
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setattr(admission, '_controllers', {})
+    return create_app({'TESTING': True, 'SESSION_TYPE': 'memory', 'UPLOAD_DIR': str(tmp_path),
+                       'JOBS_SQLITE_PATH': ''})
+
+
+class TestImportRoute:
+    """Тесты POST /cards/import"""
+
+    def test_import_job(self, app, login):
+        """Тест: задача запускается, состояние доступно по Location"""
+        calls = []
+
+        def fake_job(job, path, chunk_size, acquire_timeout):
+            with open(path, 'rb') as file:
+                calls.append(len(list(read_csv(file))))
+            job.progress(calls[0])
+            return {'rows': calls[0]}
+
+        app.extensions['jobs'].register('import', fake_job)
+        client = app.test_client()
+        login(client, db_path='import.fdb', can_view=True, can_create=True)
+
+        response = client.post('/cards/import', data=b'card_number;room;valid_days\n1;2;3\n',
+                               content_type='text/csv')
+        assert response.status_code == 202
+        location = response.headers['Location']
+
+        for _ in range(100):
+            status = client.get(location).get_json()
+            if status['status'] == 'done':
+                break
+            time.sleep(0.01)
+        assert status['result'] == {'rows': 1}
+        assert status['processed'] == 1
+
+    def test_invalid_header(self, app, tmp_path, login):
+        """Тест: файл без обязательных столбцов отклоняется и удаляется"""
+        client = app.test_client()
+        login(client, db_path='import.fdb', can_view=True, can_create=True)
+        response = client.post('/cards/import', data=b'foo;bar\n1;2\n', content_type='text/csv')
+        assert response.status_code == 400
+        assert list(tmp_path.iterdir()) == []
+
+    def test_requires_permission(self, app, login):
+        """Тест: импорт без права создания"""
+        client = app.test_client()
+        login(client, db_path='import.fdb', can_view=True)
+        assert client.post('/cards/import', data=b'', content_type='text/csv').status_code == 403
+
+    def test_unknown_job(self, app, login):
+        """Тест: неизвестная задача"""
+        client = app.test_client()
+        login(client, db_path='import.fdb', can_view=True)
+        assert client.get('/cards/import/unknown').status_code == 404
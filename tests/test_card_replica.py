@@ -0,0 +1,226 @@
+"""
+Тесты для локальной копии карт
+"""
+
+from contextlib import contextmanager
+from datetime import date, datetime
+import pytest
+from app import create_app
+from app import routes
+from app.managers import admission, circuit_breaker
+from app.managers.card_replica import ALWAYS, CardReplica, ReplicaSynchronizer
+from app.managers.circuit_breaker import DatabaseUnavailable
+from app.managers.database_manager import CARD_FIELDS, DatabaseManager
+from app.managers.report_cache import ReportCache
+
+
+class FakeFirebird:
+    """Строки CARDS и PEOPLE (как DatabaseManager.iter_replica_*)"""
+
+    def __init__(self):
+        self.people = {1: '1.05', 2: '2.01'}
+        self.cards = {
+            10: (1001, 1, date(2024, 1, 1), datetime(2024, 6, 1, 12, 0), 1, 'к'),
+            11: (1002, 2, None, None, 0, None),
+        }
+
+    def iter_replica_cards(self, after_id=0, card_numbers=None, batch_size=1000):
+        rows = [(card_id,) + row for card_id, row in sorted(self.cards.items())
+                if (card_numbers is None and card_id > after_id)
+                or (card_numbers is not None and row[0] in card_numbers)]
+        return iter([rows[:1], rows[1:]] if len(rows) > 1 else [rows] if rows else [])
+
+    def iter_replica_people(self, after_id=0, people_ids=None, batch_size=1000):
+        rows = [(people_id, room) for people_id, room in sorted(self.people.items())
+                if (people_ids is None and people_id > after_id)
+                or (people_ids is not None and people_id in people_ids)]
+        return iter([rows] if rows else [])
+
+
+@pytest.fixture
+def replica(tmp_path):
+    return CardReplica(str(tmp_path / 'cards.sqlite3'), 'replica.fdb')
+
+
+class TestCardReplica:
+    """Тесты CardReplica"""
+
+    def test_full_sync_rows_like_firebird(self, replica):
+        """Тест: строки копии совпадают со строками Firebird (даты - date/datetime)"""
+        assert replica.age() is None
+        summary = replica.sync(FakeFirebird(), full=True)
+
+        assert (summary['cards'], summary['people']) == (2, 2)
+        assert replica.age() >= 0
+        assert replica.get_all_card_rows(CARD_FIELDS) == [
+            (11, 1002, '2.01', None, None, 0, None),
+            (10, 1001, '1.05', date(2024, 1, 1), datetime(2024, 6, 1, 12, 0), 1, 'к'),
+        ]
+        assert replica.get_card_rows_by_ids([10, 99, 11], ('card_number',)) == [(1001,), (1002,)]
+        assert replica.get_card_by_number(1001)['valid_from'] == '2024-01-01'
+
+    def test_incremental_sync(self, replica):
+        """Тест: новые карты по CARDSID, измененные и удаленные - по журналу"""
+        firebird = FakeFirebird()
+        replica.sync(firebird, full=True)
+
+        firebird.cards[12] = (1003, 1, None, None, 1, None)
+        firebird.cards[10] = (1001, 1, date(2024, 1, 1), None, 0, 'заблокирована')
+        del firebird.cards[11]
+        replica.record_changes([1001, 1002])
+        summary = replica.sync(firebird)
+
+        assert summary['changes'] == 2
+        rows = replica.get_all_card_rows(('card_id', 'status', 'comments'))
+        assert rows == [(12, 1, None), (10, 0, 'заблокирована')]
+        assert replica.status()['pending_changes'] == 0
+
+    def test_full_sync_removes_missing(self, replica):
+        """Тест: полная синхронизация удаляет карты, которых нет в Firebird"""
+        firebird = FakeFirebird()
+        replica.sync(firebird, full=True)
+        del firebird.cards[10]
+        replica.sync(firebird, full=True)
+        assert replica.get_all_card_rows(('card_id',)) == [(11,)]
+
+    def test_failed_sync_keeps_data(self, replica):
+        """Тест: ошибка чтения из Firebird не меняет копию и записывается в состояние"""
+        replica.sync(FakeFirebird(), full=True)
+
+        @contextmanager
+        def connect(db_path):
+            raise DatabaseUnavailable('нет подключения')
+            yield
+
+        assert ReplicaSynchronizer(connect).sync_replica(replica) is None
+        assert len(replica.get_all_card_rows(('card_id',))) == 2
+        assert replica.status()['last_error'] == 'нет подключения'
+
+    def test_lease_shared_between_processes(self, replica):
+        """Тест: синхронизирует один владелец аренды"""
+        other = CardReplica(replica.path, replica.db_path)
+        assert replica.claim('a', 60)
+        assert replica.claim('a', 60)
+        assert not other.claim('b', 60)
+        replica.claim('a', -1)
+        assert other.claim('b', 60)
+
+
+class FakeCursor:
+    def __init__(self):
+        self.queries = []
+
+    def execute(self, query, params=()):
+        self.queries.append(query)
+
+    def fetchall(self):
+        return []
+
+    def callproc(self, name, params):
+        pass
+
+    def fetchone(self):
+        return (1, 2, 10, 1, 1, None, None)
+
+
+class FakeConnection:
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(circuit_breaker, '_breakers', {})
+    monkeypatch.setattr(CardReplica, '_registry', {})
+    monkeypatch.setattr(CardReplica, 'directory', str(tmp_path))
+    db = DatabaseManager('replica.fdb')
+    db.replica.sync(FakeFirebird(), full=True)
+    return db
+
+
+class TestDatabaseManagerReplica:
+    """Тесты чтения DatabaseManager из копии"""
+
+    def test_fallback_when_unavailable(self, db, monkeypatch):
+        """Тест: при недоступности БД список читается из копии с признаком деградации"""
+        def unavailable(operation, kind=None):
+            raise DatabaseUnavailable('нет подключения')
+
+        monkeypatch.setattr(db, '_read', unavailable)
+        assert len(db.get_all_card_rows()) == 2
+        assert db.degraded and db.replica_age is not None
+
+        db.end_transaction()
+        assert (db.degraded, db.replica_age) == (False, None)
+
+    def test_unavailable_without_sync(self, tmp_path, monkeypatch):
+        """Тест: несинхронизированная копия не используется"""
+        monkeypatch.setattr(circuit_breaker, '_breakers', {})
+        monkeypatch.setattr(CardReplica, '_registry', {})
+        monkeypatch.setattr(CardReplica, 'directory', str(tmp_path))
+        db = DatabaseManager('empty.fdb')
+        db.breaker.state = circuit_breaker.OPEN
+        db.breaker.opened = float('inf')
+        with pytest.raises(DatabaseUnavailable):
+            db.get_all_card_rows()
+
+    def test_always_mode_reads_replica(self, db, monkeypatch):
+        """Тест: в режиме always Firebird не читается, кроме карт после изменений"""
+        monkeypatch.setattr(DatabaseManager, 'replica_mode', ALWAYS)
+        db.connection = FakeConnection()
+        db.cursor = FakeCursor()
+        assert db.get_card_rows_by_ids([10], ('card_number',)) == [(1001,)]
+        assert not db.degraded and not db.cursor.queries
+
+        db._dirty = True
+        db.get_card_rows_by_ids([10], ('card_number',))
+        assert len(db.cursor.queries) == 1
+
+    def test_committed_changes_journaled(self, db):
+        """Тест: измененные карты попадают в журнал копии только при подтверждении"""
+        db.connection = FakeConnection()
+        db.cursor = FakeCursor()
+        db.call_cardedit_procedure(action=3, room=105, card_number=1001)
+        db.end_transaction(commit=False)
+        assert db.replica.status()['pending_changes'] == 0
+
+        db.call_cardedit_procedure(action=3, room=105, card_number=1001)
+        db.end_transaction(commit=True)
+        assert db.replica.status()['pending_changes'] == 1
+
+
+class FakeManager:
+    replica_age = 125.7
+    degraded = True
+
+    def get_all_card_rows(self, fields):
+        return [(10, 1001, '1.05', None, None, 1, None)]
+
+
+class FakePool:
+    def acquire(self, timeout=None):
+        return FakeManager()
+
+    def release(self, manager, commit=True):
+        pass
+
+
+def test_get_cards_marks_replica_response(monkeypatch):
+    """Тест: ответ из копии содержит возраст данных и предупреждение"""
+    monkeypatch.setattr(admission, '_controllers', {})
+    monkeypatch.setattr(ReportCache, '_registry', {})
+    app = create_app({'TESTING': True, 'SESSION_TYPE': 'memory', 'JOBS_SQLITE_PATH': ''})
+    monkeypatch.setattr(routes, 'get_pool', lambda db_path: FakePool())
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['db_path'] = 'replica.fdb'
+        sess['permissions'] = {'can_view': True}
+
+    response = client.get('/cards')
+    assert response.status_code == 200
+    assert response.headers['X-Replica-Age'] == '125'
+    assert response.headers['Warning'].startswith('110')
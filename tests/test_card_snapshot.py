@@ -0,0 +1,174 @@
+"""
+Тесты для общего снимка списка карт
+"""
+
+from contextlib import nullcontext
+import gzip
+import json
+from datetime import date, datetime
+import os
+import pytest
+from app import create_app
+from app import routes
+from app.managers import admission, card_snapshot, circuit_breaker
+from app.managers.card_snapshot import (MappedSnapshot, SharedCardSnapshot, SnapshotBody,
+                                        SnapshotRefresher)
+from app.managers.database_manager import CARD_FIELDS, DatabaseManager
+from app.managers.report_cache import ReportCache
+from app.routes import CARD_LIST_ENCODERS
+from app.utils import compression
+
+ROWS = [
+    (12, 1003, '1.05', date(2024, 1, 1), datetime(2024, 6, 1, 12, 30), 1, 'к'),
+    (11, 1001, '2.01', None, None, 0, None),
+    (10, 1002, '1.05', date(2023, 5, 1), date(2023, 12, 31), None, 'заблокирована'),
+]
+
+
+class FakeManager:
+    def __init__(self, rows=ROWS):
+        self.rows = rows
+        self.reads = 0
+
+    def get_all_card_rows(self, fields):
+        self.reads += 1
+        return list(self.rows)
+
+
+@pytest.fixture
+def shared(tmp_path, monkeypatch):
+    monkeypatch.setattr(SharedCardSnapshot, '_registry', {})
+    monkeypatch.setattr(SharedCardSnapshot, 'directory', str(tmp_path))
+    monkeypatch.setattr(SharedCardSnapshot, 'max_age', 30.0)
+    snapshot = SharedCardSnapshot.for_database('snapshot.fdb')
+    snapshot.refresh(FakeManager(), CARD_LIST_ENCODERS)
+    return snapshot
+
+
+class TestSharedCardSnapshot:
+    """Тесты SharedCardSnapshot"""
+
+    def test_rows_like_database(self, shared):
+        """Тест: строки снимка совпадают со строками БД (в том числе date/datetime и пустые)"""
+        mapped = shared.current()
+        assert len(mapped) == 3
+        assert mapped.rows() == ROWS
+        assert mapped.rows(('comments', 'card_id')) == [('к', 12), (None, 11), ('заблокирована', 10)]
+
+    def test_find_by_card_number(self, shared):
+        """Тест: поиск карты по номеру"""
+        mapped = shared.current()
+        assert mapped.find(1002) == ROWS[2]
+        assert mapped.find(1001, ('card_id',)) == (11,)
+        assert mapped.find(999) is None
+        assert mapped.find(2000) is None
+
+    def test_bodies_match_encoders(self, shared):
+        """Тест: тела полного списка совпадают с кодированием строк"""
+        mapped = shared.current()
+        for fmt, encoder in CARD_LIST_ENCODERS.items():
+            body = SnapshotBody(mapped, fmt)
+            assert b''.join(body.stream()) == encoder(ROWS, CARD_FIELDS)
+            assert body.size == len(body.variant())
+        assert bytes(mapped.body('json', 'gzip'))
+
+    def test_body_streamed_in_chunks(self, shared, monkeypatch):
+        """Тест: тело отдается частями из mmap"""
+        monkeypatch.setattr(card_snapshot, 'STREAM_CHUNK_SIZE', 16)
+        body = SnapshotBody(shared.current(), 'json')
+        chunks = list(body.stream('gzip'))
+        assert all(len(chunk) <= 16 for chunk in chunks)
+        assert b''.join(chunks) == bytes(body.variant('gzip'))
+
+    def test_replaced_file_remapped(self, shared):
+        """Тест: после замены файла читатели видят новый снимок, прежний остается читаемым"""
+        old = shared.current()
+        shared.refresh(FakeManager(ROWS[:1]), CARD_LIST_ENCODERS)
+        assert len(shared.current()) == 1
+        assert old.rows() == ROWS
+
+        reader = MappedSnapshot(shared.path)
+        assert reader.rows() == ROWS[:1]
+
+    def test_stale_after_commit(self, shared):
+        """Тест: после отметки изменений снимок не отдается до обновления"""
+        assert not shared.refresh_due(60)
+        shared.mark_stale()
+        assert shared.current() is None
+        assert shared.refresh_due(60)
+
+        refresher = SnapshotRefresher(lambda db_path: nullcontext(FakeManager()),
+                                      CARD_LIST_ENCODERS, interval=60)
+        assert refresher.refresh_snapshot(shared) == 3
+        assert shared.current() is not None
+
+    def test_expired(self, shared, monkeypatch):
+        """Тест: снимок старше max_age не отдается"""
+        monkeypatch.setattr(SharedCardSnapshot, 'max_age', -1)
+        assert shared.mapped() is not None
+        assert shared.current() is None
+
+    def test_single_refresher_per_host(self, shared):
+        """Тест: снимок обновляет процесс, удерживающий блокировку"""
+        other = SharedCardSnapshot(shared.path, shared.db_path)
+        assert shared.try_lock()
+        if os.name == 'posix':
+            assert not other.try_lock()
+
+
+def test_database_manager_reads_snapshot(shared, monkeypatch):
+    """Тест: карта по номеру читается из снимка, подтвержденная запись отмечает его устаревшим"""
+    monkeypatch.setattr(circuit_breaker, '_breakers', {})
+    db = DatabaseManager('snapshot.fdb')
+    assert db.get_card_by_number(1003)['valid_until'] == '2024-06-01T12:30:00'
+
+    db._dirty = True
+    db._committed()
+    assert shared.current() is None
+
+
+class FailingPool:
+    def acquire(self, timeout=None):
+        return FailingManager()
+
+    def release(self, manager, commit=True):
+        pass
+
+
+class FailingManager:
+    replica_age = None
+    degraded = False
+
+    def get_all_card_rows(self, fields):
+        raise AssertionError('список должен читаться из снимка')
+
+
+def test_get_cards_served_from_snapshot(shared, monkeypatch):
+    """Тест: GET /cards отдает тело из снимка без чтения БД"""
+    monkeypatch.setattr(admission, '_controllers', {})
+    monkeypatch.setattr(ReportCache, '_registry', {})
+    app = create_app({'TESTING': True, 'SESSION_TYPE': 'memory', 'JOBS_SQLITE_PATH': '',
+                      'CARD_SNAPSHOT_DIR': SharedCardSnapshot.directory,
+                      'CARD_SNAPSHOT_INTERVAL': 3600, 'COMPRESS_MIN_SIZE': 0})
+    monkeypatch.setattr(routes, 'get_pool', lambda db_path: FailingPool())
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['db_path'] = 'snapshot.fdb'
+        sess['permissions'] = {'can_view': True}
+
+    response = client.get('/cards')
+    assert response.status_code == 200
+    assert [card['card_id'] for card in response.get_json()] == [12, 11, 10]
+
+    response = client.get('/cards?fields=card_number')
+    assert response.get_json() == [{'card_number': 1003}, {'card_number': 1001},
+                                   {'card_number': 1002}]
+
+    # Сохраненная сжатая копия отдается частями, без повторного сжатия
+    monkeypatch.setattr(compression, 'compress', None)
+    response = client.get('/cards', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert int(response.headers['Content-Length']) == len(response.get_data())
+    assert [card['card_id'] for card in json.loads(gzip.decompress(response.get_data()))] == \
+        [12, 11, 10]
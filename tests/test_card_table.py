@@ -0,0 +1,130 @@
+"""
+Тесты для колоночного представления карт и компактных форматов
+"""
+
+import json
+import math
+import struct
+import pytest
+from datetime import date
+from hypothesis import given, strategies as st, settings
+from app.managers.database_manager import CARD_FIELDS
+from app.models.card_table import CardTable
+from app.utils.binary_encoder import (
+    MAGIC, TYPE_DATE, TYPE_FLOAT64, TYPE_INT32, INT32_NULL, STRING_NULL, encode_table
+)
+from app.utils.json_encoder import encode_columns, encode_rows
+
+
+def decode_table(data: bytes):
+    """Декодировать формат HCT1 (эталонная реализация для тестов)"""
+    assert data[:4] == MAGIC
+    count, column_count = struct.unpack_from('<IH', data, 4)
+    offset = 10
+    columns = []
+    for _ in range(column_count):
+        length = data[offset]
+        name = data[offset + 1:offset + 1 + length].decode('utf-8')
+        columns.append((name, data[offset + 1 + length]))
+        offset += length + 2
+
+    result = {}
+    for name, column_type in columns:
+        values = []
+        for _ in range(count):
+            if column_type in (TYPE_INT32, TYPE_DATE):
+                value, = struct.unpack_from('<i', data, offset)
+                offset += 4
+                if value == INT32_NULL:
+                    value = None
+                elif column_type == TYPE_DATE:
+                    value = CardTable.offset_to_date(value)
+            elif column_type == TYPE_FLOAT64:
+                value, = struct.unpack_from('<d', data, offset)
+                offset += 8
+                value = None if math.isnan(value) else value
+            else:
+                length, = struct.unpack_from('<I', data, offset)
+                offset += 4
+                if length == STRING_NULL:
+                    value = None
+                else:
+                    value = data[offset:offset + length].decode('utf-8')
+                    offset += length
+            values.append(value)
+        result[name] = values
+    assert offset == len(data)
+    return result
+
+
+@pytest.fixture
+def rows():
+    """Строки выборки карт"""
+    return [
+        (2, 4000000001, 'Петров', date(2025, 1, 28), date(2025, 1, 31), 1, None),
+        (1, 1234567, None, date(1970, 1, 1), None, 0, 'Тест'),
+    ]
+
+
+class TestCardTable:
+    """Тесты для CardTable"""
+
+    def test_from_rows(self, rows):
+        """Тест построения столбцов из строк"""
+        table = CardTable.from_rows(rows, CARD_FIELDS)
+
+        assert len(table) == 2
+        assert table.columns['card_id'] == [2, 1]
+        assert table.is_date_column('valid_from')
+        assert not table.is_date_column('room')
+
+    def test_from_empty_rows(self):
+        """Тест пустой таблицы"""
+        table = CardTable.from_rows([], CARD_FIELDS)
+        assert len(table) == 0
+        assert table.columns['comments'] == []
+
+    def test_columns_json(self, rows):
+        """Тест колоночного JSON с датами в виде смещений"""
+        payload = json.loads(encode_columns(rows, CARD_FIELDS))
+
+        assert payload['columns'] == list(CARD_FIELDS)
+        assert payload['epoch'] == '1970-01-01'
+        assert set(payload['dates']) == {'valid_from', 'valid_until'}
+        assert payload['data']['valid_from'] == [date(2025, 1, 28).toordinal() - date(1970, 1, 1).toordinal(), 0]
+        assert payload['data']['valid_until'][1] is None
+
+    @given(st.integers(min_value=-100000, max_value=100000))
+    @settings(max_examples=50)
+    def test_offset_round_trip(self, days):
+        """Тест обратного преобразования смещения в дату"""
+        value = CardTable.offset_to_date(days)
+        table = CardTable(('d',), {'d': [value]})
+        assert table.day_offsets('d') == [days]
+
+
+class TestBinaryEncoder:
+    """Тесты для двоичного формата HCT1"""
+
+    def test_round_trip(self, rows):
+        """Тест кодирования и декодирования таблицы"""
+        decoded = decode_table(encode_table(CardTable.from_rows(rows, CARD_FIELDS)))
+
+        assert decoded['card_id'] == [2, 1]
+        assert decoded['card_number'] == [4000000001, 1234567]
+        assert decoded['room'] == ['Петров', None]
+        assert decoded['valid_from'] == [date(2025, 1, 28), date(1970, 1, 1)]
+        assert decoded['valid_until'] == [date(2025, 1, 31), None]
+        assert decoded['comments'] == [None, 'Тест']
+
+    def test_empty_table(self):
+        """Тест кодирования пустой таблицы"""
+        decoded = decode_table(encode_table(CardTable.from_rows([], CARD_FIELDS)))
+        assert decoded['card_id'] == []
+
+    def test_smaller_than_json(self, rows):
+        """Тест компактности колоночных форматов"""
+        many = rows * 500
+        table = CardTable.from_rows(many, CARD_FIELDS)
+        assert len(encode_columns(many, CARD_FIELDS)) < len(encode_rows(many, CARD_FIELDS)) * 0.7
+        assert len(encode_table(table)) < len(encode_rows(many, CARD_FIELDS)) * 0.7
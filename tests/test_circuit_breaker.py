@@ -0,0 +1,263 @@
+"""
+Тесты для классификации ошибок fdb, повтора чтений и размыкателя
+"""
+
+import threading
+import time
+import pytest
+from app.managers import circuit_breaker, database_manager
+from app.managers.circuit_breaker import CLOSED, OPEN, CircuitBreaker, DatabaseUnavailable
+from app.managers.database_manager import DatabaseManager
+from app.utils.db_errors import (CONNECTION, FATAL, PERMISSION, TRANSIENT, ISC_DEADLOCK,
+                                 ISC_NET_READ_ERR, ISC_NO_PRIV, classify_error, is_retryable)
+
+
+class FakeFdbError(Exception):
+    """Ошибка в формате fdb: (сообщение, SQLCODE, код GDS)"""
+
+    def __init__(self, sqlcode, gds_code):
+        super().__init__(f'- SQLCODE: {sqlcode}', sqlcode, gds_code)
+
+
+def lost_connection():
+    return FakeFdbError(-902, ISC_NET_READ_ERR)
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+
+    def execute(self, query, params=()):
+        if self.server.down:
+            raise lost_connection()
+        self.server.queries += 1
+
+    def fetchall(self):
+        return [(1, 100)]
+
+    def fetchone(self):
+        return (1, 100)
+
+    def callproc(self, name, params):
+        if self.server.down:
+            raise lost_connection()
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self):
+        return FakeCursor(self.server)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeServer:
+    """Сервер Firebird, который можно остановить и запустить"""
+
+    def __init__(self):
+        self.down = False
+        self.connects = 0
+        self.queries = 0
+
+    def connect(self, **params):
+        self.connects += 1
+        if self.down:
+            raise FakeFdbError(-902, ISC_NET_READ_ERR)
+        return FakeConnection(self)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(database_manager, 'fdb', server)
+    monkeypatch.setattr(DatabaseManager, 'retry_backoff', 0)
+    monkeypatch.setattr(circuit_breaker, 'default_settings',
+                        {'failure_threshold': 3, 'probe_interval': 0.02})
+    circuit_breaker._breakers.clear()
+    yield server
+    for breaker in circuit_breaker._breakers.values():
+        breaker.stop()
+    circuit_breaker._breakers.clear()
+
+
+class TestClassifyError:
+    """Тесты классификации ошибок"""
+
+    def test_connection_codes(self):
+        """Тест: потеря подключения - повторяемая ошибка"""
+        assert classify_error(lost_connection()) == CONNECTION
+        assert is_retryable(lost_connection())
+
+    def test_deadlock_is_transient(self):
+        """Тест: взаимоблокировка - повторяемая ошибка"""
+        assert classify_error(FakeFdbError(-913, ISC_DEADLOCK)) == TRANSIENT
+
+    def test_permission(self):
+        """Тест: нет прав - не повторяется"""
+        error = FakeFdbError(-551, ISC_NO_PRIV)
+        assert classify_error(error) == PERMISSION
+        assert not is_retryable(error)
+
+    def test_unknown_code_and_plain_exception_are_fatal(self):
+        """Тест: синтаксическая ошибка и исключения без кодов - фатальные"""
+        assert classify_error(FakeFdbError(-104, 335544569)) == FATAL
+        assert classify_error(Exception('Connection refused')) == FATAL
+        assert classify_error(ConnectionResetError()) == CONNECTION
+
+
+class TestCircuitBreaker:
+    """Тесты для CircuitBreaker"""
+
+    def test_opens_after_threshold(self):
+        """Тест открытия после порога ошибок и быстрого отказа"""
+        breaker = CircuitBreaker('test', probe=lambda: 1 / 0, failure_threshold=2,
+                                 probe_interval=10)
+        breaker.record_failure()
+        breaker.check()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        with pytest.raises(DatabaseUnavailable) as error:
+            breaker.check()
+        assert error.value.retry_after == 10
+        breaker.stop()
+
+    def test_success_resets_failures(self):
+        """Тест сброса счетчика ошибок успешной операцией"""
+        breaker = CircuitBreaker('test', probe=lambda: None, failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+    def test_background_probe_closes(self):
+        """Тест закрытия фоновой проверкой после восстановления"""
+        available = threading.Event()
+
+        def probe():
+            if not available.is_set():
+                raise ConnectionError()
+
+        breaker = CircuitBreaker('test', probe=probe, failure_threshold=1,
+                                 probe_interval=0.01, max_probe_interval=0.05)
+        breaker.record_failure()
+        time.sleep(0.05)
+        assert breaker.state == OPEN
+        available.set()
+        deadline = time.monotonic() + 2
+        while breaker.state == OPEN and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert breaker.state == CLOSED
+
+
+class TestDatabaseManagerRecovery:
+    """Тесты переподключения DatabaseManager"""
+
+    def test_read_reconnects_after_dropped_connection(self, server):
+        """Тест: чтение на разорванном подключении повторяется после переподключения"""
+        db = DatabaseManager('recover.fdb')
+        assert db.get_all_card_rows(('card_id', 'card_number')) == [(1, 100)]
+
+        # Сервер перезапущен: старое подключение недействительно
+        dead = db.connection
+        dead.server = FakeServer()
+        dead.server.down = True
+        db.cursor.server = dead.server
+
+        assert db.get_all_card_rows(('card_id', 'card_number')) == [(1, 100)]
+        assert db.connection is not dead
+        assert server.connects == 2
+
+    def test_write_not_retried(self, server):
+        """Тест: запись не повторяется, клиент получает DatabaseUnavailable"""
+        db = DatabaseManager('write.fdb')
+        db.connect()
+        server.down = True
+        with pytest.raises(DatabaseUnavailable):
+            db.call_cardedit_procedure(1, room=101, card_number=5, valid_days=1)
+        assert db.connection is None
+
+    def test_read_after_uncommitted_write_not_retried(self, server):
+        """Тест: чтение после неподтвержденной записи не повторяется"""
+        db = DatabaseManager('dirty.fdb')
+        db.call_cardedit_procedure(1, room=101, card_number=5, valid_days=1)
+        server.down = True
+        connects = server.connects
+        with pytest.raises(DatabaseUnavailable):
+            db.get_all_card_rows()
+        assert server.connects == connects
+
+    def test_breaker_fails_fast_and_recovers(self, server):
+        """Тест: при недоступном сервере отказ без подключения, восстановление за секунды"""
+        db = DatabaseManager('down.fdb')
+        server.down = True
+        with pytest.raises(DatabaseUnavailable):
+            db.get_all_card_rows()
+        assert db.breaker.state == OPEN
+
+        connects = server.connects
+        with pytest.raises(DatabaseUnavailable):
+            db.get_card_by_number(1)
+        assert server.connects - connects <= 1  # только фоновые проверки
+
+        server.down = False
+        deadline = time.monotonic() + 2
+        while db.breaker.state == OPEN and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert db.get_all_card_rows(('card_id', 'card_number')) == [(1, 100)]
+
+
+class UnavailableManager:
+    """Менеджер БД при открытом размыкателе"""
+
+    replica_age = None
+    degraded = False
+
+    def get_all_card_rows(self, fields):
+        raise DatabaseUnavailable('размыкатель открыт', retry_after=7)
+
+    def call_cardedit_procedure(self, **params):
+        raise DatabaseUnavailable('размыкатель открыт', retry_after=7)
+
+
+class UnavailablePool:
+    def acquire(self, timeout=None):
+        return UnavailableManager()
+
+    def release(self, manager, commit=True):
+        pass
+
+
+@pytest.mark.parametrize('method, path', [
+    ('get', '/cards'),
+    ('get', '/cards/1001'),
+    ('delete', '/cards/1001'),
+])
+def test_routes_return_503_when_unavailable(method, path, monkeypatch):
+    """Тест: недоступность БД на чтении и удалении - 503 с Retry-After, а не 500"""
+    from app import create_app, routes
+    from app.managers import admission
+
+    monkeypatch.setattr(admission, '_controllers', {})
+    app = create_app({'TESTING': True, 'SESSION_TYPE': 'memory', 'JOBS_SQLITE_PATH': ''})
+    monkeypatch.setattr(routes, 'get_pool', lambda db_path: UnavailablePool())
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['db_path'] = 'unavailable.fdb'
+        sess['permissions'] = {'can_view': True, 'can_delete': True}
+
+    response = getattr(client, method)(path)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '7'
@@ -0,0 +1,115 @@
+"""
+Тесты для сжатия ответов
+"""
+
+import gzip
+import pytest
+from flask import Flask, Response
+from app.utils import compression
+from app.utils.compression import (
+    StaticCompressionCache, compress_response, negotiate, snapshot_response
+)
+from app.utils.json_encoder import CachedSnapshot
+
+
+@pytest.fixture(autouse=True)
+def without_brotli(monkeypatch):
+    """Тесты не зависят от наличия brotli"""
+    monkeypatch.setattr(compression, 'brotli', None)
+
+
+@pytest.fixture
+def flask_app():
+    """Приложение Flask для контекста ответов"""
+    return Flask(__name__)
+
+
+class TestNegotiate:
+    """Тесты выбора кодировки"""
+
+    def test_gzip_accepted(self):
+        """Тест выбора gzip"""
+        assert negotiate('gzip, deflate, br') == 'gzip'
+
+    def test_nothing_accepted(self):
+        """Тест отсутствия поддерживаемых кодировок"""
+        assert negotiate(None) is None
+        assert negotiate('identity') is None
+        assert negotiate('gzip;q=0') is None
+
+    def test_wildcard(self):
+        """Тест кодировки '*'"""
+        assert negotiate('*') == 'gzip'
+
+    def test_brotli_preferred(self, monkeypatch):
+        """Тест предпочтения brotli, если он установлен"""
+        monkeypatch.setattr(compression, 'brotli', object())
+        assert negotiate('gzip, br') == 'br'
+        assert negotiate('gzip, br;q=0.5') == 'gzip'
+
+
+class TestSnapshotResponse:
+    """Тесты ответов из кэшированного снимка"""
+
+    def test_compressed_once(self, flask_app, monkeypatch):
+        """Тест однократного сжатия снимка"""
+        calls = []
+        original = compression.compress
+
+        def counting(data, encoding, cached=False):
+            calls.append(encoding)
+            return original(data, encoding, cached)
+
+        monkeypatch.setattr('app.utils.json_encoder.compress', counting)
+        snapshot = CachedSnapshot(1, b'[' + b'1,' * 2000 + b'1]')
+
+        with flask_app.app_context():
+            first = snapshot_response(snapshot, 'application/json', 'gzip', 1024)
+            second = snapshot_response(snapshot, 'application/json', 'gzip', 1024)
+
+        assert first.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(second.get_data()) == snapshot.body
+        assert calls == ['gzip']
+
+    def test_below_threshold(self, flask_app):
+        """Тест отказа от сжатия маленького тела"""
+        snapshot = CachedSnapshot(1, b'[]')
+        with flask_app.app_context():
+            response = snapshot_response(snapshot, 'application/json', 'gzip', 1024)
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_data() == b'[]'
+
+
+class TestCompressResponse:
+    """Тесты сжатия произвольных ответов"""
+
+    def test_dynamic_response(self, flask_app):
+        """Тест сжатия большого JSON-ответа"""
+        body = b'{"a":"' + b'x' * 4000 + b'"}'
+        with flask_app.app_context():
+            response = compress_response(Response(body, mimetype='application/json'), 'gzip')
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.vary
+        assert gzip.decompress(response.get_data()) == body
+
+    def test_skip_non_compressible(self, flask_app):
+        """Тест пропуска несжимаемых типов и ошибок"""
+        with flask_app.app_context():
+            image = compress_response(Response(b'x' * 4000, mimetype='image/png'), 'gzip')
+            error = compress_response(Response(b'x' * 4000, status=500, mimetype='text/plain'), 'gzip')
+        assert 'Content-Encoding' not in image.headers
+        assert 'Content-Encoding' not in error.headers
+
+    def test_static_cache(self, tmp_path):
+        """Тест кэширования сжатых статических файлов"""
+        path = tmp_path / 'main.js'
+        path.write_bytes(b'console.log(1);' * 200)
+        cache = StaticCompressionCache()
+
+        first = cache.get(str(path), 'gzip')
+        assert cache.get(str(path), 'gzip') is first
+        assert gzip.decompress(first) == path.read_bytes()
+
+        path.write_bytes(b'console.log(2);' * 300)
+        assert gzip.decompress(cache.get(str(path), 'gzip')) == path.read_bytes()
+        assert cache.get(str(tmp_path / 'missing.js'), 'gzip') is None
@@ -0,0 +1,137 @@
+"""
+Тесты для пула подключений
+"""
+
+import threading
+import pytest
+from app.managers.connection_pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    """Подключение-заглушка, записывающее завершение транзакций"""
+
+    def __init__(self, fail_commit=False):
+        self.fail_commit = fail_commit
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+
+    def commit(self):
+        if self.fail_commit:
+            raise RuntimeError('connection lost')
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeManager:
+    """DatabaseManager-заглушка"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = None
+        self.cursor = None
+
+    def connect(self):
+        self.connection = FakeConnection()
+        return True
+
+    def disconnect(self):
+        if self.connection:
+            self.connection.close()
+        self.connection = None
+
+    def end_transaction(self, commit=True):
+        if self.connection:
+            if commit:
+                self.connection.commit()
+            else:
+                self.connection.rollback()
+
+
+@pytest.fixture
+def pool():
+    return ConnectionPool('pool-test.fdb', size=2, factory=FakeManager)
+
+
+class TestConnectionPool:
+    """Тесты для ConnectionPool"""
+
+    def test_reuses_released_manager(self, pool):
+        """Тест повторного использования подключения"""
+        manager = pool.acquire()
+        manager.connect()
+        pool.release(manager)
+
+        assert pool.acquire() is manager
+        assert manager.connection.commits == 1
+
+    def test_size_limit(self, pool):
+        """Тест ограничения количества подключений"""
+        pool.acquire()
+        pool.acquire()
+        with pytest.raises(PoolTimeoutError):
+            pool.acquire(timeout=0.01)
+
+    def test_waits_for_release(self, pool):
+        """Тест ожидания освобождения подключения"""
+        first = pool.acquire()
+        pool.acquire()
+        threading.Timer(0.05, pool.release, args=(first,)).start()
+        assert pool.acquire(timeout=2) is first
+
+    def test_rollback_on_error(self, pool):
+        """Тест отката транзакции при исключении"""
+        with pytest.raises(ValueError):
+            with pool.connection() as manager:
+                manager.connect()
+                raise ValueError()
+        assert manager.connection.rollbacks == 1
+        assert manager.connection.commits == 0
+
+    def test_broken_connection_discarded(self, pool):
+        """Тест закрытия подключения, транзакцию которого не удалось завершить"""
+        manager = pool.acquire()
+        manager.connection = FakeConnection(fail_commit=True)
+        pool.release(manager)
+
+        assert manager.connection is None
+        assert pool.acquire() is not manager
+
+    def test_add_probe(self, pool):
+        """Тест добавления проверочного подключения в пул"""
+        probe = FakeManager(pool.db_path)
+        probe.connect()
+
+        assert pool.add(probe) is True
+        assert pool.idle_count() == 1
+        assert pool.acquire() is probe
+
+    def test_add_when_full(self, pool):
+        """Тест отказа в добавлении в заполненный пул"""
+        pool.acquire()
+        pool.acquire()
+        probe = FakeManager(pool.db_path)
+        probe.connect()
+
+        assert pool.add(probe) is False
+        assert probe.connection is None
+
+    def test_warm(self, pool):
+        """Тест предварительного открытия подключений"""
+        assert pool.warm(5) == 2
+        assert pool.idle_count() == 2
+
+    def test_fork_resets(self, pool):
+        """Тест сброса пула в дочернем процессе"""
+        manager = pool.acquire()
+        manager.connect()
+        pool.release(manager)
+        pool._pid = -1
+
+        assert pool.idle_count() == 0
+        assert pool.acquire() is not manager
@@ -223,3 +223,74 @@ class TestCardModel:
         assert 'Card' in repr_str
         assert 'card_id=1' in repr_str
         assert 'card_number=100' in repr_str
+
+
+class FakeCursor:
+    """Курсор-заглушка, запоминающий выполненные запросы"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+        self._result = []
+
+    def execute(self, query, params=None):
+        self.queries.append((query, params))
+        if params is None:
+            self._result = list(self.rows)
+        else:
+            self._result = [row for row in self.rows if row[0] in params]
+
+    def fetchall(self):
+        return self._result
+
+
+class TestCardQueries:
+    """Тесты для выборок карт с ограничением полей и по списку ID"""
+
+    @pytest.fixture
+    def db(self):
+        """DatabaseManager с курсором-заглушкой"""
+        db = DatabaseManager('test.fdb')
+        db.connection = object()
+        db.cursor = FakeCursor([(card_id, card_id * 10) for card_id in range(1, 1201)])
+        return db
+
+    def test_select_only_requested_fields(self, db):
+        """Тест сужения списка столбцов в SELECT"""
+        db.get_all_card_rows(('card_number', 'valid_until'))
+        query, _ = db.cursor.queries[0]
+
+        assert 'c.CARDNUM' in query
+        assert 'c.CLOSEDATE' in query
+        assert 'c.COMMENTS' not in query
+        assert 'PEOPLE' not in query
+
+    def test_select_room_joins_people(self, db):
+        """Тест соединения с PEOPLE только для поля room"""
+        db.get_all_card_rows(('room',))
+        assert 'LEFT JOIN PEOPLE' in db.cursor.queries[0][0]
+
+    def test_unknown_field(self, db):
+        """Тест отклонения неизвестного поля"""
+        with pytest.raises(ValueError):
+            db.get_all_card_rows(('card_number', 'PASSWORD'))
+
+    def test_rows_by_ids_chunked(self, db):
+        """Тест выборки по списку ID порциями IN"""
+        ids = list(range(1200, 0, -1)) + [5000]
+        rows = db.get_card_rows_by_ids(ids, ('card_number',))
+
+        assert len(db.cursor.queries) == 3
+        assert all(len(params) <= 512 for _, params in db.cursor.queries)
+        assert rows[0] == (12000,)
+        assert rows[-1] == (10,)
+        assert len(rows) == 1200
+
+    def test_rows_by_ids_padded(self, db):
+        """Тест дополнения списка IN до степени двойки"""
+        rows = db.get_card_rows_by_ids([3, 1, 2, 1])
+        query, params = db.cursor.queries[0]
+
+        assert params == [3, 1, 2, 2]
+        assert query.count('?') == 4
+        assert [row[0] for row in rows] == [30, 10, 20]
@@ -35,6 +35,15 @@ class TestErrorHandler:
         assert status == 403
         assert 'error' in response
 
+    def test_handle_database_error_by_gds_code(self):
+        """Тест классификации ошибки fdb по коду GDS, а не по тексту"""
+        # (сообщение, SQLCODE, код GDS): isc_net_read_err
+        error = Exception("Error while executing SQL statement", -902, 335544726)
+        response, status = ErrorHandler.handle_database_error(error)
+        
+        assert status == 503
+        assert 'подключения' in response['error'].lower()
+
     def test_handle_procedure_result_added(self):
         """Тест обработки результата - карта добавлена"""
         response, status = ErrorHandler.handle_procedure_error(0)
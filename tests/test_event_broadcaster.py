@@ -0,0 +1,138 @@
+"""
+Тесты для рассылки событий изменения карт
+"""
+
+import json
+import threading
+import pytest
+from app.managers.event_broadcaster import EventBroadcaster, RESYNC, SQLiteEventLog
+
+
+@pytest.fixture
+def broadcaster():
+    """Рассылка с небольшим буфером"""
+    return EventBroadcaster(max_events=3, history_size=5)
+
+
+class TestEventBroadcaster:
+    """Тесты для EventBroadcaster"""
+
+    def test_publish_to_subscribers_of_same_db(self, broadcaster):
+        """Тест рассылки подписчикам только своей БД"""
+        first = broadcaster.subscribe('a.fdb')
+        second = broadcaster.subscribe('a.fdb')
+        other = broadcaster.subscribe('b.fdb')
+
+        event_id = broadcaster.publish('a.fdb', {'type': 'created', 'card_id': 1})
+
+        assert first.get(0) == (event_id, {'type': 'created', 'card_id': 1})
+        assert second.get(0)[0] == event_id
+        assert other.get(0) is None
+
+    def test_overflow_requests_resync(self, broadcaster):
+        """Тест переполнения буфера медленного клиента"""
+        subscription = broadcaster.subscribe('a.fdb')
+        for card_id in range(5):
+            broadcaster.publish('a.fdb', {'type': 'updated', 'card_id': card_id})
+
+        assert subscription.get(0) == (0, {'type': RESYNC})
+
+    def test_replay_after_reconnect(self, broadcaster):
+        """Тест повторной отправки пропущенных событий по Last-Event-ID"""
+        first = broadcaster.publish('a.fdb', {'type': 'created', 'card_id': 1})
+        second = broadcaster.publish('a.fdb', {'type': 'deleted', 'card_id': 1})
+
+        subscription = broadcaster.subscribe('a.fdb', last_event_id=first)
+        assert subscription.get(0)[0] == second
+        assert subscription.get(0) is None
+
+    def test_replay_gap_requests_resync(self, broadcaster):
+        """Тест resync, если пропущенные события вытеснены из истории"""
+        for card_id in range(10):
+            broadcaster.publish('a.fdb', {'type': 'updated', 'card_id': card_id})
+
+        subscription = broadcaster.subscribe('a.fdb', last_event_id=1)
+        assert subscription.get(0) == (0, {'type': RESYNC})
+
+    def test_unsubscribe(self, broadcaster):
+        """Тест отмены подписки"""
+        subscription = broadcaster.subscribe('a.fdb')
+        assert broadcaster.subscriber_count('a.fdb') == 1
+
+        broadcaster.unsubscribe(subscription)
+        assert broadcaster.subscriber_count() == 0
+        assert subscription.closed
+
+    def test_stream(self, broadcaster):
+        """Тест формата Server-Sent Events"""
+        subscription = broadcaster.subscribe('a.fdb')
+        stream = broadcaster.stream(subscription, heartbeat=0.01)
+
+        assert next(stream).startswith('retry:')
+        assert next(stream) == ': ping\n\n'
+
+        event_id = broadcaster.publish('a.fdb', {'type': 'created', 'card_id': 7})
+        message = next(stream)
+        assert message.startswith(f'id: {event_id}\n')
+        assert json.loads(message.split('data: ', 1)[1]) == {'type': 'created', 'card_id': 7}
+
+        stream.close()
+        assert broadcaster.subscriber_count('a.fdb') == 0
+
+    def test_get_wakes_on_publish(self, broadcaster):
+        """Тест пробуждения ожидающего клиента при публикации"""
+        subscription = broadcaster.subscribe('a.fdb')
+        timer = threading.Timer(0.05, broadcaster.publish, ('a.fdb', {'type': 'created'}))
+        timer.start()
+
+        assert subscription.get(5)[1] == {'type': 'created'}
+        timer.join()
+
+    def test_id_from_previous_start_requests_resync(self, broadcaster):
+        """Тест resync для номера, выданного до перезапуска процесса"""
+        first = broadcaster.publish('a.fdb', {'type': 'created', 'card_id': 1})
+        restarted = EventBroadcaster(max_events=3, history_size=5)
+        restarted._first_id = first + 1000
+        restarted._last_id = restarted._first_id - 1
+        subscription = restarted.subscribe('a.fdb', last_event_id=first)
+        assert subscription.get(0) == (0, {'type': RESYNC})
+
+
+class TestSharedEventLog:
+    """Тесты рассылки между процессами через журнал событий"""
+
+    @pytest.fixture
+    def path(self, tmp_path):
+        return str(tmp_path / 'events.sqlite3')
+
+    def test_events_reach_other_process(self, path):
+        """Тест: событие, опубликованное одним процессом, получает подписчик другого"""
+        publisher = EventBroadcaster(log=SQLiteEventLog(path), poll_interval=0.01)
+        other = EventBroadcaster(log=SQLiteEventLog(path), poll_interval=0.01)
+        subscription = other.subscribe('a.fdb')
+
+        event_id = publisher.publish('a.fdb', {'type': 'created', 'card_id': 1})
+        assert subscription.get(2) == (event_id, {'type': 'created', 'card_id': 1})
+        other.unsubscribe(subscription)
+
+    def test_reconnect_to_other_process(self, path):
+        """Тест: переподключение к другому процессу досылает пропущенные события"""
+        publisher = EventBroadcaster(log=SQLiteEventLog(path))
+        first = publisher.publish('a.fdb', {'type': 'created', 'card_id': 1})
+        second = publisher.publish('a.fdb', {'type': 'deleted', 'card_id': 1})
+
+        other = EventBroadcaster(log=SQLiteEventLog(path))
+        subscription = other.subscribe('a.fdb', last_event_id=first)
+        assert subscription.get(0) == (second, {'type': 'deleted', 'card_id': 1})
+        assert subscription.get(0) is None
+        other.unsubscribe(subscription)
+
+    def test_unknown_or_trimmed_id_requests_resync(self, path):
+        """Тест resync для номера не из журнала и для вытесненных событий"""
+        publisher = EventBroadcaster(log=SQLiteEventLog(path, keep=2))
+        ids = [publisher.publish('a.fdb', {'type': 'updated', 'card_id': n}) for n in range(5)]
+
+        for last_event_id in (ids[0], ids[-1] + 100):
+            subscription = publisher.subscribe('a.fdb', last_event_id=last_event_id)
+            assert subscription.get(0) == (0, {'type': RESYNC})
+            publisher.unsubscribe(subscription)
@@ -0,0 +1,143 @@
+"""
+Тесты для потоковой выгрузки карт
+"""
+
+import csv
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import date
+import pytest
+from app import create_app
+from app import routes
+from app.managers import admission
+from app.managers.admission import READ
+from app.utils.export import write_csv, write_xlsx
+
+FIELDS = ('card_id', 'card_number', 'room', 'valid_from', 'comments')
+ROWS = [
+    (2, 1002, '0203', date(2024, 1, 31), 'комментарий; "в кавычках"'),
+    (1, 1001, None, None, '<тег> & \x01'),
+]
+NS = {'m': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+def read_sheet(data: bytes):
+    """Строки листа XLSX: список списков (значение или текст ячейки)"""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert 'xl/workbook.xml' in archive.namelist()
+        root = ET.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+    rows = []
+    for row in root.iterfind('m:sheetData/m:row', NS):
+        rows.append([cell.findtext('m:is/m:t', namespaces=NS) or cell.findtext('m:v', namespaces=NS)
+                     for cell in row])
+    return rows
+
+
+class TestWriters:
+    """Тесты кодировщиков CSV и XLSX"""
+
+    def test_csv(self):
+        """Тест CSV: BOM, заголовки, экранирование, даты ISO"""
+        data = b''.join(write_csv([ROWS[:1], ROWS[1:]], FIELDS)).decode('utf-8')
+        assert data.startswith('\ufeff')
+        rows = list(csv.reader(io.StringIO(data[1:]), delimiter=';'))
+        assert rows[0][1] == 'Номер карты'
+        assert rows[1] == ['2', '1002', '0203', '2024-01-31', 'комментарий; "в кавычках"']
+        assert rows[2][2] == ''
+
+    def test_xlsx(self):
+        """Тест XLSX: корректный архив, даты - числа Excel, строки экранированы"""
+        data = b''.join(write_xlsx([ROWS[:1], ROWS[1:]], FIELDS))
+        rows = read_sheet(data)
+        assert rows[0][0] == 'ID'
+        assert rows[1] == ['2', '1002', '0203', '45322', 'комментарий; "в кавычках"']
+        assert rows[2] == ['1', '1001', '<тег> & ']
+
+    def test_xlsx_streams_per_batch(self):
+        """Тест: XLSX выдается частями по мере поступления порций"""
+        batch = [(i, i * 7919, f'{i:04d}', date(2024, 1, 1), f'карта {i * 104729}')
+                 for i in range(5000)]
+        batches = iter([batch] * 10)
+        chunks = write_xlsx(batches, FIELDS)
+        next(chunks)
+        next(chunks)
+        assert len(list(batches)) > 5
+
+
+class FakeManager:
+    def __init__(self, batches):
+        self.batches = batches
+        self.closed = False
+
+    def iter_card_rows(self, fields, card_ids=None):
+        try:
+            for batch in self.batches:
+                yield [row[:len(fields)] for row in batch]
+        finally:
+            self.closed = True
+
+
+class FakePool:
+    def __init__(self, manager):
+        self.manager = manager
+        self.released = []
+
+    def acquire(self, timeout=None):
+        return self.manager
+
+    def release(self, manager, commit=True):
+        self.released.append(commit)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(admission, '_controllers', {})
+    app = create_app({'TESTING': True, 'SESSION_TYPE': 'memory'})
+    return app
+
+
+class TestExportRoute:
+    """Тесты GET /cards/export"""
+
+    def test_export_csv_releases_connection(self, app, monkeypatch, login):
+        """Тест выгрузки CSV: подключение и слот освобождаются после передачи"""
+        manager = FakeManager([ROWS, ROWS])
+        pool = FakePool(manager)
+        monkeypatch.setattr(routes, 'get_pool', lambda db_path: pool)
+        client = app.test_client()
+        login(client, db_path='export.fdb', can_view=True)
+
+        response = client.get('/cards/export?format=csv&fields=card_id,card_number')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/csv'
+        assert 'attachment' in response.headers['Content-Disposition']
+        lines = response.get_data().decode('utf-8').splitlines()
+        assert lines[0] == '\ufeffID;Номер карты'
+        assert len(lines) == 5
+        response.close()
+
+        assert pool.released == [True]
+        assert manager.closed
+        assert admission.get_admission('export.fdb').limiter(READ).active == 0
+
+    def test_export_xlsx(self, app, monkeypatch, login):
+        """Тест выгрузки XLSX"""
+        monkeypatch.setattr(routes, 'get_pool', lambda db_path: FakePool(FakeManager([ROWS])))
+        client = app.test_client()
+        login(client, db_path='export.fdb', can_view=True)
+
+        response = client.get('/cards/export?format=xlsx&fields=' + ','.join(FIELDS))
+        assert response.status_code == 200
+        assert read_sheet(response.get_data())[1][1] == '1002'
+        response.close()
+
+    def test_export_unknown_format(self, app, login):
+        """Тест неизвестного формата"""
+        client = app.test_client()
+        login(client, db_path='export.fdb', can_view=True)
+        assert client.get('/cards/export?format=pdf').status_code == 400
+
+    def test_export_requires_login(self, app):
+        """Тест выгрузки без входа"""
+        assert app.test_client().get('/cards/export').status_code == 401
@@ -0,0 +1,229 @@
+"""
+Тесты для фоновых задач
+"""
+
+import threading
+import time
+import pytest
+from app import create_app
+from app.managers.admission import AdmissionRejected
+from app.managers.jobs import (CANCELLED, DONE, FAILED, QUEUED, RUNNING, Job, JobCancelled,
+                               JobRegistry, SQLiteJobStore)
+
+
+def wait_for(job_or_get, status, timeout=2.0):
+    """Дождаться статуса задачи"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = job_or_get() if callable(job_or_get) else job_or_get
+        if job is not None and job.status == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'задача не перешла в статус {status}')
+
+
+def blocking_handler(release: threading.Event):
+    """Функция задачи, ожидающая release и проверяющая отмену"""
+    def handler(job, value):
+        for step in range(100):
+            job.check_cancelled()
+            job.progress(step)
+            if release.wait(0.01):
+                return {'value': value}
+        raise AssertionError('задача не завершена')
+    return handler
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteJobStore(str(tmp_path / 'jobs.sqlite3'))
+
+
+class TestJobRegistry:
+    """Тесты для JobRegistry"""
+
+    def test_runs_job(self):
+        """Тест выполнения задачи и результата"""
+        registry = JobRegistry(workers=1)
+        registry.register('sum', lambda job, a, b: {'sum': a + b})
+        job = registry.submit(Job('sum', 'a.fdb'), 1, 2)
+        wait_for(job, DONE)
+        assert job.result == {'sum': 3}
+        assert job.attempts == 1
+
+    def test_failure_recorded(self):
+        """Тест: исключение функции задачи - статус failed и ошибка"""
+        registry = JobRegistry(workers=1)
+
+        def fail(job):
+            raise RuntimeError('сбой')
+
+        registry.register('fail', fail)
+        job = registry.submit(Job('fail', 'a.fdb'))
+        wait_for(job, FAILED)
+        assert job.error == 'сбой'
+
+    def test_backpressure(self):
+        """Тест: заполненная очередь - отказ с Retry-After"""
+        release = threading.Event()
+        registry = JobRegistry(workers=1, max_queued=1)
+        registry.register('block', blocking_handler(release))
+        running = registry.submit(Job('block', 'a.fdb'), 1)
+        wait_for(running, RUNNING)
+        registry.submit(Job('block', 'a.fdb'), 2)
+        with pytest.raises(AdmissionRejected) as error:
+            registry.submit(Job('block', 'a.fdb'), 3)
+        assert error.value.retry_after >= 1
+        release.set()
+
+    def test_cancel_queued_and_running(self):
+        """Тест отмены задачи в очереди и выполняемой задачи"""
+        release = threading.Event()
+        registry = JobRegistry(workers=1)
+        registry.register('block', blocking_handler(release))
+        running = registry.submit(Job('block', 'a.fdb'), 1)
+        queued = registry.submit(Job('block', 'a.fdb'), 2)
+        wait_for(running, RUNNING)
+
+        registry.cancel(queued.id)
+        registry.cancel(running.id)
+        wait_for(running, CANCELLED)
+        wait_for(queued, CANCELLED)
+        assert queued.started is None
+
+    def test_waits_for_queued_writes(self):
+        """Тест: задача ждет применения журнала отложенной записи своей БД"""
+        class Journal:
+            pending = 2
+
+            def pending_count(self, db_path):
+                Journal.pending -= 1 if db_path == 'a.fdb' else 0
+                return Journal.pending
+
+        job = Job('bulk', 'a.fdb')
+        job.journal = Journal()
+        job.wait_for_queued_writes(interval=0.01)
+        assert Journal.pending == 0
+
+        Journal.pending = 10
+        job.cancel_event.set()
+        with pytest.raises(JobCancelled):
+            job.wait_for_queued_writes(interval=0.01)
+
+    def test_unknown_kind(self):
+        """Тест: вид задачи без функции"""
+        with pytest.raises(KeyError):
+            JobRegistry().submit(Job('unknown', 'a.fdb'))
+
+
+class TestJobPersistence:
+    """Тесты сохранения состояния задач в SQLite"""
+
+    def test_state_visible_from_other_registry(self, store):
+        """Тест: состояние задачи доступно другому процессу через хранилище"""
+        registry = JobRegistry(workers=1, store=store)
+        registry.register('sum', lambda job, a, b: {'sum': a + b})
+        job = registry.submit(Job('sum', 'a.fdb'), 1, 2)
+        wait_for(job, DONE)
+
+        other = JobRegistry(store=store)
+        loaded = wait_for(lambda: other.get(job.id), DONE)
+        assert loaded.result == {'sum': 3}
+        assert [item.id for item in other.list('a.fdb')] == [job.id]
+        assert other.list('b.fdb') == []
+
+    def test_cancel_from_other_registry(self, store):
+        """Тест: отмена через хранилище доходит до процесса, выполняющего задачу"""
+        release = threading.Event()
+        registry = JobRegistry(workers=1, store=store, heartbeat_interval=0.05)
+        registry.register('block', blocking_handler(release))
+        job = registry.submit(Job('block', 'a.fdb'), 1)
+        wait_for(job, RUNNING)
+
+        JobRegistry(store=store).cancel(job.id)
+        wait_for(job, CANCELLED)
+        assert store.load(job.id).status == CANCELLED
+
+    def test_abandoned_job_restarted(self, store):
+        """Тест: задача завершившегося процесса выполняется заново"""
+        job = Job('sum', 'a.fdb')
+        job.args = (2, 3)
+        job.status = RUNNING
+        job.attempts = 1
+        store.save(job, 'dead-process')
+        store._connection().execute("UPDATE jobs SET heartbeat = 0")
+
+        registry = JobRegistry(workers=1, store=store, heartbeat_interval=0.05)
+        registry.register('sum', lambda job, a, b: {'sum': a + b})
+        registry.start()
+        restarted = wait_for(lambda: store.load(job.id), DONE)
+        assert restarted.result == {'sum': 5}
+        assert restarted.attempts == 2
+
+    def test_abandoned_job_not_retryable(self, store):
+        """Тест: начатая неповторяемая задача не перезапускается, не начатая - выполняется"""
+        started = Job('bulk', 'a.fdb')
+        started.args = ('renew',)
+        started.status = RUNNING
+        started.attempts = 1
+        store.save(started, 'dead-process')
+        queued = Job('bulk', 'a.fdb')
+        queued.args = ('renew',)
+        store.save(queued, 'dead-process')
+        store._connection().execute("UPDATE jobs SET heartbeat = 0")
+
+        registry = JobRegistry(workers=1, store=store, heartbeat_interval=0.05)
+        registry.register('bulk', lambda job, operation: {'operation': operation},
+                          retryable=lambda operation: operation != 'renew')
+        registry.start()
+        assert wait_for(lambda: store.load(started.id), FAILED).attempts == 1
+        assert wait_for(lambda: store.load(queued.id), DONE).attempts == 1
+
+    def test_abandoned_job_without_handler_failed(self, store):
+        """Тест: брошенная задача неизвестного вида помечается ошибкой"""
+        job = Job('unknown', 'a.fdb')
+        job.status = QUEUED
+        store.save(job, 'dead-process')
+        store._connection().execute("UPDATE jobs SET heartbeat = 0")
+
+        JobRegistry(store=store, heartbeat_interval=0.05).start()
+        assert wait_for(lambda: store.load(job.id), FAILED).error
+
+
+@pytest.fixture
+def app():
+    app = create_app({'TESTING': True, 'SESSION_TYPE': 'memory', 'JOBS_SQLITE_PATH': ''})
+    app.extensions['jobs'].register('sum', lambda job, a, b: {'sum': a + b})
+    return app
+
+
+class TestJobRoutes:
+    """Тесты GET /jobs и GET /jobs/<id>"""
+
+    def test_list_and_status(self, app, login):
+        """Тест списка задач БД и состояния задачи"""
+        job = app.extensions['jobs'].submit(Job('sum', 'jobs.fdb'), 1, 2)
+        app.extensions['jobs'].submit(Job('sum', 'other.fdb'), 1, 2)
+        wait_for(job, DONE)
+        client = app.test_client()
+        login(client, db_path='jobs.fdb', can_view=True, can_create=True)
+
+        jobs = client.get('/jobs').get_json()['jobs']
+        assert [item['id'] for item in jobs] == [job.id]
+        response = client.get(f'/jobs/{job.id}')
+        assert response.get_json()['result'] == {'sum': 3}
+        assert client.post(f'/jobs/{job.id}/cancel').status_code == 409
+
+    def test_other_database_job_hidden(self, app, login):
+        """Тест: задача другой БД недоступна"""
+        job = app.extensions['jobs'].submit(Job('sum', 'other.fdb'), 1, 2)
+        client = app.test_client()
+        login(client, db_path='jobs.fdb', can_view=True, can_create=True)
+        assert client.get(f'/jobs/{job.id}').status_code == 404
+        assert client.post(f'/jobs/{job.id}/cancel').status_code == 404
+
+    def test_invalid_limit(self, app, login):
+        """Тест некорректного limit"""
+        client = app.test_client()
+        login(client, db_path='jobs.fdb', can_view=True, can_create=True)
+        assert client.get('/jobs?limit=x').status_code == 400
@@ -0,0 +1,105 @@
+"""
+Тесты для сериализации карт в JSON
+"""
+
+import json
+import pytest
+from datetime import date
+from app.managers.database_manager import CARD_FIELDS
+from app.utils import json_encoder
+from app.utils.json_encoder import SnapshotCache, encode_rows
+
+
+@pytest.fixture
+def rows():
+    """Строки выборки карт"""
+    return [
+        (2, 1234568, 'Петров', date(2025, 1, 28), date(2025, 1, 31), 1, None),
+        (1, 1234567, 'Иванов', date(2025, 1, 20), None, 0, 'Тест'),
+    ]
+
+
+class TestEncodeRows:
+    """Тесты кодирования строк"""
+
+    def test_encode_rows(self, rows):
+        """Тест кодирования строк в массив объектов"""
+        cards = json.loads(encode_rows(rows, CARD_FIELDS))
+
+        assert len(cards) == 2
+        assert cards[0] == {
+            'card_id': 2,
+            'card_number': 1234568,
+            'room': 'Петров',
+            'valid_from': '2025-01-28',
+            'valid_until': '2025-01-31',
+            'status': 1,
+            'comments': None
+        }
+        assert cards[1]['valid_until'] is None
+        assert cards[1]['comments'] == 'Тест'
+
+    def test_encode_rows_stdlib_fallback(self, rows, monkeypatch):
+        """Тест кодирования без orjson"""
+        monkeypatch.setattr(json_encoder, 'orjson', None)
+        body = encode_rows(rows, CARD_FIELDS)
+
+        assert json.loads(body)[0]['valid_from'] == '2025-01-28'
+        assert 'Петров'.encode('utf-8') in body
+
+    def test_encode_empty(self):
+        """Тест кодирования пустой выборки"""
+        assert encode_rows([], CARD_FIELDS) == b'[]'
+
+
+class TestSnapshotCache:
+    """Тесты кэша закодированных снимков"""
+
+    def test_unchanged_rows_not_reencoded(self, rows):
+        """Тест повторного использования снимка для неизменных строк"""
+        cache = SnapshotCache()
+        calls = []
+
+        def encoder(data):
+            calls.append(data)
+            return encode_rows(data, CARD_FIELDS)
+
+        first = cache.get_or_encode('db', rows, encoder)
+        second = cache.get_or_encode('db', list(rows), encoder)
+
+        assert first is second
+        assert len(calls) == 1
+
+    def test_changed_rows_reencoded(self, rows):
+        """Тест перекодирования при изменении строк"""
+        cache = SnapshotCache()
+        encoder = lambda data: encode_rows(data, CARD_FIELDS)
+
+        first = cache.get_or_encode('db', rows, encoder)
+        second = cache.get_or_encode('db', rows[:1], encoder)
+
+        assert first is not second
+        assert len(json.loads(second.body)) == 1
+
+    def test_fingerprint_collision_reencoded(self, rows, monkeypatch):
+        """Тест: при совпадении отпечатков разные строки кодируются заново"""
+        monkeypatch.setattr(SnapshotCache, 'fingerprint', staticmethod(lambda rows: 1))
+        cache = SnapshotCache()
+        encoder = lambda data: encode_rows(data, CARD_FIELDS)
+
+        cache.get_or_encode('db', rows, encoder)
+        second = cache.get_or_encode('db', rows[:1], encoder)
+        assert len(json.loads(second.body)) == 1
+
+    def test_eviction_and_invalidate(self, rows):
+        """Тест вытеснения и сброса снимков"""
+        cache = SnapshotCache(max_entries=1)
+        encoder = lambda data: encode_rows(data, CARD_FIELDS)
+
+        first = cache.get_or_encode('a', rows, encoder)
+        cache.get_or_encode('b', rows, encoder)
+        assert cache.get_or_encode('a', rows, encoder) is not first
+
+        cached = cache.get_or_encode('a', rows, encoder)
+        cache.invalidate('a')
+        assert cache.get_or_encode('a', rows, encoder) is not cached
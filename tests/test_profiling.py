@@ -0,0 +1,126 @@
+"""
+Тесты для профилирования приложения
+"""
+
+import os
+import threading
+import pytest
+from app import create_app
+from app import routes
+from app.managers import admission
+from app.managers.report_cache import ReportCache
+from app.utils import profiling
+from app.utils.profiling import ProfilerBusy, RequestProfiles, StackSampler
+
+
+def busy_handler(stop: threading.Event) -> None:
+    profiling.track_request('GET busy')
+    try:
+        while not stop.is_set():
+            sum(range(1000))
+    finally:
+        profiling.untrack_request()
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_handler, args=(stop,), name='wsgi_3')
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+class TestStackSampler:
+    """Тесты StackSampler"""
+
+    def test_samples_request_threads(self, busy_thread):
+        """Тест: стеки потоков запросов с меткой запроса в корне"""
+        sampler = StackSampler(interval=0.001).run(0.05)
+        assert sampler.samples > 0
+        lines = sampler.collapsed().splitlines()
+        assert lines and all(line.startswith('GET busy;') for line in lines)
+        assert any('busy_handler (tests/test_profiling.py:' in line for line in lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) > 0
+
+    def test_all_threads(self, busy_thread):
+        """Тест: all_threads - все потоки, метка - имя потока без номера"""
+        sampler = StackSampler(interval=0.001, all_threads=True).run(0.02)
+        assert any(line.startswith('wsgi;') for line in sampler.collapsed().splitlines())
+
+    def test_one_sampler_per_process(self, monkeypatch):
+        """Тест: второй профилировщик не запускается, пока работает первый"""
+        lock = threading.Lock()
+        lock.acquire()
+        monkeypatch.setattr(profiling, '_sampling', lock)
+        with pytest.raises(ProfilerBusy):
+            StackSampler().run(0.01)
+
+
+def test_request_profiles_rotate(tmp_path):
+    """Тест: профили пишутся в каталог, хранится не больше keep файлов"""
+    profiles = RequestProfiles(str(tmp_path / 'profiles'), keep=2)
+    names = []
+    for number in range(3):
+        result, name = profiles.profile('cards', lambda value: value * 2, number)
+        assert result == number * 2
+        names.append(name)
+    assert sorted(profiles.files()) == sorted(names[1:])
+
+
+class FakeManager:
+    replica_age = None
+    degraded = False
+
+    def get_all_card_rows(self, fields):
+        return [(10, 1001, '1.05', None, None, 1, None)]
+
+
+class FakePool:
+    def acquire(self, timeout=None):
+        return FakeManager()
+
+    def release(self, manager, commit=True):
+        pass
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(admission, '_controllers', {})
+    monkeypatch.setattr(ReportCache, '_registry', {})
+    app = create_app({'TESTING': True, 'SESSION_TYPE': 'memory', 'JOBS_SQLITE_PATH': '',
+                      'PROFILE_DIR': str(tmp_path / 'profiles')})
+    monkeypatch.setattr(routes, 'get_pool', lambda db_path: FakePool())
+    return app.test_client()
+
+
+class TestProfileRoutes:
+    """Тесты маршрутов профилирования"""
+
+    def test_debug_profile_admin_only(self, client, login):
+        """Тест: /debug/profile доступен только администратору"""
+        login(client, db_path='profile.fdb', can_view=True)
+        assert client.get('/debug/profile?seconds=0.01').status_code == 403
+
+        login(client, db_path='profile.fdb', is_admin=True)
+        response = client.get('/debug/profile?seconds=0.02')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        assert int(response.headers['X-Profile-Samples']) > 0
+        assert response.headers['X-Profile-Pid'] == str(os.getpid())
+        assert client.get('/debug/profile?seconds=1000').status_code == 400
+
+    def test_cards_profile(self, client, tmp_path, login):
+        """Тест: GET /cards?profile=1 администратора сохраняет профиль cProfile"""
+        login(client, db_path='profile.fdb', can_view=True)
+        response = client.get('/cards?profile=1')
+        assert response.status_code == 200
+        assert 'X-Profile' not in response.headers
+
+        login(client, db_path='profile.fdb', is_admin=True)
+        response = client.get('/cards?profile=1')
+        assert response.status_code == 200
+        assert response.get_json()[0]['card_id'] == 10
+        assert os.listdir(tmp_path / 'profiles') == [response.headers['X-Profile']]
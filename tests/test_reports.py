@@ -0,0 +1,341 @@
+"""
+Тесты для отчетов по картам
+"""
+
+import sqlite3
+import threading
+from datetime import date
+import pytest
+from app import create_app
+from app import routes
+from app.managers import admission, circuit_breaker
+from app.managers.database_manager import DatabaseManager
+from app.managers.report_cache import ReportCache
+from app.managers.reports import _parse_occupancy, get_report
+from app.utils import occupancy
+from app.utils.occupancy import occupancy_timeline
+
+TODAY = date(2024, 3, 1)
+
+
+class TestReportCache:
+    """Тесты для ReportCache"""
+
+    def test_cached_until_invalidated(self):
+        """Тест: результат вычисляется один раз до сброса"""
+        cache = ReportCache(ttl=60)
+        calls = []
+        compute = lambda: calls.append(1) or len(calls)
+
+        assert cache.get_or_compute('a', compute)[::2] == (1, False)
+        assert cache.get_or_compute('a', compute)[::2] == (1, True)
+        cache.invalidate()
+        assert cache.get_or_compute('a', compute)[::2] == (2, False)
+
+    def test_expired(self):
+        """Тест: устаревший результат вычисляется заново"""
+        cache = ReportCache(ttl=0)
+        assert cache.get_or_compute('a', lambda: 1)[2] is False
+        assert cache.get_or_compute('a', lambda: 2)[0] == 2
+
+    def test_result_computed_before_invalidation_not_stored(self):
+        """Тест: результат, вычисленный до сброса, не сохраняется"""
+        cache = ReportCache(ttl=60)
+
+        def compute():
+            cache.invalidate()
+            return 'old'
+
+        cache.get_or_compute('a', compute)
+        assert len(cache) == 0
+
+    def test_single_computation(self):
+        """Тест: одновременные запросы ждут одного вычисления"""
+        cache = ReportCache(ttl=60)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(2)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('a', compute)))
+                   for _ in range(3)]
+        threads[0].start()
+        started.wait(2)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(2)
+        assert len(calls) == 1
+        assert [result[0] for result in results] == ['value'] * 3
+        assert cache._key_locks == {}
+
+    def test_size_limited(self):
+        """Тест: сверх max_entries вытесняются давно не запрошенные результаты"""
+        cache = ReportCache(ttl=60, max_entries=2)
+        cache.get_or_compute('a', lambda: 1)
+        cache.get_or_compute('b', lambda: 2)
+        assert cache.get_or_compute('a', lambda: 0)[2] is True
+        cache.get_or_compute('c', lambda: 3)
+
+        assert len(cache) == 2
+        assert cache.get_or_compute('a', lambda: 0)[2] is True
+        assert cache.get_or_compute('b', lambda: 0)[::2] == (0, False)
+
+    def test_invalidated_by_other_process(self, tmp_path):
+        """Тест: сброс через файл-отметку виден кэшу другого процесса"""
+        stale_path = str(tmp_path / 'reports.stale')
+        cache = ReportCache(ttl=60, stale_path=stale_path)
+        other = ReportCache(ttl=60, stale_path=stale_path)
+        cache.get_or_compute('a', lambda: 1)
+        assert cache.get_or_compute('a', lambda: 0)[2] is True
+
+        other.invalidate()
+        assert cache.get_or_compute('a', lambda: 2)[::2] == (2, False)
+        assert cache.get_or_compute('a', lambda: 0)[::2] == (2, True)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def test_commit_of_changes_invalidates_reports(monkeypatch):
+    """Тест: подтверждение изменений сбрасывает отчеты БД, чтение - нет"""
+    monkeypatch.setattr(circuit_breaker, '_breakers', {})
+    monkeypatch.setattr(ReportCache, '_registry', {})
+    db = DatabaseManager('reports.fdb')
+    db.connection = FakeConnection()
+    db.report_cache.get_or_compute('a', lambda: 1)
+
+    db.end_transaction(commit=True)
+    assert len(db.report_cache) == 1
+
+    db._dirty = True
+    db.end_transaction(commit=True)
+    assert len(db.report_cache) == 0
+
+
+@pytest.fixture
+def card_tables():
+    """CARDS и PEOPLE в SQLite в том виде, в каком их заполняет HOSTEL_CARDEDIT"""
+    conn = sqlite3.connect(':memory:')
+    conn.executescript("""
+        CREATE TABLE PEOPLE (PEOPLEID INTEGER PRIMARY KEY, LNAME TEXT, FNAME TEXT, MNAME TEXT);
+        CREATE TABLE CARDS (CARDSID INTEGER PRIMARY KEY, CARDNUM INTEGER, PEOPLEID INTEGER,
+                            OPENDATE TEXT, CLOSEDATE TEXT, ACTIVED INTEGER, COMMENTS TEXT);
+        INSERT INTO PEOPLE VALUES (1, 'ХОСТЕЛ', '1.05', '1001'), (2, 'ХОСТЕЛ', '1.06', '1002'),
+                                  (3, 'ОХРАНА', '2.01', '1003');
+        INSERT INTO CARDS VALUES (10, 1001, 1, '2024-01-01', '2024-06-01', 1, NULL),
+                                 (11, 1002, 2, '2024-01-01', '2024-02-01', 1, NULL),
+                                 (12, 1003, 3, '2024-01-01', '2024-06-01', 0, NULL),
+                                 (13, 1004, 99, NULL, NULL, 1, NULL);
+    """)
+    yield conn
+    conn.close()
+
+
+def test_count_cards_by_dep(card_tables, monkeypatch):
+    """Тест: отделы - значения dep процедуры в записи PEOPLE, карты без записи - без отдела"""
+    monkeypatch.setattr(circuit_breaker, '_breakers', {})
+    db = DatabaseManager('reports.fdb')
+    db.connection = card_tables
+    db.cursor = card_tables.cursor()
+    db.statement_timeouts = {}
+
+    rows = db.count_cards_by_dep(TODAY.isoformat())
+    assert sorted(rows, key=lambda row: str(row[0])) == [
+        (None, 1, 0), ('ОХРАНА', 1, 0), ('ХОСТЕЛ', 2, 1)]
+
+
+INTERVALS = [
+    ('1.05', date(2024, 2, 20), date(2024, 3, 2)),
+    ('1.06', None, date(2024, 3, 3)),
+    ('2.01', date(2024, 3, 2), date(2024, 5, 1)),
+    ('x', date(2024, 3, 3), date(2024, 3, 3)),
+    ('1.05', date(2024, 3, 1), None),
+]
+
+
+class TestOccupancyTimeline:
+    """Тесты ряда заполняемости"""
+
+    @pytest.fixture(params=['numpy', 'python'])
+    def backend(self, request, monkeypatch):
+        if request.param == 'python':
+            monkeypatch.setattr(occupancy, 'np', None)
+        elif occupancy.np is None:
+            pytest.skip('NumPy не установлен')
+
+    def test_total_and_groups(self, backend):
+        """Тест: интервалы включительно, обрезаются периодом, без окончания - пропускаются"""
+        timeline = occupancy_timeline(INTERVALS, date(2024, 3, 1), date(2024, 3, 4), 'floor')
+        assert timeline['total'] == [2, 3, 3, 1]
+        assert timeline['keys'] == [1, 2]
+        # Комната с некорректным именем входит только в общий ряд
+        assert timeline['counts'] == [[2, 2, 1, 0], [0, 1, 1, 1]]
+
+    def test_by_room(self, backend):
+        """Тест ряда по комнатам"""
+        timeline = occupancy_timeline(INTERVALS, date(2024, 3, 3), date(2024, 3, 3), 'room')
+        assert (timeline['keys'], timeline['counts']) == ([106, 201], [[1], [1]])
+
+    def test_empty(self, backend):
+        """Тест: нет карт"""
+        assert occupancy_timeline([], date(2024, 3, 1), date(2024, 3, 2), 'room') == {
+            'total': [0, 0], 'keys': [], 'counts': []}
+
+    def test_parse_occupancy(self):
+        """Тест параметров отчета о заполняемости"""
+        assert _parse_occupancy({'from': '2024-03-01', 'group': 'room'}) == {
+            'start': '2024-03-01', 'end': None, 'group': 'room'}
+        for args in ({'from': '01.03.2024'}, {'group': 'dep'},
+                     {'from': '2024-03-02', 'to': '2024-03-01'},
+                     {'from': '2020-01-01', 'to': '2024-01-01'}):
+            with pytest.raises(ValueError):
+                _parse_occupancy(args)
+
+
+class FakeManager:
+    def __init__(self):
+        self.calls = 0
+
+    def count_active_cards_by_floor(self, today):
+        self.calls += 1
+        return [('10', 3), ('2', 5), ('x', 1)]
+
+    def count_cards_expiring_by_day(self, start, end):
+        self.calls += 1
+        return [(date(2024, 3, 3), 4)]
+
+    def count_cards_by_dep(self, today):
+        self.calls += 1
+        return [('ХОСТЕЛ', 10, 7), (None, 2, None)]
+
+    def get_card_intervals(self, start, end):
+        self.calls += 1
+        self.period = (start, end)
+        return INTERVALS
+
+
+class TestReports:
+    """Тесты построения отчетов"""
+
+    @pytest.fixture(autouse=True)
+    def registry(self, monkeypatch):
+        monkeypatch.setattr(ReportCache, '_registry', {})
+
+    def run(self, manager):
+        return lambda build: build(manager)
+
+    def test_active_by_floor(self):
+        """Тест: этажи числами по возрастанию, некорректные пропускаются"""
+        report = get_report('r.fdb', 'active-by-floor', {}, self.run(FakeManager()), TODAY)
+        assert report['rows'] == [{'floor': 2, 'active': 5}, {'floor': 10, 'active': 3}]
+
+    def test_expiring_by_day(self):
+        """Тест: дни без истекающих карт дополняются нулями"""
+        report = get_report('r.fdb', 'expiring-by-day', {'days': 3}, self.run(FakeManager()), TODAY)
+        assert [row['expiring'] for row in report['rows']] == [0, 0, 4]
+        assert report['rows'][0]['date'] == '2024-03-01'
+
+    def test_by_dep(self):
+        """Тест отчета по отделам"""
+        report = get_report('r.fdb', 'cards-by-dep', {}, self.run(FakeManager()), TODAY)
+        assert report['rows'][1] == {'dep': None, 'issued': 2, 'active': 0}
+
+    def test_occupancy(self):
+        """Тест: даты периода и ряды по группам"""
+        manager = FakeManager()
+        params = {'start': '2024-03-01', 'end': '2024-03-04', 'group': 'floor'}
+        report = get_report('r.fdb', 'occupancy', params, self.run(manager), TODAY)
+        assert manager.period == (date(2024, 3, 1), date(2024, 3, 4))
+        assert report['dates'][::3] == ['2024-03-01', '2024-03-04']
+        assert report['groups'][1] == {'floor': 2, 'counts': [0, 1, 1, 1]}
+
+    def test_occupancy_default_period(self):
+        """Тест: без дат - год от сегодняшнего дня"""
+        manager = FakeManager()
+        report = get_report('r.fdb', 'occupancy', {'start': None, 'end': None, 'group': None},
+                            self.run(manager), TODAY)
+        assert manager.period == (TODAY, date(2025, 2, 28))
+        assert len(report['total']) == 365 and 'groups' not in report
+
+    def test_cached_by_params(self):
+        """Тест: отчет кэшируется с учетом параметров"""
+        manager = FakeManager()
+        get_report('r.fdb', 'expiring-by-day', {'days': 3}, self.run(manager), TODAY)
+        assert get_report('r.fdb', 'expiring-by-day', {'days': 3}, self.run(manager),
+                          TODAY)['cached'] is True
+        get_report('r.fdb', 'expiring-by-day', {'days': 5}, self.run(manager), TODAY)
+        assert manager.calls == 2
+
+
+class FakePool:
+    def __init__(self, manager):
+        self.manager = manager
+        self.acquired = 0
+
+    def acquire(self, timeout=None):
+        self.acquired += 1
+        return self.manager
+
+    def release(self, manager, commit=True):
+        pass
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(admission, '_controllers', {})
+    monkeypatch.setattr(ReportCache, '_registry', {})
+    return create_app({'TESTING': True, 'SESSION_TYPE': 'memory', 'JOBS_SQLITE_PATH': ''})
+
+
+class TestReportRoutes:
+    """Тесты GET /reports"""
+
+    def test_report_served_from_cache(self, app, monkeypatch, login):
+        """Тест: повторный запрос не занимает подключение"""
+        pool = FakePool(FakeManager())
+        monkeypatch.setattr(routes, 'get_pool', lambda db_path: pool)
+        client = app.test_client()
+        login(client, db_path='reports.fdb', can_view=True)
+
+        first = client.get('/reports/active-by-floor').get_json()
+        second = client.get('/reports/active-by-floor').get_json()
+        assert first['rows'] == second['rows']
+        assert (first['cached'], second['cached']) == (False, True)
+        assert pool.acquired == 1
+
+    def test_list_and_errors(self, app, login):
+        """Тест списка отчетов, неизвестного отчета и параметров"""
+        client = app.test_client()
+        login(client, db_path='reports.fdb', can_view=True)
+        names = [item['name'] for item in client.get('/reports').get_json()['reports']]
+        assert 'expiring-by-day' in names
+        assert client.get('/reports/unknown').status_code == 404
+        assert client.get('/reports/expiring-by-day?days=0').status_code == 400
+        assert client.get('/reports/occupancy?group=dep').status_code == 400
+
+    def test_occupancy(self, app, monkeypatch, login):
+        """Тест GET /reports/occupancy"""
+        monkeypatch.setattr(routes, 'get_pool', lambda db_path: FakePool(FakeManager()))
+        client = app.test_client()
+        login(client, db_path='reports.fdb', can_view=True)
+
+        response = client.get('/reports/occupancy?from=2024-03-01&to=2024-03-04&group=room')
+        assert response.status_code == 200
+        assert response.get_json()['total'] == [2, 3, 3, 1]
+        assert response.get_json()['groups'][0] == {'room': 105, 'counts': [1, 1, 0, 0]}
@@ -3,7 +3,7 @@
 """
 
 import pytest
-from hypothesis import given, strategies as st, settings
+from hypothesis import HealthCheck, given, strategies as st, settings
 from datetime import date, timedelta
 from app import app as flask_app
 
@@ -64,7 +64,7 @@ class TestSelectDatabaseRoute:
         """Тест POST с невалидным путем"""
         response = client.post('/select-database', data={'db_path': '/invalid/path.fdb'})
         assert response.status_code == 200
-        assert b'error' in response.data.lower() or b'не найден' in response.data.lower()
+        assert b'error' in response.data.lower() or 'не найден'.encode('utf-8') in response.data.lower()
 
 
 class TestLoginRoute:
@@ -77,7 +77,7 @@ class TestLoginRoute:
         
         response = client.get('/login')
         assert response.status_code == 200
-        assert b'username' in response.data or b'пользователя' in response.data.lower()
+        assert b'username' in response.data or 'пользователя'.encode('utf-8') in response.data.lower()
 
     def test_login_redirect_without_db(self, client):
         """Тест редиректа на выбор БД при отсутствии пути"""
@@ -138,7 +138,7 @@ class TestErrorHandlers:
         response = client.get('/nonexistent')
         assert response.status_code == 404
 
-    def test_400_error(self, client):
+    def test_400_error(self, client, authenticated_session):
         """Тест обработки ошибки 400"""
         response = client.post('/cards', json=None)
         # Flask может вернуть 400 или 415 в зависимости от конфигурации
@@ -150,7 +150,7 @@ class TestErrorHandlers:
     card_number=st.integers(min_value=1, max_value=9999999),
     valid_days=st.integers(min_value=1, max_value=365)
 )
-@settings(max_examples=50)
+@settings(max_examples=50, suppress_health_check=[HealthCheck.function_scoped_fixture])
 def test_create_card_property(client, authenticated_session, room, card_number, valid_days):
     """
     Property 1: Создание карты с валидными данными
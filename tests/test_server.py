@@ -0,0 +1,114 @@
+"""
+Тесты для сервера рабочих процессов
+"""
+
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+import pytest
+from app.server import DETACH_STREAM, WorkerServer
+
+
+def slow_app(environ, start_response):
+    """WSGI-приложение с долгой обработкой запроса"""
+    time.sleep(float(environ.get('QUERY_STRING') or 0))
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'ok']
+
+
+def stream_app(release: threading.Event):
+    """WSGI-приложение: /stream - поток событий до release, остальное - сразу"""
+    def app(environ, start_response):
+        if environ['PATH_INFO'] != '/stream':
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'ok']
+        if not environ[DETACH_STREAM]():
+            start_response('503 Service Unavailable', [('Content-Type', 'text/plain')])
+            return [b'busy']
+        start_response('200 OK', [('Content-Type', 'text/event-stream')])
+
+        def events():
+            yield b': connected\n\n'
+            release.wait(5)
+
+        return events()
+
+    return app
+
+
+@pytest.fixture
+def server():
+    sock = socket.create_server(('127.0.0.1', 0))
+    server = WorkerServer(sock, slow_app, threads=2, max_requests=3)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05})
+    thread.start()
+    server.thread = thread
+    yield server
+    server.stop('тест')
+    thread.join(5)
+    server.server_close()
+    sock.close()
+
+
+def fetch(server, delay=0):
+    url = f'http://127.0.0.1:{server.server_address[1]}/?{delay}'
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.read()
+
+
+class TestWorkerServer:
+    """Тесты для WorkerServer"""
+
+    def test_serves_requests(self, server):
+        """Тест обработки запросов"""
+        assert fetch(server) == b'ok'
+        assert server.handled == 1
+
+    def test_drain_waits_for_in_flight(self, server):
+        """Тест завершения начатого запроса при остановке"""
+        result = []
+        client = threading.Thread(target=lambda: result.append(fetch(server, 0.3)))
+        client.start()
+        time.sleep(0.1)
+        server.stop('тест')
+
+        assert server.drain(5) is True
+        client.join(5)
+        assert result == [b'ok']
+
+    def test_stops_after_max_requests(self, server):
+        """Тест остановки после max_requests запросов"""
+        for _ in range(3):
+            fetch(server)
+        server.thread.join(5)
+        assert not server.thread.is_alive()
+
+
+def test_streams_do_not_hold_request_slots():
+    """Тест: открытый поток событий не занимает слот обычных запросов, их лимит отдельный"""
+    release = threading.Event()
+    sock = socket.create_server(('127.0.0.1', 0))
+    server = WorkerServer(sock, stream_app(release), threads=1, streams=1)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05})
+    thread.start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    stream = None
+    try:
+        stream = urllib.request.urlopen(f'{base}/stream', timeout=5)
+        assert stream.readline() == b': connected\n'
+
+        with urllib.request.urlopen(f'{base}/', timeout=5) as response:
+            assert response.read() == b'ok'
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f'{base}/stream', timeout=5)
+        assert error.value.code == 503
+    finally:
+        release.set()
+        if stream is not None:
+            stream.close()
+        server.stop('тест')
+        thread.join(5)
+        server.server_close()
+        sock.close()
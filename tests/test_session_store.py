@@ -0,0 +1,164 @@
+"""
+Тесты для серверного хранения сессий
+"""
+
+import pytest
+from flask import Flask, session
+from app.managers.session_store import (
+    MemorySessionStore, SessionStore, SQLiteSessionStore, ServerSideSessionInterface,
+    create_session_interface, regenerate_session
+)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    """Хранилище сессий каждого типа"""
+    if request.param == 'memory':
+        return MemorySessionStore(max_entries=3)
+    return SQLiteSessionStore(str(tmp_path / 'sessions.sqlite3'))
+
+
+@pytest.fixture
+def flask_app():
+    """Приложение с серверными сессиями"""
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.session_interface = ServerSideSessionInterface(MemorySessionStore(), sweep_interval=0)
+
+    @app.route('/set/<value>')
+    def set_value(value):
+        session['value'] = value
+        return 'ok'
+
+    @app.route('/get')
+    def get_value():
+        return session.get('value', '-')
+
+    @app.route('/clear')
+    def clear():
+        session.clear()
+        return 'ok'
+
+    @app.route('/login')
+    def login():
+        regenerate_session(session)
+        session['user_id'] = 1
+        return 'ok'
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        regenerate_session(session)
+        return 'ok'
+
+    return app
+
+
+class TestSessionStore:
+    """Тесты хранилищ сессий"""
+
+    def test_save_load_delete(self, store):
+        """Тест сохранения, загрузки и удаления"""
+        store.save('sid', {'user_id': 1, 'username': 'Иван'}, 60)
+
+        data, expires = store.load('sid')
+        assert data == {'user_id': 1, 'username': 'Иван'}
+        assert expires > 0
+
+        store.delete('sid')
+        assert store.load('sid') is None
+
+    def test_expiry_and_sweep(self, store):
+        """Тест истечения и очистки сессий"""
+        store.save('old', {'a': 1}, -1)
+        store.save('new', {'a': 2}, 60)
+
+        assert store.load('old') is None
+        store.sweep()
+        assert store.load('new')[0] == {'a': 2}
+
+    def test_touch(self, store):
+        """Тест продления сессии"""
+        store.save('sid', {'a': 1}, 1)
+        _, before = store.load('sid')
+        store.touch('sid', 60)
+        assert store.load('sid')[1] > before
+
+    def test_abstract_store(self):
+        """Тест: хранилище без реализации методов не создается"""
+        with pytest.raises(TypeError):
+            SessionStore()
+
+    def test_memory_lru_eviction(self):
+        """Тест вытеснения давно не использованных сессий"""
+        store = MemorySessionStore(max_entries=2)
+        store.save('a', {}, 60)
+        store.save('b', {}, 60)
+        store.load('a')
+        store.save('c', {}, 60)
+
+        assert store.load('b') is None
+        assert store.load('a') is not None
+        assert len(store) == 2
+
+
+class TestServerSideSessionInterface:
+    """Тесты интерфейса сессий Flask"""
+
+    def test_cookie_contains_only_id(self, flask_app):
+        """Тест хранения данных на сервере"""
+        client = flask_app.test_client()
+        client.get('/set/secret-value')
+
+        cookie = client.get_cookie('session')
+        assert cookie is not None
+        assert 'secret' not in cookie.value
+        assert client.get('/get').data == b'secret-value'
+
+    def test_anonymous_request_not_stored(self, flask_app):
+        """Тест отсутствия записей для пустых сессий"""
+        client = flask_app.test_client()
+        client.get('/get')
+        assert len(flask_app.session_interface.store) == 0
+
+    def test_unknown_id_not_trusted(self, flask_app):
+        """Тест замены неизвестного идентификатора новым"""
+        client = flask_app.test_client()
+        client.set_cookie('session', 'forged')
+        client.get('/set/x')
+        assert client.get_cookie('session').value != 'forged'
+
+    def test_clear_deletes_session(self, flask_app):
+        """Тест удаления сессии при выходе"""
+        client = flask_app.test_client()
+        client.get('/set/x')
+        client.get('/clear')
+
+        assert len(flask_app.session_interface.store) == 0
+        assert client.get('/get').data == b'-'
+
+    def test_login_and_logout_rotate_id(self, flask_app):
+        """Тест: при входе и выходе идентификатор меняется, прежняя запись удаляется"""
+        store = flask_app.session_interface.store
+        client = flask_app.test_client()
+        client.get('/set/x')
+        before = client.get_cookie('session').value
+
+        client.get('/login')
+        after = client.get_cookie('session').value
+        assert after != before
+        assert store.load(before) is None
+        assert store.load(after)[0] == {'value': 'x', 'user_id': 1}
+
+        client.get('/logout')
+        assert client.get_cookie('session') is None
+        assert store.load(after) is None and len(store) == 0
+
+    def test_create_session_interface(self, tmp_path):
+        """Тест выбора типа хранилища"""
+        assert create_session_interface('cookie') is None
+        assert isinstance(create_session_interface('memory').store, MemorySessionStore)
+        sqlite = create_session_interface('sqlite', sqlite_path=str(tmp_path / 's.db'))
+        assert isinstance(sqlite.store, SQLiteSessionStore)
+        with pytest.raises(ValueError):
+            create_session_interface('redis')
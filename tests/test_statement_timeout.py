@@ -0,0 +1,166 @@
+"""
+Тесты для ограничения времени выполнения операторов
+"""
+
+import threading
+import time
+import pytest
+from app.managers import circuit_breaker, statement_timeout
+from app.managers.database_manager import LIST, DatabaseManager
+from app.managers.statement_timeout import StatementWatchdog
+from app.utils.db_errors import ISC_CANCELLED, TIMEOUT, StatementTimeout, classify_error
+from app.utils.error_handler import ErrorHandler
+
+
+class CancelledError(Exception):
+    """Ошибка fdb после fb_cancel_operation"""
+
+    def __init__(self):
+        super().__init__('- SQLCODE: -901\n- operation was cancelled', -901, ISC_CANCELLED)
+
+
+class SlowConnection:
+    """Подключение, оператор которого выполняется до отмены"""
+
+    def __init__(self):
+        self.cancel_requested = threading.Event()
+        self.rollbacks = 0
+        self.slow = True
+
+    def cursor(self):
+        return SlowCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        pass
+
+
+class SlowCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, params=()):
+        if self.connection.slow:
+            if not self.connection.cancel_requested.wait(5):
+                raise AssertionError('оператор не отменен')
+            raise CancelledError()
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def watchdog(monkeypatch):
+    watchdog = StatementWatchdog(cancel=lambda connection: connection.cancel_requested.set())
+    monkeypatch.setattr(statement_timeout, '_watchdog', watchdog)
+    monkeypatch.setattr(circuit_breaker, '_breakers', {})
+    return watchdog
+
+
+class TestStatementWatchdog:
+    """Тесты для StatementWatchdog"""
+
+    def test_cancels_expired_statement(self, watchdog):
+        """Тест отмены оператора по истечении времени"""
+        connection = SlowConnection()
+        with watchdog.watch(connection, 0.05) as watch:
+            assert connection.cancel_requested.wait(2)
+        assert watch.expired
+        assert watchdog.cancelled == 1
+
+    def test_finished_statement_not_cancelled(self, watchdog):
+        """Тест: завершившийся вовремя оператор не отменяется"""
+        connection = SlowConnection()
+        with watchdog.watch(connection, 0.05) as watch:
+            pass
+        time.sleep(0.1)
+        assert not watch.expired
+        assert not connection.cancel_requested.is_set()
+
+    def test_no_timeout(self, watchdog):
+        """Тест: без ограничения наблюдение не создается"""
+        with watchdog.watch(SlowConnection(), 0) as watch:
+            assert watch is None
+
+
+class TestDatabaseManagerTimeout:
+    """Тесты отмены запросов DatabaseManager"""
+
+    def test_slow_list_cancelled_and_connection_clean(self, watchdog, monkeypatch):
+        """Тест: медленная выборка отменяется, транзакция откатывается, подключение пригодно"""
+        monkeypatch.setattr(DatabaseManager, 'statement_timeouts', {LIST: 0.05})
+        db = DatabaseManager('slow.fdb')
+        connection = SlowConnection()
+        db.connection = connection
+        db.cursor = connection.cursor()
+
+        started = time.monotonic()
+        with pytest.raises(StatementTimeout) as error:
+            db.get_all_card_rows(('card_id',))
+        assert time.monotonic() - started < 2
+        assert error.value.timeout == 0.05
+        assert connection.rollbacks == 1
+        assert db.connection is connection
+
+        connection.slow = False
+        assert db.get_all_card_rows(('card_id',)) == [(1,)]
+
+    def test_timeout_reported_as_504(self):
+        """Тест: отмена оператора - ответ 504"""
+        assert classify_error(CancelledError()) == TIMEOUT
+        response, status = ErrorHandler.handle_database_error(StatementTimeout('slow', 1))
+        assert status == 504
+        assert 'error' in response
+
+
+class TimedOutManager:
+    """Менеджер БД, оператор которого отменен наблюдателем"""
+
+    replica_age = None
+    degraded = False
+
+    def get_all_card_rows(self, fields):
+        raise StatementTimeout('SELECT CARDS', 30)
+
+    def call_cardedit_procedure(self, **params):
+        raise StatementTimeout('HOSTEL_CARDEDIT', 5)
+
+
+class TimedOutPool:
+    def acquire(self, timeout=None):
+        return TimedOutManager()
+
+    def release(self, manager, commit=True):
+        pass
+
+
+@pytest.mark.parametrize('method, path', [
+    ('get', '/cards'),
+    ('get', '/cards/1001'),
+    ('delete', '/cards/1001'),
+])
+def test_flask_routes_return_504(method, path, monkeypatch):
+    """Тест: отмененный оператор в маршруте Flask - ответ 504, а не 500"""
+    from app import create_app, routes
+    from app.managers import admission
+
+    monkeypatch.setattr(admission, '_controllers', {})
+    app = create_app({'TESTING': True, 'SESSION_TYPE': 'memory', 'JOBS_SQLITE_PATH': ''})
+    monkeypatch.setattr(routes, 'get_pool', lambda db_path: TimedOutPool())
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['db_path'] = 'slow.fdb'
+        sess['permissions'] = {'can_view': True, 'can_delete': True}
+
+    response = getattr(client, method)(path)
+    assert response.status_code == 504
+    assert 'error' in response.get_json()
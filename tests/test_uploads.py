@@ -0,0 +1,109 @@
+"""
+Тесты для потоковой загрузки файлов БД
+"""
+
+import hashlib
+import io
+import os
+import time
+import pytest
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.utils.uploads import HashingFile, UploadRequest, cleanup_partial_uploads, store_upload
+
+
+class TestHashingFile:
+    """Тесты для HashingFile"""
+
+    def test_persist_by_hash(self, tmp_path):
+        """Тест сохранения файла под именем по хешу"""
+        data = b'firebird' * 1000
+        upload = HashingFile(str(tmp_path))
+        upload.write(data)
+
+        path, created = upload.persist()
+
+        assert created is True
+        assert os.path.basename(path) == hashlib.sha256(data).hexdigest() + '.fdb'
+        assert open(path, 'rb').read() == data
+        assert os.listdir(tmp_path) == [os.path.basename(path)]
+
+    def test_duplicate_reuses_file(self, tmp_path):
+        """Тест повторной загрузки того же содержимого"""
+        first = HashingFile(str(tmp_path))
+        first.write(b'data')
+        path, _ = first.persist()
+        mtime = os.stat(path).st_mtime_ns
+
+        second = HashingFile(str(tmp_path))
+        second.write(b'data')
+        again, created = second.persist()
+
+        assert again == path
+        assert created is False
+        assert os.stat(path).st_mtime_ns == mtime
+        assert len(os.listdir(tmp_path)) == 1
+
+    def test_size_limit(self, tmp_path):
+        """Тест ограничения размера с удалением временного файла"""
+        upload = HashingFile(str(tmp_path), max_size=10)
+        upload.write(b'12345')
+        with pytest.raises(RequestEntityTooLarge):
+            upload.write(b'678901')
+        assert os.listdir(tmp_path) == []
+
+    def test_close_removes_part(self, tmp_path):
+        """Тест удаления незавершенной загрузки"""
+        upload = HashingFile(str(tmp_path))
+        upload.write(b'data')
+        upload.close()
+        assert os.listdir(tmp_path) == []
+
+
+class TestUploadRequest:
+    """Тесты разбора multipart-запроса"""
+
+    def test_streams_fdb_to_upload_dir(self, tmp_path):
+        """Тест записи .fdb в каталог загрузок при разборе запроса"""
+        app = Flask(__name__)
+        app.request_class = UploadRequest
+        app.config['UPLOAD_DIR'] = str(tmp_path)
+        data = os.urandom(4096)
+
+        with app.test_request_context('/', method='POST',
+                                      data={'db_file': (io.BytesIO(data), 'guardee.fdb')}):
+            from flask import request
+            file = request.files['db_file']
+            assert isinstance(file.stream, HashingFile)
+            path, created = store_upload(file, str(tmp_path))
+
+        assert created is True
+        assert open(path, 'rb').read() == data
+        assert not [name for name in os.listdir(tmp_path) if name.endswith('.part')]
+
+    def test_store_plain_stream(self, tmp_path):
+        """Тест сохранения файла, разобранного без UploadRequest"""
+        file = FileStorage(io.BytesIO(b'abc'), filename='guardee.fdb')
+        path, created = store_upload(file, str(tmp_path), max_size=100)
+        assert os.path.basename(path) == hashlib.sha256(b'abc').hexdigest() + '.fdb'
+
+    def test_store_plain_stream_too_large(self, tmp_path):
+        """Тест ограничения размера при копировании потока"""
+        file = FileStorage(io.BytesIO(b'x' * 101), filename='guardee.fdb')
+        with pytest.raises(RequestEntityTooLarge):
+            store_upload(file, str(tmp_path), max_size=100)
+        assert os.listdir(tmp_path) == []
+
+
+def test_cleanup_partial_uploads(tmp_path):
+    """Тест удаления старых незавершенных загрузок"""
+    old = tmp_path / 'old.part'
+    old.write_bytes(b'x')
+    past = time.time() - 7200
+    os.utime(old, (past, past))
+    (tmp_path / 'fresh.part').write_bytes(b'x')
+    (tmp_path / 'db.fdb').write_bytes(b'x')
+
+    assert cleanup_partial_uploads(str(tmp_path)) == 1
+    assert sorted(os.listdir(tmp_path)) == ['db.fdb', 'fresh.part']
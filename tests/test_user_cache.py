@@ -0,0 +1,122 @@
+"""
+Тесты для кэша пользователей
+"""
+
+import pytest
+from app.managers.database_manager import DatabaseManager
+from app.managers.user_cache import UserCache
+
+
+class UsersCursor:
+    """Курсор-заглушка для таблицы USERS"""
+
+    def __init__(self, users):
+        self.users = users
+        self.queries = []
+        self._row = None
+
+    def execute(self, query, params=None):
+        self.queries.append(query)
+        if 'COUNT(*)' in query:
+            self._row = (len(self.users), max(u[0] for u in self.users),
+                         sum(u[2] for u in self.users), sum(u[3] for u in self.users))
+        elif 'WHERE NAME' in query:
+            self._row = next((u for u in self.users if u[1] == params[0]), None)
+        else:
+            self._row = next((u for u in self.users if u[0] == params[0]), None)
+
+    def fetchone(self):
+        return self._row
+
+    def lookups(self):
+        return [q for q in self.queries if 'COUNT(*)' not in q]
+
+
+@pytest.fixture
+def db():
+    """DatabaseManager с отдельным кэшем и курсором-заглушкой"""
+    db = DatabaseManager('users-test.fdb')
+    db.user_cache = UserCache(ttl=60, version_interval=60)
+    db.connection = object()
+    db.cursor = UsersCursor([(1, 'admin', 0x0F, 0), (2, 'guest', 0x00, 0)])
+    return db
+
+
+class TestUserCache:
+    """Тесты для UserCache"""
+
+    def test_put_and_get(self):
+        """Тест поиска по имени и ID"""
+        cache = UserCache(ttl=60)
+        cache.put({'id': 1, 'username': 'admin', 'permissions': {'is_admin': True}})
+
+        assert cache.get_by_name('admin')['id'] == 1
+        assert cache.get_by_id(1)['username'] == 'admin'
+        assert cache.get_by_name('guest') is None
+
+    def test_returns_copies(self):
+        """Тест защиты кэша от изменения возвращенных записей"""
+        cache = UserCache(ttl=60)
+        cache.put({'id': 1, 'username': 'admin', 'permissions': {'is_admin': True}})
+
+        cache.get_by_id(1)['permissions']['is_admin'] = False
+        assert cache.get_by_id(1)['permissions']['is_admin'] is True
+
+    def test_ttl_expiry(self):
+        """Тест устаревания записей"""
+        cache = UserCache(ttl=0)
+        cache.put({'id': 1, 'username': 'admin', 'permissions': {}})
+        assert cache.get_by_id(1) is None
+
+    def test_version_change_clears(self):
+        """Тест сброса при изменении версии USERS"""
+        cache = UserCache(ttl=60)
+        assert cache.update_version((2, 2, 15, 0)) is False
+        cache.put({'id': 1, 'username': 'admin', 'permissions': {}})
+
+        assert cache.update_version((2, 2, 15, 0)) is False
+        assert cache.get_by_id(1) is not None
+        assert cache.update_version((3, 3, 15, 0)) is True
+        assert cache.get_by_id(1) is None
+
+    def test_for_database_shared(self):
+        """Тест общего кэша для одной БД"""
+        assert UserCache.for_database('a.fdb') is UserCache.for_database('a.fdb')
+        assert UserCache.for_database('a.fdb') is not UserCache.for_database('b.fdb')
+
+
+class TestDatabaseManagerUserCache:
+    """Тесты кэширования в DatabaseManager"""
+
+    def test_repeated_login_single_query(self, db):
+        """Тест повторного входа без запроса к USERS"""
+        first = db.authenticate_user('admin', 'secret')
+        second = db.authenticate_user('admin', 'secret')
+
+        assert first == second
+        assert first['permissions']['is_admin'] is True
+        assert len(db.cursor.lookups()) == 1
+
+    def test_get_user_by_id_after_login(self, db):
+        """Тест поиска по ID пользователя, найденного по имени"""
+        db.authenticate_user('guest', 'secret')
+        user = db.get_user_by_id(2)
+
+        assert user['username'] == 'guest'
+        assert len(db.cursor.lookups()) == 1
+
+    def test_users_change_invalidates(self, db):
+        """Тест сброса кэша при изменении прав в USERS"""
+        db.authenticate_user('guest', 'secret')
+        db.cursor.users[1] = (2, 'guest', 0x08, 0)
+        db.user_cache.version_interval = 0
+
+        assert db.authenticate_user('guest', 'secret')['permissions']['is_admin'] is True
+        assert len(db.cursor.lookups()) == 2
+
+    def test_invalidate(self, db):
+        """Тест сброса кэша администратором"""
+        db.get_user_by_id(1)
+        db.invalidate_user_cache()
+        db.get_user_by_id(1)
+        assert len(db.cursor.lookups()) == 2
@@ -0,0 +1,219 @@
+"""
+Тесты для журнала отложенной записи изменений карт
+"""
+
+from contextlib import contextmanager
+import pytest
+from app import create_app
+from app import routes
+from app.managers import admission
+from app.managers.circuit_breaker import DatabaseUnavailable
+from app.managers.report_cache import ReportCache
+from app.managers.write_journal import (APPLIED, APPLYING, CONFLICT, FAILED, MAX_ATTEMPTS,
+                                        PENDING, UNCERTAIN, WriteJournal, WriteReplayer)
+
+
+class FakeManager:
+    """call_cardedit_procedure возвращает заданные результаты по номеру карты"""
+
+    def __init__(self, results=None):
+        self.results = results or {}
+        self.calls = []
+        self.commits = []
+
+    def call_cardedit_procedure(self, **params):
+        self.calls.append(params['card_number'])
+        result = self.results.get(params['card_number'], {'result_code': 1})
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def end_transaction(self, commit=True):
+        self.commits.append(commit)
+
+
+def replayer_for(journal, manager, **kwargs):
+    @contextmanager
+    def connect(db_path):
+        yield manager
+
+    return WriteReplayer(journal, connect, **kwargs)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return WriteJournal(str(tmp_path / 'writes.sqlite3'))
+
+
+def card(card_number):
+    return {'action': 1, 'room': 105, 'card_number': card_number}
+
+
+class TestWriteJournal:
+    """Тесты WriteJournal и WriteReplayer"""
+
+    def test_idempotency_key(self, journal):
+        """Тест: повтор с тем же ключом возвращает прежнюю запись"""
+        first = journal.append('a.fdb', card(1001), key='k1', user_id=1)
+        assert journal.append('a.fdb', card(1002), key='k1')['id'] == first['id']
+        assert journal.append('b.fdb', card(1002), key='k1')['id'] != first['id']
+        assert journal.pending_count('a.fdb') == 1
+        assert first['params'] == card(1001) and first['status'] == PENDING
+
+    def test_replay_in_order(self, journal):
+        """Тест: записи применяются по порядку, каждая в своей транзакции"""
+        for number in (1003, 1001, 1002):
+            journal.append('a.fdb', card(number))
+        manager = FakeManager()
+        applied = []
+        replayer = replayer_for(journal, manager,
+                                on_applied=lambda db, entry, result: applied.append(entry['id']))
+
+        summary = replayer.replay('a.fdb')
+        assert summary == {'applied': 3, 'conflicts': 0, 'failed': 0, 'pending': 0}
+        assert manager.calls == [1003, 1001, 1002]
+        assert manager.commits == [True, True, True]
+        assert applied == [1, 2, 3]
+        assert journal.get('a.fdb', 1)['status'] == APPLIED
+
+    def test_conflict_codes(self, journal):
+        """Тест: коды 2 и 3 - конфликт с результатом процедуры, применение продолжается"""
+        journal.append('a.fdb', card(1001))
+        journal.append('a.fdb', card(1002))
+        manager = FakeManager({1001: {'result_code': 3}})
+
+        summary = replayer_for(journal, manager).replay('a.fdb')
+        assert (summary['conflicts'], summary['applied']) == (1, 1)
+        entry = journal.get('a.fdb', 1)
+        assert entry['status'] == CONFLICT
+        assert entry['result'] == {'result_code': 3}
+        assert entry['error'] == 'Карта не найдена'
+
+    def test_stall_keeps_order(self, journal):
+        """Тест: при недоступности БД запись остается в очереди, следующие ждут"""
+        journal.append('a.fdb', card(1001))
+        journal.append('a.fdb', card(1002))
+        manager = FakeManager({1001: DatabaseUnavailable('нет подключения')})
+
+        summary = replayer_for(journal, manager).replay('a.fdb')
+        assert summary == {'applied': 0, 'conflicts': 0, 'failed': 0, 'pending': 2}
+        assert manager.calls == [1001]
+        entry = journal.get('a.fdb', 1)
+        assert (entry['status'], entry['error']) == (PENDING, 'нет подключения')
+
+    def test_procedure_error_fails_after_attempts(self, journal):
+        """Тест: ошибка процедуры повторяется до MAX_ATTEMPTS, затем запись failed"""
+        journal.append('a.fdb', card(1001))
+        journal.append('a.fdb', card(1002))
+        manager = FakeManager({1001: {'error': 'ошибка'}})
+        replayer = replayer_for(journal, manager)
+
+        for _ in range(MAX_ATTEMPTS - 1):
+            replayer.replay('a.fdb')
+        assert journal.get('a.fdb', 1)['status'] == PENDING
+        assert manager.calls == [1001] * (MAX_ATTEMPTS - 1)
+        assert manager.commits == [False] * (MAX_ATTEMPTS - 1)
+
+        summary = replayer.replay('a.fdb')
+        assert (summary['failed'], summary['applied']) == (1, 1)
+        assert journal.get('a.fdb', 1)['status'] == FAILED
+
+    def test_unexpected_error_counts_attempts(self, journal):
+        """Тест: прочая ошибка откатывает транзакцию и не оставляет запись в applying"""
+        journal.append('a.fdb', card(1001))
+        journal.append('a.fdb', card(1002))
+        manager = FakeManager({1001: RuntimeError('ошибка драйвера')})
+        replayer = replayer_for(journal, manager)
+
+        for _ in range(MAX_ATTEMPTS):
+            summary = replayer.replay('a.fdb')
+        entry = journal.get('a.fdb', 1)
+        assert (entry['status'], entry['error']) == (FAILED, 'ошибка драйвера')
+        assert summary == {'applied': 0, 'conflicts': 0, 'failed': 1, 'pending': 1}
+        assert manager.commits == [False] * MAX_ATTEMPTS
+
+        assert replayer.replay('a.fdb')['applied'] == 1
+        assert manager.calls == [1001] * MAX_ATTEMPTS + [1002]
+
+    def test_lease_shared_between_processes(self, journal):
+        """Тест: записи БД применяет один владелец аренды"""
+        other = WriteJournal(journal.path)
+        assert journal.claim('a.fdb', 'a', 60)
+        assert not other.claim('a.fdb', 'b', 60)
+        journal.append('a.fdb', card(1001))
+        assert replayer_for(other, FakeManager()).replay('a.fdb') is None
+        journal.claim('a.fdb', 'a', -1)
+        assert replayer_for(other, FakeManager()).replay('a.fdb')['applied'] == 1
+
+
+    def test_interrupted_entry_uncertain(self, journal):
+        """Тест: запись, прерванная во время применения, не применяется повторно"""
+        first = journal.append('a.fdb', card(1001))
+        journal.append('a.fdb', card(1002))
+        journal.start_attempt(first['id'])
+        manager = FakeManager()
+        replayer = replayer_for(journal, manager)
+
+        assert replayer.replay('a.fdb')['pending'] == 2
+        assert replayer.replay('a.fdb')['pending'] == 2
+        assert manager.calls == []
+        assert journal.get('a.fdb', first['id'])['status'] == UNCERTAIN
+
+        with pytest.raises(ValueError):
+            journal.resolve('a.fdb', first['id'], APPLYING)
+        assert journal.resolve('a.fdb', first['id'], APPLIED)['status'] == APPLIED
+        assert journal.resolve('a.fdb', first['id'], PENDING) is None
+        assert replayer.replay('a.fdb') == {'applied': 1, 'conflicts': 0, 'failed': 0,
+                                            'pending': 0}
+        assert manager.calls == [1002]
+
+
+class UnavailablePool:
+    def acquire(self, timeout=None):
+        raise DatabaseUnavailable('нет подключения')
+
+    def release(self, manager, commit=True):
+        pass
+
+
+def test_create_card_queued_when_unavailable(tmp_path, monkeypatch):
+    """Тест: при недоступности БД карта ставится в журнал (202), запись доступна по Location"""
+    monkeypatch.setattr(admission, '_controllers', {})
+    monkeypatch.setattr(ReportCache, '_registry', {})
+    app = create_app({'TESTING': True, 'SESSION_TYPE': 'memory', 'JOBS_SQLITE_PATH': '',
+                      'WRITE_BEHIND_PATH': str(tmp_path / 'writes.sqlite3'),
+                      'WRITE_BEHIND_INTERVAL': 3600})
+    monkeypatch.setattr(routes, 'get_pool', lambda db_path: UnavailablePool())
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['db_path'] = 'queued.fdb'
+        sess['permissions'] = {'can_create': True, 'can_view': True}
+
+    headers = {'Idempotency-Key': 'req-1'}
+    response = client.post('/cards', json={'card_number': 1001, 'room': 105}, headers=headers)
+    assert response.status_code == 202
+    entry = response.get_json()['entry']
+    assert entry['params']['valid_from'] is not None
+
+    again = client.post('/cards', json={'card_number': 1001, 'room': 105}, headers=headers)
+    assert again.get_json()['entry']['id'] == entry['id']
+
+    queued = client.get(response.headers['Location'])
+    assert queued.get_json()['status'] == PENDING
+    assert client.get('/cards/queued').get_json()['pending'] == 1
+
+    # Удаление не опережает ожидающее создание карты
+    with client.session_transaction() as sess:
+        sess['permissions'] = {'can_delete': True, 'can_view': True}
+    deleted = client.delete('/cards/1001')
+    assert deleted.status_code == 202
+    assert deleted.get_json()['entry']['params'] == {'action': 2, 'card_number': 1001}
+    assert client.get('/cards/queued').get_json()['pending'] == 2
+
+    # Решение оператора принимается только для записей uncertain
+    with client.session_transaction() as sess:
+        sess['permissions'] = {'can_edit': True, 'can_view': True}
+    resolve_url = f"/cards/queued/{entry['id']}/resolve"
+    assert client.post(resolve_url, json={'status': APPLIED}).status_code == 409
+    assert client.post(resolve_url, json={'status': 'done'}).status_code == 400